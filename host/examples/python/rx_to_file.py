@@ -39,12 +39,14 @@ def multi_usrp_rx(args):
     num_samps = int(np.ceil(args.duration*args.rate))
     if not isinstance(args.channels, list):
         args.channels = [args.channels]
+    if not args.numpy:
+        # Raw files can be streamed to disk without holding the capture in memory
+        usrp.recv_num_samps_to_file(
+            args.output_file, num_samps, args.freq, args.rate, args.channels, args.gain)
+        return
     samps = usrp.recv_num_samps(num_samps, args.freq, args.rate, args.channels, args.gain)
     with open(args.output_file, 'wb') as out_file:
-        if args.numpy:
-            np.save(out_file, samps, allow_pickle=False, fix_imports=False)
-        else:
-            samps.tofile(out_file)
+        np.save(out_file, samps, allow_pickle=False, fix_imports=False)
 
 def rfnoc_dram_rx(args):
     """
@@ -63,7 +63,8 @@ def multi_usrp_tx(args):
             # all configurations are applied and late command errors being reported.
             tx_start_time = usrp.get_time_now() + args.tx_delay
 
-    data = uhd.dsp.signals.get_continuous_tone(
+    # send_waveform() repeats the buffer by itself, so one period is enough
+    data, _ = uhd.dsp.signals.get_continuous_tone_period(
         args.rate,
         args.wave_freq,
         args.wave_ampl,
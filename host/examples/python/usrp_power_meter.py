@@ -114,6 +114,7 @@ def main():
     usrp = uhd.usrp.MultiUSRP(args.args)
     (chan, ref_level) = setup_device(usrp, args)
     streamer = get_streamer(usrp, chan)
+    power_meter = uhd.dsp.signals.PowerMeter(streamer, num_samps=int(args.samps_per_est))
     if args.mode == 'continuous':
         def handle_sigint(_sig, _frame):
             print("Caught Ctrl-C, exiting...")
@@ -122,8 +123,7 @@ def main():
         signal.signal(signal.SIGINT, handle_sigint)
     while RUN:
         try:
-            power_dbfs = uhd.dsp.signals.get_usrp_power(
-                streamer, num_samps=int(args.samps_per_est))
+            power_dbfs = power_meter.measure()[0]
         except RuntimeError:
             # This is a hack b/c the signal handler is not gracefully handling
             # SIGINT
@@ -133,6 +133,92 @@ COMMON_PY_TMPL = """<% import time %>\
 
 from enum import Enum
 
+<%text>
+def _field(index):
+    "Return a property for the register field which is stored at index"
+    def fget(self):
+        return self._values[index]
+    def fset(self, value):
+        self._set_value(index, value)
+    return property(fget, fset)
+
+
+def _array_field(start, length):
+    "Return a property for the register array stored at start...start+length"
+    def fget(self):
+        return _RegArray(self, start, length)
+    def fset(self, values):
+        _RegArray(self, start, length)[:] = values
+    return property(fget, fset)
+
+
+def _field_table(fields):
+    \"\"\"
+    Expand the field descriptions (addr, addr_step, array_len, mask, shift)
+    into the address of every stored value, and a map
+    addr -> [(index, mask, shift)] of the values in every register.
+    \"\"\"
+    addrs = []
+    words = {}
+    for addr, addr_step, array_len, mask, shift in fields:
+        for offset in range(array_len):
+            words.setdefault(addr + offset * addr_step, []).append(
+                (len(addrs), mask, shift))
+            addrs.append(addr + offset * addr_step)
+    return tuple(addrs), words
+
+
+class _RegArray:
+    "List-like view onto a register array. Writes are tracked by the regmap."
+    __slots__ = ("_regs", "_indices")
+
+    def __init__(self, regs, start, length):
+        self._regs = regs
+        self._indices = range(start, start + length)
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._regs._values[i] for i in self._indices[index]]
+        return self._regs._values[self._indices[index]]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            indices = self._indices[index]
+            values = list(value)
+            if len(values) != len(indices):
+                raise ValueError("Can't change the length of a register array")
+            for i, val in zip(indices, values):
+                self._regs._set_value(i, val)
+        else:
+            self._regs._set_value(self._indices[index], value)
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __eq__(self, other):
+        if isinstance(other, _RegArray):
+            other = other.copy()
+        return self.copy() == other
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def copy(self):
+        "Return the values of the array as a list"
+        return self._regs._values[self._indices.start:self._indices.stop]
+</%text>
+<%
+    # Every field value is stored in one flat list. Arrays take up one entry
+    # per element.
+    indices = []
+    num_values = 0
+    for reg in regs:
+        indices.append(num_values)
+        num_values += reg.get_array_len() if reg.is_array else 1
+%>
 ## Create a class for the register map
 class ${name}_t:
     ## Create an enum for each register which has defined values
@@ -145,65 +231,98 @@ class ${name}_t:
     % endif
     %endfor
 
+    ## The fields are properties, which write through _set_value(), so every
+    ## change is tracked
+    % for index, reg in zip(indices, regs):
+    % if reg.is_array:
+    ${reg.get_name()} = _array_field(${index}, ${reg.get_array_len()})
+    % else:
+    ${reg.get_name()} = _field(${index})
+    % endif
+    ${reg.get_name()}_addr = ${reg.get_addr()}
+    ${reg.get_name()}_mask = ${reg.get_mask()}
+    ${reg.get_name()}_shift = ${reg.get_shift()}
+    % endfor
+
+    _ADDRS, _WORDS = _field_table((
+    % for reg in regs:
+        (${reg.get_addr()}, ${reg.get_addr_step_size()}, ${reg.get_array_len() if reg.is_array else 1}, ${reg.get_mask()}, ${reg.get_shift()}),
+    % endfor
+    ))
+
+    __slots__ = ("_values", "_saved", "_state_saved")
+
     def __init__(self):
         ## Assign each register to its default value
-        self._state = None
-        % for reg in regs:
+        self._values = [None] * ${num_values}
+        # Maps value index -> value at the last save_state(). Only contains
+        # the values which were written since then.
+        self._saved = {}
+        self._state_saved = False
+        % for index, reg in zip(indices, regs):
             % if reg.get_enums():
                 % if reg.is_array:
-        self.${reg.get_name()} = [self.${reg.get_name()}_t.${reg.get_default()},] * ${reg.get_array_len()}
+        self._values[${index}:${index + reg.get_array_len()}] = [self.${reg.get_name()}_t.${reg.get_default()},] * ${reg.get_array_len()}
                 % else:
-        self.${reg.get_name()} = self.${reg.get_name()}_t.${reg.get_default()}
+        self._values[${index}] = self.${reg.get_name()}_t.${reg.get_default()}
                 % endif
             % else:
                 % if reg.is_array:
-        self.${reg.get_name()} = [${reg.get_default()},] * ${reg.get_array_len()}
+        self._values[${index}:${index + reg.get_array_len()}] = [${reg.get_default()},] * ${reg.get_array_len()}
                 % else:
-        self.${reg.get_name()} = ${reg.get_default()}
+        self._values[${index}] = ${reg.get_default()}
                 % endif
             % endif
-        self.${reg.get_name()}_addr = ${reg.get_addr()}
-        self.${reg.get_name()}_mask = ${reg.get_mask()}
-        self.${reg.get_name()}_shift = ${reg.get_shift()}
         % endfor
 
+    def _set_value(self, index, value):
+        if index not in self._saved:
+            self._saved[index] = self._values[index]
+        self._values[index] = value
+
     ${body}
 
     def save_state(self):
-        if self._state is None:
-            self._state = ${name}_t()
-        % for reg in regs:
-            % if reg.is_array:
-        self._state.${reg.get_name()} = self.${reg.get_name()}.copy()
-            % else:
-        self._state.${reg.get_name()} = self.${reg.get_name()}
-            % endif
-        % endfor
+        self._saved.clear()
+        self._state_saved = True
 
-    % for reg in regs:
-    def get_state_${reg.get_name()}(self):
-        if self._state is None:
+    def _get_state(self, index):
+        if not self._state_saved:
             raise RuntimeError("No saved state")
-        return self._state.${reg.get_name()}
+        return self._saved.get(index, self._values[index])
+
+    % for index, reg in zip(indices, regs):
+    def get_state_${reg.get_name()}(self):
+        % if reg.is_array:
+        return [self._get_state(index) for index in range(${index}, ${index + reg.get_array_len()})]
+        % else:
+        return self._get_state(${index})
+        % endif
 
     %endfor
 
     def get_changed_addrs(self):
-        if self._state is None:
+        if not self._state_saved:
             raise RuntimeError("No saved state")
-        #check each register for changes
-        addrs = set()
-        % for reg in regs:
-        % if reg.is_array:
-        for index, value in enumerate(self.${reg.get_name()}):
-            if self._state.${reg.get_name()}[index] != value:
-                addrs.add(${reg.get_addr()} + index * ${reg.get_addr_step_size()})
-        % else:
-        if self._state.${reg.get_name()} != self.${reg.get_name()}:
-            addrs.add(${reg.get_addr()})
-        % endif
-        % endfor
-        return addrs
+        # Only values which were written since save_state() can differ
+        return {self._ADDRS[index] for index, value in self._saved.items()
+                if self._values[index] != value}
+
+    def get_dirty_writes(self):
+        \"\"\"
+        Return a sorted list of (addr, value) of every register which changed
+        since the last save_state(). This does not save the state.
+        \"\"\"
+        writes = []
+        for addr in sorted(self.get_changed_addrs()):
+            word = 0
+            for index, mask, shift in self._WORDS[addr]:
+                value = self._values[index]
+                if isinstance(value, Enum):
+                    value = value.value
+                word |= (int(value) & mask) << shift
+            writes.append((addr, word))
+        return writes
 
     % for mreg in mregs:
     def get_${mreg.get_name()}(self):
@@ -12,6 +12,30 @@
 #include <uhd/types/metadata.hpp>
 #include <boost/format.hpp>
 
+/*! Return a new reference to a NumPy array whose rows can be used in-place
+ *
+ * Arrays whose rows are individually contiguous are used as-is, even if the rows
+ * themselves are not adjacent in memory. This includes result[:, a:b] views of a
+ * larger 2D array, np.memmap slices, and np.broadcast_to() arrays (row stride 0)
+ * for sending. recv() and send() can then access the caller's memory directly.
+ * Anything else is converted to a C-contiguous array.
+ */
+static PyObject* get_row_array(py::object& np_array, const bool writeable)
+{
+    if (PyArray_Check(np_array.ptr())) {
+        PyArrayObject* array_type_obj = reinterpret_cast<PyArrayObject*>(np_array.ptr());
+        const int dims                = PyArray_NDIM(array_type_obj);
+        if (dims >= 1 && dims <= 2 && PyArray_ISALIGNED(array_type_obj)
+            && (!writeable || PyArray_ISWRITEABLE(array_type_obj))
+            && PyArray_STRIDE(array_type_obj, dims - 1)
+                   == PyArray_ITEMSIZE(array_type_obj)) {
+            Py_INCREF(np_array.ptr());
+            return np_array.ptr();
+        }
+    }
+    return PyArray_FROM_OF(np_array.ptr(), NPY_ARRAY_CARRAY);
+}
+
 static size_t wrap_recv(uhd::rx_streamer* rx_stream,
     py::object& np_array,
     uhd::rx_metadata_t& metadata,
@@ -19,7 +43,7 @@ static size_t wrap_recv(uhd::rx_streamer* rx_stream,
 {
     // Get a numpy array object from given python object
     // No sanity checking possible!
-    PyObject* array_obj           = PyArray_FROM_OF(np_array.ptr(), NPY_ARRAY_CARRAY);
+    PyObject* array_obj           = get_row_array(np_array, true);
     PyArrayObject* array_type_obj = reinterpret_cast<PyArrayObject*>(array_obj);
 
     // Get dimensions of the numpy array
@@ -79,7 +103,7 @@ static size_t wrap_send(uhd::tx_streamer* tx_stream,
     // No sanity checking possible!
     // Note: this increases the ref count, which we'll need to manually decrease at the
     // end
-    PyObject* array_obj           = PyArray_FROM_OF(np_array.ptr(), NPY_ARRAY_CARRAY);
+    PyObject* array_obj           = get_row_array(np_array, false);
     PyArrayObject* array_type_obj = reinterpret_cast<PyArrayObject*>(array_obj);
 
     // Get dimensions of the numpy array
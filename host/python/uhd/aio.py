@@ -0,0 +1,311 @@
+#
+# Copyright 2024 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+""" @package aio
+asyncio front-end for the UHD Python API
+
+All UHD calls (and all MPM RPC calls) block the calling thread. The classes in
+this module offload these calls onto executor threads and expose them as
+awaitables, so a single event loop can control many devices.
+
+Every wrapped object gets its own single-threaded executor by default. This
+keeps calls into one object in order (none of the wrapped objects are
+thread-safe), while calls into different objects run in parallel. Streamers
+get their own executor, so a blocking recv() or send() does not hold up
+control calls to the same device. recv() and send() release the GIL while they
+wait for data. The wrappers are async context managers, which shut down their
+executors on exit (or call close()). Closing an AsyncMultiUSRP also closes the
+streamers it created.
+
+Example:
+
+>>> async def capture(args):
+...     async with await AsyncMultiUSRP.create(args) as usrp:
+...         rx_streamer = await usrp.get_rx_stream(uhd.usrp.StreamArgs("fc32", "sc16"))
+...         buff = np.empty((1, rx_streamer.get_max_num_samps()), dtype=np.complex64)
+...         metadata = uhd.types.RXMetadata()
+...         async with rx_streaming(rx_streamer, usrp=usrp):
+...             num_samps = await rx_streamer.recv(buff, metadata)
+"""
+
+import asyncio
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import libpyuhd as lib
+from .usrp import MultiUSRP
+
+# Delay between reading the device time and a timed stream start
+INIT_DELAY = 0.05
+
+
+def _new_executor(name):
+    """
+    Return a new single-threaded executor.
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+
+class AsyncProxy:
+    """
+    Wrap an arbitrary object such that all of its methods become coroutines.
+
+    Attributes which are not callable are returned as-is. Calls are executed on
+    the given executor, in the order in which they were awaited.
+    """
+
+    def __init__(self, obj, executor=None):
+        """
+        :param obj: The (blocking) object to wrap
+        :param executor: A concurrent.futures.Executor. If None, a new
+                         single-threaded executor is created for this object.
+        """
+        self._obj = obj
+        self._owns_executor = executor is None
+        self._executor = executor or _new_executor(type(obj).__name__)
+
+    @property
+    def wrapped(self):
+        """
+        Return the underlying blocking object.
+        """
+        return self._obj
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run an arbitrary callable on this object's executor.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs))
+
+    def close(self):
+        """
+        Shut down the executor, if it was created by this object.
+
+        Waits for pending calls to complete. From a coroutine, use aclose()
+        (or async with) instead, which doesn't block the event loop.
+        """
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    async def aclose(self):
+        """
+        Shut down the executor without blocking the event loop, see close().
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self._obj, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def _async_call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        return _async_call
+
+
+class AsyncRXStreamer(AsyncProxy):
+    """
+    Async wrapper for an RX streamer.
+
+    recv() and issue_stream_cmd() are awaitables. The cheap getters
+    (get_num_channels() and get_max_num_samps()) are called directly.
+    """
+
+    def get_num_channels(self):
+        """
+        See RXStreamer.get_num_channels()
+        """
+        return self._obj.get_num_channels()
+
+    def get_max_num_samps(self):
+        """
+        See RXStreamer.get_max_num_samps()
+        """
+        return self._obj.get_max_num_samps()
+
+
+class AsyncTXStreamer(AsyncProxy):
+    """
+    Async wrapper for a TX streamer.
+
+    send(), recv_async_msg() are awaitables. The cheap getters
+    (get_num_channels() and get_max_num_samps()) are called directly.
+    """
+
+    def get_num_channels(self):
+        """
+        See TXStreamer.get_num_channels()
+        """
+        return self._obj.get_num_channels()
+
+    def get_max_num_samps(self):
+        """
+        See TXStreamer.get_max_num_samps()
+        """
+        return self._obj.get_max_num_samps()
+
+
+class AsyncMultiUSRP(AsyncProxy):
+    """
+    Async wrapper for MultiUSRP.
+
+    Use create() to construct the underlying MultiUSRP object without blocking
+    the event loop. get_rx_stream() and get_tx_stream() return async streamer
+    wrappers, each of which runs on its own executor thread. get_tree()
+    returns an AsyncProxy for the property tree, sharing this device's
+    executor.
+    """
+
+    @classmethod
+    async def create(cls, args="", executor=None):
+        """
+        Create a MultiUSRP object on an executor thread and wrap it.
+
+        :param args: Device args, see MultiUSRP
+        :param executor: Optional executor. If None, a new single-threaded
+                         executor is used for this device.
+        """
+        owns_executor = executor is None
+        executor = executor or _new_executor("MultiUSRP")
+        loop = asyncio.get_running_loop()
+        try:
+            usrp = await loop.run_in_executor(executor, MultiUSRP, args)
+        except BaseException:
+            if owns_executor:
+                executor.shutdown(wait=False)
+            raise
+        wrapper = cls(usrp, executor)
+        wrapper._owns_executor = owns_executor
+        return wrapper
+
+    def __init__(self, obj, executor=None):
+        super().__init__(obj, executor)
+        self._streamers = []
+
+    async def get_rx_stream(self, stream_args):
+        """
+        Create an RX streamer and return it as an AsyncRXStreamer.
+        """
+        streamer = AsyncRXStreamer(await self.run(self._obj.get_rx_stream, stream_args))
+        self._streamers.append(streamer)
+        return streamer
+
+    async def get_tx_stream(self, stream_args):
+        """
+        Create a TX streamer and return it as an AsyncTXStreamer.
+        """
+        streamer = AsyncTXStreamer(await self.run(self._obj.get_tx_stream, stream_args))
+        self._streamers.append(streamer)
+        return streamer
+
+    def close(self):
+        """
+        Shut down the executors of this device and of all streamers created by
+        it.
+        """
+        for streamer in self._streamers:
+            streamer.close()
+        self._streamers = []
+        super().close()
+
+    async def get_tree(self):
+        """
+        Return the property tree as an AsyncProxy.
+        """
+        return AsyncProxy(await self.run(self._obj.get_tree), self._executor)
+
+
+class AsyncMPMClient(AsyncProxy):
+    """
+    Async wrapper for mpmtools.MPMClient.
+
+    All RPC methods of the device become awaitables. Use connect() to create
+    the connection without blocking the event loop.
+    """
+
+    @classmethod
+    async def connect(cls, init_mode, host, port=None, token=None, executor=None):
+        """
+        Connect to an MPM device on an executor thread and wrap the client.
+
+        Arguments are the same as for mpmtools.MPMClient.
+        """
+        # mprpc is an optional dependency, so only import mpmtools when needed
+        # pylint: disable=import-outside-toplevel
+        from .utils import mpmtools
+
+        if port is None:
+            port = mpmtools.MPM_RPC_PORT
+        owns_executor = executor is None
+        executor = executor or _new_executor(f"MPMClient-{host}")
+        loop = asyncio.get_running_loop()
+        try:
+            client = await loop.run_in_executor(
+                executor, mpmtools.MPMClient, init_mode, host, port, token)
+        except BaseException:
+            if owns_executor:
+                executor.shutdown(wait=False)
+            raise
+        wrapper = cls(client, executor)
+        wrapper._owns_executor = owns_executor
+        return wrapper
+
+
+@contextlib.asynccontextmanager
+async def rx_streaming(rx_streamer, start_time=None, dtype=np.complex64, usrp=None):
+    """
+    Async context manager which starts continuous streaming on entry, and
+    stops it on exit.
+
+    On exit, any samples still in flight are flushed from the streamer.
+
+    :param rx_streamer: An AsyncRXStreamer
+    :param start_time: A TimeSpec object with the start time. If None,
+                       single-channel streams start immediately. Streams with
+                       multiple channels need a timed start to be aligned, so
+                       they start INIT_DELAY after the current device time.
+    :param dtype: NumPy data type matching the CPU format of the streamer.
+                  Used for flushing.
+    :param usrp: The AsyncMultiUSRP the streamer belongs to. Only required to
+                 read the device time for multi-channel streams without a
+                 start_time.
+    """
+    if start_time is None and rx_streamer.get_num_channels() > 1:
+        if usrp is None:
+            raise ValueError(
+                "Multi-channel streams require a start_time or the usrp argument!")
+        start_time = lib.types.time_spec(
+            (await usrp.get_time_now()).get_real_secs() + INIT_DELAY)
+    stream_cmd = lib.types.stream_cmd(lib.types.stream_mode.start_cont)
+    stream_cmd.stream_now = start_time is None
+    if start_time is not None:
+        stream_cmd.time_spec = start_time
+    await rx_streamer.issue_stream_cmd(stream_cmd)
+    try:
+        yield rx_streamer
+    finally:
+        await rx_streamer.issue_stream_cmd(
+            lib.types.stream_cmd(lib.types.stream_mode.stop_cont))
+        metadata = lib.types.rx_metadata()
+        flush_buffer = np.empty(
+            (rx_streamer.get_num_channels(), rx_streamer.get_max_num_samps()),
+            dtype=dtype)
+        while await rx_streamer.recv(flush_buffer, metadata):
+            pass
@@ -7,59 +7,133 @@
 Utilities for generating/analyzing signals
 """
 
+import collections
 import math
+import threading
 import numpy
 import uhd
 
-def get_continuous_tone(rate, freq, ampl, desired_size=None, max_size=None, waveform='sine'):
+# Max. number of bytes of tone periods kept by _get_tone_period(). Periods
+# which are larger than this on their own are never cached.
+TONE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_tone_cache = collections.OrderedDict()
+_tone_cache_bytes = 0
+_tone_cache_lock = threading.Lock()
+
+def clear_tone_cache():
     """
-    Return a buffer containing a complex tone at frequency freq. The tone is
-    continuous, that is, repeating this signal will produce a continuous phase
-    sinusoid.
-    The buffer will try and approximate desired_size in length. If it is not
-    possible to create a buffer smaller than max_size, an exception is thrown.
+    Drop all tone periods cached by get_continuous_tone_period() and
+    get_continuous_tone().
+    """
+    global _tone_cache_bytes
+    with _tone_cache_lock:
+        _tone_cache.clear()
+        _tone_cache_bytes = 0
 
-    Arguments:
-    rate   -- Sampling rate in Hz.
-    freq   -- Tone frequency in Hz
-    ampl   -- Amplitude
-    desired_size -- Number of samples ideally in returned buffer
-    max_size -- Number of samples maximally in returned buffer
-    waveform -- Waveform type: 'sine', 'square', 'ramp'
+def _get_tone_period(f_norm, length, ampl, waveform):
     """
-    desired_size = desired_size or 1.0 * rate # About one second worth of data
-    max_size = max_size or 100e6
-    assert rate > freq
-    rate_int = int(rate)
-    freq_int = int(freq)
-    gcd = math.gcd(rate_int, freq_int)
-    rate_int = rate_int / gcd
-    freq_int = freq_int / gcd
-    length = int(max(freq_int * rate_int, 1)) # freq may be zero
-    f_norm = freq/rate
+    Return a read-only buffer containing one continuous period of a tone.
+
+    This is cached on the normalized parameters, so repeated calls with the
+    same rate/frequency ratio return the same (shared) array. The least
+    recently used periods are evicted once the cache exceeds
+    TONE_CACHE_MAX_BYTES.
+    """
+    global _tone_cache_bytes
+    key = (f_norm, length, ampl, waveform)
+    with _tone_cache_lock:
+        tone = _tone_cache.get(key)
+        if tone is not None:
+            _tone_cache.move_to_end(key)
+            return tone
+    tone = _make_tone_period(f_norm, length, ampl, waveform)
+    if tone.nbytes > TONE_CACHE_MAX_BYTES:
+        return tone
+    with _tone_cache_lock:
+        if key not in _tone_cache:
+            _tone_cache[key] = tone
+            _tone_cache_bytes += tone.nbytes
+        while _tone_cache_bytes > TONE_CACHE_MAX_BYTES:
+            _, evicted = _tone_cache.popitem(last=False)
+            _tone_cache_bytes -= evicted.nbytes
+    return tone
+
+def _make_tone_period(f_norm, length, ampl, waveform):
+    """
+    Generate one continuous period of a tone as a read-only buffer.
+    """
+    phase = f_norm * numpy.arange(length)
     if waveform in ('sine', 'square'):
-        tone = \
-            numpy.exp(1j * 2 * numpy.pi * f_norm * numpy.arange(length),
-                      dtype=numpy.complex64)
+        tone = numpy.exp(1j * 2 * numpy.pi * phase, dtype=numpy.complex64)
         if waveform == 'square':
             tone = numpy.sign(tone) * ampl
         else:
             tone = tone * ampl
     elif waveform == 'ramp':
-        tone = numpy.array(
-            [2 * (n * f_norm - numpy.floor(float(0.5 + n * f_norm)))
-             for n in range(length)],
-            dtype=numpy.complex64)
+        tone = (2 * (phase - numpy.floor(0.5 + phase))).astype(numpy.complex64)
     elif waveform == 'const':
-        tone = numpy.ones(length, dtype=numpy.complex64) * ampl
+        tone = numpy.full(length, ampl, dtype=numpy.complex64)
     else:
         raise KeyError(f"Invalid waveform type: `{waveform}'")
+    tone = tone.astype(numpy.complex64, copy=False)
+    tone.flags.writeable = False
+    return tone
+
+def get_continuous_tone_period(
+        rate, freq, ampl, desired_size=None, max_size=None, waveform='sine'):
+    """
+    Return the shortest buffer containing a continuous complex tone at
+    frequency freq, plus the number of times it needs to be repeated to
+    approximate desired_size.
+
+    Unlike get_continuous_tone(), this never materializes the repeated buffer.
+    The returned buffer is read-only, and may be shared between callers.
+    Consumers which cycle through a buffer anyway (e.g.,
+    MultiUSRP.send_waveform()) can use it directly.
 
-    if length < desired_size:
-        tone = numpy.tile(tone, int(desired_size // length))
+    Arguments are the same as for get_continuous_tone().
+
+    Returns a tuple (tone, num_repeats).
+    """
+    desired_size = desired_size or 1.0 * rate # About one second worth of data
+    max_size = max_size or 100e6
+    assert rate > freq
+    rate_int = int(rate)
+    freq_int = int(freq)
+    gcd = math.gcd(rate_int, freq_int)
+    rate_int = rate_int / gcd
+    freq_int = freq_int / gcd
+    length = int(max(freq_int * rate_int, 1)) # freq may be zero
     if length > max_size:
         raise ValueError("Cannot create a TX buffer! Rate/Freq ratio is too odd.")
-    return tone
+    tone = _get_tone_period(freq/rate, length, ampl, waveform)
+    num_repeats = int(desired_size // length) if length < desired_size else 1
+    return tone, max(num_repeats, 1)
+
+def get_continuous_tone(rate, freq, ampl, desired_size=None, max_size=None, waveform='sine'):
+    """
+    Return a buffer containing a complex tone at frequency freq. The tone is
+    continuous, that is, repeating this signal will produce a continuous phase
+    sinusoid.
+    The buffer will try and approximate desired_size in length. If it is not
+    possible to create a buffer smaller than max_size, an exception is thrown.
+
+    The returned buffer is a new, writable array. To avoid the copy, see
+    get_continuous_tone_period().
+
+    Arguments:
+    rate   -- Sampling rate in Hz.
+    freq   -- Tone frequency in Hz
+    ampl   -- Amplitude
+    desired_size -- Number of samples ideally in returned buffer
+    max_size -- Number of samples maximally in returned buffer
+    waveform -- Waveform type: 'sine', 'square', 'ramp', 'const'
+    """
+    tone, num_repeats = get_continuous_tone_period(
+        rate, freq, ampl, desired_size, max_size, waveform)
+    # Never hand out the cached period itself, callers may modify the result
+    return numpy.tile(tone, num_repeats)
 
 def get_power_dbfs(signal):
     """
@@ -70,22 +144,97 @@ def get_power_dbfs(signal):
     """
     return 10 * numpy.log10(numpy.var(signal))
 
+class PowerMeter:
+    """
+    Reusable power measurement engine for all channels of an RX streamer.
+
+    A PowerMeter owns a receive buffer which is allocated once and reused for
+    every measurement. Samples are received in chunks of that size, and the
+    signal power (i.e., the variance, same as get_power_dbfs()) is accumulated
+    chunk by chunk for every channel using a Welford-style (Chan et al.)
+    update of the running mean and sum of squared deviations. This means the
+    measurement length is not limited by the buffer size, and no buffer of
+    num_samps samples per channel is ever allocated.
+
+    Example:
+
+    >>> meter = PowerMeter(streamer, num_samps=int(1e6))
+    >>> power_dbfs = meter.measure() # One value per channel
+    """
+
+    def __init__(self, streamer, num_samps=int(1e6), chunk_size=None):
+        """
+        Arguments:
+        streamer   -- An RX streamer object (fc32 CPU format)
+        num_samps  -- Default number of samples per acquisition and channel
+        chunk_size -- Size of the receive buffer (samples per channel).
+                      Defaults to num_samps, but no larger than 2**16.
+        """
+        self._streamer = streamer
+        self.num_samps = int(num_samps)
+        self.num_chans = streamer.get_num_channels()
+        chunk_size = int(chunk_size or min(self.num_samps, 2**16))
+        self._recv_buffer = numpy.zeros((self.num_chans, chunk_size), dtype=numpy.complex64)
+        self._metadata = uhd.types.RXMetadata()
+        self._stream_cmd = uhd.types.StreamCMD(uhd.types.StreamMode.num_done)
+        self._stream_cmd.stream_now = True
+
+    def _acquire(self, num_samps, count, mean, m2):
+        """
+        Run a single acquisition of num_samps samples, and merge the per-chunk
+        statistics into the running count, mean and sum of squared deviations
+        (m2). Returns the updated count.
+        """
+        self._stream_cmd.num_samps = num_samps
+        self._streamer.issue_stream_cmd(self._stream_cmd)
+        samps_recvd = 0
+        while samps_recvd < num_samps:
+            chunk = self._recv_buffer[:, :min(num_samps - samps_recvd, self._recv_buffer.shape[1])]
+            # Pass in long timeout, so we can rx the entire chunk in one go
+            chunk_len = self._streamer.recv(chunk, self._metadata, 5.0)
+            if chunk_len == 0 or \
+                    self._metadata.error_code != uhd.types.RXMetadataErrorCode.none:
+                raise RuntimeError(
+                    "ERROR! PowerMeter: Did not receive the correct number of samples!")
+            chunk = chunk[:, :chunk_len]
+            chunk_mean = chunk.mean(axis=1)
+            chunk_m2 = numpy.sum(
+                numpy.abs(chunk - chunk_mean[:, numpy.newaxis])**2, axis=1)
+            new_count = count + chunk_len
+            delta = chunk_mean - mean
+            mean += delta * (chunk_len / new_count)
+            m2 += chunk_m2 + numpy.abs(delta)**2 * (count * chunk_len / new_count)
+            count = new_count
+            samps_recvd += chunk_len
+        return count
+
+    def measure(self, num_samps=None, num_avgs=1):
+        """
+        Return the measured input power in dBFS, one value per channel.
+
+        Arguments:
+        num_samps -- Samples per acquisition and channel. Defaults to the
+                     value given to the constructor.
+        num_avgs  -- Number of acquisitions to average over. The power is
+                     computed over the samples of all acquisitions.
+        """
+        num_samps = int(num_samps or self.num_samps)
+        count = 0
+        mean = numpy.zeros(self.num_chans, dtype=numpy.complex128)
+        m2 = numpy.zeros(self.num_chans, dtype=numpy.float64)
+        for _ in range(num_avgs):
+            count = self._acquire(num_samps, count, mean, m2)
+        return 10 * numpy.log10(m2 / count)
+
 def get_usrp_power(streamer, num_samps=1e6, chan=0):
     """
     Return the measured input power in dBFS
 
-    The return value is a list of dBFS power values, one per channel.
-    """
-    recv_buffer = numpy.zeros(
-        (streamer.get_num_channels(), num_samps), dtype=numpy.complex64)
-    metadata = uhd.types.RXMetadata()
-    stream_cmd = uhd.types.StreamCMD(uhd.types.StreamMode.num_done)
-    stream_cmd.num_samps = num_samps
-    stream_cmd.stream_now = True
-    streamer.issue_stream_cmd(stream_cmd)
-    # Pass in long timeout, so we can rx the entire buffer in one go
-    samps_recvd = streamer.recv(recv_buffer, metadata, 5.0)
-    if samps_recvd != num_samps:
-        raise RuntimeError(
-            "ERROR! get_usrp_power(): Did not receive the correct number of samples!")
-    return get_power_dbfs(recv_buffer[chan])
+    If chan is None, the return value is a list of dBFS power values, one per
+    channel. Otherwise, only the power of the given channel is returned.
+
+    When measuring repeatedly, create a PowerMeter object instead, which
+    reuses its buffers.
+    """
+    power = PowerMeter(streamer, num_samps).measure()
+    return power if chan is None else power[chan]
@@ -8,6 +8,8 @@ Python UHD module containing the MultiUSRP and other objects
 """
 
 from .multi_usrp import MultiUSRP
+from .rx_blocks import RxBlock, RxBlockIterator
+from .tx_waveform import WaveformTransmitter
 # Disable PyLint because the entire libtypes modules is a list of renames. It is
 # thus less redundant to do a wildcard import, even if generally discouraged.
 # We could also paste the contents of libtypes.py into here, but by leaving it
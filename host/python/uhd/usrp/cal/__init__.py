@@ -16,5 +16,5 @@ from .libtypes import *
 # pylint: enable=wildcard-import
 
 from .meas_device import get_meas_device
-from .switch import get_switch
+from .switch import get_switch, is_interactive_switch
 from .usrp_calibrator import get_usrp_calibrator
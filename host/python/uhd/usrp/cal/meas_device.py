@@ -25,6 +25,11 @@ class PowerMeterBase:
     Base class for measuring output power (Tx) of the USRP. That means the
     measurement device is receiving and the USRP (the DUT) is transmitting.
     """
+    # Set this to False if get_power() can't be called repeatedly in quick
+    # succession (e.g., because it requires user interaction). The calibrator
+    # will then not poll the power to detect settling.
+    supports_polling = True
+
     def __init__(self, options):
         self._options = options
         self.power_offset = 0
@@ -116,6 +121,7 @@ class ManualPowerMeter(PowerMeterBase):
     manually make changes and return values
     """
     key = 'manual'
+    supports_polling = False
 
     def set_frequency(self, freq):
         """
@@ -116,13 +116,19 @@ class NISwitch(SwitchBase):
 ###############################################################################
 # The dispatch function
 ###############################################################################
-def get_switch(direction, dev_key, options):
+def _get_option_dict(options):
     """
-    Return the measurement device object
+    Turn a list of key=value strings into a dictionary
     """
-    opt_dict = {
+    return {
         k[0]: k[1] if len(k) > 1 else None for k in [x.split("=", 1) for x in options]
     }
+
+def _find_switch_class(dev_key, opt_dict):
+    """
+    Return the switch class for dev_key, or None if there is none (in which
+    case the manual switch is used)
+    """
     members = inspect.getmembers(sys.modules[__name__])
     if 'import' in opt_dict:
         try:
@@ -135,7 +141,27 @@ def get_switch(direction, dev_key, options):
     for _, obj in members:
         try:
             if issubclass(obj, SwitchBase) and dev_key == getattr(obj, 'key', ''):
-                return obj(opt_dict)
+                return obj
         except TypeError:
             continue
+    return None
+
+def get_switch(direction, dev_key, options):
+    """
+    Return the measurement device object
+    """
+    opt_dict = _get_option_dict(options)
+    switch_class = _find_switch_class(dev_key, opt_dict)
+    if switch_class is not None:
+        return switch_class(opt_dict)
     return ManualSwitch(direction, opt_dict)
+
+def is_interactive_switch(dev_key, options):
+    """
+    Return True if the switch get_switch() returns for these arguments asks
+    the user to change the cabling, i.e., it is a manual switch which is not
+    in auto mode.
+    """
+    opt_dict = _get_option_dict(options)
+    return _find_switch_class(dev_key, opt_dict) is None and opt_dict.get('mode') != 'auto'
+
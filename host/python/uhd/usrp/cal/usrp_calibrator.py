@@ -23,6 +23,13 @@ PWR_EST_LLIM = -20
 PWR_EST_IDEAL_LEVEL = -6
 PWR_EST_ULIM = -3
 SIGPWR_LOCK_MAX_ITER = 4
+# Settling detection after gain changes: We poll the power until two consecutive
+# readings are within SETTLING_TOLERANCE of each other, but never wait longer
+# than MAX_SETTLING_TIME (which used to be the fixed, highly conservative
+# settling time). RX readings use short acquisitions of SETTLING_NUM_SAMPS.
+SETTLING_TOLERANCE = 0.1 # dB
+MAX_SETTLING_TIME = 0.1 # s
+SETTLING_NUM_SAMPS = int(10e3)
 
 # The default distance between frequencies at which we measure
 DEFAULT_FREQ_STEP = 10e6 # Hz
@@ -52,21 +59,10 @@ def get_usrp_power(streamer, num_samps=NUM_SAMPS_PER_EST, chan=0):
     """
     Return the measured input power in dBFS
 
-    The return value is a list of dBFS power values, one per channel.
+    If chan is None, the return value is a list of dBFS power values, one per
+    channel.
     """
-    recv_buffer = numpy.zeros(
-        (streamer.get_num_channels(), num_samps), dtype=numpy.complex64)
-    metadata = uhd.types.RXMetadata()
-    stream_cmd = uhd.types.StreamCMD(uhd.types.StreamMode.num_done)
-    stream_cmd.num_samps = num_samps
-    stream_cmd.stream_now = True
-    streamer.issue_stream_cmd(stream_cmd)
-    # Pass in long timeout, so we can rx the entire buffer in one go
-    samps_recvd = streamer.recv(recv_buffer, metadata, 5.0)
-    if samps_recvd != num_samps:
-        raise RuntimeError(
-            "ERROR! get_usrp_power(): Did not receive the correct number of samples!")
-    return uhd.dsp.signals.get_power_dbfs(recv_buffer[chan])
+    return uhd.dsp.signals.get_usrp_power(streamer, num_samps, chan)
 
 
 def subtract_power(p1_db, p2_db):
@@ -108,6 +104,9 @@ class USRPCalibratorBase:
         self._chan = None
         self._ant = ""
         self._streamer = None
+        # For RX power cal, this measures the power on all channels of the
+        # streamer, reusing its buffers between measurements
+        self._power_meter = None
         # These dictionaries store the results that get written out as well as
         # the noise floor for reference
         self.results = {} # This must be of the form results[freq][gain] = power
@@ -146,12 +145,58 @@ class USRPCalibratorBase:
         self._ant = antenna
         if chan != self._chan:
             # This will be an RX streamer for RX power cal, and a TX streamer
-            # for TX power cal.
+            # for TX power cal. It only streams the current channel: The
+            # switch connects one channel/antenna to the measurement device
+            # at a time, so there is nothing to measure on other channels.
             self._streamer = get_streamer(self._usrp, self._dir, chan)
             if self._dir == 'tx':
                 self._tone_gen.set_streamer(self._streamer)
+            else:
+                self._power_meter = uhd.dsp.signals.PowerMeter(
+                    self._streamer, NUM_SAMPS_PER_EST)
         self._chan = chan
 
+    def get_power(self, num_avgs=1):
+        """
+        Return the measured input power of the current channel in dBFS.
+        """
+        return self._power_meter.measure(num_avgs=num_avgs)[0]
+
+    def wait_for_rx_settling(self):
+        """
+        Wait until the received power is stable after a gain change.
+
+        Polls the power with short acquisitions until two consecutive readings
+        are within SETTLING_TOLERANCE, or MAX_SETTLING_TIME has passed.
+        """
+        deadline = time.monotonic() + MAX_SETTLING_TIME
+        last_power = self._power_meter.measure(SETTLING_NUM_SAMPS)[0]
+        while time.monotonic() < deadline:
+            power = self._power_meter.measure(SETTLING_NUM_SAMPS)[0]
+            if abs(power - last_power) <= SETTLING_TOLERANCE:
+                return
+            last_power = power
+
+    def get_settled_tx_power(self):
+        """
+        Return the measured TX power after a gain change, once it is stable.
+
+        If the measurement device can be polled, read the power until two
+        consecutive readings are within SETTLING_TOLERANCE, or
+        MAX_SETTLING_TIME has passed. Otherwise, wait MAX_SETTLING_TIME and
+        take a single reading.
+        """
+        if not getattr(self._meas_dev, 'supports_polling', False):
+            time.sleep(MAX_SETTLING_TIME)
+            return self._meas_dev.get_power()
+        deadline = time.monotonic() + MAX_SETTLING_TIME
+        last_power = self._meas_dev.get_power()
+        while True:
+            power = self._meas_dev.get_power()
+            if abs(power - last_power) <= SETTLING_TOLERANCE or time.monotonic() >= deadline:
+                return power
+            last_power = power
+
     def _get_frequencies(self, start_hint=None, stop_hint=None, step_hint=None):
         """
         Return an iterable of frequencies for testing.
@@ -204,7 +249,7 @@ class USRPCalibratorBase:
                 time.sleep(self.tune_settling_time)
                 for gain in self._gains:
                     self._usrp.set_rx_gain(gain, self._chan)
-                    self._noise[freq][gain] = get_usrp_power(self._streamer)
+                    self._noise[freq][gain] = self.get_power()
                     print("[RX] Noise floor: {:7.2f} MHz / {} dB => {:+6.2f} dBFS"
                           .format(freq/1e6, gain, self._noise[freq][gain]))
         return freqs
@@ -235,12 +280,12 @@ class USRPCalibratorBase:
         """
         # Go to highest gain, lock in signal generator
         self._usrp.set_rx_gain(max(self._gains), self._chan)
-        time.sleep(0.1) # Settling time of the USRP, highly conservative
+        self.wait_for_rx_settling()
         self.log("Locking in signal generator power...")
         self.log("Requesting input power: {:+.2f} dBm."
                  .format(self.min_detectable_signal))
         usrp_input_power = self._meas_dev.set_power(self.min_detectable_signal)
-        recvd_power = get_usrp_power(self._streamer)
+        recvd_power = self.get_power()
         self.log("Got input power: {:+.2f} dBm. Received power: {:.2f} dBFS. "
                  "Requesting new input power: {:+.2f} dBm."
                  .format(usrp_input_power,
@@ -250,7 +295,7 @@ class USRPCalibratorBase:
             usrp_input_power + PWR_EST_IDEAL_LEVEL - recvd_power)
         siggen_locked = False
         for _ in range(SIGPWR_LOCK_MAX_ITER):
-            recvd_power = get_usrp_power(self._streamer)
+            recvd_power = self.get_power()
             if PWR_EST_LLIM <= recvd_power <= PWR_EST_ULIM:
                 siggen_locked = True
                 break
@@ -274,7 +319,7 @@ class USRPCalibratorBase:
             self._usrp.set_rx_gain(gain, self._chan) # Set the new gain
             self.log("Set gain to: {} dB. Got gain: {} dB."
                      .format(gain, self._usrp.get_rx_gain(self._chan)))
-            time.sleep(0.1) # Settling time of the USRP, highly conservative
+            self.wait_for_rx_settling()
             gain_delta = last_gain - gain # This is our gain step
             if gain_delta:
                 # If we decrease the device gain, we need to crank up the input
@@ -283,7 +328,7 @@ class USRPCalibratorBase:
                     min(usrp_input_power + gain_delta, self.max_input_power))
                 # usrp_input_power = self._meas_dev.set_power(usrp_input_power + gain_delta)
                 self.log("New input power is: {:+.2f} dBm".format(usrp_input_power))
-            recvd_power = get_usrp_power(self._streamer)
+            recvd_power = self.get_power()
             self.log("Received power: {:.2f} dBFS".format(recvd_power))
             # It's possible that we lose the lock on the signal power, so allow
             # for a correction
@@ -294,7 +339,7 @@ class USRPCalibratorBase:
                 usrp_input_power = self._meas_dev.set_power(usrp_input_power + power_delta)
                 self.log("New input power is: {:+.2f} dBm".format(usrp_input_power))
                 # And then of course, measure again
-                recvd_power = get_usrp_power(self._streamer)
+                recvd_power = self.get_power()
                 self.log("Received power: {:.2f} dBFS".format(recvd_power))
             # Note: The noise power should be way down there, and really
             # shouldn't matter. We subtract it anyway for formal correctness.
@@ -322,8 +367,7 @@ class USRPCalibratorBase:
         results = {}
         for gain in self._gains:
             self._usrp.set_tx_gain(gain, self._chan)
-            time.sleep(0.1) # Settling time of the USRP, highly conservative
-            results[gain] = self._meas_dev.get_power()
+            results[gain] = self.get_settled_tx_power()
             self.log(f"{gain:4.2f} dB => {results[gain]:+6.2f} dBm")
         self.results[freq] = results
 
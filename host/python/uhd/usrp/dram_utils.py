@@ -8,30 +8,32 @@ UHD Extension, helpers, and utilities for doing more with the available PL DRAM
 """
 
 import time
+from concurrent.futures import ThreadPoolExecutor
 from uhd import rfnoc
 from uhd.usrp import StreamArgs
 from uhd.types import TXMetadata, RXMetadata, RXMetadataErrorCode, StreamMode, StreamCMD, TimeSpec
 
+def unpack_rcp_spec(rcps):
+    """
+    Convert a radio/channel pair specification into a tuple of form
+    (radio_block_id, radio_chan).
+
+    Valid inputs (and their corresponding outputs are:
+    - "0/Radio#0:0" -> ("0/Radio#0", 0)
+    - "0/Radio#0" -> ("0/Radio#0", 0)      [Channel 0 is chosen as default)
+    - ("0/Radio#0", 0) -> ("0/Radio#0", 0)
+    """
+    if isinstance(rcps, str):
+        return (rcps.split(':', 2)[0], int(rcps.split(':', 2)[1])) \
+               if ':' in rcps else (rcps, 0)
+    if isinstance(rcps, tuple) and len(rcps) == 2:
+        return rcps
+    raise RuntimeError(f"Unknown radio channel pair specification: {rcps}")
+
 def enumerate_radios(graph, radio_chans):
     """
     Return a list of radio block controllers/chan pairs to use for this test.
     """
-    def unpack_rcp_spec(rcps):
-        """
-        Convert a radio/channel pair specification into a tuple of form
-        (radio_block_id, radio_chan).
-
-        Valid inputs (and their corresponding outputs are:
-        - "0/Radio#0:0" -> ("0/Radio#0", 0)
-        - "0/Radio#0" -> ("0/Radio#0", 0)      [Channel 0 is chosen as default)
-        - ("0/Radio#0", 0) -> ("0/Radio#0", 0)
-        """
-        if isinstance(rcps, str):
-            return (rcps.split(':', 2)[0], int(rcps.split(':', 2)[1])) \
-                   if ':' in rcps else (rcps, 0)
-        if isinstance(rcps, tuple) and len(rcps) == 2:
-            return rcps
-        raise RuntimeError(f"Unknown radio channel pair specification: {rcps}")
     radio_id_chan_pairs = [unpack_rcp_spec(r) for r in radio_chans]
     # Sanity checks
     available_radios = graph.find_blocks("Radio")
@@ -42,6 +44,53 @@ def enumerate_radios(graph, radio_chans):
         radio_chan_pairs.append((rfnoc.RadioControl(graph.get_block(rcp[0])), rcp[1]))
     return radio_chan_pairs
 
+# Default number of samples per streamer call for uploads and downloads. Larger
+# transfers are split up into chunks of this size.
+DEFAULT_CHUNK_SIZE = 2**24
+# Bounds for the exponential backoff when polling the record fullness
+MIN_POLL_INTERVAL = 0.001
+MAX_POLL_INTERVAL = 0.05
+
+def wait_for_record_fullness(replay, port, num_bytes, timeout, expected_duration=0.0):
+    """
+    Wait until the record buffer of a replay block port holds num_bytes.
+
+    Rather than polling at a fixed interval, this first sleeps for the expected
+    duration of the transfer (if known), then polls with an exponential backoff
+    between MIN_POLL_INTERVAL and MAX_POLL_INTERVAL. Returns the last value of
+    the record fullness.
+    """
+    deadline = time.monotonic() + timeout
+    if expected_duration:
+        time.sleep(min(expected_duration, timeout))
+    interval = MIN_POLL_INTERVAL
+    fullness = replay.get_record_fullness(port)
+    while fullness < num_bytes and time.monotonic() < deadline:
+        time.sleep(interval)
+        interval = min(2 * interval, MAX_POLL_INTERVAL)
+        fullness = replay.get_record_fullness(port)
+    return fullness
+
+def flush_record_buffer(replay, port, timeout=.25):
+    """
+    Restart recording on a replay block port until its record buffer is empty.
+    """
+    flush_timeout = time.monotonic() + timeout
+    while time.monotonic() < flush_timeout:
+        if replay.get_record_fullness(port) == 0:
+            break
+        replay.record_restart(port)
+
+def transfer_stats(num_bytes, duration):
+    """
+    Return a dictionary describing a transfer between host and DRAM.
+    """
+    return {
+        'bytes': num_bytes,
+        'duration': duration,
+        'gbps': num_bytes / duration / 1e9 if duration > 0 else 0.0,
+    }
+
 def find_replay_block(graph, replay_blockid):
     """
     Find any or a specific replay block
@@ -53,6 +102,60 @@ def find_replay_block(graph, replay_blockid):
         replay_blockid = blocklist[0]
     return rfnoc.ReplayBlockControl(graph.get_block(replay_blockid))
 
+def find_replay_blocks(graph, replay_blockids=None):
+    """
+    Return the block IDs of all replay blocks on the graph (across all
+    motherboards), or validate a given list of replay block IDs.
+    """
+    available_blocks = [str(block_id) for block_id in graph.find_blocks("Replay")]
+    if replay_blockids is None:
+        if not available_blocks:
+            raise RuntimeError("No Replay block found on RFNoC graph!")
+        return sorted(available_blocks)
+    for replay_blockid in replay_blockids:
+        if str(replay_blockid) not in available_blocks:
+            raise RuntimeError(f"'{replay_blockid}' is not a valid replay block ID!")
+    return [str(replay_blockid) for replay_blockid in replay_blockids]
+
+def assign_replay_blocks(graph, radio_chans, replay_blockids, get_num_ports):
+    """
+    Distribute radio channels among replay blocks.
+
+    Every radio channel is assigned to a replay block on the same motherboard
+    (streaming between motherboards is not possible). Among those, the replay
+    block with the fewest channels assigned so far is chosen, so channels are
+    striped across all available blocks.
+
+    Arguments:
+    graph -- The graph object
+    radio_chans -- List of radio channels, see DramTransmitter
+    replay_blockids -- List of candidate replay block IDs
+    get_num_ports -- Callable that returns the number of usable ports for a
+                     ReplayBlockControl object
+
+    Returns a list of (replay block ID, list of radio channel indices) tuples.
+    Replay blocks which were not assigned any channels are omitted.
+    """
+    num_ports = {
+        blockid: get_num_ports(rfnoc.ReplayBlockControl(graph.get_block(blockid)))
+        for blockid in replay_blockids
+    }
+    assignment = {blockid: [] for blockid in replay_blockids}
+    for chan_idx, rcp in enumerate(radio_chans):
+        radio_id = unpack_rcp_spec(rcp)[0]
+        device_no = rfnoc.BlockID(radio_id).get_device_no()
+        candidates = [
+            blockid for blockid in replay_blockids
+            if rfnoc.BlockID(blockid).get_device_no() == device_no
+            and len(assignment[blockid]) < num_ports[blockid]
+        ]
+        if not candidates:
+            raise RuntimeError(
+                f"No replay block with free ports found for radio channel {rcp}!")
+        blockid = min(candidates, key=lambda blockid: len(assignment[blockid]))
+        assignment[blockid].append(chan_idx)
+    return [(blockid, chans) for blockid, chans in assignment.items() if chans]
+
 class DramTransmitter:
     """
     Helper class to stream data from DRAM to one or more radios.
@@ -60,8 +163,8 @@ class DramTransmitter:
     This can be useful when setting up a USRP as a transmitter, with a waveform
     preloaded into memory.
 
-    NOTE: This assumes we are using a single memory bank, until UHD is upgraded
-    to better handle multiple memory banks.
+    NOTE: This uses a single replay block. To use all replay blocks on all
+    motherboards, see StripedDramTransmitter.
 
     Arguments:
     rfnoc_graph -- The graph object
@@ -77,6 +180,11 @@ class DramTransmitter:
     cpu_format -- For the upload process, the data format to be used
     mem_regions -- A list of (memory start, memory size) tuples, one per replay block port.
                    If left out, the memory is split up evenly among available replay block ports.
+    chunk_size -- Maximum number of samples per call to send(). Larger uploads
+                  are split into multiple calls.
+
+    After every upload, the transfer_stats attribute holds the number of bytes,
+    the duration, and the achieved rate in GB/s per replay port.
     """
     def __init__(self,
                  rfnoc_graph,
@@ -85,6 +193,7 @@ class DramTransmitter:
                  replay_ports=None,
                  cpu_format='fc32',
                  mem_regions=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE,
                  ):
         # We make replay_blocks a list so we can support multiple replay blocks
         # (not only on multiple motherboards) in the future without changing APIs
@@ -95,6 +204,8 @@ class DramTransmitter:
         if replay_ports is None:
             replay_ports = list(range(len(radio_chans)))
         self.replay_ports = replay_ports
+        self.chunk_size = chunk_size
+        self.transfer_stats = {}
 
         self.reconnect(rfnoc_graph, radio_chans, mem_regions)
         # Since for multi-channel we nevertheless only use one input port to upload the 
@@ -227,6 +338,8 @@ class DramTransmitter:
         mem_start: Memory address where the data should be uploaded to
         mem_size: Amount of available memory. If the data in waveforms exceeds
                   this value, then waveform will be only partially uploaded.
+
+        Returns the number of bytes uploaded, and the transfer statistics.
         """
         # Sanitize parameters
         assert mem_start < self.replay_blocks[0].get_mem_size(), \
@@ -243,32 +356,39 @@ class DramTransmitter:
         waveform = waveform[:num_items]
 
         num_bytes = num_items * self.bytes_per_sample
+        if num_bytes == 0:
+            return 0, transfer_stats(0, 0.0)
         in_port = self.replay_in_port
+        start_time = time.monotonic()
         # Configure DRAM block for recording
         self.replay_blocks[0].record(mem_start, num_bytes, in_port)
         # Flush data on input buffer
-        flush_timeout = time.monotonic() + .25
-        while time.monotonic() < flush_timeout:
-            if self.replay_blocks[0].get_record_fullness(in_port) == 0:
-                break
-            self.replay_blocks[0].record_restart(in_port)
-        # Upload data
+        flush_record_buffer(self.replay_blocks[0], in_port)
+        # Upload data in chunks. The timeout only applies to chunks that make no
+        # progress at all, so uploads of any size are possible.
         tx_md = TXMetadata()
         tx_md.start_of_burst = True
-        tx_md.end_of_burst = True
-        if self.tx_streamer.send(waveform, tx_md, 10.0) != num_items:
-            raise RuntimeError("Unable to upload all data without errors!")
-        # Make sure DRAM is fully populated
-        upload_timeout = time.monotonic() + 20.0
-        while time.monotonic() < upload_timeout and \
-                self.replay_blocks[0].get_record_fullness(in_port) < num_bytes:
-            time.sleep(.05)
-        fullness = self.replay_blocks[0].get_record_fullness(in_port)
+        num_sent = 0
+        while num_sent < num_items:
+            chunk_items = min(self.chunk_size, num_items - num_sent)
+            tx_md.end_of_burst = num_sent + chunk_items == num_items
+            chunk_sent = self.tx_streamer.send(
+                waveform[num_sent:num_sent + chunk_items], tx_md, 10.0)
+            if chunk_sent == 0:
+                raise RuntimeError("Unable to upload all data without errors!")
+            tx_md.start_of_burst = False
+            num_sent += chunk_sent
+        send_duration = time.monotonic() - start_time
+        # Make sure DRAM is fully populated. Whatever has not yet arrived in
+        # DRAM should take no longer than it took to send it.
+        pending = 1 - self.replay_blocks[0].get_record_fullness(in_port) / num_bytes
+        fullness = wait_for_record_fullness(
+            self.replay_blocks[0], in_port, num_bytes, 20.0, send_duration * pending)
         if fullness != num_bytes:
             raise RuntimeError(
                 f"DRAM fullness did not reach expected levels! "
                 f"{fullness}/{num_bytes} bytes.")
-        return num_bytes
+        return num_bytes, transfer_stats(num_bytes, time.monotonic() - start_time)
 
     def upload(self, waveform, ports=None, mem_regions=None):
         """
@@ -316,9 +436,10 @@ class DramTransmitter:
             # Since by default we slice the dram per input/output port, we only
             # want to upload to the memory regions that we are actually using.
             if ports is None or region_idx < len(ports):
-                bytes_uploaded = self._upload(waveform[region_idx], *mem_region)
+                bytes_uploaded, stats = self._upload(waveform[region_idx], *mem_region)
                 if ports:
                     self.upload_size[ports[region_idx]] = bytes_uploaded
+                    self.transfer_stats[ports[region_idx]] = stats
 
     def issue_stream_cmd(self, stream_cmd, ports=None):
         """
@@ -409,8 +530,8 @@ class DramReceiver:
 
     This can be useful when setting up a USRP as a receiver.
 
-    NOTE: This assumes we are using a single memory bank, until UHD is upgraded
-    to better handle multiple memory banks.
+    NOTE: This uses a single replay block. To use all replay blocks on all
+    motherboards, see StripedDramReceiver.
 
     Arguments:
     rfnoc_graph -- The graph object
@@ -428,6 +549,11 @@ class DramReceiver:
                    If left out, the memory is split up evenly among available replay block ports.
     throttle -- Throttle factor for the streamer. This is a value between 0 and
                 1 or a percentage in the range (0%, 100%] that is passed as string.
+    chunk_size -- Maximum number of samples per call to recv(). Larger
+                  downloads are split into multiple calls.
+
+    After every download, the transfer_stats attribute holds the number of bytes,
+    the duration, and the achieved rate in GB/s per replay port.
     """
     def __init__(self,
                  rfnoc_graph,
@@ -436,7 +562,8 @@ class DramReceiver:
                  replay_ports=None,
                  cpu_format='fc32',
                  mem_regions=None,
-                 throttle="0.1"
+                 throttle="0.1",
+                 chunk_size=DEFAULT_CHUNK_SIZE,
                  ):
         # We make replay_blocks a list so we can support multiple replay blocks
         # (not only on multiple motherboards) in the future without changing APIs
@@ -450,6 +577,8 @@ class DramReceiver:
             replay_ports = list(range(len(radio_chans)))
         self.replay_ports = replay_ports
         self.receive_metadata = None
+        self.chunk_size = chunk_size
+        self.transfer_stats = {}
 
         self.reconnect(rfnoc_graph, radio_chans, mem_regions)
         # We only use the first of the given replay ports to download the data sequentially.
@@ -578,6 +707,9 @@ class DramReceiver:
         mem_start: Memory address where the data should be downloaded from
         mem_size: Amount of available memory. This is the maximum length that 
                   a captured waveform can have.
+
+        Returns the number of samples downloaded (0 on error), and the transfer
+        statistics.
         """
         # Sanitize parameters
         assert mem_start < self.replay_blocks[0].get_mem_size(), \
@@ -593,6 +725,7 @@ class DramReceiver:
         num_items = min(len(waveform), int(mem_size) // self.bytes_per_sample)
         num_bytes = num_items * self.bytes_per_sample
         out_port = self.replay_out_port
+        start_time = time.monotonic()
         stream_cmd = StreamCMD(StreamMode.num_done)
         stream_cmd.num_samps = num_items
         stream_cmd.time_spec = TimeSpec(0.0)
@@ -601,12 +734,24 @@ class DramReceiver:
 
         if not self.receive_metadata:
             self.receive_metadata = RXMetadata()
-        num_items = self.rx_streamer.recv(waveform, self.receive_metadata, 15.0)
-        if self.receive_metadata.error_code != RXMetadataErrorCode.none:
-            # While the error code might be overwritten by the next call to _download(),
-            # returning 0 will lead to recv() returning 0, too, which indicates an error.
-            return 0
-        return num_items
+        # Receive in chunks, directly into the waveform array. The timeout only
+        # applies to chunks that make no progress at all, so downloads of any
+        # size are possible.
+        num_recvd = 0
+        while num_recvd < num_items:
+            chunk_items = min(self.chunk_size, num_items - num_recvd)
+            chunk_recvd = self.rx_streamer.recv(
+                waveform[num_recvd:num_recvd + chunk_items], self.receive_metadata, 15.0)
+            if self.receive_metadata.error_code != RXMetadataErrorCode.none:
+                # While the error code might be overwritten by the next call to _download(),
+                # returning 0 will lead to recv() returning 0, too, which indicates an error.
+                return 0, transfer_stats(
+                    num_recvd * self.bytes_per_sample, time.monotonic() - start_time)
+            if chunk_recvd == 0:
+                break
+            num_recvd += chunk_recvd
+        return num_recvd, transfer_stats(
+            num_recvd * self.bytes_per_sample, time.monotonic() - start_time)
 
     def download(self, waveform, ports=None, mem_regions=None):
         """
@@ -644,14 +789,16 @@ class DramReceiver:
         # basis. Otherwise we will walk through the mem_regions that we have put
         # together above.
         if len(waveform.shape) == 1:
-            bytes_downloaded = self._download(waveform, *mem_regions[0])
+            bytes_downloaded, stats = self._download(waveform, *mem_regions[0])
             self.download_size[ports[0]] = bytes_downloaded
+            self.transfer_stats[ports[0]] = stats
         else:
             for region_idx, mem_region in enumerate(mem_regions):
                 if ports is None or region_idx < len(self.radio_chan_pairs):
-                    bytes_downloaded = self._download(waveform[region_idx], *mem_region)
+                    bytes_downloaded, stats = self._download(waveform[region_idx], *mem_region)
                     if ports:
                         self.download_size[ports[region_idx]] = bytes_downloaded
+                        self.transfer_stats[ports[region_idx]] = stats
 
     def issue_stream_cmd(self, stream_cmd, ports=None):
         """
@@ -669,11 +816,7 @@ class DramReceiver:
         for idx, rcp in enumerate(self.radio_chan_pairs):
             stream_cmd = tmp_stream_cmd
             # Flush data on output buffer
-            flush_timeout = time.monotonic() + .25
-            while time.monotonic() < flush_timeout:
-                if self.replay_blocks[0].get_record_fullness(ports[idx]) == 0:
-                    break
-                self.replay_blocks[0].record_restart(ports[idx])
+            flush_record_buffer(self.replay_blocks[0], ports[idx])
             mem_region = mem_regions[ports[idx]]
             mem_size = min(stream_cmd.num_samps * self.bytes_per_sample, mem_region[1])
             self.replay_blocks[0].record(mem_region[0], mem_size, ports[idx])
@@ -690,11 +833,14 @@ class DramReceiver:
                 stream_cmd.time_spec = tmp_stream_cmd.time_spec
             rcp[0].issue_stream_cmd(stream_cmd, rcp[1])
 
-        timeout = time.monotonic() + 15.0
-        while any((self.replay_blocks[0].get_record_fullness(ports[idx]) < mem_size
-            for idx, _ in enumerate(self.radio_chan_pairs))):
-            time.sleep(0.200)
-            if time.monotonic() > timeout:
+        # All ports record simultaneously, so we wait for them one after the
+        # other against a common deadline
+        deadline = time.monotonic() + 15.0
+        for idx, _ in enumerate(self.radio_chan_pairs):
+            fullness = wait_for_record_fullness(
+                self.replay_blocks[0], ports[idx], mem_size,
+                max(0, deadline - time.monotonic()))
+            if fullness < mem_size:
                 raise RuntimeError("Timeout while loading replay buffer!")
 
     def recv(self, data, metadata, timeout=0.1):
@@ -725,3 +871,257 @@ class DramReceiver:
             for idx, _ in enumerate(self.radio_chan_pairs):
                 self.download(data[idx], self.replay_ports[idx])
         return min(self.download_size)
+
+class StripedDramTransmitter:
+    """
+    Helper class to stream data from the DRAM of multiple replay blocks to one
+    or more radios.
+
+    The radio channels are striped across all replay blocks (by default, all
+    replay blocks on all motherboards), with each radio channel using a replay
+    block on its own motherboard. Every replay block gets its own
+    DramTransmitter, and therefore its own TX streamer, and uploads to
+    different replay blocks run concurrently. This way, both the available
+    DRAM and the upload bandwidth scale with the number of replay blocks.
+
+    Arguments:
+    rfnoc_graph -- The graph object
+    radio_chans -- A list of radio channels, see DramTransmitter
+    replay_blockids -- List of replay blocks to use. If not specified, use all
+                       replay blocks on the graph.
+    cpu_format -- For the upload process, the data format to be used
+    chunk_size -- Maximum number of samples per call to send()
+
+    After every upload, the transfer_stats attribute holds the total number of
+    bytes, the duration, and the achieved rate in GB/s across all replay
+    blocks. Per-block statistics are available from the individual
+    transmitters.
+    """
+    def __init__(self,
+                 rfnoc_graph,
+                 radio_chans,
+                 replay_blockids=None,
+                 cpu_format='fc32',
+                 chunk_size=DEFAULT_CHUNK_SIZE,
+                 ):
+        stripes = assign_replay_blocks(
+            rfnoc_graph, radio_chans,
+            find_replay_blocks(rfnoc_graph, replay_blockids),
+            lambda replay: replay.get_num_output_ports())
+        self.transmitters = []
+        # For every radio channel, store the index of its transmitter and the
+        # replay port it uses
+        self.chan_map = [None] * len(radio_chans)
+        for replay_blockid, chans in stripes:
+            for sub_chan, chan in enumerate(chans):
+                self.chan_map[chan] = (len(self.transmitters), sub_chan)
+            self.transmitters.append(DramTransmitter(
+                rfnoc_graph,
+                [radio_chans[chan] for chan in chans],
+                replay_blockid=replay_blockid,
+                cpu_format=cpu_format,
+                chunk_size=chunk_size))
+        self.replay_blocks = [tx.replay_blocks[0] for tx in self.transmitters]
+        self.transfer_stats = {}
+
+    def get_mem_size(self):
+        """
+        Return the total amount of DRAM available on all replay blocks in use.
+        """
+        return sum(replay.get_mem_size() for replay in self.replay_blocks)
+
+    def upload(self, waveform):
+        """
+        Upload one waveform per radio channel.
+
+        Arguments:
+        waveform: Array of shape (number of radio channels, number of samples),
+                  or a 1-dimensional array which is uploaded for all channels.
+        """
+        if len(waveform.shape) == 1:
+            waveform = [waveform] * len(self.chan_map)
+        if len(waveform) < len(self.chan_map):
+            raise RuntimeError("Number of waveforms in waveform array does not match "
+                               "the number of radio channels!")
+        def upload_stripe(tx_idx):
+            tx = self.transmitters[tx_idx]
+            for chan, (chan_tx_idx, sub_chan) in enumerate(self.chan_map):
+                if chan_tx_idx == tx_idx:
+                    tx.upload(waveform[chan], tx.replay_ports[sub_chan])
+        for tx in self.transmitters:
+            tx.transfer_stats = {}
+        start_time = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(self.transmitters)) as executor:
+            # Calling list() propagates exceptions from the worker threads
+            list(executor.map(upload_stripe, range(len(self.transmitters))))
+        num_bytes = sum(
+            stats['bytes'] for tx in self.transmitters for stats in tx.transfer_stats.values())
+        self.transfer_stats = transfer_stats(num_bytes, time.monotonic() - start_time)
+
+    def issue_stream_cmd(self, stream_cmd):
+        """
+        Issue a command to start or stop the streaming from DRAM on all
+        radio channels.
+
+        To start streaming synchronously on multiple replay blocks, use a timed
+        stream command.
+        """
+        for tx in self.transmitters:
+            tx.issue_stream_cmd(stream_cmd)
+
+    def send(self, data, metadata, timeout=0.1):
+        """
+        This is a wrapper around upload() and issue_stream_cmd() that can be
+        used to use this class like you would use a TxStreamer object. See
+        DramTransmitter.send() for details.
+        """
+        num_samps = len(data) if len(data.shape) == 1 else data.shape[1]
+        if num_samps == 0 or any((x == 0 for x in data.shape)):
+            return 0
+        self.upload(data)
+        stream_cmd = StreamCMD(StreamMode.num_done)
+        stream_cmd.stream_now = not metadata.has_time_spec
+        stream_cmd.time_spec = metadata.time_spec
+        stream_cmd.num_samps = num_samps
+        self.issue_stream_cmd(stream_cmd)
+        return num_samps
+
+    def recv_async_msg(self, timeout=0.1):
+        """
+        This emulates TxStreamer.recv_async_msg(). Returns the first async
+        message from any of the replay blocks, or None.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            for replay in self.replay_blocks:
+                async_md = replay.get_play_async_metadata(0.0)
+                if async_md is not None:
+                    return async_md
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(MIN_POLL_INTERVAL)
+
+class StripedDramReceiver:
+    """
+    Helper class to stream data from one or more radios to the DRAM of
+    multiple replay blocks.
+
+    The radio channels are striped across all replay blocks (by default, all
+    replay blocks on all motherboards), with each radio channel using a replay
+    block on its own motherboard. Every replay block gets its own
+    DramReceiver, and therefore its own RX streamer, and downloads from
+    different replay blocks run concurrently. This way, both the available
+    DRAM and the download bandwidth scale with the number of replay blocks.
+
+    Arguments:
+    rfnoc_graph -- The graph object
+    radio_chans -- A list of radio channels, see DramReceiver
+    replay_blockids -- List of replay blocks to use. If not specified, use all
+                       replay blocks on the graph.
+    cpu_format -- Desired data format of the downloaded, received data on the host.
+    throttle -- Throttle factor for the streamers, see DramReceiver
+    chunk_size -- Maximum number of samples per call to recv()
+
+    After every download, the transfer_stats attribute holds the total number
+    of bytes, the duration, and the achieved rate in GB/s across all replay
+    blocks. Per-block statistics are available from the individual receivers.
+    """
+    def __init__(self,
+                 rfnoc_graph,
+                 radio_chans,
+                 replay_blockids=None,
+                 cpu_format='fc32',
+                 throttle="0.1",
+                 chunk_size=DEFAULT_CHUNK_SIZE,
+                 ):
+        stripes = assign_replay_blocks(
+            rfnoc_graph, radio_chans,
+            find_replay_blocks(rfnoc_graph, replay_blockids),
+            lambda replay: replay.get_num_input_ports())
+        self.receivers = []
+        # For every radio channel, store the index of its receiver and the
+        # replay port it uses
+        self.chan_map = [None] * len(radio_chans)
+        for replay_blockid, chans in stripes:
+            for sub_chan, chan in enumerate(chans):
+                self.chan_map[chan] = (len(self.receivers), sub_chan)
+            self.receivers.append(DramReceiver(
+                rfnoc_graph,
+                [radio_chans[chan] for chan in chans],
+                replay_blockid=replay_blockid,
+                cpu_format=cpu_format,
+                throttle=throttle,
+                chunk_size=chunk_size))
+        self.replay_blocks = [rx.replay_blocks[0] for rx in self.receivers]
+        self.transfer_stats = {}
+
+    def get_mem_size(self):
+        """
+        Return the total amount of DRAM available on all replay blocks in use.
+        """
+        return sum(replay.get_mem_size() for replay in self.replay_blocks)
+
+    def _run_concurrently(self, func):
+        """
+        Call func(rx_idx) for every receiver, each on its own thread.
+        """
+        with ThreadPoolExecutor(max_workers=len(self.receivers)) as executor:
+            # Calling list() propagates exceptions from the worker threads
+            return list(executor.map(func, range(len(self.receivers))))
+
+    def issue_stream_cmd(self, stream_cmd):
+        """
+        Issue a command to record into DRAM on all radio channels, and wait
+        until all replay blocks have recorded the requested number of samples.
+
+        To start recording synchronously on multiple replay blocks, use a timed
+        stream command.
+        """
+        self._run_concurrently(lambda rx_idx: self.receivers[rx_idx].issue_stream_cmd(stream_cmd))
+
+    def download(self, waveform):
+        """
+        Download the recorded samples of all radio channels.
+
+        Arguments:
+        waveform: Array of shape (number of radio channels, number of samples)
+                  (may be 1-dimensional if there is only one radio channel)
+
+        Returns the smallest number of samples downloaded for any channel. If
+        any of the downloads failed, 0 is returned, and the error can be found
+        in the receive_metadata attribute of the corresponding receiver.
+        """
+        if len(waveform.shape) == 1:
+            waveform = waveform.reshape(1, len(waveform))
+        def download_stripe(rx_idx):
+            rx = self.receivers[rx_idx]
+            if rx.receive_metadata is None:
+                rx.receive_metadata = RXMetadata()
+            num_samps = []
+            for chan, (chan_rx_idx, sub_chan) in enumerate(self.chan_map):
+                if chan_rx_idx == rx_idx:
+                    rx.download(waveform[chan], rx.replay_ports[sub_chan])
+                    num_samps.append(rx.download_size[rx.replay_ports[sub_chan]])
+            return min(num_samps)
+        for rx in self.receivers:
+            rx.transfer_stats = {}
+        start_time = time.monotonic()
+        num_samps = min(self._run_concurrently(download_stripe))
+        num_bytes = sum(
+            stats['bytes'] for rx in self.receivers for stats in rx.transfer_stats.values())
+        self.transfer_stats = transfer_stats(num_bytes, time.monotonic() - start_time)
+        return num_samps
+
+    def recv(self, data, metadata, timeout=0.1):
+        """
+        This is a wrapper around download() that can be used to use this class
+        like you would use an RxStreamer object. See DramReceiver.recv() for
+        details.
+
+        The metadata object is only used for the first replay block; every
+        other replay block uses its own metadata object. The timeout parameter
+        is unused, it is only there to retain the call signature compatibility.
+        """
+        if self.receivers:
+            self.receivers[0].receive_metadata = metadata
+        return self.download(data)
@@ -12,6 +12,7 @@ import time
 import numpy as np
 
 from .. import libpyuhd as lib
+from .tx_waveform import WaveformTransmitter
 
 
 def _get_mpm_client(token, mb_args):
@@ -42,7 +43,15 @@ class MultiUSRP(lib.usrp.multi_usrp):
             setattr(self, "get_mpm_client", lambda: _get_mpm_client(token, mb_args))
 
     def recv_num_samps(
-        self, num_samps, freq, rate=1e6, channels=(0,), gain=10, start_time=None, streamer=None
+        self,
+        num_samps,
+        freq,
+        rate=1e6,
+        channels=(0,),
+        gain=10,
+        start_time=None,
+        streamer=None,
+        out=None,
     ):
         """
         RX a finite number of samples from the USRP
@@ -52,6 +61,11 @@ class MultiUSRP(lib.usrp.multi_usrp):
         in a script, pass in a streamer object to avoid recreating streamers
         more than once.
 
+        Samples are received directly into the result array, without going
+        through an intermediate buffer. To capture into caller-owned memory
+        (for example, an np.memmap backed by a file on disk), pass that array
+        as the out argument.
+
         :param num_samps: number of samples to RX
         :param freq: RX frequency (Hz)
         :param rate: RX sample rate (Hz)
@@ -61,73 +75,174 @@ class MultiUSRP(lib.usrp.multi_usrp):
                            None, then streaming starts immediately.
         :param streamer: An RX streamer object. If None, this function will create
                          one locally and attempt to destroy it afterwards.
-        :return: numpy array of complex floating-point samples (fc32)
+        :param out: Optional complex64 array of shape (len(channels), num_samps)
+                    to receive into. For a single channel, a 1D array of length
+                    num_samps is also accepted. If None, a new array is
+                    allocated.
+        :return: numpy array of complex floating-point samples (fc32). If
+                 out was given, this is out.
         """
+        num_samps = int(num_samps)
+        if out is None:
+            out = np.empty((len(channels), num_samps), dtype=np.complex64)
+        result = self._get_rx_result_view(out, num_samps, channels)
+        streamer = self._setup_rx(freq, rate, channels, gain, streamer)
+        metadata = lib.types.rx_metadata()
+        self._start_rx_stream(streamer, channels, start_time)
+        recv_samps = 0
+        try:
+            while recv_samps < num_samps:
+                recv_samps += self._recv_into(streamer, result[:, recv_samps:], metadata)
+        finally:
+            # Stop and clean up
+            self._stop_rx_stream(streamer)
+        # Help the garbage collection
+        streamer = None
+        return out
 
-        def _config_streamer(streamer):
-            """
-            Set up the correct streamer
-            """
-            if streamer is None:
-                st_args = lib.usrp.stream_args("fc32", "sc16")
-                st_args.channels = channels
-                streamer = super(MultiUSRP, self).get_rx_stream(st_args)
-            return streamer
+    def recv_num_samps_to_file(
+        self,
+        filename,
+        num_samps,
+        freq,
+        rate=1e6,
+        channels=(0,),
+        gain=10,
+        start_time=None,
+        streamer=None,
+        chunk_size=None,
+    ):
+        """
+        RX a finite number of samples from the USRP and write them to a file
 
-        def _start_stream(streamer):
-            """
-            Issue the start-stream command.
-            """
-            stream_cmd = lib.types.stream_cmd(lib.types.stream_mode.start_cont)
-            stream_cmd.stream_now = (len(channels) == 1) and start_time is None
-            if not stream_cmd.stream_now:
-                if start_time is not None:
-                    stream_cmd.time_spec = start_time
-                else:
-                    stream_cmd.time_spec = lib.types.time_spec(
-                        super(MultiUSRP, self).get_time_now().get_real_secs() + 0.05
-                    )
-            streamer.issue_stream_cmd(stream_cmd)
-
-        def _stop_stream(streamer):
-            """
-            Issue the stop-stream command and flush the queue.
-            """
-            metadata = lib.types.rx_metadata()
-            stream_cmd = lib.types.stream_cmd(lib.types.stream_mode.stop_cont)
-            streamer.issue_stream_cmd(stream_cmd)
-            while streamer.recv(recv_buffer, metadata):
-                pass
+        Unlike recv_num_samps(), this does not hold the entire capture in
+        memory. Samples are received directly into a reusable buffer of
+        chunk_size samples per channel, which is written to disk whenever
+        it is full. Capture length is therefore only limited by disk space.
 
-        ## And go!
-        # Configure USRP
+        The file layout is identical to calling tofile() on the return value of
+        recv_num_samps(): All samples of the first channel are stored first,
+        followed by all samples of the second channel, etc., as raw fc32 data.
+
+        :param filename: Path to the output file. Will be overwritten.
+        :param num_samps: number of samples to RX per channel
+        :param freq: RX frequency (Hz)
+        :param rate: RX sample rate (Hz)
+        :param channels: list of channels to RX on
+        :param gain: RX gain (dB)
+        :param start_time: A valid TimeSpec object with the starting time. If
+                           None, then streaming starts immediately.
+        :param streamer: An RX streamer object. If None, this function will create
+                         one locally and attempt to destroy it afterwards.
+        :param chunk_size: Number of samples per channel which are buffered
+                           before writing to disk. Defaults to roughly 100 ms
+                           worth of samples at the given rate.
+        :return: the number of samples written per channel
+        """
+        num_samps = int(num_samps)
+        streamer = self._setup_rx(freq, rate, channels, gain, streamer)
+        if chunk_size is None:
+            chunk_size = max(int(rate / 10), streamer.get_max_num_samps())
+        chunk_size = min(int(chunk_size), num_samps)
+        chunk = np.empty((len(channels), chunk_size), dtype=np.complex64)
+        chan_stride = num_samps * chunk.itemsize
+        metadata = lib.types.rx_metadata()
+        recv_samps = 0
+        with open(filename, "wb") as out_file:
+            # Pre-size the file so every channel's section can be written in place
+            out_file.truncate(chan_stride * len(channels))
+            self._start_rx_stream(streamer, channels, start_time)
+            try:
+                while recv_samps < num_samps:
+                    chunk_samps = min(chunk_size, num_samps - recv_samps)
+                    filled = 0
+                    while filled < chunk_samps:
+                        filled += self._recv_into(
+                            streamer, chunk[:, filled:chunk_samps], metadata
+                        )
+                    for chan_idx in range(len(channels)):
+                        out_file.seek(chan_idx * chan_stride + recv_samps * chunk.itemsize)
+                        out_file.write(memoryview(chunk[chan_idx, :chunk_samps]))
+                    recv_samps += chunk_samps
+            finally:
+                self._stop_rx_stream(streamer)
+        # Help the garbage collection
+        streamer = None
+        return recv_samps
+
+    @staticmethod
+    def _get_rx_result_view(out, num_samps, channels):
+        """
+        Validate a user-provided output array and return a 2D view of it
+        """
+        if out.dtype != np.complex64:
+            raise ValueError(f"Output array must be of type complex64, not {out.dtype}!")
+        if out.ndim == 1 and len(channels) == 1:
+            out = out.reshape(1, out.size)
+        if out.ndim != 2 or out.shape[0] != len(channels) or out.shape[1] < num_samps:
+            raise ValueError(
+                f"Output array of shape {out.shape} cannot hold {num_samps} "
+                f"samples on {len(channels)} channel(s)!"
+            )
+        if out.strides[1] != out.itemsize:
+            raise ValueError("Output array must be contiguous along the sample axis!")
+        return out[:, :num_samps]
+
+    def _setup_rx(self, freq, rate, channels, gain, streamer):
+        """
+        Configure the USRP for RX and create a streamer, if none was given
+        """
         for chan in channels:
             super(MultiUSRP, self).set_rx_rate(rate, chan)
             super(MultiUSRP, self).set_rx_freq(lib.types.tune_request(freq), chan)
             super(MultiUSRP, self).set_rx_gain(gain, chan)
-        # Configure streamer
-        streamer = _config_streamer(streamer)
+        if streamer is None:
+            st_args = lib.usrp.stream_args("fc32", "sc16")
+            st_args.channels = channels
+            streamer = super(MultiUSRP, self).get_rx_stream(st_args)
+        return streamer
+
+    def _start_rx_stream(self, streamer, channels, start_time):
+        """
+        Issue the start-stream command.
+        """
+        stream_cmd = lib.types.stream_cmd(lib.types.stream_mode.start_cont)
+        stream_cmd.stream_now = (len(channels) == 1) and start_time is None
+        if not stream_cmd.stream_now:
+            if start_time is not None:
+                stream_cmd.time_spec = start_time
+            else:
+                stream_cmd.time_spec = lib.types.time_spec(
+                    super(MultiUSRP, self).get_time_now().get_real_secs() + 0.05
+                )
+        streamer.issue_stream_cmd(stream_cmd)
+
+    @staticmethod
+    def _recv_into(streamer, buffer, metadata):
+        """
+        Receive directly into buffer, which may be a view into a larger array.
+
+        Each row of buffer must be contiguous, but rows need not be adjacent in
+        memory. Returns the number of samples received per channel.
+        """
+        samps = streamer.recv(buffer, metadata)
+        if metadata.error_code != lib.types.rx_metadata_error_code.none:
+            print(metadata.strerror())
+        return samps
+
+    @staticmethod
+    def _stop_rx_stream(streamer):
+        """
+        Issue the stop-stream command and flush the queue.
+        """
         metadata = lib.types.rx_metadata()
-        # Set up buffers and counters
-        result = np.empty((len(channels), num_samps), dtype=np.complex64)
-        recv_buffer = np.zeros((len(channels), streamer.get_max_num_samps()), dtype=np.complex64)
-        recv_samps = 0
-        samps = 0
-        # Now stream
-        _start_stream(streamer)
-        while recv_samps < num_samps:
-            samps = streamer.recv(recv_buffer, metadata)
-            if metadata.error_code != lib.types.rx_metadata_error_code.none:
-                print(metadata.strerror())
-            if samps:
-                real_samps = min(num_samps - recv_samps, samps)
-                result[:, recv_samps : recv_samps + real_samps] = recv_buffer[:, 0:real_samps]
-                recv_samps += real_samps
-        # Stop and clean up
-        _stop_stream(streamer)
-        # Help the garbage collection
-        streamer = None
-        return result
+        stream_cmd = lib.types.stream_cmd(lib.types.stream_mode.stop_cont)
+        streamer.issue_stream_cmd(stream_cmd)
+        flush_buffer = np.empty(
+            (streamer.get_num_channels(), streamer.get_max_num_samps()), dtype=np.complex64
+        )
+        while streamer.recv(flush_buffer, metadata):
+            pass
 
     def send_waveform(
         self,
@@ -142,6 +257,10 @@ class MultiUSRP(lib.usrp.multi_usrp):
     ):
         """
         TX a finite number of samples from the USRP
+
+        The waveform prototype is transmitted repeatedly until duration has
+        passed. It is not copied or tiled, see WaveformTransmitter for details.
+
         :param waveform_proto: numpy array of samples to TX
         :param duration: time in seconds to transmit at the supplied rate
         :param freq: TX frequency (Hz)
@@ -189,35 +308,21 @@ class MultiUSRP(lib.usrp.multi_usrp):
 
         # Configure streamer
         streamer = _config_streamer(streamer)
-        # Set up buffers and counters
-        buffer_samps = streamer.get_max_num_samps()
-        proto_len = waveform_proto.shape[-1]
-        if proto_len < buffer_samps:
-            waveform_proto = np.tile(
-                waveform_proto, (1, int(np.ceil(float(buffer_samps) / proto_len)))
-            )
-            proto_len = waveform_proto.shape[-1]
-        send_samps = 0
-        max_samps = int(np.floor(duration * rate))
-        if len(waveform_proto.shape) == 1:
-            waveform_proto = waveform_proto.reshape(1, waveform_proto.size)
-        if waveform_proto.shape[0] < len(channels):
-            waveform_proto = np.tile(waveform_proto[0], (len(channels), 1))
-        # Now stream
-        metadata = lib.types.tx_metadata()
-        if start_time is not None:
-            metadata.time_spec = start_time
-            metadata.has_time_spec = True
-        while send_samps < max_samps:
-            real_samps = min(proto_len, max_samps - send_samps)
-            if real_samps < proto_len:
-                samples = streamer.send(waveform_proto[:, :real_samps], metadata)
-            else:
-                samples = streamer.send(waveform_proto, metadata)
-            send_samps += samples
-        # Send EOB to terminate Tx
-        metadata.end_of_burst = True
-        streamer.send(np.zeros((len(channels), 1), dtype=np.complex64), metadata)
+        # Now stream. The transmitter cycles through the prototype without
+        # tiling it, and feeds the streamer from a background thread.
+        transmitter = WaveformTransmitter(
+            streamer,
+            waveform_proto,
+            num_samps=int(np.floor(duration * rate)),
+            start_time=start_time,
+        )
+        transmitter.start()
+        try:
+            send_samps = transmitter.wait()
+        finally:
+            # Only does anything if wait() was interrupted
+            if transmitter.is_running():
+                transmitter.stop()
         # Help the garbage collection
         streamer = None
         return send_samps
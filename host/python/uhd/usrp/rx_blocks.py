@@ -0,0 +1,338 @@
+#
+# Copyright 2024 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Block-based RX streaming on top of an RX streamer.
+
+This module takes care of the recv() loop which otherwise needs to be written
+for every RX application (see also benchmark_rate.py): It keeps the streamer
+fed from a background thread, handles overflows, late commands and timeouts,
+and hands out fixed-size blocks of samples from a ring of preallocated buffers.
+
+Example:
+
+>>> usrp = uhd.usrp.MultiUSRP("type=x4xx")
+>>> streamer = usrp.get_rx_stream(uhd.usrp.StreamArgs("fc32", "sc16"))
+>>> blocks = RxBlockIterator(streamer, usrp.get_rx_rate(), block_size=8192,
+...                          get_time_now=usrp.get_time_now)
+>>> with blocks:
+...     for block in blocks:
+...         process(block.data)
+"""
+
+import queue
+import threading
+
+import numpy as np
+
+from .. import libpyuhd as lib
+
+# Time between issuing a timed stream command and the requested start time
+INIT_DELAY = 0.05
+
+
+class RxBlock:
+    """
+    A block of received samples plus the metadata that applies to it.
+
+    The data attribute is a view into one of the iterator's ring buffers. It
+    remains valid until release() is called (either explicitly, or
+    implicitly by the iterator when auto_release is enabled).
+
+    Attributes:
+    - data: NumPy array of shape (num_channels, block_size)
+    - time_spec: Time of the first sample in this block (TimeSpec)
+    - error_code: The first error (other than 'none') that was reported while
+      this block was being filled (RXMetadataErrorCode)
+    - dropped_samps: Estimated number of samples which were dropped due to
+      overflows before or within this block
+    """
+
+    __slots__ = ("data", "time_spec", "error_code", "dropped_samps", "_slot", "_free_slots",
+                 "_in_use")
+
+    def __init__(self, data, slot, free_slots):
+        self.data = data
+        self.time_spec = lib.types.time_spec(0.0)
+        self.error_code = lib.types.rx_metadata_error_code.none
+        self.dropped_samps = 0
+        self._slot = slot
+        self._free_slots = free_slots
+        self._in_use = False
+
+    def release(self):
+        """
+        Return this block's buffer to the ring, so it can be filled again.
+
+        Calling this more than once has no effect.
+        """
+        if self._in_use:
+            self._in_use = False
+            self._free_slots.put(self._slot)
+
+
+class RxBlockIterator:
+    """
+    Iterate over fixed-size blocks of samples from an RX streamer.
+
+    Samples are received by a background thread into a ring of num_buffers
+    preallocated buffers. Iterating this object yields RxBlock objects, which
+    are reused as well, so no allocations happen per packet or per block.
+
+    If the consumer holds on to all buffers, the receive thread stops calling
+    recv() until a block is released (backpressure). The device will then
+    overflow; the resulting gap is reported via the dropped_samps attribute
+    of the next block, and counted in stats.
+    """
+
+    def __init__(
+        self,
+        streamer,
+        rate,
+        block_size=None,
+        num_buffers=4,
+        dtype=np.complex64,
+        start_time=None,
+        get_time_now=None,
+        num_blocks=None,
+        auto_release=True,
+        timeout=0.1,
+    ):
+        """
+        :param streamer: An RX streamer object
+        :param rate: The RX sample rate (Hz). Used to estimate the number of
+                     dropped samples after an overflow.
+        :param block_size: Number of samples per channel and block. Defaults
+                           to the max. number of samples per packet.
+        :param num_buffers: Number of buffers in the ring
+        :param dtype: NumPy data type of the buffers. Must match the CPU
+                      format of the streamer.
+        :param start_time: A TimeSpec object with the start time. If None,
+                           streaming starts immediately (single channel), or
+                           shortly after the current time (multiple channels).
+        :param get_time_now: A callable returning the current device time as a
+                             TimeSpec, e.g. MultiUSRP.get_time_now. Required
+                             for streaming on multiple channels without a
+                             start time, and for restarting after late
+                             commands.
+        :param num_blocks: Stop after this many blocks. If None, stream until
+                           stop() is called.
+        :param auto_release: If True, release a block once the next one is
+                             requested. Otherwise, the consumer must call
+                             release() on every block.
+        :param timeout: Timeout for individual recv() calls (seconds)
+        """
+        self._streamer = streamer
+        self._rate = rate
+        self._num_chans = streamer.get_num_channels()
+        self.block_size = int(block_size or streamer.get_max_num_samps())
+        self._start_time = start_time
+        self._get_time_now = get_time_now
+        self._num_blocks = num_blocks
+        self._auto_release = auto_release
+        self._timeout = timeout
+        if num_buffers < 2:
+            raise ValueError("RxBlockIterator requires at least two buffers!")
+        if self._num_chans > 1 and start_time is None and get_time_now is None:
+            raise ValueError(
+                "Streaming on multiple channels requires either a start time "
+                "or a get_time_now callable!"
+            )
+        self._free_slots = queue.Queue()
+        self._full_blocks = queue.Queue()
+        self._blocks = []
+        for slot in range(num_buffers):
+            buff = np.empty((self._num_chans, self.block_size), dtype=dtype)
+            self._blocks.append(RxBlock(buff, slot, self._free_slots))
+            self._free_slots.put(slot)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.stats = {
+            "num_samps": 0,
+            "num_overruns": 0,
+            "num_seqerr": 0,
+            "num_late": 0,
+            "num_timeouts": 0,
+            "num_dropped": 0,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __iter__(self):
+        self.start()
+        prev_block = None
+        try:
+            while True:
+                block = self._full_blocks.get()
+                if block is None:
+                    return
+                if isinstance(block, Exception):
+                    raise block
+                if self._auto_release and prev_block is not None:
+                    prev_block.release()
+                prev_block = block
+                yield block
+        finally:
+            self.stop()
+
+    def start(self):
+        """
+        Issue the start-stream command and start the receive thread.
+
+        This is called implicitly when iterating over this object.
+        """
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._issue_start_cmd(self._start_time)
+        self._thread = threading.Thread(target=self._rx_worker, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop streaming, join the receive thread, and flush the streamer.
+
+        All buffers are returned to the ring, so blocks which have not been
+        released yet must no longer be used. Iterating again afterwards
+        restarts streaming.
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._streamer.issue_stream_cmd(lib.types.stream_cmd(lib.types.stream_mode.stop_cont))
+        self._thread.join()
+        self._thread = None
+        # Flush any remaining samples into a buffer that isn't handed out
+        metadata = lib.types.rx_metadata()
+        flush_buffer = np.empty(
+            (self._num_chans, self._streamer.get_max_num_samps()),
+            dtype=self._blocks[0].data.dtype,
+        )
+        while self._streamer.recv(flush_buffer, metadata):
+            pass
+        self._reset_buffers()
+
+    def _reset_buffers(self):
+        """
+        Drop any blocks (and end-of-stream markers) the consumer didn't pick
+        up, and return all buffers to the ring.
+        """
+        while True:
+            try:
+                self._full_blocks.get_nowait()
+            except queue.Empty:
+                break
+        while True:
+            try:
+                self._free_slots.get_nowait()
+            except queue.Empty:
+                break
+        for block in self._blocks:
+            block._in_use = False  # pylint: disable=protected-access
+            self._free_slots.put(block._slot)  # pylint: disable=protected-access
+
+    def _issue_start_cmd(self, start_time):
+        """
+        Start continuous streaming, either now or at a given time.
+        """
+        stream_cmd = lib.types.stream_cmd(lib.types.stream_mode.start_cont)
+        stream_cmd.stream_now = (self._num_chans == 1) and start_time is None
+        if not stream_cmd.stream_now:
+            if start_time is None:
+                start_time = self._get_time_now() + INIT_DELAY
+            stream_cmd.time_spec = start_time
+        self._streamer.issue_stream_cmd(stream_cmd)
+
+    def _rx_worker(self):
+        """
+        Receive thread: Fill free buffers and pass them on to the consumer.
+        """
+        try:
+            self._rx_loop()
+        except Exception as ex:  # pylint: disable=broad-except
+            self._full_blocks.put(ex)
+        self._full_blocks.put(None)
+
+    def _next_free_block(self):
+        """
+        Wait for a free buffer. Returns None if we were asked to stop.
+        """
+        while not self._stop_event.is_set():
+            try:
+                block = self._blocks[self._free_slots.get(timeout=self._timeout)]
+            except queue.Empty:
+                continue
+            block._in_use = True  # pylint: disable=protected-access
+            return block
+        return None
+
+    def _rx_loop(self):
+        """
+        Receive loop. Handles the metadata error codes like benchmark_rate.py.
+        """
+        error_none = lib.types.rx_metadata_error_code.none
+        error_overflow = lib.types.rx_metadata_error_code.overflow
+        error_late = lib.types.rx_metadata_error_code.late
+        error_timeout = lib.types.rx_metadata_error_code.timeout
+        metadata = lib.types.rx_metadata()
+        streamer = self._streamer
+        stats = self.stats
+        had_an_overflow = False
+        last_overflow = None
+        num_blocks = 0
+        while self._num_blocks is None or num_blocks < self._num_blocks:
+            block = self._next_free_block()
+            if block is None:
+                return
+            block.error_code = error_none
+            block.dropped_samps = 0
+            filled = 0
+            while filled < self.block_size:
+                if self._stop_event.is_set():
+                    block.release()
+                    return
+                num_samps = streamer.recv(block.data[:, filled:], metadata, self._timeout)
+                error_code = metadata.error_code
+                if error_code == error_none:
+                    if had_an_overflow:
+                        had_an_overflow = False
+                        dropped = (metadata.time_spec - last_overflow).to_ticks(self._rate)
+                        block.dropped_samps += dropped
+                        stats["num_dropped"] += dropped
+                elif error_code == error_overflow:
+                    had_an_overflow = True
+                    # Copy, because metadata.time_spec gets overwritten by
+                    # the next recv() call
+                    last_overflow = lib.types.time_spec(
+                        metadata.time_spec.get_full_secs(), metadata.time_spec.get_frac_secs()
+                    )
+                    if metadata.out_of_sequence:
+                        stats["num_seqerr"] += 1
+                    else:
+                        stats["num_overruns"] += 1
+                elif error_code == error_late:
+                    stats["num_late"] += 1
+                    # Radio core will be in the idle state, restart streaming
+                    if self._num_chans > 1 and self._get_time_now is None:
+                        raise RuntimeError(f"Receiver error: {metadata.strerror()}")
+                    self._issue_start_cmd(None)
+                elif error_code == error_timeout:
+                    stats["num_timeouts"] += 1
+                else:
+                    raise RuntimeError(f"Receiver error: {metadata.strerror()}")
+                if error_code != error_none and block.error_code == error_none:
+                    block.error_code = error_code
+                if num_samps and filled == 0:
+                    block.time_spec = lib.types.time_spec(
+                        metadata.time_spec.get_full_secs(), metadata.time_spec.get_frac_secs()
+                    )
+                filled += num_samps
+            stats["num_samps"] += filled * self._num_chans
+            self._full_blocks.put(block)
+            num_blocks += 1
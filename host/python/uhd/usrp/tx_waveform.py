@@ -0,0 +1,266 @@
+#
+# Copyright 2024 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Continuous transmission of a periodic waveform from a TX streamer.
+"""
+
+import queue
+import threading
+
+import numpy as np
+
+from .. import libpyuhd as lib
+
+
+class WaveformTransmitter:
+    """
+    Transmit a waveform prototype repeatedly from a background thread.
+
+    Prototypes of at least one chunk are never tiled or copied in full.
+    Instead, the transmitter cycles through a read-only view of them with
+    wraparound indexing: Chunks which lie within the prototype are sent
+    straight from the prototype memory. Every chunk spans many packets, so
+    send() splits it up in C++ rather than in the Python loop. Only chunks
+    which wrap around the end of the prototype within less than one packet
+    are assembled into one of two preallocated chunk buffers. Assembling
+    chunks happens on a separate thread from sending them (double buffering),
+    so the streamer stays fed even when the calling thread is busy.
+
+    Shorter prototypes (e.g., a single period of a tone) are tiled once to a
+    little more than one chunk, so every chunk is a plain slice of the tiled
+    buffer.
+
+    If the prototype has a single row, but more than one channel is used, the
+    same row is sent on all channels without copying it.
+
+    Example:
+
+    >>> tx = WaveformTransmitter(streamer, waveform, num_samps=int(10 * rate))
+    >>> tx.start()
+    >>> do_something_else()
+    >>> num_sent = tx.wait()
+    """
+
+    def __init__(
+        self,
+        streamer,
+        waveform_proto,
+        num_samps=None,
+        start_time=None,
+        timeout=0.1,
+        chunk_size=None,
+    ):
+        """
+        :param streamer: A TX streamer object
+        :param waveform_proto: NumPy array of samples to TX, either 1D or of
+                               shape (num_channels, proto_len)
+        :param num_samps: Total number of samples to transmit per channel. If
+                          None, transmit until stop() is called.
+        :param start_time: A valid TimeSpec object with the starting time. If
+                           None, then streaming starts immediately.
+        :param timeout: Timeout for individual send() calls (seconds)
+        :param chunk_size: Max. number of samples per channel handed to a single
+                           send() call. Defaults to 32 packets.
+        """
+        self._streamer = streamer
+        num_chans = streamer.get_num_channels()
+        self._packet_size = streamer.get_max_num_samps()
+        if chunk_size is None:
+            chunk_size = 32 * self._packet_size
+        self._chunk_size = max(int(chunk_size), 1)
+        proto = np.asarray(waveform_proto)
+        if proto.ndim == 1:
+            proto = proto.reshape(1, proto.size)
+        proto = proto[:num_chans]
+        # Length of one period of the waveform. The buffer we cycle through
+        # may hold more than one period, see below.
+        self._period_len = proto.shape[-1]
+        if self._period_len < self._chunk_size:
+            # Tile short prototypes, so that a chunk starting anywhere within
+            # the first period is a slice of the buffer
+            proto = np.tile(proto, (1, self._chunk_size // self._period_len + 2))
+        if proto.shape[0] < num_chans:
+            proto = np.broadcast_to(proto[0], (num_chans, proto.shape[-1]))
+        elif proto.strides[-1] != proto.itemsize:
+            proto = np.ascontiguousarray(proto)
+        self._proto = proto
+        self._proto.flags.writeable = False
+        self._num_samps = num_samps
+        self._start_time = start_time
+        self._timeout = timeout
+        # Two chunk buffers: One can be assembled while the other one is sent.
+        # They are only needed if chunks can wrap around the end of the buffer.
+        self._free_buffers = queue.Queue()
+        if proto.shape[-1] == self._period_len:
+            for _ in range(2):
+                self._free_buffers.put(
+                    np.empty((num_chans, self._chunk_size), dtype=proto.dtype)
+                )
+        self._chunks = queue.Queue(maxsize=2)
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._error = None
+        self.num_sent = 0
+
+    def start(self):
+        """
+        Start transmitting. Returns immediately.
+        """
+        if self._threads:
+            raise RuntimeError("WaveformTransmitter is already running!")
+        self._stop_event.clear()
+        self._error = None
+        self.num_sent = 0
+        self._threads = [
+            threading.Thread(target=self._fill_worker, daemon=True),
+            threading.Thread(target=self._send_worker, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Stop transmitting (sends an end-of-burst) and wait for the background
+        threads to finish. Returns the number of samples sent per channel.
+        """
+        self._stop_event.set()
+        return self.wait()
+
+    def wait(self, timeout=None):
+        """
+        Wait until transmission is complete. Returns the number of samples sent
+        per channel, or None if the timeout expired first.
+
+        If an error occurred in the background, it is re-raised here.
+        """
+        for thread in self._threads:
+            thread.join(timeout)
+            if thread.is_alive():
+                return None
+        self._threads = []
+        if self._error is not None:
+            raise self._error
+        return self.num_sent
+
+    def is_running(self):
+        """
+        Return True if the transmitter is still sending.
+        """
+        return any(thread.is_alive() for thread in self._threads)
+
+    def _put_chunk(self, chunk, buff=None):
+        """
+        Hand a chunk to the send thread. Returns False if we were stopped.
+        """
+        while not self._stop_event.is_set():
+            try:
+                self._chunks.put((chunk, buff), timeout=self._timeout)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get_free_buffer(self):
+        """
+        Wait for a chunk buffer. Returns None if we were stopped.
+        """
+        while not self._stop_event.is_set():
+            try:
+                return self._free_buffers.get(timeout=self._timeout)
+            except queue.Empty:
+                pass
+        return None
+
+    def _fill_worker(self):
+        """
+        Produce chunks by cycling through the prototype.
+        """
+        try:
+            self._fill_chunks()
+        except Exception as ex:
+            self._error = ex
+            self._stop_event.set()
+            return
+        self._put_chunk(None)
+
+    def _fill_chunks(self):
+        """
+        Cycle through the prototype and hand chunks to the send thread until
+        all samples are queued or we are stopped.
+        """
+        proto = self._proto
+        proto_len = proto.shape[-1]
+        period_len = self._period_len
+        remaining = self._num_samps
+        pos = 0
+        while remaining is None or remaining > 0:
+            chunk_len = self._chunk_size if remaining is None else min(self._chunk_size, remaining)
+            if pos + chunk_len > proto_len and proto_len - pos >= self._packet_size:
+                # Stop at the end of the prototype rather than copying
+                chunk_len = proto_len - pos
+            if pos + chunk_len <= proto_len:
+                # Chunk lies within the prototype: Send a view, no copy needed
+                if not self._put_chunk(proto[:, pos : pos + chunk_len]):
+                    break
+                pos = (pos + chunk_len) % period_len
+            else:
+                # Only prototypes which are not tiled get here, so they are
+                # at least one chunk long and we wrap around at most once
+                buff = self._get_free_buffer()
+                if buff is None:
+                    break
+                head_len = proto_len - pos
+                buff[:, :head_len] = proto[:, pos:]
+                buff[:, head_len:chunk_len] = proto[:, : chunk_len - head_len]
+                pos = chunk_len - head_len
+                if not self._put_chunk(buff[:, :chunk_len], buff):
+                    break
+            if remaining is not None:
+                remaining -= chunk_len
+
+    def _send_worker(self):
+        """
+        Send chunks until the fill thread is done, then send an EOB.
+        """
+        metadata = lib.types.tx_metadata()
+        if self._start_time is not None:
+            metadata.time_spec = self._start_time
+            metadata.has_time_spec = True
+        try:
+            while True:
+                try:
+                    chunk, buff = self._chunks.get(timeout=self._timeout)
+                except queue.Empty:
+                    if self._stop_event.is_set():
+                        break
+                    continue
+                if chunk is None:
+                    break
+                chunk_len = chunk.shape[-1]
+                sent = 0
+                while sent < chunk_len and not self._stop_event.is_set():
+                    sent += self._streamer.send(chunk[:, sent:], metadata, self._timeout)
+                    if sent:
+                        metadata.has_time_spec = False
+                self.num_sent += sent
+                if buff is not None:
+                    self._free_buffers.put(buff)
+                if sent < chunk_len:
+                    break
+        except Exception as ex:
+            self._error = ex
+            self._stop_event.set()
+        # Send EOB to terminate Tx
+        metadata.end_of_burst = True
+        metadata.has_time_spec = False
+        try:
+            self._streamer.send(
+                np.zeros((self._streamer.get_num_channels(), 1), dtype=self._proto.dtype),
+                metadata,
+            )
+        except Exception as ex:
+            if self._error is None:
+                self._error = ex
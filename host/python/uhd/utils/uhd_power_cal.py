@@ -9,6 +9,8 @@
 
 import argparse
 import math
+import multiprocessing
+import os
 import pickle
 import sys
 import time
@@ -23,8 +25,11 @@ def parse_args():
     )
     parser.add_argument(
         "--args",
-        default="",
-        help="USRP Device Args",
+        default=[],
+        action="append",
+        help="USRP Device Args. May be given multiple times to calibrate "
+        "several devices in parallel, each in its own process and with its own "
+        "measurement device and switch.",
     )
     parser.add_argument(
         "-d",
@@ -114,13 +119,20 @@ def parse_args():
         "--meas-option",
         default=[],
         action="append",
-        help="Options that are passed to the measurement device",
+        help="Options that are passed to the measurement device. When "
+        "calibrating multiple devices, prefix an option with the device index "
+        "(e.g. 1:visa_query=...) to pass it only to that device's measurement "
+        "device.",
     )
     parser.add_argument(
         "--switch", default="manual", help="Type of switch to be used to connect antennas"
     )
     parser.add_argument(
-        "--switch-option", default=[], action="append", help="Options that are passed to the switch"
+        "--switch-option",
+        default=[],
+        action="append",
+        help="Options that are passed to the switch. Device index prefixes "
+        "work like for --meas-option.",
     )
     parser.add_argument(
         "-r", "--rate", type=float, help="Sampling rate at which the calibration is performed"
@@ -129,14 +141,42 @@ def parse_args():
         "--store",
         metavar="filename.pickle",
         help="If provided, will store intermediate cal data. This can be analyzed "
-        "separately, or loaded into the tool with --load.",
+        "separately, or loaded into the tool with --load. When calibrating "
+        "multiple devices, the device index is inserted before the extension.",
     )
     parser.add_argument(
         "--load",
         metavar="filename.pickle",
         help="If provided, will load intermediate cal data instead of running a " "measurement.",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    args.args = args.args or [""]
+    return args
+
+
+def get_device_options(options, dev_idx):
+    """Return the options that apply to device dev_idx.
+
+    Options of the form "<idx>:key=value" only apply to the device with that
+    index, all others apply to every device.
+    """
+    result = []
+    for option in options:
+        idx, sep, dev_option = option.partition(":")
+        if sep and idx.isdigit():
+            if int(idx) == dev_idx:
+                result.append(dev_option)
+        else:
+            result.append(option)
+    return result
+
+
+def get_device_filename(filename, dev_idx, num_devices):
+    """Return the pickle filename for device dev_idx."""
+    if filename is None or num_devices == 1:
+        return filename
+    base, ext = os.path.splitext(filename)
+    return "{}_{}{}".format(base, dev_idx, ext)
 
 
 def sanitize_args(usrp, args, default_rate):
@@ -216,7 +256,7 @@ class CalRunner:
         print("=== Running calibration at frequency {:.3f} MHz...".format(freq / 1e6))
         tune_req = uhd.types.TuneRequest(freq, self.lo_offset)
         getattr(self.usrp, "set_{}_freq".format(self.dir))(tune_req, chan)
-        time.sleep(self.usrp_cal.tune_settling_time)
+        settled_time = time.monotonic() + self.usrp_cal.tune_settling_time
         actual_freq = getattr(self.usrp, "get_{}_freq".format(self.dir))(chan)
         if abs(actual_freq - freq) > 1.0:
             print(
@@ -224,25 +264,31 @@ class CalRunner:
                     freq / 1e6, actual_freq / 1e6
                 )
             )
+        # Retune the measurement device while the USRP is settling, and only
+        # wait for whatever is left of the settling time afterwards
         self.meas_dev.set_frequency(actual_freq + self.tone_offset)
+        time.sleep(max(0, settled_time - time.monotonic()))
         getattr(self.usrp_cal, "run_{}_cal".format(self.dir))(freq)
 
 
-def main():
-    """Go, go, go!"""
-    args = parse_args()
+def calibrate_device(args, dev_idx=0):
+    """Run the full calibration for the device with index dev_idx in args.args."""
     print("=== Detecting USRP...")
-    usrp = uhd.usrp.MultiUSRP(args.args)
+    usrp = uhd.usrp.MultiUSRP(args.args[dev_idx])
     print("=== Measurement direction:", args.dir)
     print("=== Initializing measurement device...")
-    meas_dev = uhd.usrp.cal.get_meas_device(args.dir, args.meas_dev, args.meas_option)
+    meas_dev = uhd.usrp.cal.get_meas_device(
+        args.dir, args.meas_dev, get_device_options(args.meas_option, dev_idx)
+    )
     meas_dev.power_offset = args.attenuation
     # If we're transmitting, then we need to factor in the "attenuation" from us
     # not transmitting at full scale
     if args.dir == "tx":
         meas_dev.power_offset -= 20 * math.log10(args.amplitude)
     print("=== Initializing port connector...")
-    switch = uhd.usrp.cal.get_switch(args.dir, args.switch, args.switch_option)
+    switch = uhd.usrp.cal.get_switch(
+        args.dir, args.switch, get_device_options(args.switch_option, dev_idx)
+    )
     print("=== Initializing USRP calibration object...")
     usrp_cal = uhd.usrp.cal.get_usrp_calibrator(
         usrp,
@@ -251,7 +297,8 @@ def main():
         gain_step=args.gain_step,
     )
     channels, antennas, rate = sanitize_args(usrp, args, usrp_cal.default_rate)
-    results = init_results(args.load)
+    num_devices = len(args.args)
+    results = init_results(get_device_filename(args.load, dev_idx, num_devices))
     usrp_cal.init(
         rate=rate,
         tone_freq=args.tone_freq,
@@ -284,13 +331,59 @@ def main():
             # Store results for pickling and shut down for next antenna port
             results[chan][ant] = usrp_cal.results
             usrp_cal.stop()  # This will deactivate siggen and store the data
-    if args.store:
-        print("=== Storing pickled calibration data to {}...".format(args.store))
-        with open(args.store, "wb") as results_file:
+    store_file = get_device_filename(args.store, dev_idx, num_devices)
+    if store_file:
+        print("=== Storing pickled calibration data to {}...".format(store_file))
+        with open(store_file, "wb") as results_file:
             pickle.dump(results, results_file)
     return 0
 
 
+def _calibrate_device_process(args, dev_idx):
+    """Process entry point for calibrating a single device."""
+    try:
+        sys.exit(calibrate_device(args, dev_idx))
+    except (RuntimeError, ValueError, EOFError) as ex:
+        print("ERROR: [Device {}] {}".format(dev_idx, str(ex)))
+        sys.exit(1)
+
+
+def main():
+    """Go, go, go!"""
+    args = parse_args()
+    if len(args.args) == 1:
+        return calibrate_device(args)
+    if args.meas_dev == "manual":
+        raise ValueError("Cannot calibrate multiple devices in parallel with a manual "
+                         "measurement device!")
+    for dev_idx in range(len(args.args)):
+        if uhd.usrp.cal.is_interactive_switch(
+                args.switch, get_device_options(args.switch_option, dev_idx)):
+            raise ValueError("Cannot calibrate multiple devices in parallel with a manual "
+                             "switch! Use an automatic switch (e.g. --switch niswitch), "
+                             "or --switch-option mode=auto if no recabling is required.")
+    print("=== Calibrating {} devices in parallel...".format(len(args.args)))
+    # Every device gets its own process (and thus its own USRP session,
+    # measurement device, and switch), so devices don't block each other
+    procs = [
+        multiprocessing.Process(
+            target=_calibrate_device_process,
+            args=(args, dev_idx),
+            name="uhd_power_cal_{}".format(dev_idx),
+        )
+        for dev_idx in range(len(args.args))
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    failed = [idx for idx, proc in enumerate(procs) if proc.exitcode != 0]
+    if failed:
+        print("ERROR: Calibration failed for device(s):", ", ".join(str(x) for x in failed))
+        return 1
+    return 0
+
+
 if __name__ == "__main__":
     try:
         sys.exit(main())
@@ -0,0 +1,104 @@
+#
+# Copyright 2024 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Unit test for uhd.aio
+"""
+
+import threading
+import unittest
+import numpy as np
+from uhd import aio
+from uhd.types import StreamMode, TimeSpec
+
+class MockRxStreamer:
+    """ RX streamer which records stream commands, and returns a few packets """
+    def __init__(self, num_chans=1, spp=16, num_flush_packets=3):
+        self.num_chans = num_chans
+        self.spp = spp
+        self.stream_cmds = []
+        self.num_flush_packets = num_flush_packets
+        self.streaming = False
+        self.threads = set()
+
+    def get_num_channels(self):
+        return self.num_chans
+
+    def get_max_num_samps(self):
+        return self.spp
+
+    def issue_stream_cmd(self, stream_cmd):
+        self.threads.add(threading.current_thread())
+        self.stream_cmds.append(stream_cmd)
+        self.streaming = stream_cmd.stream_mode == StreamMode.start_cont
+
+    def recv(self, buff, metadata, timeout=0.1):
+        self.threads.add(threading.current_thread())
+        if not self.streaming:
+            # Samples which were in flight when streaming was stopped
+            if not self.num_flush_packets:
+                return 0
+            self.num_flush_packets -= 1
+        buff[:, :self.spp] = 1
+        return self.spp
+
+class MockUSRP:
+    """ MultiUSRP which only knows the time, and creates streamers """
+    def __init__(self, num_chans):
+        self.num_chans = num_chans
+
+    def get_time_now(self):
+        return TimeSpec(10.0)
+
+    def get_rx_stream(self, stream_args):
+        return MockRxStreamer(self.num_chans)
+
+class AioTest(unittest.IsolatedAsyncioTestCase):
+    """ Test the asyncio wrappers with mocked streamers """
+
+    async def test_rx_streaming(self):
+        """
+        Check single-channel streams start immediately, and samples in flight
+        are flushed when streaming stops
+        """
+        async with aio.AsyncRXStreamer(MockRxStreamer()) as rx_streamer:
+            buff = np.zeros((1, 16), dtype=np.complex64)
+            async with aio.rx_streaming(rx_streamer):
+                self.assertEqual(await rx_streamer.recv(buff, None), 16)
+            mock_streamer = rx_streamer.wrapped
+            start_cmd, stop_cmd = mock_streamer.stream_cmds
+            self.assertEqual(start_cmd.stream_mode, StreamMode.start_cont)
+            self.assertTrue(start_cmd.stream_now)
+            self.assertEqual(stop_cmd.stream_mode, StreamMode.stop_cont)
+            self.assertEqual(mock_streamer.num_flush_packets, 0)
+            # All calls ran on the streamer's executor thread
+            self.assertEqual(len(mock_streamer.threads), 1)
+            self.assertNotIn(threading.current_thread(), mock_streamer.threads)
+        self.assertTrue(rx_streamer._executor._shutdown)
+
+    async def test_multi_channel_timed_start(self):
+        """
+        Check multi-channel streams start at a common time
+        """
+        async with aio.AsyncMultiUSRP(MockUSRP(num_chans=2)) as usrp:
+            rx_streamer = await usrp.get_rx_stream(None)
+            with self.assertRaises(ValueError):
+                async with aio.rx_streaming(rx_streamer):
+                    pass
+            async with aio.rx_streaming(rx_streamer, usrp=usrp):
+                pass
+            start_cmd = rx_streamer.wrapped.stream_cmds[0]
+            self.assertFalse(start_cmd.stream_now)
+            self.assertAlmostEqual(
+                start_cmd.time_spec.get_real_secs(), 10.0 + aio.INIT_DELAY)
+            async with aio.rx_streaming(rx_streamer, start_time=TimeSpec(20.0)):
+                pass
+            self.assertEqual(rx_streamer.wrapped.stream_cmds[2].time_spec.get_real_secs(), 20.0)
+        # Closing the device also closes its streamers
+        self.assertTrue(usrp._executor._shutdown)
+        self.assertTrue(rx_streamer._executor._shutdown)
+
+if __name__ == '__main__':
+    unittest.main()
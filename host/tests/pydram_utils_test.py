@@ -0,0 +1,282 @@
+#
+# Copyright 2024 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Unit test for uhd.usrp.dram_utils
+"""
+
+import unittest
+import numpy as np
+from uhd.types import RXMetadataErrorCode
+from uhd.usrp.dram_utils import \
+    DramTransmitter, DramReceiver, StripedDramTransmitter, StripedDramReceiver
+
+MEM_SIZE = 2**16
+WORD_SIZE = 8
+BYTES_PER_SAMPLE = 4
+
+class MockReplayBlock:
+    """ Replay block with two ports, which records the calls into it """
+    def __init__(self):
+        self.fullness = [0, 0]
+        self.records = []
+        self.plays = []
+
+    def get_mem_size(self):
+        return MEM_SIZE
+
+    def get_word_size(self):
+        return WORD_SIZE
+
+    def get_num_input_ports(self):
+        return 2
+
+    def get_num_output_ports(self):
+        return 2
+
+    def record(self, offset, size, port):
+        self.records.append((offset, size, port))
+        self.fullness[port] = 0
+
+    def record_restart(self, port):
+        self.fullness[port] = 0
+
+    def get_record_fullness(self, port):
+        return self.fullness[port]
+
+    def config_play(self, offset, size, port):
+        self.plays.append((offset, size, port))
+
+class MockTxStreamer:
+    """ TX streamer which fills up the record buffer of a replay block port """
+    def __init__(self, replay, port):
+        self.replay = replay
+        self.port = port
+        self.bursts = []
+
+    def send(self, data, metadata, timeout=0.1):
+        self.bursts.append((len(data), metadata.start_of_burst, metadata.end_of_burst))
+        self.replay.fullness[self.port] += len(data) * BYTES_PER_SAMPLE
+        return len(data)
+
+class MockRxStreamer:
+    """
+    RX streamer which returns a ramp of sample indices, and optionally fails
+    after a number of recv() calls
+    """
+    def __init__(self, num_good_recvs=None):
+        self.num_samps = 0
+        self.num_recvs = 0
+        self.num_good_recvs = num_good_recvs
+        self.stream_cmds = []
+
+    def issue_stream_cmd(self, stream_cmd):
+        self.stream_cmds.append(stream_cmd)
+
+    def recv(self, buff, metadata, timeout=0.1):
+        self.num_recvs += 1
+        if self.num_good_recvs is not None and self.num_recvs > self.num_good_recvs:
+            metadata.error_code = RXMetadataErrorCode.overflow
+            return 0
+        buff[:] = np.arange(self.num_samps, self.num_samps + len(buff))
+        self.num_samps += len(buff)
+        return len(buff)
+
+class MockRXMetadata:
+    """ RX metadata with a writable error code """
+    def __init__(self):
+        self.error_code = RXMetadataErrorCode.none
+
+def make_transmitter(chunk_size):
+    """
+    Return a DramTransmitter for a mocked replay block. The constructor
+    requires an RFNoC graph, so we skip it.
+    """
+    replay = MockReplayBlock()
+    transmitter = DramTransmitter.__new__(DramTransmitter)
+    transmitter.replay_blocks = [replay]
+    transmitter.word_size = WORD_SIZE
+    transmitter.bytes_per_sample = BYTES_PER_SAMPLE
+    transmitter.replay_ports = [0, 1]
+    transmitter.replay_in_port = 0
+    transmitter.chunk_size = chunk_size
+    transmitter.transfer_stats = {}
+    transmitter.mem_regions = [(0, MEM_SIZE // 2), (MEM_SIZE // 2, MEM_SIZE // 2)]
+    transmitter.upload_size = [MEM_SIZE // 2, MEM_SIZE // 2]
+    transmitter.tx_streamer = MockTxStreamer(replay, 0)
+    return transmitter
+
+def make_receiver(chunk_size, num_good_recvs=None):
+    """
+    Return a DramReceiver for a mocked replay block. The constructor
+    requires an RFNoC graph, so we skip it.
+    """
+    receiver = DramReceiver.__new__(DramReceiver)
+    receiver.replay_blocks = [MockReplayBlock()]
+    receiver.word_size = WORD_SIZE
+    receiver.bytes_per_sample = BYTES_PER_SAMPLE
+    receiver.replay_ports = [0]
+    receiver.replay_out_port = 0
+    receiver.radio_chan_pairs = [None]
+    receiver.chunk_size = chunk_size
+    receiver.transfer_stats = {}
+    receiver.mem_regions = [(0, MEM_SIZE // 2), (MEM_SIZE // 2, MEM_SIZE // 2)]
+    receiver.download_size = [MEM_SIZE // 2, MEM_SIZE // 2]
+    receiver.receive_metadata = MockRXMetadata()
+    receiver.rx_streamer = MockRxStreamer(num_good_recvs)
+    return receiver
+
+def make_striped_transmitter(chunk_size):
+    """
+    Return a StripedDramTransmitter for two mocked replay blocks. Channels 0
+    and 2 are on the first block, channel 1 is on the second one.
+    """
+    striped = StripedDramTransmitter.__new__(StripedDramTransmitter)
+    striped.transmitters = [make_transmitter(chunk_size), make_transmitter(chunk_size)]
+    striped.chan_map = [(0, 0), (1, 0), (0, 1)]
+    striped.replay_blocks = [tx.replay_blocks[0] for tx in striped.transmitters]
+    striped.transfer_stats = {}
+    return striped
+
+def make_striped_receiver(chunk_size, num_good_recvs=(None, None)):
+    """
+    Return a StripedDramReceiver for two mocked replay blocks, with one
+    channel on each block
+    """
+    striped = StripedDramReceiver.__new__(StripedDramReceiver)
+    striped.receivers = [make_receiver(chunk_size, num_good) for num_good in num_good_recvs]
+    striped.chan_map = [(0, 0), (1, 0)]
+    striped.replay_blocks = [rx.replay_blocks[0] for rx in striped.receivers]
+    striped.transfer_stats = {}
+    return striped
+
+class DramUtilsTest(unittest.TestCase):
+    """ Test DRAM uploads and downloads with mocked replay blocks and streamers """
+
+    def check_stats(self, stats, num_bytes):
+        """
+        Check the transfer statistics are consistent
+        """
+        self.assertEqual(stats['bytes'], num_bytes)
+        self.assertGreaterEqual(stats['duration'], 0)
+        if stats['duration'] > 0:
+            self.assertAlmostEqual(stats['gbps'], num_bytes / stats['duration'] / 1e9)
+        else:
+            self.assertEqual(stats['gbps'], 0.0)
+
+    def test_upload(self):
+        """
+        Check uploads are split into chunks, and return their statistics
+        """
+        transmitter = make_transmitter(chunk_size=300)
+        num_bytes, stats = transmitter._upload(
+            np.zeros(1000, dtype=np.complex64), *transmitter.mem_regions[1])
+        self.assertEqual(num_bytes, 1000 * BYTES_PER_SAMPLE)
+        self.check_stats(stats, num_bytes)
+        self.assertEqual(transmitter.tx_streamer.bursts, [
+            (300, True, False), (300, False, False), (300, False, False), (100, False, True)])
+        self.assertEqual(transmitter.replay_blocks[0].records,
+                         [(MEM_SIZE // 2, num_bytes, 0)])
+        # Uploads are truncated to the memory region
+        transmitter.upload(np.zeros(MEM_SIZE, dtype=np.complex64), ports=[1])
+        self.assertEqual(transmitter.upload_size[1], MEM_SIZE // 2)
+        self.check_stats(transmitter.transfer_stats[1], MEM_SIZE // 2)
+
+    def test_empty_upload(self):
+        """
+        Check an empty upload doesn't touch the replay block
+        """
+        transmitter = make_transmitter(chunk_size=300)
+        transmitter.upload(np.zeros(0, dtype=np.complex64), ports=[0, 1])
+        self.assertEqual(transmitter.upload_size, [0, 0])
+        for port in (0, 1):
+            self.check_stats(transmitter.transfer_stats[port], 0)
+        self.assertEqual(transmitter.replay_blocks[0].records, [])
+        self.assertEqual(transmitter.tx_streamer.bursts, [])
+
+    def test_download(self):
+        """
+        Check downloads are received in chunks, and return their statistics
+        """
+        receiver = make_receiver(chunk_size=300)
+        waveform = np.zeros(1000, dtype=np.complex64)
+        receiver.download(waveform, ports=[0])
+        self.assertEqual(receiver.download_size[0], 1000)
+        self.check_stats(receiver.transfer_stats[0], 1000 * BYTES_PER_SAMPLE)
+        self.assertEqual(receiver.rx_streamer.num_recvs, 4)
+        self.assertEqual(receiver.rx_streamer.stream_cmds[0].num_samps, 1000)
+        np.testing.assert_array_equal(waveform.real, np.arange(1000))
+
+    def test_download_error(self):
+        """
+        Check a failed download returns 0 samples, and the statistics of what
+        was received up to the error
+        """
+        receiver = make_receiver(chunk_size=300, num_good_recvs=2)
+        num_recvd, stats = receiver._download(
+            np.zeros(1000, dtype=np.complex64), *receiver.mem_regions[0])
+        self.assertEqual(num_recvd, 0)
+        self.check_stats(stats, 600 * BYTES_PER_SAMPLE)
+
+    def test_empty_download(self):
+        """
+        Check an empty download doesn't receive anything
+        """
+        receiver = make_receiver(chunk_size=300)
+        num_recvd, stats = receiver._download(
+            np.zeros(0, dtype=np.complex64), *receiver.mem_regions[0])
+        self.assertEqual(num_recvd, 0)
+        self.check_stats(stats, 0)
+        self.assertEqual(receiver.rx_streamer.num_recvs, 0)
+
+    def test_striped_upload(self):
+        """
+        Check striped uploads go to the right replay blocks and ports, and the
+        total transfer statistics add up the ones of every block
+        """
+        striped = make_striped_transmitter(chunk_size=300)
+        striped.upload(np.zeros((3, 1000), dtype=np.complex64))
+        num_bytes = 1000 * BYTES_PER_SAMPLE
+        tx0, tx1 = striped.transmitters
+        self.assertEqual(sorted(tx0.transfer_stats), [0, 1])
+        self.assertEqual(sorted(tx1.transfer_stats), [0])
+        for stats in list(tx0.transfer_stats.values()) + list(tx1.transfer_stats.values()):
+            self.check_stats(stats, num_bytes)
+        self.assertEqual(tx0.upload_size, [num_bytes, num_bytes])
+        self.assertEqual(tx1.upload_size[0], num_bytes)
+        self.check_stats(striped.transfer_stats, 3 * num_bytes)
+        # Every upload starts from scratch
+        striped.upload(np.zeros(500, dtype=np.complex64))
+        self.check_stats(striped.transfer_stats, 3 * 500 * BYTES_PER_SAMPLE)
+        self.assertEqual(sorted(tx1.transfer_stats), [0])
+        striped.upload(np.zeros((3, 0), dtype=np.complex64))
+        self.check_stats(striped.transfer_stats, 0)
+
+    def test_striped_download(self):
+        """
+        Check striped downloads fill every channel, and the total transfer
+        statistics add up the ones of every block
+        """
+        striped = make_striped_receiver(chunk_size=300)
+        waveform = np.zeros((2, 1000), dtype=np.complex64)
+        self.assertEqual(striped.download(waveform), 1000)
+        for chan, rx in enumerate(striped.receivers):
+            self.check_stats(rx.transfer_stats[0], 1000 * BYTES_PER_SAMPLE)
+            np.testing.assert_array_equal(waveform[chan].real, np.arange(1000))
+        self.check_stats(striped.transfer_stats, 2 * 1000 * BYTES_PER_SAMPLE)
+
+    def test_striped_download_error(self):
+        """
+        Check a failed download on one block returns 0 samples, and only the
+        bytes actually received are accounted for
+        """
+        striped = make_striped_receiver(chunk_size=300, num_good_recvs=(None, 1))
+        self.assertEqual(striped.download(np.zeros((2, 1000), dtype=np.complex64)), 0)
+        self.check_stats(striped.transfer_stats, (1000 + 300) * BYTES_PER_SAMPLE)
+        self.assertEqual(striped.receivers[1].receive_metadata.error_code,
+                         RXMetadataErrorCode.overflow)
+
+if __name__ == '__main__':
+    unittest.main()
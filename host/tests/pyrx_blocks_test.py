@@ -0,0 +1,70 @@
+#
+# Copyright 2024 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Unit test for uhd.usrp.RxBlockIterator
+"""
+
+import unittest
+import numpy as np
+from uhd.types import StreamMode
+from uhd.usrp import RxBlockIterator
+
+class MockRxStreamer:
+    """ Single-channel RX streamer which returns a ramp of sample indices """
+    def __init__(self, spp=16):
+        self.spp = spp
+        self.streaming = False
+        self.num_samps = 0
+
+    def get_num_channels(self):
+        return 1
+
+    def get_max_num_samps(self):
+        return self.spp
+
+    def issue_stream_cmd(self, stream_cmd):
+        self.streaming = stream_cmd.stream_mode == StreamMode.start_cont
+
+    def recv(self, buff, metadata, timeout=0.1):
+        if not self.streaming:
+            return 0
+        num_samps = min(self.spp, buff.shape[-1])
+        buff[:, :num_samps] = np.arange(self.num_samps, self.num_samps + num_samps)
+        self.num_samps += num_samps
+        return num_samps
+
+class RxBlockIteratorTest(unittest.TestCase):
+    """ Test the block-based RX streaming iterator """
+
+    def test_iterate(self):
+        """
+        Check we get num_blocks contiguous blocks of samples
+        """
+        blocks = RxBlockIterator(MockRxStreamer(), 1e6, block_size=32, num_blocks=5)
+        first_samps = [int(block.data[0, 0].real) for block in blocks]
+        self.assertEqual(first_samps, [0, 32, 64, 96, 128])
+        self.assertEqual(blocks.stats["num_samps"], 5 * 32)
+
+    def test_stop_and_iterate_again(self):
+        """
+        Check that stopping halfway through (without releasing blocks)
+        doesn't leave stale blocks or lost buffers behind
+        """
+        blocks = RxBlockIterator(
+            MockRxStreamer(), 1e6, block_size=32, num_buffers=2, num_blocks=4,
+            auto_release=False)
+        for _ in blocks:
+            break
+        blocks.stop()
+        num_blocks = 0
+        for block in blocks:
+            self.assertEqual(block.data.shape, (1, 32))
+            block.release()
+            num_blocks += 1
+        self.assertEqual(num_blocks, 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#
+# Copyright 2024 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Unit test for uhd.dsp.signals
+"""
+
+import math
+import unittest
+import numpy
+from uhd.dsp import signals
+
+def reference_tone(rate, freq, ampl, desired_size=None, max_size=None, waveform='sine'):
+    """
+    Tone generator as it was before tone periods were cached: Computes
+    every sample individually.
+    """
+    desired_size = desired_size or 1.0 * rate
+    max_size = max_size or 100e6
+    gcd = math.gcd(int(rate), int(freq))
+    length = int(max((int(freq) / gcd) * (int(rate) / gcd), 1))
+    f_norm = freq/rate
+    if waveform in ('sine', 'square'):
+        tone = \
+            numpy.exp(1j * 2 * numpy.pi * f_norm * numpy.arange(length),
+                      dtype=numpy.complex64)
+        if waveform == 'square':
+            tone = numpy.sign(tone) * ampl
+        else:
+            tone = tone * ampl
+    elif waveform == 'ramp':
+        tone = numpy.array(
+            [2 * (n * f_norm - numpy.floor(float(0.5 + n * f_norm)))
+             for n in range(length)],
+            dtype=numpy.complex64)
+    elif waveform == 'const':
+        tone = numpy.ones(length, dtype=numpy.complex64) * ampl
+    if length < desired_size:
+        tone = numpy.tile(tone, int(desired_size // length))
+    return tone
+
+class SignalsTest(unittest.TestCase):
+    """ Test tone generation """
+
+    def setUp(self):
+        signals.clear_tone_cache()
+
+    def test_matches_reference(self):
+        """
+        Check cached tones match the uncached generator
+        """
+        for waveform in ('sine', 'square', 'ramp', 'const'):
+            for rate, freq, desired_size in (
+                    (1e6, 1e3, None), (1e6, 250e3, 1000), (10e6, 0, 100), (1e6, 3e3, 10)):
+                expected = reference_tone(rate, freq, 0.7, desired_size, waveform=waveform)
+                for _ in range(2): # Uncached, then cached
+                    tone = signals.get_continuous_tone(
+                        rate, freq, 0.7, desired_size, waveform=waveform)
+                    self.assertEqual(tone.dtype, numpy.complex64)
+                    self.assertEqual(tone.shape, expected.shape)
+                    numpy.testing.assert_allclose(tone, expected, rtol=0, atol=1e-5)
+
+    def test_writable_result(self):
+        """
+        Check get_continuous_tone() returns a writable copy, and modifying it
+        doesn't affect the cache
+        """
+        tone = signals.get_continuous_tone(1e6, 1e3, 1.0, desired_size=1000)
+        tone[:] = 0
+        tone = signals.get_continuous_tone(1e6, 1e3, 1.0, desired_size=1000)
+        self.assertTrue(numpy.all(numpy.abs(tone) > 0.99))
+        period, num_repeats = signals.get_continuous_tone_period(1e6, 1e3, 1.0)
+        self.assertEqual((len(period), num_repeats), (1000, 1000))
+        self.assertFalse(period.flags.writeable)
+        self.assertIs(signals.get_continuous_tone_period(1e6, 1e3, 1.0)[0], period)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,8 @@
 #include <boost/noncopyable.hpp>
 #include <cstdint>
 #include <string>
+#include <utility>
+#include <vector>
 
 namespace mpm { namespace types {
 
@@ -37,6 +39,14 @@ public:
     //! Read data from \p addr
     uint32_t peek32(const uint32_t addr);
 
+    /*! Write a list of (address, data) pairs, in the given order
+     *
+     * If \p verify is true, every register is read back right after it was
+     * written, and an exception is thrown if the value read back differs.
+     */
+    void poke32_batch(
+        const std::vector<std::pair<uint32_t, uint32_t>>& pokes, const bool verify = false);
+
 private:
     void log(mpm::types::log_level_t level, const std::string path, const char* comment);
 
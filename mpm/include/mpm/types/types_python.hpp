@@ -11,6 +11,7 @@
 #include "log_buf.hpp"
 #include "mmap_regs_iface.hpp"
 #include "regs_iface.hpp"
+#include <pybind11/stl.h>
 
 void export_types(py::module& top_module)
 {
@@ -46,5 +47,9 @@ void export_types(py::module& top_module)
         .def("open", &mmap_regs_iface::open)
         .def("close", &mmap_regs_iface::close)
         .def("peek32", &mmap_regs_iface::peek32)
-        .def("poke32", &mmap_regs_iface::poke32);
+        .def("poke32", &mmap_regs_iface::poke32)
+        .def("poke32_batch",
+            &mmap_regs_iface::poke32_batch,
+            py::arg("pokes"),
+            py::arg("verify") = false);
 }
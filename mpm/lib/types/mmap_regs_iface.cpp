@@ -91,6 +91,26 @@ uint32_t mmap_regs_iface::peek32(const uint32_t addr)
     return _mmap[addr / sizeof(uint32_t)];
 }
 
+void mmap_regs_iface::poke32_batch(
+    const std::vector<std::pair<uint32_t, uint32_t>>& pokes, const bool verify)
+{
+    MPM_ASSERT_THROW(_mmap);
+    for (const auto& poke : pokes) {
+        // The read back must not be optimized away
+        volatile uint32_t* reg = _mmap + poke.first / sizeof(uint32_t);
+        *reg                   = poke.second;
+        if (!verify) {
+            continue;
+        }
+        const uint32_t readback = *reg;
+        if (readback != poke.second) {
+            throw mpm::runtime_error(
+                str(boost::format("Register 0x%X reads back 0x%08X after writing 0x%08X")
+                    % poke.first % readback % poke.second));
+        }
+    }
+}
+
 void mmap_regs_iface::log(
     mpm::types::log_level_t level, const std::string path, const char* comment)
 {
@@ -0,0 +1,170 @@
+#
+# Copyright 2026 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the batched register writes, from the X4xx daughterboard interface
+down to mmap_regs_iface
+"""
+import tempfile
+import unittest
+from unittest import mock
+from base_tests import TestBase
+from test_utilities import MockLog
+from usrp_mpm import lib
+from usrp_mpm.mpmlog import get_main_logger
+from usrp_mpm.sys_utils import uio
+from usrp_mpm.periph_manager.x4xx_periphs import CtrlportRegs
+from usrp_mpm.dboard_manager.x4xx_db_iface import X4xxDboardIface
+
+REGS_SIZE = 0x20000
+
+
+class MockMmapRegsIface:
+    """
+    Stands in for lib.types.mmap_regs_iface. Records every write, and has
+    registers with stuck bits, which don't read back what was written.
+    """
+    def __init__(self, path, length, offset, read_only, open_now):
+        self.regs = {}
+        self.stuck_bits = {}
+        self.writes = []
+        self.num_opens = 0
+        self.is_open = False
+        if open_now:
+            self.open()
+
+    def open(self):
+        self.num_opens += 1
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def peek32(self, addr):
+        if not self.is_open:
+            raise RuntimeError("Device is not open")
+        return self.regs.get(addr, 0)
+
+    def poke32(self, addr, val):
+        if not self.is_open:
+            raise RuntimeError("Device is not open")
+        self.writes.append((addr, val))
+        self.regs[addr] = val & ~self.stuck_bits.get(addr, 0)
+
+    def poke32_batch(self, pokes, verify=False):
+        for addr, val in pokes:
+            self.poke32(addr, val)
+            if verify and self.peek32(addr) != val:
+                raise RuntimeError("Register 0x{:X} reads back 0x{:08X} after writing 0x{:08X}"
+                                   .format(addr, self.peek32(addr), val))
+
+
+class TestBatchPokes(TestBase):
+    """
+    Tests for poke32_batch() of UIO, CtrlportRegs and its DB CPLD windows,
+    and X4xxDboardIface.poke_db_cpld_batch()
+    """
+    def setUp(self):
+        get_main_logger(use_console=False, use_logbuf=False)
+        with mock.patch.object(uio, 'get_uio_map_info',
+                               return_value={'offset': 0, 'size': REGS_SIZE}), \
+                mock.patch.object(uio.lib.types, 'mmap_regs_iface', MockMmapRegsIface):
+            self.uio = uio.UIO(path='/dev/uio0', length=REGS_SIZE, read_only=False)
+        self.mmap = self.uio._uio
+        # The constructors of CtrlportRegs and X4xxDboardIface talk to the
+        # hardware, so they are skipped
+        self.ctrlport = CtrlportRegs.__new__(CtrlportRegs)
+        self.ctrlport.log = MockLog()
+        self.ctrlport.regs = self.uio
+        self.ctrlport._regs_uio_opened = False
+        self.ctrlport.db_0_regs = CtrlportRegs.DbCpldIface(self.ctrlport, CtrlportRegs.DB_0_CPLD)
+        self.ctrlport.db_1_regs = CtrlportRegs.DbCpldIface(self.ctrlport, CtrlportRegs.DB_1_CPLD)
+        self.db_iface = X4xxDboardIface.__new__(X4xxDboardIface)
+        self.db_iface.db_cpld_iface = self.ctrlport.get_db_cpld_iface(1)
+
+    def test_uio_batch(self):
+        """
+        Check a batch is written in order, with the device opened once
+        """
+        pokes = [(0x10, 1), (0x8, 2), (0x10, 3)]
+        self.uio.poke32_batch(iter(pokes))
+        self.assertEqual(self.mmap.writes, pokes)
+        self.assertEqual(self.mmap.num_opens, 1)
+        self.assertFalse(self.mmap.is_open)
+        self.assertEqual(self.mmap.regs, {0x8: 2, 0x10: 3})
+        # An open device stays open
+        with self.uio:
+            self.uio.poke32_batch(pokes, verify=True)
+            self.assertTrue(self.mmap.is_open)
+        self.assertEqual(self.mmap.num_opens, 2)
+
+    def test_uio_verify(self):
+        """
+        Check a mismatch is only detected with verify=True, and stops the
+        batch at the mismatching register
+        """
+        self.mmap.stuck_bits[0x8] = 0x4
+        pokes = [(0x4, 1), (0x8, 0xF), (0xC, 2)]
+        self.uio.poke32_batch(pokes)
+        self.assertEqual(self.mmap.writes, pokes)
+        self.mmap.writes.clear()
+        with self.assertRaises(RuntimeError):
+            self.uio.poke32_batch(pokes, verify=True)
+        self.assertEqual(self.mmap.writes, pokes[:2])
+        self.assertFalse(self.mmap.is_open)
+        self.uio._read_only = True
+        with self.assertRaises(AssertionError):
+            self.uio.poke32_batch(pokes)
+
+    def test_empty_batch(self):
+        """
+        Check empty batches don't write anything, nor open the device
+        """
+        self.uio.poke32_batch([], verify=True)
+        self.ctrlport.poke32_batch([])
+        self.db_iface.poke_db_cpld_batch([], verify=True)
+        self.assertEqual(self.mmap.writes, [])
+        self.assertEqual(self.mmap.num_opens, 0)
+
+    def test_db_cpld_batch(self):
+        """
+        Check DB CPLD batches are written in order, at the DB CPLD's offset
+        """
+        offset = CtrlportRegs.DB_1_CPLD
+        self.db_iface.poke_db_cpld_batch([(0x1004, 5), (0x1000, 6)])
+        self.assertEqual(self.mmap.writes, [(offset + 0x1004, 5), (offset + 0x1000, 6)])
+        self.ctrlport.poke32_batch([(0x20, 7)])
+        self.ctrlport.get_db_cpld_iface(0).poke32_batch([(0x20, 8)])
+        self.assertEqual(self.mmap.writes[2:],
+                         [(0x20, 7), (CtrlportRegs.DB_0_CPLD + 0x20, 8)])
+        self.assertEqual(self.mmap.num_opens, 3)
+        self.mmap.stuck_bits[offset + 0x1000] = 0x1
+        self.db_iface.poke_db_cpld_batch([(0x1000, 1)])
+        with self.assertRaises(RuntimeError):
+            self.db_iface.poke_db_cpld_batch([(0x1000, 1), (0x1004, 1)], verify=True)
+        self.assertEqual(self.mmap.writes[-1], (offset + 0x1000, 1))
+        self.ctrlport.regs = None
+        with self.assertRaises(RuntimeError):
+            self.ctrlport.poke32_batch([(0x20, 7)])
+
+    def test_mmap_regs_iface(self):
+        """
+        Check the C++ poke32_batch() on a memory mapped file, which always
+        reads back what was written
+        """
+        with tempfile.NamedTemporaryFile() as regs_file:
+            regs_file.truncate(4096)
+            regs = lib.types.mmap_regs_iface(regs_file.name, 4096, 0, False, True)
+            regs.poke32_batch([(0x10, 1), (0x14, 2), (0x10, 3)])
+            self.assertEqual((regs.peek32(0x10), regs.peek32(0x14)), (3, 2))
+            regs.poke32_batch([(0x18, 0xFFFFFFFF), (0x14, 4)], True)
+            self.assertEqual((regs.peek32(0x14), regs.peek32(0x18)), (4, 0xFFFFFFFF))
+            regs.poke32_batch([], True)
+            self.assertEqual(regs.peek32(0x10), 3)
+            regs.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
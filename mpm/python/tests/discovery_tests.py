@@ -0,0 +1,139 @@
+#
+# Copyright 2024 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the discovery responder
+"""
+import ipaddress
+import logging
+import unittest
+from base_tests import TestBase
+from usrp_mpm import discovery
+from usrp_mpm.mpmtypes import SharedState
+
+
+class MockSocket:
+    """
+    Socket which records everything sent to it
+    """
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((data, addr))
+
+
+class TestDiscovery(TestBase):
+    """
+    Tests for the subnet filter, the cached discovery response and the echo
+    rate limiter
+    """
+    def setUp(self):
+        self.state = SharedState()
+        self.state.dev_type.value = b"e3xx"
+        self.state.dev_product.value = b"e320"
+        self.state.dev_serial.value = b"1234"
+        self.state.touch()
+        self.log = logging.getLogger("discovery_tests")
+
+    def _make_responder(self, discovery_addr="0.0.0.0"):
+        return discovery.DiscoveryResponder(
+            self.state, discovery.parse_discovery_subnets(discovery_addr), self.log)
+
+    def test_parse_discovery_subnets(self):
+        """
+        Check subnets, addresses and broadcast addresses are parsed
+        """
+        net = ipaddress.IPv4Network
+        self.assertEqual(discovery.parse_discovery_subnets("0.0.0.0"), [])
+        self.assertEqual(discovery.parse_discovery_subnets("10.0.0.0/8, 0.0.0.0"), [])
+        self.assertEqual(discovery.parse_discovery_subnets(""), [])
+        self.assertEqual(
+            discovery.parse_discovery_subnets("192.168.10.255"), [net("192.168.10.0/24")])
+        self.assertEqual(
+            discovery.parse_discovery_subnets("192.168.255.255"), [net("192.168.0.0/16")])
+        self.assertEqual(
+            discovery.parse_discovery_subnets("192.168.10.2"), [net("192.168.10.2/32")])
+        self.assertEqual(
+            discovery.parse_discovery_subnets("192.168.10.7/24,10.1.0.0/16"),
+            [net("192.168.10.0/24"), net("10.1.0.0/16")])
+
+    def test_subnet_filter(self):
+        """
+        Check only requests from the configured subnets are answered
+        """
+        responder = self._make_responder("192.168.10.255,10.0.0.1")
+        self.assertTrue(responder.is_allowed("192.168.10.42"))
+        self.assertTrue(responder.is_allowed("10.0.0.1"))
+        self.assertFalse(responder.is_allowed("10.0.0.2"))
+        self.assertFalse(responder.is_allowed("192.168.11.42"))
+        # Cached results must not change the outcome
+        self.assertTrue(responder.is_allowed("192.168.10.42"))
+        self.assertFalse(responder.is_allowed("192.168.11.42"))
+        sock = MockSocket()
+        responder.handle_request(sock, discovery.DISCOVERY_REQUEST, ("192.168.11.42", 1))
+        self.assertEqual(sock.sent, [])
+        responder.handle_request(sock, discovery.DISCOVERY_REQUEST, ("192.168.10.42", 1))
+        self.assertEqual(len(sock.sent), 1)
+        self.assertTrue(self._make_responder().is_allowed("172.16.0.1"))
+
+    def test_cached_response(self):
+        """
+        Check the response is only rebuilt when the shared state is touched
+        """
+        responder = self._make_responder()
+        response = responder.get_response()
+        self.assertTrue(response.startswith(discovery.RESPONSE_PREAMBLE))
+        self.assertIn(b"claimed=False", response)
+        self.assertIs(responder.get_response(), response)
+        # Without a touch, changes are not picked up
+        self.state.claim_status.value = True
+        self.assertIs(responder.get_response(), response)
+        self.state.touch()
+        self.assertIn(b"claimed=True", responder.get_response())
+
+    def test_handle_request(self):
+        """
+        Check discovery and echo requests are answered, anything else is not
+        """
+        responder = self._make_responder()
+        sock = MockSocket()
+        sender = ("192.168.10.42", 49600)
+        responder.handle_request(sock, discovery.DISCOVERY_REQUEST + b"\0", sender)
+        responder.handle_request(sock, discovery.ECHO_REQUEST + b"1234", sender)
+        responder.handle_request(sock, b"HELLO", sender)
+        self.assertEqual(sock.sent, [
+            (responder.get_response(), sender),
+            (discovery.ECHO_REQUEST + b"1234", sender),
+        ])
+
+    def test_echo_rate_limit(self):
+        """
+        Check the echo token bucket allows a burst, then refills at the
+        configured rate, independently for every sender
+        """
+        responder = self._make_responder()
+        now = 100.0
+        allowed = [responder.allow_echo("10.0.0.1", now)
+                   for _ in range(discovery.ECHO_BURST + 1)]
+        self.assertTrue(all(allowed[:discovery.ECHO_BURST]))
+        self.assertFalse(allowed[-1])
+        # Other senders have their own bucket
+        self.assertTrue(responder.allow_echo("10.0.0.2", now))
+        # Half a token is not enough, a full one is
+        now += 0.5 / discovery.ECHO_RATE
+        self.assertFalse(responder.allow_echo("10.0.0.1", now))
+        now += 1.0 / discovery.ECHO_RATE
+        self.assertTrue(responder.allow_echo("10.0.0.1", now))
+        self.assertFalse(responder.allow_echo("10.0.0.1", now))
+        # The bucket never holds more than a burst
+        now += 1000.0
+        allowed = [responder.allow_echo("10.0.0.1", now)
+                   for _ in range(discovery.ECHO_BURST + 1)]
+        self.assertEqual(sum(allowed), discovery.ECHO_BURST)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#
+# Copyright 2023 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the eye scan tool
+"""
+
+import tempfile
+import unittest
+from base_tests import TestBase
+from usrp_mpm.cores.eyescan import EyeScanTool, np
+from usrp_mpm.mpmlog import get_main_logger
+
+
+class MockJesdCore:
+    """
+    Emulates the DRP ports of the GTs of a JESD core. The eye scan FSM of a
+    GT finishes immediately when it is started. The error counter is 0 inside
+    a diamond-shaped eye, and saturated outside of it.
+    """
+    SAMPLE_COUNT = 0xFFFF
+
+    def __init__(self, eye_sizes):
+        # Eye size (in horizontal offsets) for every lane
+        self.eye_sizes = eye_sizes
+        self.drp_regs = [{0x082: 1 << 5} for _ in eye_sizes]
+        self.lane = None
+        self.offsets = []
+
+    def set_drp_target(self, mgt_or_qpll, dev_num):
+        assert mgt_or_qpll == 'mgt'
+        self.lane = dev_num
+
+    def disable_drp_target(self):
+        self.lane = None
+
+    def drp_access(self, rd=True, addr=0, wr_data=0):
+        regs = self.drp_regs[self.lane]
+        if not rd:
+            regs[addr] = wr_data
+            # Run bit set: measure at the current offsets
+            if addr == 0x03D and wr_data & 0b1:
+                ver_offset = regs[0x03B] & 0x7F
+                ver_offset = -ver_offset if regs[0x03B] & 0x80 else ver_offset
+                hor_offset = regs[0x03C] & 0x0FFF
+                hor_offset = hor_offset - 0x1000 if hor_offset & 0x800 else hor_offset
+                if self.lane == 0:
+                    self.offsets.append((hor_offset, ver_offset))
+                is_open = abs(hor_offset) + abs(ver_offset) // 4 < self.eye_sizes[self.lane]
+                regs[0x14F] = 0 if is_open else 0xFFFF
+                regs[0x150] = self.SAMPLE_COUNT
+            return 0
+        if addr == 0x151:
+            # END state, done
+            return (0b010 << 1) | 0b1
+        return regs.get(addr, 0)
+
+
+@unittest.skipIf(np is None, "NumPy is not available")
+class TestEyeScan(TestBase):
+    """
+    Tests the eye scan tool with an emulated JESD core
+    """
+    hor_range = {'start': -32, 'stop': 32, 'step': 1}
+    ver_range = {'start': -127, 'stop': 127, 'step': 2}
+
+    def setUp(self):
+        # EyeScanTool needs the main logger
+        get_main_logger(use_console=False, use_logbuf=False)
+
+    def test_full_scan(self):
+        """
+        Checks the counters, BER and eye opening of a full scan
+        """
+        jesdcore = MockJesdCore([10, 16])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            eyescan_tool = EyeScanTool(jesdcore, eq_mode='DFE', SAVE_DIR=tmp_dir + '/')
+            eyescan_tool.eyescan_full_scan([0, 1], self.hor_range, self.ver_range)
+        results = eyescan_tool.results
+        self.assertTrue(results.measured.all())
+        self.assertEqual(results.sample_count['-UT'].shape, (2, 65, 128))
+        ber = results.get_ber()
+        # 2 * 0xFFFF errors in 2 * 0xFFFF samples of 2^1 * 16 bits
+        self.assertEqual(ber.max(), 1 / 32)
+        self.assertEqual(ber[0, 32, 63], 0)
+        widths, heights = results.get_eye_opening(1e-6)
+        self.assertEqual(list(widths), [19, 31])
+        self.assertEqual(list(heights), [80, 128])
+        contours = results.get_contours([0, 1])
+        self.assertEqual(contours.shape, (2, 2, 65, 128))
+        self.assertTrue(contours[1].all())
+
+    def test_adaptive_scan(self):
+        """
+        Checks that an adaptive scan finds the same eye as a full scan
+        """
+        jesdcore = MockJesdCore([10, 16])
+        eyescan_tool = EyeScanTool(jesdcore)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            eyescan_tool.SAVE_DIR = tmp_dir + '/'
+            eyescan_tool.eyescan_full_scan([0, 1], self.hor_range, self.ver_range)
+        full_results = eyescan_tool.results
+        jesdcore.offsets = []
+        results = eyescan_tool.eyescan_adaptive_scan(
+            [0, 1], self.hor_range, self.ver_range, target_ber=1e-6)
+        # Every offset is measured at most once
+        self.assertEqual(len(jesdcore.offsets), len(set(jesdcore.offsets)))
+        self.assertEqual(len(jesdcore.offsets), results.measured.sum())
+        self.assertLess(results.measured.sum(), results.measured.size / 2)
+        self.assertTrue(results.valid.all())
+        self.assertTrue((results.get_contours([1e-6]) ==
+                         full_results.get_contours([1e-6])).all())
+        for opening, full_opening in zip(results.get_eye_opening(1e-6),
+                                         full_results.get_eye_opening(1e-6)):
+            self.assertEqual(list(opening), list(full_opening))
@@ -0,0 +1,190 @@
+#
+# Copyright 2026 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the Python register maps generated from host/lib/ic_reg_maps
+"""
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from base_tests import TestBase
+
+REG_MAPS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'host', 'lib', 'ic_reg_maps')
+
+REGS_TMPL = """\
+field_a             0x00[0:3]       0
+field_b             0x00[4:7]       5
+mode                0x04[0:1]       0       off, on, auto
+arr[4]              0x10[0:15]      0
+step_arr[0:2:8]     0x20[8:15]      1
+"""
+
+# name, address, address step, array length (None for regular registers)
+FIELDS = (
+    ('field_a', 0x00, 0, None),
+    ('field_b', 0x00, 0, None),
+    ('mode', 0x04, 0, None),
+    ('arr', 0x10, 4, 4),
+    ('step_arr', 0x20, 8, 3),
+)
+
+
+def generate_regs():
+    """
+    Generate the Python register map for REGS_TMPL, and return an instance
+    of it
+    """
+    sys.path.insert(0, REG_MAPS_DIR)
+    try:
+        import common
+    finally:
+        sys.path.pop(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out_file = os.path.join(tmp_dir, 'test_regs.py')
+        with mock.patch.object(sys, 'argv', ['gen_test_regs.py', out_file]):
+            common.generate(name='test_regs', regs_tmpl=REGS_TMPL, file='gen_test_regs.py')
+        spec = importlib.util.spec_from_file_location('test_regs', out_file)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module.test_regs_t()
+
+
+def snapshot(regs):
+    """
+    Copy all field values, like save_state() did before writes were tracked
+    """
+    return {name: list(getattr(regs, name)) if length else getattr(regs, name)
+            for name, _, _, length in FIELDS}
+
+
+def reference_changed_addrs(regs, state):
+    """
+    Compare every field against a snapshot, like get_changed_addrs() did
+    before writes were tracked
+    """
+    addrs = set()
+    for name, addr, step, length in FIELDS:
+        if length:
+            for index, value in enumerate(getattr(regs, name)):
+                if state[name][index] != value:
+                    addrs.add(addr + index * step)
+        elif state[name] != getattr(regs, name):
+            addrs.add(addr)
+    return addrs
+
+
+def reference_word(regs, addr):
+    """
+    Pack the value of the register at addr from its fields
+    """
+    word = 0
+    for name, base_addr, step, length in FIELDS:
+        value = None
+        if length:
+            if addr >= base_addr and (addr - base_addr) % step == 0 \
+                    and (addr - base_addr) // step < length:
+                value = getattr(regs, name)[(addr - base_addr) // step]
+        elif addr == base_addr:
+            value = getattr(regs, name)
+        if value is not None:
+            value = getattr(value, 'value', value)
+            word |= (value & getattr(regs, name + '_mask')) \
+                << getattr(regs, name + '_shift')
+    return word
+
+
+@unittest.skipUnless(os.path.isdir(REG_MAPS_DIR), "Register map generator not found")
+class TestIcRegMaps(TestBase):
+    """
+    Tests for the write tracking of generated Python register maps
+    """
+    def check_changes(self, regs, state):
+        """
+        Check get_changed_addrs() and get_dirty_writes() match a full
+        comparison against the snapshot state
+        """
+        expected = reference_changed_addrs(regs, state)
+        self.assertEqual(regs.get_changed_addrs(), expected)
+        self.assertEqual(regs.get_dirty_writes(),
+                         [(addr, reference_word(regs, addr)) for addr in sorted(expected)])
+
+    def test_field_writes(self):
+        """
+        Check writes to regular fields are tracked, including writes which
+        don't change the value
+        """
+        regs = generate_regs()
+        with self.assertRaises(RuntimeError):
+            regs.get_changed_addrs()
+        regs.save_state()
+        state = snapshot(regs)
+        self.check_changes(regs, state)
+        regs.field_b = 5
+        self.check_changes(regs, state)
+        regs.field_a = 3
+        regs.mode = regs.mode_t.MODE_AUTO
+        self.check_changes(regs, state)
+        self.assertEqual(regs.get_dirty_writes(), [(0x00, 0x53), (0x04, 2)])
+        # Writing the original value back is not a change
+        regs.field_a = 0
+        self.check_changes(regs, state)
+        self.assertEqual(regs.get_dirty_writes(), [(0x04, 2)])
+
+    def test_array_writes(self):
+        """
+        Check element, slice and whole-array writes are tracked
+        """
+        regs = generate_regs()
+        regs.save_state()
+        state = snapshot(regs)
+        regs.arr[1] = 7
+        self.check_changes(regs, state)
+        regs.arr[2:4] = [1, 0]
+        self.check_changes(regs, state)
+        regs.step_arr = [1, 9, 1]
+        self.check_changes(regs, state)
+        self.assertEqual(regs.get_dirty_writes(),
+                         [(0x14, 7), (0x18, 1), (0x28, 9 << 8)])
+        regs.arr[1] = 0
+        self.check_changes(regs, state)
+        self.assertEqual(list(regs.arr), [0, 0, 1, 0])
+        self.assertEqual(regs.step_arr, [1, 9, 1])
+        with self.assertRaises(ValueError):
+            regs.arr[0:2] = [1]
+
+    def test_save_state(self):
+        """
+        Check save_state() starts a new comparison, and the saved state can
+        be read back
+        """
+        regs = generate_regs()
+        regs.save_state()
+        regs.field_a = 3
+        regs.arr[0] = 4
+        # get_dirty_writes() doesn't save the state
+        regs.get_dirty_writes()
+        self.assertEqual(regs.get_changed_addrs(), {0x00, 0x10})
+        self.assertEqual(regs.get_state_field_a(), 0)
+        self.assertEqual(regs.get_state_arr(), [0, 0, 0, 0])
+        regs.save_state()
+        state = snapshot(regs)
+        self.check_changes(regs, state)
+        self.assertEqual(regs.get_dirty_writes(), [])
+        self.assertEqual(regs.get_state_field_a(), 3)
+        self.assertEqual(regs.get_state_arr(), [4, 0, 0, 0])
+        regs.field_a = 1
+        regs.field_b = 2
+        regs.arr[0] = 0
+        self.check_changes(regs, state)
+        self.assertEqual(regs.get_dirty_writes(), [(0x00, 0x21), (0x10, 0)])
+        self.assertEqual(regs.get_state_field_a(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#
+# Copyright 2024 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the RPC call statistics and the read-only method routing
+"""
+import unittest
+from base_tests import TestBase
+from usrp_mpm import rpc_utils
+
+
+class MockWorkerPool:
+    """
+    Worker pool which runs functions directly, and records what it ran
+    """
+    def __init__(self):
+        self.applied = []
+
+    def apply(self, func, args):
+        self.applied.append(func)
+        return func(*args)
+
+
+class MockPeriphManager:
+    """
+    Class with a read-only and a regular method
+    """
+    @rpc_utils.read_only
+    def get_sensor(self, name):
+        return {'name': name, 'value': "42"}
+
+    def set_gain(self, gain):
+        return gain
+
+
+class TestRpcUtils(TestBase):
+    """
+    Tests for RPCStats and get_rpc_executor()
+    """
+    def test_executor_selection(self):
+        """
+        Check only read-only methods are handed to the worker pool, and only
+        if there is one
+        """
+        pool = MockWorkerPool()
+        mgr = MockPeriphManager()
+        self.assertTrue(rpc_utils.is_read_only(mgr.get_sensor))
+        self.assertFalse(rpc_utils.is_read_only(mgr.set_gain))
+        self.assertIsNone(rpc_utils.get_rpc_executor(mgr.set_gain, pool))
+        self.assertIsNone(rpc_utils.get_rpc_executor(mgr.get_sensor, None))
+        executor = rpc_utils.get_rpc_executor(mgr.get_sensor, pool)
+        self.assertIsNotNone(executor)
+        stats = rpc_utils.RPCStats()
+        self.assertEqual(stats.call('get_sensor', mgr.get_sensor, ("temp",), executor),
+                         {'name': "temp", 'value': "42"})
+        self.assertEqual(stats.call('set_gain', mgr.set_gain, (10,),
+                                    rpc_utils.get_rpc_executor(mgr.set_gain, pool)), 10)
+        self.assertEqual(pool.applied, [mgr.get_sensor])
+
+    def test_stats_accumulate(self):
+        """
+        Check calls, errors, latencies and payload sizes are accumulated per
+        method
+        """
+        stats = rpc_utils.RPCStats()
+        def fail():
+            raise RuntimeError("This is just a drill")
+        stats.call('ping', lambda data: data, ("abcd",))
+        stats.call('ping', lambda data: data, ("ef",))
+        with self.assertRaises(RuntimeError):
+            stats.call('fail', fail, ())
+        result = stats.get()
+        self.assertEqual(result['latency_buckets'], list(rpc_utils.LATENCY_BUCKETS))
+        ping = result['methods']['ping']
+        self.assertEqual(ping['calls'], 2)
+        self.assertEqual(ping['errors'], 0)
+        self.assertEqual(ping['in_flight'], 0)
+        self.assertEqual(ping['request_bytes'], 6)
+        self.assertEqual(ping['response_bytes'], 6)
+        self.assertEqual(sum(ping['latency_hist']), 2)
+        self.assertGreaterEqual(ping['latency_total'], ping['latency_max'])
+        fail_stats = result['methods']['fail']
+        self.assertEqual(fail_stats['calls'], 1)
+        self.assertEqual(fail_stats['errors'], 1)
+        self.assertEqual(fail_stats['response_bytes'], 0)
+        self.assertEqual(sum(fail_stats['latency_hist']), 1)
+        # get() returns a copy
+        ping['calls'] = 100
+        ping['latency_hist'][0] = 100
+        self.assertEqual(stats.get()['methods']['ping']['calls'], 2)
+        self.assertEqual(sum(stats.get()['methods']['ping']['latency_hist']), 2)
+
+    def test_reset_during_call(self):
+        """
+        Check a reset clears the statistics, but keeps track of calls in
+        flight
+        """
+        stats = rpc_utils.RPCStats()
+        def reset_while_running():
+            self.assertEqual(stats.get()['methods']['slow']['in_flight'], 1)
+            stats.reset()
+            self.assertEqual(stats.get()['methods']['slow']['calls'], 0)
+            self.assertEqual(stats.get()['methods']['slow']['in_flight'], 1)
+        stats.call('slow', reset_while_running, ())
+        slow = stats.get()['methods']['slow']
+        self.assertEqual(slow['in_flight'], 0)
+        self.assertEqual(sum(slow['latency_hist']), 1)
+
+    def test_payload_size(self):
+        """
+        Check payload size estimates for the common RPC types
+        """
+        self.assertEqual(rpc_utils.get_payload_size("abc"), 3)
+        self.assertEqual(rpc_utils.get_payload_size(b"ab"), 2)
+        self.assertEqual(rpc_utils.get_payload_size(None), 1)
+        self.assertEqual(rpc_utils.get_payload_size(True), 1)
+        self.assertEqual(rpc_utils.get_payload_size(1.5), 8)
+        self.assertEqual(rpc_utils.get_payload_size([1, "ab", (None,)]), 11)
+        self.assertEqual(rpc_utils.get_payload_size({'key': "value"}), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,6 +15,10 @@ from sys_utils_tests import TestNet
 from mpm_utils_tests import TestMpmUtils
 from eeprom_tests import TestEeprom
 from x440_clock_tests import TestX440ClockConfig
+from eyescan_tests import TestEyeScan
+from discovery_tests import TestDiscovery
+from rpc_utils_tests import TestRpcUtils
+from ic_reg_maps_tests import TestIcRegMaps
 from usrp_mpm import __simulated__
 
 import importlib.util
@@ -27,16 +31,41 @@ TESTS = {
         TestMpmUtils,
         TestEeprom,
         TestCompatNum,
-        TestX440ClockConfig
+        TestX440ClockConfig,
+        TestEyeScan,
+        TestDiscovery,
+        TestRpcUtils,
+        TestIcRegMaps
     },
     'n3xx': set(),
-    'x4xx': set()
+    'x4xx': set(),
+    'sim': set()
 }
 
 if not __simulated__:
     from components_tests import TestZynqComponents
+    from batch_poke_tests import TestBatchPokes
     TESTS['x4xx'].update({
-        TestZynqComponents
+        TestZynqComponents,
+        TestBatchPokes
+    })
+else:
+    from sim_chdr_stream_tests import TestChdrInputStream, TestChdrOutputStream
+    from sim_timekeeper_tests import TestTimekeeper
+    from sim_numpy_samples_tests import TestNumpySamples
+    from sim_farm_tests import TestSimulatorFarm
+    from sim_noc_block_regs_tests import TestNocBlockRegs
+    from sim_rfnoc_graph_tests import TestRfnocGraph
+    from sim_chdr_ctrl_tests import TestCtrlProcessor
+    TESTS['sim'].update({
+        TestChdrInputStream,
+        TestChdrOutputStream,
+        TestTimekeeper,
+        TestNumpySamples,
+        TestSimulatorFarm,
+        TestNocBlockRegs,
+        TestRfnocGraph,
+        TestCtrlProcessor
     })
 
 def parse_args():
@@ -0,0 +1,220 @@
+#
+# Copyright 2026 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the simulator's control packet fast path
+"""
+import queue
+import unittest
+from unittest import mock
+from base_tests import TestBase
+from uhd.chdr import \
+    ChdrWidth, ChdrHeader, ChdrPacket, CtrlPayload, CtrlOpCode, CtrlStatus, PacketType
+from usrp_mpm.mpmlog import get_main_logger
+from usrp_mpm.simulator import chdr_endpoint
+from usrp_mpm.simulator.chdr_ctrl import CtrlProcessor
+from usrp_mpm.simulator.chdr_endpoint import ChdrEndpoint
+from usrp_mpm.simulator.config import Topology
+from usrp_mpm.simulator.noc_block_regs import \
+    PROTOVER_ADDR, ADJACENCY_BASE_ADDR, RADIO_BASE_ADDR, REG_LOOPBACK, REG_RX_MAX_WORDS_PER_PKT
+from usrp_mpm.simulator.rfnoc_graph import RFNoCGraph, XportNode, XbarNode
+from usrp_mpm.simulator.stream_endpoint_node import StreamEndpointNode
+
+HOST_EPID = 100
+SEP_EPIDS = (2, 3)
+HOST_ADDR = ('127.0.0.1', 50000)
+# Control ports of the radio and the DDC
+RADIO_PORT = 2
+DDC_PORT = 3
+
+
+def make_graph():
+    """
+    Create the RFNoCGraph of a radio with two channels and a DDC, whose
+    stream endpoints have the EPIDs SEP_EPIDS
+    """
+    topology = Topology(1, 2, 2, ['DDC'])
+    nodes = [XportNode(0), XbarNode(0, [2, 3], [0])]
+    nodes.extend(StreamEndpointNode(inst, None, None, topology.get_num_sep_ports(inst))
+                 for inst in range(topology.num_stream_eps))
+    graph = RFNoCGraph(nodes, get_main_logger(), 0, None, None, 0x4242, topology)
+    for stream_ep, epid in zip(graph.stream_ep, SEP_EPIDS):
+        stream_ep.set_epid(epid)
+    return graph
+
+
+def make_ctrl_packet(chdr_w, op_code, address, data, dst_port=0, dst_epid=SEP_EPIDS[0],
+                     timestamp=None, status=CtrlStatus.OKAY):
+    """
+    Return a serialized control request from the host
+    """
+    header = ChdrHeader()
+    header.pkt_type = PacketType.CTRL
+    header.dst_epid = dst_epid
+    header.seq_num = 1234
+    payload = CtrlPayload()
+    payload.dst_port = dst_port
+    payload.src_port = 5
+    payload.seq_num = 42
+    payload.src_epid = HOST_EPID
+    payload.address = address
+    payload.byte_enable = 0xF
+    payload.op_code = op_code
+    payload.status = status
+    payload.set_data(data)
+    if timestamp is not None:
+        payload.timestamp = timestamp
+    return bytearray(ChdrPacket(chdr_w, header, payload).serialize())
+
+
+class MockSocket:
+    """
+    Socket which receives the datagrams in rx_data, and records when each
+    datagram was received and sent
+    """
+    def __init__(self, rx_data):
+        self.rx_data = list(rx_data)
+        self.events = []
+
+    def recvfrom_into(self, buffer, num_bytes, flags):
+        if not self.rx_data:
+            raise BlockingIOError()
+        data = self.rx_data.pop(0)
+        buffer[:len(data)] = data
+        self.events.append(('recv', bytes(data)))
+        return len(data), HOST_ADDR
+
+    def sendto(self, data, addr):
+        self.events.append(('send', bytes(data), addr))
+        return len(data)
+
+
+class StopWorker(Exception):
+    """
+    Raised to leave the endless loop of the socket worker
+    """
+
+
+class TestCtrlProcessor(TestBase):
+    """
+    Tests for CtrlProcessor, against the responses of the node graph, and
+    for the batching of the responses by the ChdrEndpoint socket worker
+    """
+    def setUp(self):
+        get_main_logger(use_console=False, use_logbuf=False)
+
+    def get_graph_response(self, graph, chdr_w, request):
+        """
+        Return the response of graph's stream endpoint to request, which
+        has been deserialized, processed and serialized again
+        """
+        packet = ChdrPacket.deserialize(chdr_w, bytes(request))
+        stream_ep = graph.find_ep_by_id(packet.get_header().dst_epid)
+        stream_ep.handle_packet(packet, regs=graph.regs)
+        return bytes(packet.serialize())
+
+    def test_responses(self):
+        """
+        Check the fast path responds with the same bytes as the node graph,
+        and has the same effect on the registers
+        """
+        requests = [
+            (CtrlOpCode.READ, PROTOVER_ADDR, [0], 0),
+            (CtrlOpCode.WRITE, RADIO_BASE_ADDR + REG_LOOPBACK, [0xDEADBEEF], RADIO_PORT),
+            (CtrlOpCode.READ, RADIO_BASE_ADDR + REG_LOOPBACK, [0], RADIO_PORT),
+            (CtrlOpCode.WRITE, RADIO_BASE_ADDR + REG_RX_MAX_WORDS_PER_PKT, [200], RADIO_PORT),
+            (CtrlOpCode.BLOCK_WRITE, 0x800, [1, 2, 3, 4, 5], DDC_PORT),
+            (CtrlOpCode.BLOCK_READ, 0x7FC, [0] * 7, DDC_PORT),
+            (CtrlOpCode.BLOCK_READ, ADJACENCY_BASE_ADDR, [0] * 5, 0),
+            (CtrlOpCode.BLOCK_READ, 0x40 * 3, [0] * 3, 0),
+        ]
+        for chdr_w in (ChdrWidth.W64, ChdrWidth.W128, ChdrWidth.W256):
+            for timestamp in (None, 0x123456789):
+                graph = make_graph()
+                fast_graph = make_graph()
+                processor = CtrlProcessor(get_main_logger(), fast_graph, chdr_w)
+                for op_code, address, data, dst_port in requests:
+                    request = make_ctrl_packet(chdr_w, op_code, address, data, dst_port,
+                                               timestamp=timestamp)
+                    response = processor.process(request, len(request))
+                    self.assertEqual(bytes(response),
+                                     self.get_graph_response(graph, chdr_w, request))
+                    payload = ChdrPacket.deserialize(chdr_w, bytes(response)).get_payload_ctrl()
+                    self.assertTrue(payload.is_ack)
+                    self.assertEqual(payload.src_epid, SEP_EPIDS[0])
+                    self.assertEqual(len(payload.get_data()), len(data))
+                self.assertEqual(fast_graph.get_stream_spec(0, 0).packet_samples, 200)
+                self.assertEqual(fast_graph.regs.read(0x808, DDC_PORT), 3)
+                self.assertEqual(fast_graph.regs.radio_reg, [0xDEADBEEF])
+
+    def test_fallback(self):
+        """
+        Check packets which the fast path can't handle are left to the
+        node graph
+        """
+        graph = make_graph()
+        processor = CtrlProcessor(get_main_logger(), graph, ChdrWidth.W64)
+        request = make_ctrl_packet(ChdrWidth.W64, CtrlOpCode.READ, 0, [0], dst_epid=42)
+        self.assertIsNone(processor.process(request, len(request)))
+        request = make_ctrl_packet(ChdrWidth.W64, CtrlOpCode.SLEEP, 0, [0])
+        self.assertIsNone(processor.process(request, len(request)))
+        with self.assertRaises(NotImplementedError):
+            self.get_graph_response(graph, ChdrWidth.W64, request)
+        # Truncated packets
+        request = make_ctrl_packet(ChdrWidth.W64, CtrlOpCode.BLOCK_WRITE, 0x1000, [0] * 4)
+        self.assertIsNone(processor.process(request, len(request) - 8))
+        request = make_ctrl_packet(ChdrWidth.W64, CtrlOpCode.READ, 0, [0],
+                                   status=CtrlStatus.CMDERR)
+        with self.assertRaises(RuntimeError):
+            processor.process(request, len(request))
+        # The EPIDs of the stream endpoints are cached until they change
+        self.assertEqual(set(processor.stream_eps), {SEP_EPIDS[0]})
+        graph.stream_ep[0].set_epid(7)
+        processor.clear_cache()
+        request = make_ctrl_packet(ChdrWidth.W64, CtrlOpCode.READ, 0, [0])
+        self.assertIsNone(processor.process(request, len(request)))
+        request = make_ctrl_packet(ChdrWidth.W64, CtrlOpCode.READ, 0, [0], dst_epid=7)
+        self.assertIsNotNone(processor.process(request, len(request)))
+
+    def test_batched_responses(self):
+        """
+        Check the socket worker sends the responses to a burst of control
+        packets once the burst has been received, in order
+        """
+        # The constructor opens a socket and starts the worker thread, so
+        # it is skipped
+        endpoint = ChdrEndpoint.__new__(ChdrEndpoint)
+        endpoint.log = get_main_logger().getChild("ChdrEndpoint")
+        endpoint.graph = make_graph()
+        endpoint.ctrl_processor = CtrlProcessor(endpoint.log, endpoint.graph, ChdrWidth.W64)
+        endpoint.send_wrapper = mock.Mock()
+        endpoint.send_queue = mock.Mock()
+        endpoint.epid_workers = {}
+        endpoint.stream_workers = {}
+        endpoint.free_buffers = queue.Queue()
+        for _ in range(4):
+            endpoint.free_buffers.put(bytearray(chdr_endpoint.MAX_PACKET_SIZE))
+        requests = [make_ctrl_packet(ChdrWidth.W64, CtrlOpCode.READ, addr, [0], dst_epid=epid)
+                    for addr in (PROTOVER_ADDR, ADJACENCY_BASE_ADDR) for epid in SEP_EPIDS]
+        requests.append(make_ctrl_packet(ChdrWidth.W64, CtrlOpCode.BLOCK_READ,
+                                         ADJACENCY_BASE_ADDR + 4, [0] * 4))
+        sock = MockSocket(requests)
+        endpoint.open_socket = lambda: sock
+        # The first wakeup receives all requests, the second one ends the test
+        with mock.patch.object(chdr_endpoint.select, 'select',
+                               side_effect=[([sock], [], []), StopWorker()]):
+            with self.assertRaises(StopWorker):
+                endpoint.socket_worker()
+        self.assertEqual([event[0] for event in sock.events],
+                         ['recv'] * len(requests) + ['send'] * len(requests))
+        graph = make_graph()
+        for request, event in zip(requests, sock.events[len(requests):]):
+            self.assertEqual(event[1:],
+                             (self.get_graph_response(graph, ChdrWidth.W64, request), HOST_ADDR))
+        self.assertEqual(endpoint.free_buffers.qsize(), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
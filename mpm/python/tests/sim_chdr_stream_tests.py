@@ -0,0 +1,248 @@
+#
+# Copyright 2026 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the simulator's CHDR input and output streams
+"""
+import queue
+import threading
+import unittest
+from unittest import mock
+from base_tests import TestBase
+from test_utilities import MockLog
+from uhd.chdr import ChdrWidth, PacketType, ChdrHeader, ChdrPacket
+from usrp_mpm.simulator import chdr_stream
+from usrp_mpm.simulator.chdr_stream import \
+    HEADER_STRUCT, PKT_TYPE_SHIFT, ChdrInputStream, ChdrOutputStream
+from usrp_mpm.simulator.config import StreamOptions
+from usrp_mpm.simulator.rfnoc_common import StreamSpec
+from usrp_mpm.simulator.timekeeper import Timekeeper
+
+CHDR_W = ChdrWidth.W64
+
+
+def make_data_buffer(payload_len):
+    """
+    Return a receive buffer holding a serialized 64-bit CHDR data packet
+    without timestamp
+    """
+    buffer = bytearray(8 + payload_len)
+    HEADER_STRUCT.pack_into(buffer, 0, 1, len(buffer), 0,
+                            int(PacketType.DATA_NO_TS) << PKT_TYPE_SHIFT, 0)
+    return buffer
+
+
+class MockSampleSink:
+    """
+    Sample sink which counts the payload bytes it is handed
+    """
+    def __init__(self):
+        self.num_bytes = 0
+        self.closed = False
+
+    def accept_payload(self, payload):
+        self.num_bytes += len(payload)
+
+    def close(self):
+        self.closed = True
+
+
+class MockSampleSource:
+    """
+    Sample source which produces a byte pattern, and keeps a copy of
+    everything it produced
+    """
+    def __init__(self):
+        self.data = bytearray()
+
+    def fill_payload(self, payload):
+        start = len(self.data)
+        payload[:] = bytes((start + idx) % 251 for idx in range(len(payload)))
+        self.data += payload
+        return len(payload)
+
+    def close(self):
+        pass
+
+
+class MockSendWrapper:
+    """
+    Records the packets of every batch. Headers and payloads are joined,
+    as they would be on the wire.
+    """
+    def __init__(self):
+        self.batches = []
+        self.addrs = set()
+
+    def send_batch(self, batch, addr):
+        self.batches.append([bytes(header) + bytes(payload) for header, payload in batch])
+        self.addrs.add(addr)
+
+    def get_packets(self):
+        return [packet for batch in self.batches for packet in batch]
+
+
+def make_stream_spec(num_packets, packet_samples=16):
+    """
+    Return the stream spec of a finite stream of num_packets packets, which
+    is never held up by flow control, nor by pacing
+    """
+    stream_spec = StreamSpec()
+    stream_spec.packet_samples = packet_samples
+    stream_spec.sample_rate = 1e9
+    stream_spec.dst_epid = 5
+    stream_spec.addr = ('127.0.0.1', 49153)
+    stream_spec.capacity_packets = 1 << 20
+    stream_spec.capacity_bytes = 1 << 30
+    stream_spec.is_continuous = False
+    stream_spec.total_samples = num_packets * packet_samples
+    return stream_spec
+
+
+class TestChdrInputStream(TestBase):
+    """
+    Tests for the receive buffer handling of ChdrInputStream
+    """
+    NUM_BUFFERS = 8
+    NUM_LOOPS = 50
+
+    def test_start_stop_returns_buffers(self):
+        """
+        Check stopping a stream while buffers are being queued hands every
+        buffer back to the pool
+        """
+        for loop in range(self.NUM_LOOPS):
+            free_buffers = queue.Queue()
+            for _ in range(self.NUM_BUFFERS):
+                free_buffers.put(make_data_buffer(64))
+            sink = MockSampleSink()
+            stream = ChdrInputStream(MockLog(), CHDR_W, sink, None, 1, queue_cap=4)
+            # Stop after a different number of packets in every loop
+            num_queued = threading.Semaphore(0)
+            def produce():
+                while True:
+                    try:
+                        buffer = free_buffers.get(timeout=0.5)
+                    except queue.Empty:
+                        return
+                    stream.queue_buffer(buffer, len(buffer), None, free_buffers.put)
+                    num_queued.release()
+                    if not stream.thread.is_alive():
+                        return
+            producer = threading.Thread(target=produce, daemon=True)
+            producer.start()
+            for _ in range(loop):
+                num_queued.acquire()
+            stream.finish()
+            stream.thread.join(timeout=5)
+            producer.join(timeout=5)
+            self.assertFalse(stream.thread.is_alive())
+            self.assertFalse(producer.is_alive())
+            self.assertTrue(sink.closed)
+            self.assertEqual(free_buffers.qsize(), self.NUM_BUFFERS)
+            self.assertEqual(sink.num_bytes % 64, 0)
+
+
+class TestChdrOutputStream(TestBase):
+    """
+    Tests for the packets of ChdrOutputStream, which are assembled from
+    header templates, against packets serialized by ChdrPacket
+    """
+    def run_stream(self, stream_spec, chdr_w=CHDR_W, data_seq_num=0, **kwargs):
+        """
+        Run the worker of a ChdrOutputStream in this thread, and return the
+        stream, its sample source and its send wrapper
+        """
+        source = MockSampleSource()
+        send_wrapper = MockSendWrapper()
+        with mock.patch.object(chdr_stream, 'Thread'):
+            stream = ChdrOutputStream(MockLog(), chdr_w, source, stream_spec, send_wrapper,
+                                      **kwargs)
+        stream.data_seq_num = data_seq_num
+        stream._tx_worker()
+        self.assertEqual(send_wrapper.addrs, {stream_spec.addr})
+        return stream, source, send_wrapper
+
+    def check_packet(self, chdr_w, data, seq_num, payload, timestamp=None):
+        """
+        Check data deserializes to the given data packet, and is exactly
+        what ChdrPacket serializes for it
+        """
+        packet = ChdrPacket.deserialize(chdr_w, data)
+        header = packet.get_header()
+        self.assertEqual(header.dst_epid, 5)
+        self.assertEqual(header.seq_num, seq_num)
+        self.assertEqual(header.length, len(data))
+        self.assertEqual(header.pkt_type, PacketType.DATA_NO_TS if timestamp is None
+                         else PacketType.DATA_WITH_TS)
+        self.assertEqual(packet.get_timestamp(), timestamp)
+        self.assertEqual(bytes(packet.get_payload_bytes()), payload)
+        expected_header = ChdrHeader()
+        expected_header.dst_epid = 5
+        expected_header.seq_num = seq_num
+        expected_header.pkt_type = header.pkt_type
+        expected = ChdrPacket(chdr_w, expected_header, payload, timestamp)
+        self.assertEqual(data, bytes(expected.serialize()))
+
+    def test_packets(self):
+        """
+        Check the packets of a finite stream for all CHDR widths, including
+        the short last packet
+        """
+        for chdr_w in (ChdrWidth.W64, ChdrWidth.W128, ChdrWidth.W256, ChdrWidth.W512):
+            stream_spec = make_stream_spec(10)
+            stream_spec.total_samples += 5
+            _, source, send_wrapper = self.run_stream(stream_spec, chdr_w, batch_size=4)
+            self.assertEqual([len(batch) for batch in send_wrapper.batches], [4, 4, 3])
+            packets = send_wrapper.get_packets()
+            self.assertEqual(len(source.data), (10 * 16 + 5) * 4)
+            for idx, data in enumerate(packets):
+                self.check_packet(chdr_w, data, idx, bytes(source.data[idx * 64:(idx + 1) * 64]))
+
+    def test_timestamps(self):
+        """
+        Check the timestamps and sequence numbers count up and wrap around
+        """
+        stream_spec = make_stream_spec(6)
+        stream_spec.is_timed = True
+        stream_spec.init_timestamp = (1 << 64) - 40
+        for chdr_w in (ChdrWidth.W64, ChdrWidth.W128):
+            _, source, send_wrapper = self.run_stream(stream_spec, chdr_w, data_seq_num=0xFFFD)
+            for idx, data in enumerate(send_wrapper.get_packets()):
+                self.check_packet(chdr_w, data, (0xFFFD + idx) & 0xFFFF,
+                                  bytes(source.data[idx * 64:(idx + 1) * 64]),
+                                  (stream_spec.init_timestamp + idx * 16) & ((1 << 64) - 1))
+        # With a timekeeper, timestamps are in ticks of the timekeeper
+        stream, source, send_wrapper = self.run_stream(
+            make_stream_spec(4), timekeeper=Timekeeper(2e9))
+        packets = send_wrapper.get_packets()
+        first_timestamp = ChdrPacket.deserialize(CHDR_W, packets[0]).get_timestamp()
+        for idx, data in enumerate(packets):
+            self.check_packet(CHDR_W, data, idx, bytes(source.data[idx * 64:(idx + 1) * 64]),
+                              first_timestamp + idx * 32)
+        self.assertEqual(stream.num_samples, 64)
+
+    def test_overflow(self):
+        """
+        Check overflows skip the sequence numbers and timestamps of the
+        dropped packets, and count towards the requested samples
+        """
+        stream_spec = make_stream_spec(20)
+        stream_spec.is_timed = True
+        stream_spec.init_timestamp = 1000
+        stream, source, send_wrapper = self.run_stream(
+            stream_spec, stream_options=StreamOptions(overflow_interval=3, overflow_packets=2))
+        seq_nums = [seq_num for seq_num in range(20) if seq_num % 5 < 3]
+        packets = send_wrapper.get_packets()
+        self.assertEqual(len(packets), len(seq_nums))
+        for idx, (seq_num, data) in enumerate(zip(seq_nums, packets)):
+            self.check_packet(CHDR_W, data, seq_num, bytes(source.data[idx * 64:(idx + 1) * 64]),
+                              1000 + seq_num * 16)
+        self.assertEqual(stream.num_overflows, 4)
+        self.assertEqual(stream.num_samples, 20 * 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
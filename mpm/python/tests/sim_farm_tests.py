@@ -0,0 +1,89 @@
+#
+# Copyright 2026 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the simulator farm launcher
+"""
+import os
+import tempfile
+import unittest
+from base_tests import TestBase
+from test_utilities import MockLog
+from usrp_mpm.simulator.config import Config
+from usrp_mpm.simulator.farm import SimulatorFarm, PORTS_PER_DEVICE
+
+NUM_DEVICES = 64
+
+
+class TestSimulatorFarm(TestBase):
+    """
+    Tests for the port and serial number allocation, and the generated
+    config files of SimulatorFarm
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_distinct_devices(self):
+        """
+        Check every device gets its own ports and serial number, and its
+        config file selects them
+        """
+        farm = SimulatorFarm(MockLog(), NUM_DEVICES, base_port=40000,
+                             workdir=self.tmp_dir.name)
+        self.assertEqual(len(farm.devices), NUM_DEVICES)
+        ports = [port for device in farm.devices
+                 for port in (device.discovery_port, device.rpc_port, device.chdr_port)]
+        self.assertEqual(len(set(ports)), NUM_DEVICES * PORTS_PER_DEVICE)
+        self.assertEqual(min(ports), 40000)
+        self.assertEqual(max(ports), 40000 + NUM_DEVICES * PORTS_PER_DEVICE - 1)
+        serials = [device.serial for device in farm.devices]
+        self.assertEqual(len(set(serials)), NUM_DEVICES)
+        self.assertEqual(len(set(device.config_path for device in farm.devices)), NUM_DEVICES)
+        for device, device_args in zip(farm.devices, farm.get_device_args("10.0.0.1")):
+            config = Config.from_path(MockLog(), device.config_path)
+            self.assertEqual(config.hardware.serial_num, device.serial)
+            self.assertEqual(config.chdr.port, device.chdr_port)
+            self.assertIn("serial={},".format(device.serial), device_args)
+            self.assertIn("discovery_port={},".format(device.discovery_port), device_args)
+            self.assertTrue(device_args.endswith("rpc_port={}".format(device.rpc_port)))
+            hwd_args = device.get_hwd_args()
+            self.assertEqual(hwd_args[hwd_args.index("--rpc-port") + 1], str(device.rpc_port))
+            self.assertEqual(hwd_args[hwd_args.index("--discovery-port") + 1],
+                             str(device.discovery_port))
+
+    def test_config_template(self):
+        """
+        Check the settings of a config template are kept, except for the
+        ones which identify the device
+        """
+        template = os.path.join(self.tmp_dir.name, "template.ini")
+        with open(template, 'w') as template_file:
+            template_file.write("[hardware]\npreset = E320\nserial_num = 1234\n"
+                                "[chdr]\nport = 49153\n[stream]\njitter = 0.001\n")
+        farm = SimulatorFarm(MockLog(), 2, config_template=template,
+                             workdir=self.tmp_dir.name)
+        configs = [Config.from_path(MockLog(), device.config_path) for device in farm.devices]
+        self.assertEqual([config.hardware.serial_num for config in configs],
+                         [device.serial for device in farm.devices])
+        self.assertEqual([config.chdr.port for config in configs],
+                         [device.chdr_port for device in farm.devices])
+        self.assertEqual([config.stream.jitter for config in configs], [0.001, 0.001])
+
+    def test_invalid_farms(self):
+        """
+        Check unknown presets and port ranges beyond 65535 are rejected
+        """
+        with self.assertRaises(ValueError):
+            SimulatorFarm(MockLog(), 1, preset_names=("E320", "X999"), workdir=self.tmp_dir.name)
+        with self.assertRaises(ValueError):
+            SimulatorFarm(MockLog(), 2, base_port=0x10000 - PORTS_PER_DEVICE,
+                          workdir=self.tmp_dir.name)
+        SimulatorFarm(MockLog(), 1, base_port=0x10000 - PORTS_PER_DEVICE,
+                      workdir=self.tmp_dir.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
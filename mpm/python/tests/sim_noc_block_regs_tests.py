@@ -0,0 +1,326 @@
+#
+# Copyright 2026 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the register maps of the simulated NoC core and NoC blocks
+"""
+import unittest
+from base_tests import TestBase
+from usrp_mpm.mpmlog import get_main_logger
+from usrp_mpm.simulator import noc_block_regs
+from usrp_mpm.simulator.noc_block_regs import \
+    RegisterMap, NocBlockRegs, NocBlock, StreamEndpointPort, NocBlockPort, make_noc_block, \
+    RADIO_NOC_ID, RADIO_BASE_ADDR, REG_CHAN_OFFSET, REG_LOOPBACK, REG_RX_MAX_WORDS_PER_PKT, \
+    REG_RX_CMD_NUM_WORDS_HI, REG_RX_CMD_NUM_WORDS_LO, REG_RX_CMD_TIME_HI, REG_RX_CMD_TIME_LO, \
+    REG_RX_CMD, RX_CMD_CONTINUOUS, RX_CMD_FINITE, RX_CMD_STOP, ADJACENCY_BASE_ADDR, \
+    PROTOVER_ADDR, DDC_NOC_ID
+from usrp_mpm.simulator.rfnoc_common import StreamSpec
+
+NUM_STREAM_EP = 3
+NUM_CTRL_EP = 1
+NUM_CHANS = 2
+# Control ports of the radio blocks and the DDC
+RADIO_PORTS = (1 + NUM_CTRL_EP, 2 + NUM_CTRL_EP)
+DDC_PORT = 3 + NUM_CTRL_EP
+
+
+class LegacyNocBlockRegs(NocBlockRegs):
+    """
+    NocBlockRegs which decodes register accesses with the chains of
+    comparisons it used before the register maps were introduced. This is
+    the reference the register maps are checked against.
+    """
+    def read(self, addr, ctrl_port=0):
+        if addr == noc_block_regs.PROTOVER_ADDR:
+            return self.read_protover()
+        elif addr == noc_block_regs.PORT_CNT_ADDR:
+            return self.read_port_cnt()
+        elif addr == noc_block_regs.EDGE_CNT_ADDR:
+            return self.read_edge_cnt()
+        elif addr == noc_block_regs.DEVICE_INFO_ADDR:
+            return self.read_device_info()
+        elif addr == noc_block_regs.CTRLPORT_CNT_ADDR:
+            return self.read_ctrlport_cnt()
+        elif addr >= 0x40 and addr < 0x1000:
+            return self.read_port_reg(addr)
+        elif addr >= 0x1000 and addr < 0x10000:
+            return self.read_radio(addr, self.get_radio_index(ctrl_port))
+        elif addr >= 0x10000:
+            return self.read_adjacency_list(addr)
+        else:
+            raise RuntimeError("Unsupported register addr: 0x{:08X}".format(addr))
+
+    def read_radio(self, addr, radio):
+        if addr == 0x1000:
+            raise NotImplementedError()
+        elif addr == 0x1004:
+            return self.read_radio_width()
+        else:
+            radio_offset = (addr - 0x1000) % 0x80
+            if radio_offset in (0x40, 0x3C):
+                return self.radio_reg[radio]
+            else:
+                raise NotImplementedError("Radio addr 0x{:08X} not implemented".format(addr))
+
+    def write(self, addr, value, ctrl_port=0):
+        radio = self.get_radio_index(ctrl_port)
+        num_chans = self.blocks[self.radio_slots[radio] - 1 - self.num_stream_ep].num_outputs
+        if RADIO_BASE_ADDR <= addr < RADIO_BASE_ADDR + num_chans * REG_CHAN_OFFSET:
+            self.write_radio(addr, value, radio)
+
+    def write_radio(self, addr, value, radio):
+        offset = addr - 0x1000
+        chan = offset // 0x80
+        reg = offset % 0x80
+        stream_spec = self.get_stream_spec(radio, chan)
+        if reg == REG_LOOPBACK:
+            self.radio_reg[radio] = value
+        elif reg == REG_RX_MAX_WORDS_PER_PKT:
+            stream_spec.packet_samples = value
+        elif reg == REG_RX_CMD_NUM_WORDS_HI:
+            stream_spec.set_num_words_hi(value)
+        elif reg == REG_RX_CMD_NUM_WORDS_LO:
+            stream_spec.set_num_words_lo(value)
+        elif reg == REG_RX_CMD_TIME_HI:
+            stream_spec.set_timestamp_hi(value)
+        elif reg == REG_RX_CMD_TIME_LO:
+            stream_spec.set_timestamp_lo(value)
+        elif reg == REG_RX_CMD:
+            stream_spec.is_timed = value & (1 << 31) != 0
+            value = value & ~(1 << 31)
+            sep_block_id = self.resolve_ep_towards_outputs((self.radio_slots[radio], chan))
+            if value == RX_CMD_STOP:
+                self.stop_tx_stream(sep_block_id)
+                return
+            elif value == RX_CMD_CONTINUOUS:
+                stream_spec.is_continuous = True
+            elif value == RX_CMD_FINITE:
+                stream_spec.is_continuous = False
+            else:
+                raise RuntimeError("Unknown Stream RX_CMD: {:08X}".format(value))
+            self.create_tx_stream(sep_block_id, stream_spec)
+
+    def resolve_ep_towards_outputs(self, block_id):
+        for src_blk, dst_blk in self.adjacency_list:
+            if src_blk == block_id:
+                if dst_blk[0] <= self.num_stream_ep:
+                    return dst_blk
+                return self.resolve_ep_towards_outputs(dst_blk)
+        return None
+
+
+class MockRadios:
+    """
+    Holds the stream specs of the radio channels, and records the streams
+    which are started and stopped
+    """
+    def __init__(self):
+        self.stream_specs = {(radio, chan): StreamSpec()
+                             for radio in range(len(RADIO_PORTS)) for chan in range(NUM_CHANS)}
+        self.calls = []
+
+    def get_stream_spec(self, radio, chan):
+        return self.stream_specs[(radio, chan)]
+
+    def create_tx_stream(self, sep_block_id, stream_spec):
+        self.calls.append(('create', sep_block_id, vars(stream_spec).copy()))
+
+    def stop_tx_stream(self, sep_block_id):
+        self.calls.append(('stop', sep_block_id))
+
+    def get_state(self):
+        """
+        Return the state of all stream specs, and the recorded calls
+        """
+        return ({key: vars(spec).copy() for key, spec in self.stream_specs.items()},
+                list(self.calls))
+
+
+def make_regs(regs_cls, radios):
+    """
+    Create the registers of two radios and a DDC. Channel 0 of radio 0 is
+    connected to SEP 0, channel 1 to SEP 1. Both channels of radio 1 go
+    through the DDC to the two ports of SEP 2.
+    """
+    blocks = [NocBlock(1 << 16, NUM_CHANS, NUM_CHANS, 512, 1, RADIO_NOC_ID, 16)
+              for _ in RADIO_PORTS]
+    blocks.append(make_noc_block('DDC', NUM_CHANS))
+    adj_list = [
+        (StreamEndpointPort(0, 0), NocBlockPort(0, 0)),
+        (NocBlockPort(0, 0), StreamEndpointPort(0, 0)),
+        (StreamEndpointPort(1, 0), NocBlockPort(0, 1)),
+        (NocBlockPort(0, 1), StreamEndpointPort(1, 0)),
+    ]
+    for chan in range(NUM_CHANS):
+        adj_list.append((NocBlockPort(1, chan), NocBlockPort(2, chan)))
+        adj_list.append((NocBlockPort(2, chan), StreamEndpointPort(2, chan)))
+    return regs_cls(get_main_logger(), 1 << 16, True, 1, blocks, NUM_STREAM_EP, NUM_CTRL_EP,
+                    0x4242, adj_list, 16, 1, radios.get_stream_spec, radios.create_tx_stream,
+                    radios.stop_tx_stream)
+
+
+def access(func, *args):
+    """
+    Return the result of func(*args), or the type of the exception it
+    raised
+    """
+    try:
+        return func(*args)
+    except Exception as ex:
+        return type(ex)
+
+
+class TestNocBlockRegs(TestBase):
+    """
+    Tests for RegisterMap, and the register maps of NocBlockRegs against
+    the decoding they replaced
+    """
+    def setUp(self):
+        get_main_logger(use_console=False, use_logbuf=False)
+        self.radios = MockRadios()
+        self.regs = make_regs(NocBlockRegs, self.radios)
+        self.legacy_radios = MockRadios()
+        self.legacy_regs = make_regs(LegacyNocBlockRegs, self.legacy_radios)
+
+    def test_register_map(self):
+        """
+        Check registers take precedence over ranges, ranges don't overlap,
+        and unmapped accesses go to the fallback
+        """
+        fallback = RegisterMap()
+        fallback.add_register(0x0, read=lambda addr: 42)
+        regmap = RegisterMap(fallback)
+        writes = []
+        regmap.add_range(0x100, 0x200, read=lambda addr: addr,
+                         write=lambda addr, value: writes.append((addr, value)))
+        regmap.add_range(0x0, 0x100, read=lambda addr: -addr)
+        regmap.add_register(0x104, read=lambda addr: 7)
+        regmap.add_register(0x10C, write=lambda addr, value: writes.append((addr, -value)))
+        for start, end in ((0x80, 0x180), (0x1FC, 0x300), (0x104, 0x108)):
+            with self.assertRaises(ValueError):
+                regmap.add_range(start, end)
+        regmap.add_range(0x200, 0x204, read=lambda addr: 5)
+        self.assertEqual(regmap.read(0x100), 0x100)
+        self.assertEqual(regmap.read(0x1FC), 0x1FC)
+        self.assertEqual(regmap.read(0x104), 7)
+        self.assertEqual(regmap.read(0x4), -4)
+        # Write-only registers are read through the range they lie in
+        self.assertEqual(regmap.read(0x10C), 0x10C)
+        self.assertEqual(regmap.read(0x200), 5)
+        with self.assertRaises(RuntimeError):
+            regmap.read(0x204)
+        # The range at 0x0 has no write handler, nor has the fallback
+        regmap.write(0x0, 1)
+        regmap.write(0x104, 2)
+        regmap.write(0x108, 3)
+        regmap.write(0x10C, 4)
+        regmap.write(0x300, 5)
+        self.assertEqual(writes, [(0x104, 2), (0x108, 3), (0x10C, -4)])
+        regmap = RegisterMap()
+        regmap.add_channel_registers(0x1000, 0x80, 2, {
+            0x4: (lambda chan: chan + 10, lambda chan, value: writes.append((chan, value))),
+        })
+        self.assertEqual((regmap.read(0x1004), regmap.read(0x1084)), (10, 11))
+        regmap.write(0x1084, 9)
+        self.assertEqual(writes[-1], (1, 9))
+        with self.assertRaises(RuntimeError):
+            regmap.read(0x1104)
+
+    def test_reads(self):
+        """
+        Check reads through client zero and the radio ports match the
+        legacy decoding, for all implemented radio channels
+        """
+        self.regs.radio_reg = [0x1234, 0x5678]
+        self.legacy_regs.radio_reg = [0x1234, 0x5678]
+        addrs = list(range(0, RADIO_BASE_ADDR + NUM_CHANS * REG_CHAN_OFFSET, 4))
+        addrs += range(ADJACENCY_BASE_ADDR, ADJACENCY_BASE_ADDR + 4 * 16, 4)
+        for ctrl_port in (0,) + RADIO_PORTS:
+            for addr in addrs:
+                self.assertEqual(access(self.regs.read, addr, ctrl_port),
+                                 access(self.legacy_regs.read, addr, ctrl_port),
+                                 "Port {} addr 0x{:X}".format(ctrl_port, addr))
+        self.assertEqual(self.regs.read(RADIO_BASE_ADDR + REG_LOOPBACK, RADIO_PORTS[1]), 0x5678)
+        self.assertEqual(self.regs.read(ADJACENCY_BASE_ADDR), 8)
+
+    def test_writes(self):
+        """
+        Check writes through client zero and the radio ports have the same
+        effect on the stream specs and streams as the legacy decoding
+        """
+        chan_writes = [
+            (REG_LOOPBACK, 0xABCD),
+            (REG_RX_MAX_WORDS_PER_PKT, 100),
+            (REG_RX_CMD_NUM_WORDS_HI, 1),
+            (REG_RX_CMD_NUM_WORDS_LO, 2),
+            (REG_RX_CMD_TIME_HI, 3),
+            (REG_RX_CMD_TIME_LO, 4),
+            (REG_RX_CMD, RX_CMD_FINITE | (1 << 31)),
+            (REG_RX_CMD, RX_CMD_CONTINUOUS),
+            (REG_RX_CMD, RX_CMD_STOP),
+            (REG_RX_CMD, 0x7),
+        ]
+        # Addresses which aren't radio channel registers
+        other_addrs = [PROTOVER_ADDR, 0x40, RADIO_BASE_ADDR + 0x4, ADJACENCY_BASE_ADDR,
+                       RADIO_BASE_ADDR + NUM_CHANS * REG_CHAN_OFFSET + REG_RX_CMD]
+        for ctrl_port in (0,) + RADIO_PORTS:
+            for chan in range(NUM_CHANS):
+                for offset, value in chan_writes:
+                    addr = RADIO_BASE_ADDR + chan * REG_CHAN_OFFSET + offset
+                    self.assertEqual(access(self.regs.write, addr, value, ctrl_port),
+                                     access(self.legacy_regs.write, addr, value, ctrl_port))
+                    self.assertEqual(self.radios.get_state(), self.legacy_radios.get_state(),
+                                     "Port {} addr 0x{:X}".format(ctrl_port, addr))
+                    self.assertEqual(self.regs.radio_reg, self.legacy_regs.radio_reg)
+            for addr in other_addrs:
+                self.regs.write(addr, RX_CMD_FINITE, ctrl_port)
+                self.legacy_regs.write(addr, RX_CMD_FINITE, ctrl_port)
+                self.assertEqual(self.radios.get_state(), self.legacy_radios.get_state())
+        self.assertEqual([call[1] for call in self.radios.calls if call[0] == 'stop'],
+                         [(1, 0), (2, 0), (1, 0), (2, 0), (3, 0), (3, 1)])
+
+    def test_resolve_ep(self):
+        """
+        Check the adjacency index finds the same stream endpoints as the
+        legacy search, also through the DDC, and survives loops
+        """
+        block_ids = {block_id for edge in self.regs.adjacency_list for block_id in edge}
+        block_ids.add((42, 0))
+        for block_id in block_ids:
+            self.assertEqual(self.regs.resolve_ep_towards_outputs(block_id),
+                             self.legacy_regs.resolve_ep_towards_outputs(block_id))
+            # The second lookup is answered from the cache
+            self.assertEqual(self.regs.resolve_ep_towards_outputs(block_id),
+                             self.legacy_regs.resolve_ep_towards_outputs(block_id))
+        self.assertEqual(self.regs.resolve_ep_towards_outputs((5, 1)), (3, 1))
+        self.regs.downstream = {(4, 0): (5, 0), (5, 0): (4, 0)}
+        self.regs.sep_cache = {}
+        self.assertIsNone(self.regs.resolve_ep_towards_outputs((4, 0)))
+
+    def test_storage_map(self):
+        """
+        Check the DDC's registers store what is written to them per port,
+        and the rest falls back to client zero
+        """
+        self.assertEqual(self.regs.read(0x40 * (NUM_STREAM_EP + 3) + 4), DDC_NOC_ID)
+        self.assertEqual(self.regs.read(0x08, DDC_PORT), 3)
+        self.assertEqual(self.regs.read(0x808, DDC_PORT), 3)
+        self.assertEqual(self.regs.read(0x0C, DDC_PORT), 0)
+        self.regs.write(0x80C, 17, DDC_PORT)
+        self.assertEqual((self.regs.read(0x0C, DDC_PORT), self.regs.read(0x80C, DDC_PORT)),
+                         (0, 17))
+        self.assertEqual(self.regs.read(ADJACENCY_BASE_ADDR, DDC_PORT),
+                         self.regs.read(ADJACENCY_BASE_ADDR))
+        with self.assertRaises(RuntimeError):
+            self.regs.read(RADIO_BASE_ADDR, DDC_PORT)
+        # Radio writes to the DDC's port don't reach the radios
+        self.regs.write(RADIO_BASE_ADDR + REG_RX_CMD, RX_CMD_CONTINUOUS, DDC_PORT)
+        self.assertEqual(self.radios.calls, [])
+        with self.assertRaises(ValueError):
+            make_noc_block('FFT', NUM_CHANS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+#
+# Copyright 2026 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the simulator's NumPy sample sources and sinks
+"""
+import os
+import tempfile
+import unittest
+import zlib
+import numpy as np
+from base_tests import TestBase
+from usrp_mpm.mpmlog import get_main_logger
+from usrp_mpm.simulator import sample_source
+from usrp_mpm.simulator.numpy_samples import \
+    SC16_FULL_SCALE, RingSource, ToneSource, NoiseSource, ChirpSource, MmapFileSource, StatsSink
+
+
+def read_samples(source, num_samples):
+    """
+    Fill a payload of num_samples sc16 samples from source, and return them
+    as complex values relative to full scale
+    """
+    payload = bytearray(4 * num_samples)
+    num_bytes = source.fill_payload(memoryview(payload))
+    values = np.frombuffer(payload[:num_bytes], dtype='<i2').astype(np.float64)
+    return (values[0::2] + 1j * values[1::2]) / SC16_FULL_SCALE
+
+
+class TestNumpySamples(TestBase):
+    """
+    Tests for the ring based signal generators, MmapFileSource and
+    StatsSink
+    """
+    def setUp(self):
+        # StatsSink logs its statistics
+        get_main_logger(use_console=False, use_logbuf=False)
+
+    def test_ring_source(self):
+        """
+        Check payloads wrap around the ring, or end with it
+        """
+        ring = np.arange(10, dtype=np.uint8)
+        source = RingSource(ring)
+        payload = bytearray(25)
+        self.assertEqual(source.fill_payload(memoryview(payload)), 25)
+        self.assertEqual(list(payload), list(range(10)) * 2 + list(range(5)))
+        self.assertEqual(source.fill_payload(memoryview(payload)[:3]), 3)
+        self.assertEqual(list(payload[:3]), [5, 6, 7])
+        source = RingSource(ring, repeat=False)
+        self.assertEqual(source.fill_payload(memoryview(payload)[:8]), 8)
+        self.assertEqual(source.fill_payload(memoryview(payload)), 2)
+        self.assertEqual(list(payload[:2]), [8, 9])
+        self.assertEqual(source.fill_payload(memoryview(payload)), 0)
+        packet = sample_source._PayloadPacket()
+        self.assertIsNone(source.fill_packet(packet, 4))
+        source = RingSource(ring)
+        self.assertIs(source.fill_packet(packet, 4), packet)
+        self.assertEqual(packet.get_payload_bytes(), bytes([0, 1, 2, 3]))
+        source.close()
+        with self.assertRaises(ValueError):
+            RingSource(bytes())
+
+    def test_tone_source(self):
+        """
+        Check the tone matches a complex sine wave, and is continuous across
+        the end of the ring
+        """
+        # Config files pass all arguments as strings
+        source = sample_source.sources['ToneSource'](
+            freq="0.126", amplitude="0.5", ring_samples="1000")
+        self.assertEqual(source.freq, 0.126)
+        samples = read_samples(source, 2500)
+        expected = 0.5 * np.exp(2j * np.pi * 0.126 * np.arange(2500))
+        np.testing.assert_allclose(samples, expected, rtol=0, atol=1.0 / SC16_FULL_SCALE)
+        # The frequency is rounded to a whole number of cycles in the ring
+        self.assertEqual(ToneSource(freq=0.1234, ring_samples=100).freq, 0.12)
+
+    def test_noise_source(self):
+        """
+        Check the noise has the requested RMS amplitude, and is reproducible
+        with a seed
+        """
+        samples = read_samples(NoiseSource(amplitude="0.1", seed="1", ring_samples=2**16), 2**16)
+        self.assertAlmostEqual(np.sqrt(np.mean(np.abs(samples)**2)), 0.1, delta=0.002)
+        self.assertAlmostEqual(abs(np.mean(samples)), 0.0, delta=0.002)
+        np.testing.assert_array_equal(
+            read_samples(NoiseSource(seed=1, ring_samples=1000), 1000),
+            read_samples(NoiseSource(seed=1, ring_samples=1000), 1000))
+
+    def test_chirp_source(self):
+        """
+        Check the chirp sweeps from the start to the stop frequency
+        """
+        source = ChirpSource(start_freq="-0.2", stop_freq="0.3", amplitude="0.9",
+                             ring_samples="10000")
+        samples = read_samples(source, 10000)
+        np.testing.assert_allclose(np.abs(samples), 0.9, atol=2.0 / SC16_FULL_SCALE)
+        freqs = np.angle(samples[1:] * np.conj(samples[:-1])) / (2 * np.pi)
+        self.assertAlmostEqual(freqs[0], -0.2, places=3)
+        self.assertAlmostEqual(freqs[-1], 0.3, places=3)
+        self.assertTrue(np.all(np.diff(freqs) > 0))
+
+    def test_mmap_file_source(self):
+        """
+        Check files are streamed once, or looped
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "samples.dat")
+            with open(path, 'wb') as samples_file:
+                samples_file.write(bytes(range(12)))
+            source = sample_source.sources['MmapFileSource'](path, repeat="false")
+            payload = bytearray(8)
+            self.assertEqual(source.fill_payload(memoryview(payload)), 8)
+            self.assertEqual(source.fill_payload(memoryview(payload)), 4)
+            self.assertEqual(source.fill_payload(memoryview(payload)), 0)
+            source.close()
+            source = MmapFileSource(path)
+            payload = bytearray(16)
+            self.assertEqual(source.fill_payload(memoryview(payload)), 16)
+            self.assertEqual(list(payload), list(range(12)) + list(range(4)))
+            source.close()
+
+    def test_stats_sink(self):
+        """
+        Check the statistics of a known signal
+        """
+        sink = sample_source.sinks['StatsSink'](log_interval="4")
+        self.assertEqual(sink.get_stats()['mean_power_dbfs'], float('-inf'))
+        # Two samples at half scale, two at zero, one at full scale
+        half = SC16_FULL_SCALE // 2
+        payloads = [
+            np.array([half, 0, 0, -half], dtype='<i2').tobytes(),
+            np.array([0, 0, 0, 0, SC16_FULL_SCALE, 0], dtype='<i2').tobytes(),
+        ]
+        sink.accept_payload(memoryview(payloads[0]))
+        sink.accept_packet(sample_source._PayloadPacket(payloads[1]))
+        stats = sink.get_stats()
+        self.assertEqual(stats['num_packets'], 2)
+        self.assertEqual(stats['num_samples'], 5)
+        self.assertEqual(stats['crc32'], zlib.crc32(payloads[0] + payloads[1]))
+        mean_power = (2 * half**2 + SC16_FULL_SCALE**2) / 5 / SC16_FULL_SCALE**2
+        self.assertAlmostEqual(stats['mean_power_dbfs'], 10 * np.log10(mean_power))
+        self.assertAlmostEqual(stats['peak_power_dbfs'], 0.0)
+        self.assertEqual(sink.next_log, 8)
+        self.assertIn("5 samples", sink.format_stats())
+        sink.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+#
+# Copyright 2026 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the generation of the simulator's RFNoC graph from its topology
+"""
+import unittest
+from unittest import mock
+from base_tests import TestBase
+from usrp_mpm.mpmlog import get_main_logger
+from usrp_mpm.simulator.config import Topology
+from usrp_mpm.simulator.noc_block_regs import \
+    PORT_CNT_ADDR, ADJACENCY_BASE_ADDR, RADIO_BASE_ADDR, REG_CHAN_OFFSET, REG_RX_CMD, \
+    RX_CMD_CONTINUOUS, RX_CMD_STOP, DDC_NOC_ID
+from usrp_mpm.simulator.rfnoc_graph import RFNoCGraph, XportNode, XbarNode
+from usrp_mpm.simulator.stream_endpoint_node import StreamEndpointNode
+
+HOST_ADDR = ('192.168.10.1', 49153)
+HOST_EPID = 100
+
+
+def make_graph(topology):
+    """
+    Create the RFNoCGraph of topology, with the nodes the simulator uses
+    (see ChdrEndpoint.get_default_nodes()). Every stream endpoint is
+    configured to stream to the host.
+    """
+    num_sep = topology.num_stream_eps
+    nodes = [XportNode(0), XbarNode(0, list(range(2, 2 + num_sep)), [0])]
+    nodes.extend(StreamEndpointNode(inst, None, None, topology.get_num_sep_ports(inst))
+                 for inst in range(num_sep))
+    graph = RFNoCGraph(nodes, get_main_logger(), 0, None, None, 0x4242, topology)
+    nodes[0].addr_map[HOST_EPID] = HOST_ADDR
+    nodes[1].routing_table[HOST_EPID] = 0
+    for stream_ep in graph.stream_ep:
+        stream_ep.dst_epid = HOST_EPID
+        # Starting an output stream spins up a thread, which isn't needed here
+        stream_ep.begin_output = mock.Mock()
+        stream_ep.end_output = mock.Mock()
+    return graph
+
+
+def write_rx_cmd(graph, radio, chan, value):
+    """
+    Write value to the RX_CMD register of a radio channel, through the
+    control port of the radio
+    """
+    graph.regs.write(RADIO_BASE_ADDR + chan * REG_CHAN_OFFSET + REG_RX_CMD, value, 2 + radio)
+
+
+class TestRfnocGraph(TestBase):
+    """
+    Tests for Topology, and the radio blocks and connections RFNoCGraph
+    generates from it
+    """
+    def setUp(self):
+        get_main_logger(use_console=False, use_logbuf=False)
+
+    def test_topology(self):
+        """
+        Check radio channels are assigned to stream endpoints round-robin
+        """
+        topology = Topology.default()
+        self.assertEqual((topology.num_radios, topology.num_chans, topology.num_stream_eps),
+                         (1, 2, 2))
+        self.assertEqual([topology.get_radio_chan_sep(0, chan) for chan in range(2)],
+                         [(0, 0), (1, 0)])
+        # Config files pass all values as strings
+        topology = Topology.from_dict(
+            {'num_radios': "2", 'num_chans': "2", 'num_stream_eps': "3", 'blocks': "DDC, DUC,"})
+        self.assertEqual(topology.blocks, ['DDC', 'DUC'])
+        self.assertEqual([topology.get_radio_chan_sep(radio, chan)
+                          for radio in range(2) for chan in range(2)],
+                         [(0, 0), (1, 0), (2, 0), (0, 1)])
+        self.assertEqual([topology.get_num_sep_ports(sep) for sep in range(3)], [2, 1, 1])
+        self.assertEqual(Topology.from_dict({'num_radios': 3}).num_stream_eps, 6)
+        for topology_dict in ({'num_radios': 0}, {'num_chans': 0}, {'num_stream_eps': 0}):
+            with self.assertRaises(ValueError):
+                Topology.from_dict(topology_dict)
+
+    def test_graph(self):
+        """
+        Check the graph has the blocks and connections of the topology
+        """
+        topology = Topology(2, 2, 3, ['DDC'])
+        graph = make_graph(topology)
+        self.assertEqual([stream_ep.output_ports for stream_ep in graph.stream_ep], [2, 1, 1])
+        port_cnt = graph.regs.read(PORT_CNT_ADDR)
+        self.assertEqual((port_cnt & 0x3FF, (port_cnt >> 10) & 0x3FF), (3, 3))
+        self.assertEqual(graph.regs.radio_slots, [4, 5])
+        self.assertEqual(graph.regs.blocks[2].noc_id, DDC_NOC_ID)
+        # Radio channel n is connected both ways to the SEP it is assigned to
+        expected_edges = []
+        for radio in range(2):
+            for chan in range(2):
+                sep_inst, sep_port = topology.get_radio_chan_sep(radio, chan)
+                expected_edges.append(((1 + sep_inst, sep_port), (4 + radio, chan)))
+                expected_edges.append(((4 + radio, chan), (1 + sep_inst, sep_port)))
+        self.assertEqual(graph.regs.adjacency_list, expected_edges)
+        self.assertEqual(graph.regs.read(ADJACENCY_BASE_ADDR), len(expected_edges))
+        self.assertEqual(graph.regs.read(ADJACENCY_BASE_ADDR + 4),
+                         (1 << 22) | (4 << 6))
+        # Every radio channel has its own stream spec
+        stream_specs = graph.get_stream_specs()
+        self.assertEqual(len(stream_specs), 4)
+        self.assertEqual(len(set(map(id, stream_specs))), 4)
+        graph.change_spp(100)
+        self.assertTrue(all(spec.packet_samples == 100 for spec in stream_specs))
+        # The graph must have a SEP for every SEP of the topology
+        nodes = [XportNode(0), XbarNode(0, [2], [0]), StreamEndpointNode(0, None, None)]
+        with self.assertRaises(AssertionError):
+            RFNoCGraph(nodes, get_main_logger(), 0, None, None, 0x4242, Topology(1, 2, 2))
+
+    def test_stream_routing(self):
+        """
+        Check stream commands start and stop the stream of the SEP port
+        each radio channel is connected to
+        """
+        topology = Topology(2, 2, 3)
+        graph = make_graph(topology)
+        for radio in range(2):
+            for chan in range(2):
+                sep_inst, sep_port = topology.get_radio_chan_sep(radio, chan)
+                stream_ep = graph.stream_ep[sep_inst]
+                stream_spec = graph.get_stream_spec(radio, chan)
+                write_rx_cmd(graph, radio, chan, RX_CMD_CONTINUOUS)
+                stream_ep.begin_output.assert_called_with(stream_spec, sep_port)
+                self.assertEqual(stream_spec.addr, HOST_ADDR)
+                write_rx_cmd(graph, radio, chan, RX_CMD_STOP)
+                stream_ep.end_output.assert_called_with(sep_port)
+        self.assertEqual([stream_ep.begin_output.call_count for stream_ep in graph.stream_ep],
+                         [2, 1, 1])
+
+    def test_default_streams(self):
+        """
+        Check both channels of the default topology can stream at the same
+        time, from their own SEPs
+        """
+        graph = make_graph(Topology.default())
+        write_rx_cmd(graph, 0, 0, RX_CMD_CONTINUOUS)
+        write_rx_cmd(graph, 0, 1, RX_CMD_CONTINUOUS)
+        for chan, stream_ep in enumerate(graph.stream_ep):
+            stream_ep.begin_output.assert_called_once_with(graph.get_stream_spec(0, chan), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#
+# Copyright 2026 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests for the simulator's timekeeper and stream pacing
+"""
+import unittest
+from unittest import mock
+from base_tests import TestBase
+from test_utilities import MockLog
+from usrp_mpm.simulator import timekeeper
+from usrp_mpm.simulator.chdr_stream import ChdrOutputStream
+from usrp_mpm.simulator.config import StreamOptions
+from usrp_mpm.simulator.timekeeper import Timekeeper, PacingClock
+
+
+class MockClock:
+    """
+    Replaces time.monotonic() and time.sleep() with a clock which only
+    advances when told to, or when sleeping
+    """
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+class TestTimekeeper(TestBase):
+    """
+    Tests for Timekeeper, PacingClock, the start of timed output streams
+    and StreamOptions
+    """
+    def setUp(self):
+        self.clock = MockClock()
+        patcher = mock.patch.multiple(
+            timekeeper.time, monotonic=self.clock.monotonic, sleep=self.clock.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ticks(self):
+        """
+        Check the time advances at the tick rate, and can be set
+        """
+        keeper = Timekeeper(100e6)
+        self.assertEqual(keeper.get_ticks(), 0)
+        self.clock.now += 0.5
+        self.assertEqual(keeper.get_ticks(), 50000000)
+        keeper.set_ticks(1000)
+        self.clock.now += 0.25
+        self.assertEqual(keeper.get_ticks(), 25001000)
+        self.assertEqual(keeper.ticks_to_monotonic(50001000), self.clock.now + 0.25)
+        # Changing the tick rate doesn't change the current time
+        keeper.set_tick_rate(200e6)
+        self.assertEqual(keeper.get_tick_rate(), 200e6)
+        self.assertEqual(keeper.get_ticks(), 25001000)
+        self.clock.now += 0.5
+        self.assertEqual(keeper.get_ticks(), 125001000)
+
+    def test_pps(self):
+        """
+        Check PPS edges occur once per second, and set_ticks(next_pps=True)
+        takes effect on the next edge
+        """
+        keeper = Timekeeper(1e6)
+        self.clock.now += 2.75
+        self.assertEqual(keeper.get_ticks(last_pps=True), 2000000)
+        keeper.set_ticks(0, next_pps=True)
+        self.assertEqual(keeper.get_ticks(), 2750000)
+        self.assertEqual(keeper.ticks_to_monotonic(3000000), self.clock.now + 0.25)
+        self.clock.now += 0.5
+        self.assertEqual(keeper.get_ticks(), 250000)
+        self.assertEqual(keeper.get_ticks(last_pps=True), 0)
+        # An immediate set_ticks() cancels a pending one
+        keeper.set_ticks(5, next_pps=True)
+        keeper.set_ticks(7)
+        self.clock.now += 1.0
+        self.assertEqual(keeper.get_ticks(), 1000007)
+
+    def test_pacing(self):
+        """
+        Check the pacing clock sleeps until the samples are due, and late
+        calls neither sleep nor accumulate drift
+        """
+        pacer = PacingClock(self.clock.now + 0.5, 1000)
+        self.assertEqual(pacer.wait(0), 0.0)
+        self.assertEqual(self.clock.sleeps, [0.5])
+        self.assertEqual(pacer.wait(100), 0.0)
+        self.assertAlmostEqual(self.clock.sleeps[-1], 0.1)
+        # Oversleeping makes the next call late
+        self.clock.now += 0.3
+        self.assertAlmostEqual(pacer.wait(200), 0.2)
+        self.assertEqual(len(self.clock.sleeps), 2)
+        self.assertEqual(pacer.wait(600), 0.0)
+        self.assertAlmostEqual(self.clock.now, pacer.start_time + 0.6)
+
+    def test_jitter(self):
+        """
+        Check jitter only ever delays sends, and is reproducible with a seed
+        """
+        def get_sleeps(seed):
+            clock = MockClock()
+            with mock.patch.multiple(timekeeper.time, monotonic=clock.monotonic,
+                                     sleep=clock.sleep):
+                pacer = PacingClock(clock.now, 1000, jitter=0.01, seed=seed)
+                for num_samples in range(0, 1000, 100):
+                    pacer.wait(num_samples)
+                    self.assertGreaterEqual(clock.now, pacer.start_time + num_samples / 1000)
+                    self.assertLessEqual(clock.now, pacer.start_time + num_samples / 1000 + 0.01)
+            return clock.sleeps
+        self.assertEqual(get_sleeps(42), get_sleeps(42))
+        self.assertNotEqual(get_sleeps(42), get_sleeps(43))
+
+    def test_stream_start(self):
+        """
+        Check when output streams start, and which timestamp their first
+        packet carries
+        """
+        # The constructor starts streaming right away, so it is skipped
+        stream = ChdrOutputStream.__new__(ChdrOutputStream)
+        stream.log = MockLog()
+        stream.stream_spec = mock.Mock(is_timed=False, init_timestamp=5000000)
+        stream.timekeeper = None
+        now = self.clock.now
+        self.assertEqual(stream._get_start(), (None, now))
+        stream.stream_spec.is_timed = True
+        self.assertEqual(stream._get_start(), (5000000, now))
+        stream.timekeeper = Timekeeper(10e6)
+        self.clock.now += 0.25
+        now = self.clock.now
+        self.assertEqual(stream._get_start(), (5000000, now + 0.25))
+        # Within the tolerance, a late command keeps its timestamp
+        self.clock.now += 0.25 + ChdrOutputStream.LATE_TOLERANCE / 2
+        self.assertEqual(stream._get_start(), (5000000, now + 0.25))
+        self.assertTrue(stream.log.warning_log.empty())
+        self.clock.now += ChdrOutputStream.LATE_TOLERANCE
+        ticks = stream.timekeeper.get_ticks()
+        self.assertEqual(stream._get_start(), (ticks, self.clock.now))
+        self.assertFalse(stream.log.warning_log.empty())
+        stream.stream_spec.is_timed = False
+        self.assertEqual(stream._get_start(), (ticks, self.clock.now))
+
+    def test_stream_options(self):
+        """
+        Check the stream options are parsed and validated
+        """
+        options = StreamOptions.from_dict(
+            {'jitter': "0.001", 'overflow_interval': "10", 'seed': "3"})
+        self.assertEqual((options.jitter, options.overflow_interval, options.overflow_packets,
+                          options.seed), (0.001, 10, 1, 3))
+        self.assertIsNone(StreamOptions().seed)
+        for options_dict in ({'jitter': "-1"}, {'overflow_interval': "-1"},
+                             {'overflow_packets': "0"}):
+            with self.assertRaises(ValueError):
+                StreamOptions.from_dict(options_dict)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,10 +4,17 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 #
 
+import json
+import os
+import tempfile
 import unittest
 import logging
+from unittest import mock
 from base_tests import TestBase
-from usrp_mpm.periph_manager.x4xx_clock_policy import X440ClockPolicy
+from test_utilities import MockLog
+from usrp_mpm.periph_manager.x4xx_clock_mgr import X4xxClockManager
+from usrp_mpm.periph_manager.x4xx_clock_policy import X440ClockPolicy, get_clock_transition
+from usrp_mpm.periph_manager.x440_clock_table import validate_config
 from usrp_mpm.periph_manager.x4xx_clock_types import Spll1Vco
 from usrp_mpm.periph_manager.x4xx_rfdc_ctrl import X4xxRfdcCtrl
 
@@ -290,3 +297,258 @@ class TestX440ClockConfig(TestBase):
         self.assertEqual(clk_config.spll_config.sysref_div, 1200)
         self.assertEqual(clk_config.spll_config.clkin0_r_div, 200)
         self.assertEqual(clk_config.spll_config.pll2_n_cal_div, clk_config.spll_config.pll2_n_div)
+
+    def test_config_cache(self):
+        """
+        Checks that cached configurations match freshly calculated ones.
+        """
+        log = logging.getLogger()
+        cp = X440ClockPolicy(None, None, {}, log)
+        dsp_info = {
+            'num_rx_chans': 4,
+            'num_tx_chans': 4,
+            'bw': 1600,
+            'extra_resampling': 1,
+            'spc_rx': 8,
+            'spc_tx': 8,
+        }
+        cp.set_dsp_info([dsp_info, dsp_info])
+        mcr = cp.coerce_mcr((500e6, 250e6))
+        ref_clock_freq = 10e6
+        clk_config = cp.get_config(ref_clock_freq, mcr)
+        conv_rates = cp.conv_rates
+        # Modifying the returned config must not modify the cached one
+        clk_config.mmcm_feedback_divider = 0
+        self.assertEqual(cp.coerce_mcr((500e6, 250e6)), mcr)
+        cached_config = cp.get_config(ref_clock_freq, mcr)
+        self.assertEqual(cp.conv_rates, conv_rates)
+        self.assertEqual(cached_config, cp._calculate_config(ref_clock_freq, mcr))
+        self.assertEqual(validate_config(cached_config, mcr, 8, 1), [])
+
+    def test_config_table(self):
+        """
+        Checks that configurations survive a round trip through a table file.
+        """
+        log = logging.getLogger()
+        cp = X440ClockPolicy(None, None, {}, log)
+        dsp_info = {
+            'num_rx_chans': 4,
+            'num_tx_chans': 4,
+            'bw': 400,
+            'extra_resampling': 1,
+            'spc_rx': 2,
+            'spc_tx': 2,
+        }
+        cp.set_dsp_info([dsp_info, dsp_info])
+        mcr = cp.coerce_mcr((368.64e6,))
+        ref_clock_freq = 10e6
+        clk_config = cp.get_config(ref_clock_freq, mcr)
+        table = X440ClockPolicy.get_config_table()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            table_path = os.path.join(tmp_dir, 'clocks.json')
+            with open(table_path, 'w') as table_file:
+                json.dump(table, table_file)
+            X440ClockPolicy._config_cache.clear()
+            X440ClockPolicy._preloaded_configs.clear()
+            cp = X440ClockPolicy(None, None, {'clock_config_table': table_path}, log)
+        self.assertEqual(len(X440ClockPolicy._preloaded_configs), len(table))
+        cp.set_dsp_info([dsp_info, dsp_info])
+        mcr = cp.coerce_mcr((368.64e6,))
+        self.assertEqual(cp.get_config(ref_clock_freq, mcr), clk_config)
+        self.assertEqual(len(X440ClockPolicy._config_cache), 0)
+        # Evicting calculated configurations keeps the preloaded ones
+        for mcr in (245.76e6, 250e6, 368.64e6):
+            cp._add_to_cache(X440ClockPolicy._config_cache, mcr, None)
+        with mock.patch.object(X440ClockPolicy, 'MAX_CACHE_ENTRIES', 2):
+            cp.get_config(ref_clock_freq, cp.coerce_mcr((245.76e6,)))
+        self.assertEqual(len(X440ClockPolicy._config_cache), 1)
+        self.assertEqual(len(X440ClockPolicy._preloaded_configs), len(table))
+        X440ClockPolicy._preloaded_configs.clear()
+
+    def test_config_table_validation(self):
+        """
+        Checks that invalid table entries are not loaded.
+        """
+        log = logging.getLogger()
+        cp = X440ClockPolicy(None, None, {}, log)
+        dsp_info = {
+            'num_rx_chans': 4,
+            'num_tx_chans': 4,
+            'bw': 1600,
+            'extra_resampling': 1,
+            'spc_rx': 8,
+            'spc_tx': 8,
+        }
+        cp.set_dsp_info([dsp_info, dsp_info])
+        X440ClockPolicy._config_cache.clear()
+        for mcr in (245.76e6, 500e6, 368.64e6):
+            cp.get_config(10e6, cp.coerce_mcr((mcr,)))
+        table = X440ClockPolicy.get_config_table()
+        table[0]['config']['mmcm_feedback_divider'] = 1
+        table[1]['config']['spll_config']['sysref_div'] += 1
+        table[2]['ref_clock_freq'] = 20e6
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            table_path = os.path.join(tmp_dir, 'clocks.json')
+            with open(table_path, 'w') as table_file:
+                json.dump(table, table_file)
+            X440ClockPolicy._preloaded_configs.clear()
+            errors = X440ClockPolicy.load_config_table(table_path)
+        for message in ("Invalid MMCM feedback divider",
+                        "Invalid SYSREF frequency",
+                        "SPLL reference frequency does not match"):
+            self.assertTrue(any(message in error for error in errors))
+        self.assertEqual(len(X440ClockPolicy._preloaded_configs), 0)
+
+    def test_clock_transition(self):
+        """
+        Checks which clocks are reconfigured when switching between MCRs.
+        """
+        log = logging.getLogger()
+        cp = X440ClockPolicy(None, None, {}, log)
+        dsp_info = {
+            'num_rx_chans': 4,
+            'num_tx_chans': 4,
+            'bw': 1600,
+            'extra_resampling': 1,
+            'spc_rx': 8,
+            'spc_tx': 8,
+        }
+        cp.set_dsp_info([dsp_info, dsp_info])
+        ref_clock_freq = 10e6
+        configs = {}
+        for mcr in (250e6, 500e6, 1e9, 245.76e6):
+            coerced_mcr = cp.coerce_mcr((mcr,))
+            configs[mcr] = (coerced_mcr, cp.get_config(ref_clock_freq, coerced_mcr))
+        self.assertEqual(get_clock_transition(None, configs[500e6][1]), ('spll', 'mmcm', 'rfdc'))
+        self.assertEqual(get_clock_transition(configs[500e6][1], configs[500e6][1]), ())
+        for old_mcr, (old_mcrs, old_config) in configs.items():
+            for new_mcr, (new_mcrs, new_config) in configs.items():
+                transition = get_clock_transition(old_config, new_config)
+                if old_config.spll_config != new_config.spll_config:
+                    self.assertEqual(transition, ('spll', 'mmcm', 'rfdc'))
+                elif old_mcr != new_mcr:
+                    self.assertIn('mmcm', transition)
+                conv_rates = [cfg.conv_rate for cfg in new_config.rfdc_configs]
+                cp.conv_rates = conv_rates
+                interm_config = cp.get_intermediate_clk_settings(
+                    ref_clock_freq, old_mcrs, new_mcrs)
+                # Must not change the converter rates of the new configuration
+                self.assertEqual(cp.conv_rates, conv_rates)
+                self.assertEqual(interm_config is None, old_mcr == new_mcr)
+
+
+class TestX440ClockReconfig(TestBase):
+    """
+    Checks which clocks X4xxClockManager reconfigures on MCR changes, with the
+    hardware access mocked out
+    """
+    def _make_clock_mgr(self, partial_clock_reconfig, mcr=500e6):
+        """
+        Return a clock manager which has applied the clock configuration for
+        mcr, without any hardware attached
+        """
+        cp = X440ClockPolicy(None, None, {}, logging.getLogger())
+        dsp_info = {
+            'num_rx_chans': 4,
+            'num_tx_chans': 4,
+            'bw': 1600,
+            'extra_resampling': 1,
+            'spc_rx': 8,
+            'spc_tx': 8,
+        }
+        cp.set_dsp_info([dsp_info, dsp_info])
+        # Skip __init__(), it requires the clocking hardware
+        mgr = X4xxClockManager.__new__(X4xxClockManager)
+        mgr.log = MockLog()
+        mgr.clk_policy = cp
+        mgr.clk_ctrl = mock.Mock()
+        mgr.clk_ctrl.get_ref_locked.return_value = True
+        mgr.rfdc = mock.Mock()
+        mgr._config_mmcm = mock.Mock()
+        mgr._set_reset_db_clocks = lambda x: None
+        mgr._clocking_auxbrd = None
+        mgr._clock_source = X4xxClockManager.CLOCK_SOURCE_MBOARD
+        mgr._time_source = X4xxClockManager.TIME_SOURCE_INTERNAL
+        mgr._avail_clk_sources = [mgr._clock_source]
+        mgr._avail_time_sources = [mgr._time_source]
+        mgr._safe_sync_source = {
+            'clock_source': mgr._clock_source,
+            'time_source': mgr._time_source,
+            'skip_mpm_reboot': 1,
+        }
+        mgr.get_ref_clock_freq = lambda: 10e6
+        mgr.synchronize = mock.Mock()
+        mgr.num_dboards = 2
+        mgr.tasks = {"mpm_reboot": []}
+        mgr.skip_adc_selfcal = True
+        mgr.partial_clock_reconfig = partial_clock_reconfig
+        mgr._clk_settings = None
+        mgr._clk_settings_applied = False
+        mgr._master_clock_rates = [mcr, mcr]
+        mgr.set_master_clock_rate([mcr])
+        mgr.configured_since_boot = True
+        mgr.clk_ctrl.reset_mock()
+        mgr.rfdc.reset_mock()
+        return mgr
+
+    def test_full_reconfig_by_default(self):
+        """
+        Without partial_clock_reconfig, an MCR change reconfigures everything,
+        including the intermediate clock settings
+        """
+        mgr = self._make_clock_mgr(False)
+        mgr.set_sync_source({'master_clock_rate': '1e9', 'skip_mpm_reboot': 1})
+        self.assertEqual(mgr.clk_ctrl.config_spll.call_count, 2)
+        self.assertEqual(mgr.get_master_clock_rate(), 1e9)
+        # Setting the same MCR again is a no-op
+        mgr.clk_ctrl.reset_mock()
+        mgr.rfdc.reset_mock()
+        mgr.set_sync_source({'master_clock_rate': [1e9, 1e9], 'skip_mpm_reboot': 1})
+        mgr.clk_ctrl.config_spll.assert_not_called()
+        mgr.rfdc.configure.assert_not_called()
+
+    def test_partial_reconfig(self):
+        """
+        With partial_clock_reconfig, the SPLL is only touched if its settings
+        change, but the MMCM and the RFDC are always reconfigured together
+        """
+        mgr = self._make_clock_mgr(True)
+        # 500 MHz and 1 GHz share the SPLL configuration
+        mgr.set_sync_source({'master_clock_rate': '1e9', 'skip_mpm_reboot': 1})
+        mgr.clk_ctrl.config_spll.assert_not_called()
+        mgr.clk_ctrl.sync_spll_clocks.assert_not_called()
+        mgr.rfdc.reset_mmcm.assert_any_call(reset=True)
+        mgr.rfdc.reset_rfdc.assert_any_call(reset=True)
+        mgr.rfdc.configure.assert_called_once()
+        self.assertEqual(mgr.get_master_clock_rate(), 1e9)
+        # 245.76 MHz does not, so the SPLL is reconfigured, going through the
+        # intermediate settings
+        mgr.clk_ctrl.reset_mock()
+        mgr.set_sync_source({'master_clock_rate': '245.76e6', 'skip_mpm_reboot': 1})
+        self.assertEqual(mgr.clk_ctrl.config_spll.call_count, 2)
+        self.assertEqual(mgr.get_master_clock_rate(), 245.76e6)
+
+    def test_reboot_check(self):
+        """
+        The reboot check applies whenever clocks are reconfigured after the
+        first configuration, also if partial_clock_reconfig only touches the
+        MMCM and the RFDC
+        """
+        for partial_clock_reconfig in (False, True):
+            mgr = self._make_clock_mgr(partial_clock_reconfig)
+            with self.assertRaises(RuntimeError):
+                mgr.set_sync_source({'master_clock_rate': '1e9', '__noretry__': True})
+            mgr = self._make_clock_mgr(partial_clock_reconfig)
+            mgr.set_sync_source({'master_clock_rate': '1e9', 'initializing': True})
+            self.assertEqual(mgr.tasks["mpm_reboot"], [{"Run": "True"}])
+            mgr.clk_ctrl.config_spll.assert_not_called()
+            mgr.rfdc.configure.assert_not_called()
+            # Nothing changes, so neither rebooting nor an error is required
+            mgr = self._make_clock_mgr(partial_clock_reconfig)
+            mgr.set_sync_source({'master_clock_rate': [500e6, 500e6]})
+            self.assertEqual(mgr.tasks["mpm_reboot"], [])
+        # A single rate is a change of the MCRs, but with partial_clock_reconfig
+        # it maps onto the clock configuration which is already applied
+        mgr = self._make_clock_mgr(True)
+        mgr.set_sync_source({'master_clock_rate': '500e6'})
+        mgr.rfdc.configure.assert_not_called()
@@ -60,10 +60,30 @@ def setup_arg_parser():
     )
     parser.add_argument(
         '--discovery-addr',
-        help="Bind discovery socket to this address only. Defaults to all " \
-             "addresses.",
+        help="Only answer discovery requests from these subnets (comma-" \
+             "separated, e.g. 192.168.10.0/24 or 192.168.10.255). Defaults " \
+             "to all addresses.",
         default="0.0.0.0",
     )
+    parser.add_argument(
+        '--discovery-ifaces',
+        help="Comma-separated list of network interfaces to listen for " \
+             "discovery requests on, with one socket per interface. " \
+             "Defaults to all interfaces.",
+        default=None,
+    )
+    parser.add_argument(
+        '--discovery-port',
+        help="UDP port of the discovery socket",
+        type=int,
+        default=mpm.mpmtypes.MPM_DISCOVERY_PORT,
+    )
+    parser.add_argument(
+        '--rpc-port',
+        help="TCP port of the RPC server",
+        type=int,
+        default=mpm.mpmtypes.MPM_RPC_PORT,
+    )
     parser.add_argument(
         '--default-args',
         help="Provide a comma-separated list of key=value pairs that are" \
@@ -165,13 +185,15 @@ def spawn_processes(log, args):
     log.info("Spawning RPC process...")
     _PROCESSES.append(
         mpm.rpc_server.spawn_rpc_process(
-            shared, mpm.mpmtypes.MPM_RPC_PORT, args.default_args))
+            shared, args.rpc_port, args.default_args))
     log.debug("RPC process has PID: %d", _PROCESSES[-1].pid)
     if watchdog.has_watchdog():
         watchdog.transfer_control(_PROCESSES[-1].pid)
     log.info("Spawning discovery process...")
     _PROCESSES.append(
-        mpm.discovery.spawn_discovery_process(shared, args.discovery_addr)
+        mpm.discovery.spawn_discovery_process(
+            shared, args.discovery_addr, args.discovery_port,
+            args.discovery_ifaces.split(',') if args.discovery_ifaces else None)
     )
     log.debug("Discovery process has PID: %d", _PROCESSES[-1].pid)
     log.info("Processes launched. Registering signal handlers.")
@@ -122,6 +122,17 @@ Using the Eye Scan tool:
        ver_range  = {'start':-127, 'stop':127, 'step': 2}
        pes_file_name = eyescan_tool.eyescan_full_scan(scan_lanes, hor_range, ver_range)
 
+     If NumPy is available, the counters of the scan are also stored in
+     eyescan_tool.results (see EyeScanResults below), which calculates the BER and
+     the eye opening of every lane.
+     When only the eye opening at a given BER is of interest, eyescan_adaptive_scan(...)
+     is a lot faster than a full scan. It starts with a coarse grid of offsets, and then
+     only measures the offsets close to the boundary of the eye. It does not write a
+     PES file, but returns an EyeScanResults object:
+       results = eyescan_tool.eyescan_adaptive_scan(scan_lanes, hor_range, ver_range,
+                                                    target_ber=1e-7)
+       widths, heights = results.get_eye_opening(1e-7)
+
   7. Process and visualize the PES file.
      The resulting .pes binary file must be manually copied to a known location for
      LabVIEW access (i.e. a Windows machine running LV).
@@ -154,14 +165,17 @@ Theory of operation:
   eyescan_full_scan(...) method; which handles the measurement configuration, the binary
   file creation, the GT(s) configuration, and the measurement sweep across the ranges.
 
+  The measurement at every offset is started on all lanes before any of them is
+  polled, and then the eye scan FSMs of all lanes are polled together, so the lanes are
+  measured in parallel. The polling interval grows exponentially while the FSMs are
+  still counting, up to a maximum that depends on the prescale value.
+
 
 Future work ideas:
 
   1. Generate the eye scan results in human-readable fashion (i.e. ascii encoded
      instead of binary data).
-  2. Add Bit Error Rate (BER) calculation for each offset within the tool, instead of
-     just spitting samples and errors counters.
-  3. Develop a open-source data visualization tool to enable non-LabVIEW users to
+  2. Develop a open-source data visualization tool to enable non-LabVIEW users to
      process and visualize the eye scan results (pes file).
 """
 
@@ -171,6 +185,125 @@ import math
 import datetime
 from builtins import object
 from usrp_mpm.mpmlog import get_logger
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class EyeScanResults(object):
+    """
+    Stores the sample and error counters of an eye scan in NumPy arrays, and
+    calculates the BER from them.
+
+    The counters are stored per UT sign ('+UT', and '-UT' for DFE eq. mode) in
+    arrays indexed by (lane, hor, ver). lane is the index into the lanes
+    array, hor and ver are the indices into the hor_offsets and ver_offsets
+    arrays (the offsets as given in the ranges, i.e. hor_offsets is not
+    multiplied by rxout_div).
+
+    measured tells which offsets were actually measured. Adaptive scans don't
+    measure every offset, the counters of the other offsets are copied from a
+    nearby offset with the same result (see EyeScanTool.eyescan_adaptive_scan).
+    """
+
+    def __init__(self, lanes, hor_range, ver_range, eq_mode, prescale, rx_int_datawidth):
+        if np is None:
+            raise RuntimeError("Storing eye scan results requires NumPy.")
+        self.lanes = list(lanes)
+        self.hor_offsets = np.arange(hor_range['start'], hor_range['stop'] + 1, hor_range['step'])
+        self.ver_offsets = np.arange(ver_range['start'], ver_range['stop'] + 1, ver_range['step'])
+        self.hor_step = hor_range['step']
+        self.ver_step = ver_range['step']
+        self.prescale = prescale
+        self.rx_int_datawidth = rx_int_datawidth
+        self.uts = ('+UT', '-UT') if eq_mode == 'DFE' else ('+UT',)
+        shape = (len(self.lanes), len(self.hor_offsets), len(self.ver_offsets))
+        self.sample_count = {ut: np.zeros(shape, dtype=np.uint16) for ut in self.uts}
+        self.error_count = {ut: np.zeros(shape, dtype=np.uint16) for ut in self.uts}
+        self.measured = np.zeros(shape[1:], dtype=bool)
+        # Offsets which have counters (measured or copied)
+        self.valid = np.zeros(shape[1:], dtype=bool)
+
+    def store(self, hor_idx, ver_idx, acq_counters):
+        """
+        Stores the counters returned by EyeScanTool.eyescan_acquisition() for the
+        offset at (hor_idx, ver_idx).
+        """
+        for lane_idx, lane in enumerate(self.lanes):
+            for ut in self.uts:
+                self.sample_count[ut][lane_idx, hor_idx, ver_idx] = \
+                    acq_counters[lane][ut]['sample_count']
+                self.error_count[ut][lane_idx, hor_idx, ver_idx] = \
+                    acq_counters[lane][ut]['error_count']
+        self.measured[hor_idx, ver_idx] = True
+        self.valid[hor_idx, ver_idx] = True
+
+    def copy_counters(self, hor_idx, ver_idx, src_hor_idx, src_ver_idx):
+        """
+        Copies the counters of the offsets at (src_hor_idx, src_ver_idx) to the
+        offsets at (hor_idx, ver_idx). All arguments are index arrays.
+        """
+        for ut in self.uts:
+            for counters in (self.sample_count[ut], self.error_count[ut]):
+                counters[:, hor_idx, ver_idx] = counters[:, src_hor_idx, src_ver_idx]
+        self.valid[hor_idx, ver_idx] = True
+
+    def get_ber(self):
+        """
+        Returns the BER of every offset as array indexed by (lane, hor, ver).
+        Offsets without counters are NaN.
+
+        For DFE eq. mode, this is the total BER of the +UT and -UT measurements.
+        The number of compared bits is sample_count * 2^(1 + prescale) *
+        rx_int_datawidth (UG476 pg. 223).
+        """
+        bits_per_sample = 2 ** (1 + self.prescale) * self.rx_int_datawidth
+        errors = sum(self.error_count[ut].astype(np.float64) for ut in self.uts)
+        bits = sum(self.sample_count[ut].astype(np.float64) for ut in self.uts) \
+            * bits_per_sample
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ber = errors / bits
+        ber[:, ~self.valid] = np.nan
+        return ber
+
+    def get_contours(self, target_bers):
+        """
+        Returns a boolean array indexed by (target_ber, lane, hor, ver) which
+        is True for every offset with a BER at or below the given target BERs.
+        The boundary of the True region of a lane is its BER contour.
+        """
+        ber = self.get_ber()
+        target_bers = np.asarray(target_bers, dtype=np.float64).reshape(-1, 1, 1, 1)
+        return ber[np.newaxis] <= target_bers
+
+    def get_eye_opening(self, target_ber):
+        """
+        Returns a tuple of arrays (widths, heights) with the eye opening of every
+        lane at target_ber, in units of the offset ranges.
+
+        The width is measured at the vertical offset closest to 0, the height at
+        the horizontal offset closest to 0. Only the offsets connected to the
+        center count, an eye which is closed at the center has no opening.
+        """
+        is_open = self.get_contours([target_ber])[0]
+        hor_center = int(np.argmin(np.abs(self.hor_offsets)))
+        ver_center = int(np.argmin(np.abs(self.ver_offsets)))
+        widths = self._get_open_span(is_open[:, :, ver_center], hor_center)
+        heights = self._get_open_span(is_open[:, hor_center, :], ver_center)
+        return widths * self.hor_step, heights * self.ver_step
+
+    @staticmethod
+    def _get_open_span(is_open, center):
+        """
+        For every row of the 2-D array is_open, returns the number of
+        consecutive True elements around the element at center.
+        """
+        indices = np.arange(is_open.shape[1])
+        closed = ~is_open
+        right = np.where(closed & (indices >= center), indices, is_open.shape[1]).min(axis=1)
+        left = np.where(closed & (indices <= center), indices, -1).max(axis=1)
+        return np.maximum(right - left - 1, 0)
 
 class EyeScanTool(object):
     """
@@ -186,6 +319,18 @@ class EyeScanTool(object):
     # E.g. PRINT_STATUS_EVERY = 1 will print a status message every offset measurement.
     PRINT_STATUS_EVERY = 10
 
+    # Eye scan control FSM states (ES_CONTROL_STATUS[3:1]).
+    STATE_DECODE = {'WAIT': 0b000, 'RESET': 0b001, 'COUNT': 0b011, \
+                    'END' : 0b010, 'ARMED': 0b101, 'READ' : 0b100}
+
+    # Polling interval (in seconds) while waiting for the eye scan FSMs. After
+    # every poll that did not find all lanes in the expected state, the interval
+    # is doubled, up to the maximum of POLL_INTERVAL_MIN and 2^(prescale-13) ms.
+    POLL_INTERVAL_MIN = 0.0001
+
+    # Results of the last eye scan (an EyeScanResults object), if NumPy is available.
+    results = None
+
     lanes = None
     # Array that defines the available lanes to measure.
     lane_num = None
@@ -510,8 +655,7 @@ class EyeScanTool(object):
           wait_for -> State which the function waits the FSM to transition to.
                       {'WAIT','RESET','COUNT','END','ARMED','READ'}
         """
-        STATE_DECODE = {'WAIT': 0b000, 'RESET': 0b001, 'COUNT': 0b011, \
-                        'END' : 0b010, 'ARMED': 0b101, 'READ' : 0b100}
+        STATE_DECODE = self.STATE_DECODE
         self.log.trace("Waiting for %s state at MGT #%d", wait_for, self.lane_num)
         # Validate the state input parameter.
         assert wait_for.upper() in ('WAIT', 'RESET', 'COUNT', 'END', 'ARMED', 'READ')
@@ -546,6 +690,55 @@ class EyeScanTool(object):
         return state_reached
 
 
+    def eyescan_wait_lanes(self, lanes, wait_for='END', exit_after=10000):
+        """
+        This function waits for the eye scan control FSMs of all the given lanes
+        to transition to the given state (wait_for). All lanes are polled in every
+        round, so lanes measuring in parallel are waited for in parallel.
+        Returns True when the desired state is reached on all lanes.
+        The global lane number is left at an arbitrary lane.
+
+        Parameters:
+          lanes      -> Array of GT numbers to wait for.
+          wait_for   -> State which the function waits the FSMs to transition to.
+                        {'WAIT','RESET','COUNT','END','ARMED','READ'}
+          exit_after -> Maximum number of polling rounds.
+        """
+        self.log.trace("Waiting for %s state at MGTs %s", wait_for, lanes)
+        # Validate the state input parameter.
+        assert wait_for.upper() in self.STATE_DECODE
+        expected_state = self.STATE_DECODE[wait_for.upper()]
+        max_interval = max(self.POLL_INTERVAL_MIN, 2 ** (self.prescale - 13) / 1000.0)
+        interval = self.POLL_INTERVAL_MIN
+        pending_lanes = list(lanes)
+        iterations = 0
+        while pending_lanes:
+            # Read the status register of every pending lane, and drop the
+            # lanes which have reached the expected state.
+            still_pending = []
+            for current_lane in pending_lanes:
+                self.set_global_lane(current_lane)
+                es_control_status = self.jesdcore.drp_access(rd=True, addr=0x151)
+                if (es_control_status & 0x000E) >> 1 != expected_state:
+                    still_pending.append(current_lane)
+            pending_lanes = still_pending
+            iterations += 1
+            if not pending_lanes or exit_after == iterations:
+                break
+            if iterations % 100 == 0:
+                self.log.debug("%s state has not been reached for GTs %s after %d iterations.",
+                               wait_for, pending_lanes, iterations)
+            time.sleep(interval)
+            interval = min(2 * interval, max_interval)
+        # Validate that the expected state was reached.
+        if pending_lanes:
+            self.log.error("%s state was not reached at GTs %s after %d polls.",
+                           wait_for, pending_lanes, iterations)
+            raise Exception("Eyescan status timed out, see log for details.")
+        self.log.trace("%s state reached at GTs %s", wait_for, lanes)
+        return True
+
+
     def eyescan_counters(self):
         """
         This function reads the error and sample counters for the current lane number.
@@ -590,12 +783,13 @@ class EyeScanTool(object):
             # Start eyescan FSM: set run with ErrDet enabled.
             self.eyescan_control(err_det_en=True, run=True, arm=False)
         #
-        # Wait for the FSM to complete on each lane, read counters, and
-        # start second eye scan measurement (DFE eq. only).
+        # Wait for the FSM to complete on all lanes.
+        self.eyescan_wait_lanes(self.lanes, wait_for='END')
+        #
+        # Read counters on each lane, and start second eye scan measurement
+        # (DFE eq. only).
         for current_lane in self.lanes:
             self.set_global_lane(current_lane)
-            # Wait for END state.
-            self.eyescan_wait(wait_for='END')
             # Clear run & arm bits in the Eyescan control.
             self.eyescan_control(err_det_en=True, run=False, arm=False)
             # Read counters with +UT.
@@ -613,12 +807,11 @@ class EyeScanTool(object):
                 self.log.debug("Single measurement finalized for GT #%d (H=%d, V=%d, %s).",
                                self.lane_num, hor_offset, ver_offset, self.eq_mode)
         #
-        # Wait for the FSM (-UT, DFE only) to complete on each lane, and read counters.
+        # Wait for the FSM (-UT, DFE only) to complete on all lanes, and read counters.
         if self.eq_mode == 'DFE':
+            self.eyescan_wait_lanes(self.lanes, wait_for='END')
             for current_lane in self.lanes:
                 self.set_global_lane(current_lane)
-                # Wait for END state.
-                self.eyescan_wait(wait_for='END')
                 # Clear run & arm bits in the Eyescan control.
                 self.eyescan_control(err_det_en=True, run=False, arm=False)
                 # Read counters with -UT.
@@ -634,7 +827,7 @@ class EyeScanTool(object):
         return acq_counters
 
 
-    def eyescan_sweep(self, bin_file, parsed_ranges):
+    def eyescan_sweep(self, bin_file, parsed_ranges, results=None):
         """
         Performs Eye Scan "measurement loop" (error counting) acquisitions across the
         given phase and voltage offset ranges.
@@ -664,6 +857,7 @@ class EyeScanTool(object):
         Parameters:
           bin_file      -> Binary file reference to write data to. Passed from top level function.
           parsed_ranges -> This is a keyed list with parsed parameters from parse_ranges().
+          results       -> EyeScanResults object to store the counters in (optional).
         """
         def write_byte_counters(acq_counters):
             """
@@ -694,15 +888,19 @@ class EyeScanTool(object):
         total_iterations = parsed_ranges['hor_iterations'] * parsed_ranges['ver_iterations']
         iterations = 0
         # Outer loop iterates horizontally.
-        for hor_offset in range(parsed_ranges['hor_start'], parsed_ranges['hor_stop'] + 1,
-                                parsed_ranges['hor_step']):
+        for hor_idx, hor_offset in enumerate(
+                range(parsed_ranges['hor_start'], parsed_ranges['hor_stop'] + 1,
+                      parsed_ranges['hor_step'])):
             # Inner loop iterates vertically.
-            for ver_offset in range(parsed_ranges['ver_start'], parsed_ranges['ver_stop'] + 1,
-                                    parsed_ranges['ver_step']):
+            for ver_idx, ver_offset in enumerate(
+                    range(parsed_ranges['ver_start'], parsed_ranges['ver_stop'] + 1,
+                          parsed_ranges['ver_step'])):
                 # Perform a single acquisition at each "coordinate".
                 acq_counters = self.eyescan_acquisition(hor_offset, ver_offset)
                 # Write the data to a binary file.
                 write_byte_counters(acq_counters)
+                if results is not None:
+                    results.store(hor_idx, ver_idx, acq_counters)
                 # Report Eye Scan progress.
                 iterations += 1
                 progress = iterations / total_iterations * 100
@@ -830,10 +1028,119 @@ class EyeScanTool(object):
         parsed_ranges = self.parse_ranges(hor_range, ver_range)
         # Create the .pes binary file.
         file_name, pes_file = self.create_pes_file(hor_range, ver_range)
+        # Keep the counters in memory, too, if we can.
+        if np is not None:
+            self.results = EyeScanResults(self.lanes, hor_range, ver_range, self.eq_mode,
+                                          self.prescale, self.rx_int_datawidth)
+        else:
+            self.log.debug("NumPy is not available, results are only written to the PES file.")
+            self.results = None
         # Configure the requested lanes.
         self.eyescan_config()
         # Perform the sweep on the requested lanes.
-        self.eyescan_sweep(pes_file, parsed_ranges)
+        self.eyescan_sweep(pes_file, parsed_ranges, self.results)
         # Close the binary file.
         pes_file.close()
         return file_name
+
+
+    def eyescan_adaptive_scan(self,
+                              scan_lanes=[0],
+                              hor_range={'start':-32 , 'stop':32 , 'step': 1},
+                              ver_range={'start':-127, 'stop':127, 'step': 2},
+                              target_ber=1e-6,
+                              coarse_factor=8):
+        """
+        This function performs a coarse-to-fine scan of the eye boundary at the given
+        target BER, and returns the results as EyeScanResults object (which is also
+        stored in self.results). No PES file is written. Requires NumPy.
+
+        First, the offsets on a coarse grid (every coarse_factor-th offset of the ranges
+        in both directions, plus the last ones) are measured. Then the grid spacing is
+        halved until it reaches the step of the ranges. On every finer grid, an offset
+        is only measured if the offsets of the coarser grids around it (up to the new
+        grid spacing away) are open (BER <= target_ber) on some lane and closed on some
+        lane. Otherwise, for every lane, it has the same result as its neighbours, and
+        the counters of the closest offset of the previous grid are copied to it.
+
+        Parameters:
+          scan_lanes    -> Array that represents which GTs will be scanned.
+          hor_range     -> Horizontal phase offset range (see eyescan_full_scan()).
+          ver_range     -> Vertical voltage offset range (see eyescan_full_scan()).
+          target_ber    -> BER at which the eye boundary is searched.
+          coarse_factor -> Spacing of the coarse grid, in steps of the ranges.
+                           Must be a power of 2.
+        """
+        assert coarse_factor >= 1 and (coarse_factor & (coarse_factor - 1)) == 0
+        # Set the global lanes variable that defines which lanes will be scanned.
+        self.lanes = scan_lanes
+        # Extract the needed parameters from the given ranges.
+        parsed_ranges = self.parse_ranges(hor_range, ver_range)
+        results = EyeScanResults(self.lanes, hor_range, ver_range, self.eq_mode,
+                                 self.prescale, self.rx_int_datawidth)
+        self.results = results
+        # Configure the requested lanes.
+        self.eyescan_config()
+        num_hor = len(results.hor_offsets)
+        num_ver = len(results.ver_offsets)
+        # Result of every offset of the current and coarser grids, per lane:
+        # 1 -> open, 0 -> closed, -1 -> not on any grid yet.
+        is_open = np.full((len(self.lanes), num_hor, num_ver), -1, dtype=np.int8)
+        #
+        def get_grid_indices(num_offsets, spacing):
+            """
+            Returns the indices of the offsets on a grid with the given spacing.
+            """
+            return np.unique(np.append(np.arange(0, num_offsets, spacing), num_offsets - 1))
+        #
+        def measure(hor_indices, ver_indices):
+            """
+            Measures the given offsets on all lanes, and updates is_open.
+            """
+            for hor_idx, ver_idx in zip(hor_indices, ver_indices):
+                acq_counters = self.eyescan_acquisition(
+                    parsed_ranges['hor_start'] + hor_idx * parsed_ranges['hor_step'],
+                    parsed_ranges['ver_start'] + ver_idx * parsed_ranges['ver_step'])
+                results.store(hor_idx, ver_idx, acq_counters)
+            is_open[:, hor_indices, ver_indices] = \
+                results.get_ber()[:, hor_indices, ver_indices] <= target_ber
+        #
+        spacing = coarse_factor
+        hor_grid, ver_grid = np.meshgrid(get_grid_indices(num_hor, spacing),
+                                         get_grid_indices(num_ver, spacing), indexing='ij')
+        self.log.debug("Measuring %d offsets of the coarse grid...", hor_grid.size)
+        measure(hor_grid.ravel(), ver_grid.ravel())
+        while spacing > 1:
+            spacing //= 2
+            # The offsets of the new grid which are not on a coarser grid
+            on_grid = np.zeros((num_hor, num_ver), dtype=bool)
+            on_grid[np.ix_(get_grid_indices(num_hor, spacing),
+                           get_grid_indices(num_ver, spacing))] = True
+            hor_new, ver_new = np.nonzero(on_grid & (is_open[0] < 0))
+            # Look for open and closed offsets of the coarser grids around every
+            # offset (within a window of +/- spacing in both directions).
+            window = 2 * spacing + 1
+            padded = np.pad(is_open, ((0, 0), (spacing, spacing), (spacing, spacing)),
+                            constant_values=-1)
+            neighbours = np.lib.stride_tricks.sliding_window_view(
+                padded, (window, window), axis=(1, 2))[:, hor_new, ver_new]
+            has_open = (neighbours == 1).any(axis=(-2, -1))
+            has_closed = (neighbours == 0).any(axis=(-2, -1))
+            on_boundary = (has_open == has_closed).any(axis=0)
+            # Offsets away from the boundary take over the counters of the
+            # closest offset of the previous grid, which is in their window.
+            hor_copy = hor_new[~on_boundary]
+            ver_copy = ver_new[~on_boundary]
+            hor_src = np.minimum(np.round(hor_copy / (2 * spacing)).astype(int) * 2 * spacing,
+                                 num_hor - 1)
+            ver_src = np.minimum(np.round(ver_copy / (2 * spacing)).astype(int) * 2 * spacing,
+                                 num_ver - 1)
+            results.copy_counters(hor_copy, ver_copy, hor_src, ver_src)
+            is_open[:, hor_copy, ver_copy] = is_open[:, hor_src, ver_src]
+            self.log.debug("Grid spacing %d: measuring %d of %d new offsets...",
+                           spacing, np.count_nonzero(on_boundary), len(hor_new))
+            measure(hor_new[on_boundary], ver_new[on_boundary])
+        self.log.info("Adaptive Eye Scan for GTs %s measured %d of %d offsets.", self.lanes,
+                      np.count_nonzero(results.measured), results.measured.size)
+        self.set_global_lane(None)
+        return results
@@ -64,6 +64,9 @@ class DboardIface(object):
     def poke_db_cpld(self, addr, val):
         raise NotImplementedError('DboardIface::poke_db_cpld() not supported!')
 
+    def poke_db_cpld_batch(self, pokes, verify=False):
+        raise NotImplementedError('DboardIface::poke_db_cpld_batch() not supported!')
+
     def ctrl_spi_reset(self):
         raise NotImplementedError('DboardIface::ctrl_spi_reset() not supported!')
 
@@ -81,6 +81,13 @@ class X4xxDboardIface(DboardIface):
     def poke_db_cpld(self, addr, val):
         self.db_cpld_iface.poke32(addr, val)
 
+    def poke_db_cpld_batch(self, pokes, verify=False):
+        """
+        Write a list of (addr, val) pairs to the DB CPLD in one go. If verify
+        is True, every register is read back after it was written.
+        """
+        self.db_cpld_iface.poke32_batch(pokes, verify)
+
     ####################################################################
     # MB Control
     #   Some of the MB settings may be controlled from the DB Driver
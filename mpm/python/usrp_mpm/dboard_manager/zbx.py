@@ -230,8 +230,7 @@ class ZBX(X4xxDbMixin, DboardManagerBase):
         cpld_regs.RX0_DSA2[0] = 15
         cpld_regs.RX0_DSA3_A[0] = 15
         cpld_regs.RX0_DSA3_B[0] = 15
-        for addr in cpld_regs.get_changed_addrs():
-            self.poke_cpld(addr, cpld_regs.get_reg(addr))
+        self.db_iface.poke_db_cpld_batch(cpld_regs.get_dirty_writes())
         # pylint: enable=too-many-statements
 
     def _get_cpld_git_hash(self):
@@ -389,8 +388,7 @@ class ZBX(X4xxDbMixin, DboardManagerBase):
             self.regs.TX1_TRX_LED[0] = self.regs.TX1_TRX_LED[0].TX1_TRX_LED_ENABLE \
                 if bool(trx_tx) else self.regs.TX1_TRX_LED[0].TX1_TRX_LED_DISABLE
 
-        for addr in self.regs.get_changed_addrs():
-            self.poke_cpld(addr, self.regs.get_reg(addr))
+        self.db_iface.poke_db_cpld_batch(self.regs.get_dirty_writes())
 
     ###########################################################################
     # Sensors
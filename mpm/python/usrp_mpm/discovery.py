@@ -8,90 +8,238 @@ Code to run the discovery port
 """
 
 from multiprocessing import Process
+import ipaddress
+import selectors
 import socket
-from usrp_mpm.mpmtypes import MPM_DISCOVERY_PORT
-from usrp_mpm.mpmlog import get_main_logger
+import time
+from usrp_mpm.mpmtypes import MPM_DISCOVERY_PORT, MPM_DISCOVERY_MESSAGE
+from usrp_mpm.mpmlog import get_main_logger, TRACE
 from usrp_mpm.mpmutils import to_binary_str
 
 RESPONSE_PREAMBLE = b"USRP-MPM"
 RESPONSE_SEP = b";"
 RESPONSE_CLAIMED_KEY = b"claimed"
+DISCOVERY_REQUEST = to_binary_str(MPM_DISCOVERY_MESSAGE)
+ECHO_REQUEST = b"MPM-ECHO"
 # A buffer size large enough to capture any UDP packet we receive on the
 # discovery socket
 MAX_SOCK_BUFSIZ = 9000
+# Max number of requests read from one socket before checking the others
+RECV_BATCH_SIZE = 64
 # For setsockopt
 IP_MTU_DISCOVER = 10
 IP_PMTUDISC_DO = 2
+SO_BINDTODEVICE = getattr(socket, 'SO_BINDTODEVICE', 25)
+# Echo requests (used by UHD for MTU discovery) are rate limited per sender.
+# Every sender can send ECHO_BURST requests back-to-back, and ECHO_RATE
+# requests per second on average. Any excess requests are dropped.
+ECHO_RATE = 200.0
+ECHO_BURST = 100
+# Max number of senders remembered by the subnet filter and the rate limiter
+MAX_TRACKED_SENDERS = 1024
+# Dropped echo requests are reported at most once per interval (seconds)
+DROP_REPORT_INTERVAL = 10.0
 
-def spawn_discovery_process(shared_state, discovery_addr):
+def spawn_discovery_process(shared_state, discovery_addr,
+                            discovery_port=MPM_DISCOVERY_PORT, discovery_ifaces=None):
     """
     Returns a process that contains the device discovery.
 
     Arguments:
     shared_state -- Shared state of device (is it claimed, etc.). Is a
                     SharedState() object.
-    discovery_addr -- Discovery will listen on this address(es)
+    discovery_addr -- Discovery will only answer requests from these
+                      subnets (see parse_discovery_subnets())
+    discovery_port -- Discovery will listen on this UDP port
+    discovery_ifaces -- List of network interfaces. If given, discovery
+                        listens on each of these interfaces with a separate
+                        socket. Otherwise, it listens on all interfaces.
     """
     proc = Process(
         target=_discovery_process,
-        args=(shared_state, discovery_addr)
+        args=(shared_state, discovery_addr, discovery_port, discovery_ifaces)
     )
     proc.start()
     return proc
 
+def parse_discovery_subnets(discovery_addr):
+    """
+    Return a list of the IPv4Network objects described by discovery_addr, or
+    an empty list if requests from all addresses shall be answered.
 
-def _discovery_process(state, discovery_addr):
+    discovery_addr is a comma-separated list. Every entry is either a subnet
+    in CIDR notation (e.g. 192.168.10.0/24) or an address. Trailing octets of
+    255 in an address are treated as the host part, i.e. the broadcast
+    address 192.168.10.255 is the same as 192.168.10.0/24. 0.0.0.0 matches
+    all addresses.
     """
-    The actual process for device discovery. Is spawned by
-    spawn_discovery_process().
+    subnets = []
+    for entry in discovery_addr.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        if ipaddress.IPv4Address(entry.split('/')[0]).is_unspecified:
+            return []
+        if '/' not in entry:
+            octets = entry.split('.')
+            num_host_octets = 0
+            while num_host_octets < len(octets) and octets[-1 - num_host_octets] == '255':
+                num_host_octets += 1
+            entry = "{}/{}".format(entry, 32 - 8 * num_host_octets)
+        subnets.append(ipaddress.IPv4Network(entry, strict=False))
+    return subnets
+
+def create_response_string(state):
+    " Generate the string that gets sent back to the requester. "
+    return RESPONSE_SEP.join(
+        [RESPONSE_PREAMBLE] + \
+        [b"type="+state.dev_type.value] + \
+        [b"product="+state.dev_product.value] + \
+        [b"serial="+state.dev_serial.value] + \
+        [b"name="+state.dev_name.value] + \
+        [b"fpga="+state.dev_fpga_type.value] + \
+        [RESPONSE_CLAIMED_KEY+to_binary_str("={}".format(state.claim_status.value))]
+    )
+
+class DiscoveryResponder:
     """
-    log = get_main_logger().getChild('discovery')
-    def create_response_string(state):
-        " Generate the string that gets sent back to the requester. "
-        return RESPONSE_SEP.join(
-            [RESPONSE_PREAMBLE] + \
-            [b"type="+state.dev_type.value] + \
-            [b"product="+state.dev_product.value] + \
-            [b"serial="+state.dev_serial.value] + \
-            [b"name="+state.dev_name.value] + \
-            [b"fpga="+state.dev_fpga_type.value] + \
-            [RESPONSE_CLAIMED_KEY+to_binary_str("={}".format(state.claim_status.value))]
-        )
+    Answers discovery and echo requests.
+
+    The discovery response is only rebuilt when the version of the shared
+    state changes (see SharedState.touch()). The version is read without
+    taking the shared state lock, so as long as the version is unchanged,
+    discovery is not held up while the RPC process holds the lock. The RPC
+    server only touches the state after releasing the lock, so discovery
+    keeps answering with the previous response during a claim.
+    """
+    def __init__(self, state, subnets, log):
+        self.log = log
+        self._state = state
+        self._version = state.version.get_obj()
+        self._response_version = None
+        self._response = b""
+        self._subnets = [(int(subnet.network_address), int(subnet.netmask))
+                         for subnet in subnets]
+        # Sender address -> is in one of our subnets
+        self._allowed = {}
+        # Sender address -> (tokens, time of last update)
+        self._echo_buckets = {}
+        self._echo_dropped = 0
+        self._next_drop_report = 0.0
+
+    def get_response(self):
+        """
+        Return the discovery response for the current shared state
+        """
+        if self._version.value != self._response_version:
+            with self._state.lock:
+                self._response_version = self._version.value
+                self._response = create_response_string(self._state)
+            self.log.debug("Discovery response updated: %s", self._response)
+        return self._response
 
+    def is_allowed(self, sender_addr):
+        """
+        Check if requests from sender_addr shall be answered
+        """
+        if not self._subnets:
+            return True
+        allowed = self._allowed.get(sender_addr)
+        if allowed is None:
+            addr = int(ipaddress.IPv4Address(sender_addr))
+            allowed = any(addr & netmask == network for network, netmask in self._subnets)
+            if len(self._allowed) >= MAX_TRACKED_SENDERS:
+                self._allowed.clear()
+            self._allowed[sender_addr] = allowed
+        return allowed
+
+    def allow_echo(self, sender_addr, now):
+        """
+        Take a token from the echo rate limiter of sender_addr. Returns False
+        if the sender has exceeded its rate.
+        """
+        tokens, last_update = self._echo_buckets.get(sender_addr, (ECHO_BURST, now))
+        tokens = min(ECHO_BURST, tokens + (now - last_update) * ECHO_RATE)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self._echo_dropped += 1
+            if now >= self._next_drop_report:
+                self.log.warning("Dropped %d echo requests exceeding the rate limit "
+                                 "(last sender: %s)", self._echo_dropped, sender_addr)
+                self._echo_dropped = 0
+                self._next_drop_report = now + DROP_REPORT_INTERVAL
+        if sender_addr not in self._echo_buckets and \
+                len(self._echo_buckets) >= MAX_TRACKED_SENDERS:
+            self._echo_buckets.clear()
+        self._echo_buckets[sender_addr] = (tokens, now)
+        return allowed
+
+    def handle_request(self, sock, data, sender):
+        """
+        Answer the request data, which was received on sock from sender
+        """
+        if self.log.isEnabledFor(TRACE):
+            self.log.trace("Got poked by: %s", sender[0])
+        if not self.is_allowed(sender[0]):
+            return
+        if data.strip(b"\0") == DISCOVERY_REQUEST:
+            send_data = self.get_response()
+        elif data.startswith(ECHO_REQUEST):
+            if not self.allow_echo(sender[0], time.monotonic()):
+                return
+            send_data = data
+        else:
+            return
+        try:
+            sock.sendto(send_data, sender)
+        except OSError as ex:
+            self.log.debug("Send error (to %s): %s", sender[0], str(ex))
+
+def _open_socket(discovery_port, iface=None):
+    """
+    Open a non-blocking discovery socket, optionally bound to one interface
+    """
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    # FIXME really, we should only bind to the subnet but I haven't gotten that
-    # working yet
-    sock.bind((("0.0.0.0", MPM_DISCOVERY_PORT)))
+    if iface is not None:
+        # There is one socket per interface, all of which share the port
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, SO_BINDTODEVICE, to_binary_str(iface))
+    sock.bind((("0.0.0.0", discovery_port)))
     sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+    sock.setblocking(False)
+    return sock
 
-    # TODO yeah I know that's not how you do this
-    discovery_addr_prefix = discovery_addr.replace('.255', '')
-    if discovery_addr == '0.0.0.0':
-        discovery_addr_prefix = ''
+def _discovery_process(state, discovery_addr, discovery_port=MPM_DISCOVERY_PORT,
+                       discovery_ifaces=None):
+    """
+    The actual process for device discovery. Is spawned by
+    spawn_discovery_process().
+    """
+    log = get_main_logger().getChild('discovery')
+    responder = DiscoveryResponder(state, parse_discovery_subnets(discovery_addr), log)
+    if discovery_ifaces:
+        socks = [_open_socket(discovery_port, iface) for iface in discovery_ifaces]
+    else:
+        socks = [_open_socket(discovery_port)]
+    # This is an epoll selector on Linux
+    selector = selectors.DefaultSelector()
+    for sock in socks:
+        selector.register(sock, selectors.EVENT_READ)
 
     try:
         while True:
-            data, sender = sock.recvfrom(MAX_SOCK_BUFSIZ)
-            log.debug("Got poked by: %s", sender[0])
-            # TODO this is still part of the awful subnet identification
-            if not sender[0].startswith(discovery_addr_prefix):
-                continue
-            if data.strip(b"\0") == b"MPM-DISC":
-                log.debug("Sending discovery response to %s port: %d",
-                          sender[0], sender[1])
-                resp_str = create_response_string(state)
-                send_data = resp_str
-                log.trace("Return data: %s", send_data)
-                sock.sendto(send_data, sender)
-            elif data.startswith(b"MPM-ECHO"):
-                log.debug("Received echo request ({len} bytes) from {sender}"
-                          .format(len=len(data), sender=sender[0]))
-                send_data = data
-                try:
-                    sock.sendto(send_data, sender)
-                except OSError as ex:
-                    log.debug("ECHO send error: %s", str(ex))
+            for key, _ in selector.select():
+                sock = key.fileobj
+                for _ in range(RECV_BATCH_SIZE):
+                    try:
+                        data, sender = sock.recvfrom(MAX_SOCK_BUFSIZ)
+                    except BlockingIOError:
+                        break
+                    responder.handle_request(sock, data, sender)
     except Exception as err:
         log.error("Unexpected error: `%s' Type: `%s'", str(err), type(err))
-        sock.close()
+        for sock in socks:
+            sock.close()
         exit(1)
@@ -32,3 +32,13 @@ class SharedState:
         self.dev_name = Array(ctypes.c_char, 21, lock=self.lock)
         self.dev_product = Array(ctypes.c_char, 16, lock=self.lock)
         self.dev_fpga_type = Array(ctypes.c_char, 8, lock=self.lock)
+        # Incremented whenever the claim status or device info change
+        self.version = Value(ctypes.c_uint32, 0, lock=self.lock)
+
+    def touch(self):
+        """
+        Mark the claim status or the device info as changed. This must be
+        called after changing them, so discovery picks up the change.
+        """
+        with self.lock:
+            self.version.value = (self.version.value + 1) & 0xFFFFFFFF
@@ -22,7 +22,7 @@ from usrp_mpm.sys_utils.udev import get_spidev_nodes
 from usrp_mpm.sys_utils import dtoverlay
 from usrp_mpm.sys_utils import net
 from usrp_mpm.xports import XportAdapterMgr
-from usrp_mpm.rpc_utils import no_claim, no_rpc
+from usrp_mpm.rpc_utils import no_claim, no_rpc, read_only
 from usrp_mpm.mpmutils import get_dboard_class_from_pid
 from usrp_mpm import eeprom
 from usrp_mpm import prefs
@@ -862,6 +862,7 @@ class PeriphManagerBase:
         ]
 
     @no_claim
+    @read_only
     def list_available_overlays(self):
         """
         Returns a list of available device tree overlays
@@ -869,6 +870,7 @@ class PeriphManagerBase:
         return dtoverlay.list_available_overlays()
 
     @no_claim
+    @read_only
     def list_active_overlays(self):
         """
         Returns a list of currently loaded device tree overlays
@@ -1015,9 +1017,13 @@ class PeriphManagerBase:
     ##########################################################################
     # Mboard Sensors
     ##########################################################################
+    @read_only
     def get_mb_sensors(self):
         """
         Return a list of sensor names.
+
+        Unlike get_mb_sensor(), this does not access the hardware, so it may
+        run on an RPC worker thread.
         """
         return list(self.mboard_sensor_callback_map.keys())
 
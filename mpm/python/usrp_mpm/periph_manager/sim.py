@@ -27,8 +27,11 @@ class SimXportMgrUDP(XportMgrUDP):
     """This is an adaptor class for the normal XportMgrUDP
     In radios, the interface names are hardcoded. Since we are on a
     desktop computer, we generate the names at runtime.
+
+    The CHDR port is the port of the simulator's ChdrEndpoint, so
+    several simulated devices can run on one computer.
     """
-    def __init__(self, log, args, eth_dispatcher_cls):
+    def __init__(self, log, args, eth_dispatcher_cls, chdr_port):
         with IPRoute() as ipr:
             self.iface_config = {
                 link.get_attr('IFLA_IFNAME'): {
@@ -37,6 +40,7 @@ class SimXportMgrUDP(XportMgrUDP):
                 } for link in ipr.get_links()
             }
         super().__init__(log, args, eth_dispatcher_cls)
+        self.chdr_port = chdr_port
 
 class SimEthDispatcher:
     """This is the hardware specific part of the normal XportMgrUDP
@@ -151,7 +155,7 @@ class sim(PeriphManagerBase):
 
         # Init CHDR transports
         self._xport_mgrs = {
-            'udp': SimXportMgrUDP(self.log, args, SimEthDispatcher)
+            'udp': SimXportMgrUDP(self.log, args, SimEthDispatcher, self.config.chdr.port)
         }
 
         # Init complete.
@@ -257,6 +261,7 @@ class sim(PeriphManagerBase):
         """
         self.log.debug("Setting timekeeper time (tx_idx:{}, ticks: {}, next_pps: {})"
                        .format(tk_idx, ticks, next_pps))
+        self.chdr_endpoint.timekeeper.set_ticks(ticks, next_pps)
 
     def get_timekeeper_time(self, tk_idx, last_pps):
         """
@@ -266,7 +271,7 @@ class sim(PeriphManagerBase):
         tk_idx: Index of timekeeper
         next_pps: If True, get time at last PPS. Otherwise, get time now.
         """
-        return 0
+        return self.chdr_endpoint.timekeeper.get_ticks(last_pps)
 
     def set_tick_period(self, tk_idx, period_ns):
         """
@@ -278,6 +283,8 @@ class sim(PeriphManagerBase):
         """
         self.log.debug("Setting tick period (tk_idx: {}, period_ns: {})"
                        .format(tk_idx, period_ns))
+        # period_ns is a Q32 fixed point value (see mb_controller.cpp)
+        self.chdr_endpoint.timekeeper.set_tick_rate(1e9 * (1 << 32) / period_ns)
 
     def get_clocks(self):
         """
@@ -0,0 +1,157 @@
+#
+# Copyright 2023 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+X440 clock configuration tables
+
+X440ClockPolicy caches its clock configurations. To skip the calculation
+even for the first request of a rate, the cache can be preloaded from a
+table file with the clock_config_table device arg. This module generates
+such tables, and validates them against the lookup tables in
+x4xx_clock_lookup and against the current clock policy.
+
+Example:
+    python3 -m usrp_mpm.periph_manager.x440_clock_table generate \\
+        --dsp-bw 1600 --spc 8 -o x440_clocks.json
+    python3 -m usrp_mpm.periph_manager.x440_clock_table validate x440_clocks.json
+"""
+
+import argparse
+import itertools
+import json
+import sys
+from usrp_mpm.mpmlog import get_main_logger
+from usrp_mpm.periph_manager.x4xx_clock_lookup import MCR_LMK_VCO
+from usrp_mpm.periph_manager.x4xx_clock_policy import \
+    X440ClockPolicy, config_from_dict, validate_config
+
+
+def make_policy(log, dsp_bw, spc, extra_resampling):
+    """Return an X440ClockPolicy for an FPGA image with the given DSP info."""
+    policy = X440ClockPolicy(None, None, {}, log)
+    dsp_info = {
+        "num_rx_chans": 4,
+        "num_tx_chans": 4,
+        "bw": dsp_bw,
+        "extra_resampling": extra_resampling,
+        "spc_rx": spc,
+        "spc_tx": spc,
+    }
+    policy.set_dsp_info([dsp_info, dsp_info])
+    return policy
+
+
+def generate_table(log, dsp_bw, spc, extra_resampling, ref_clock_freqs, all_pairs=False):
+    """Calculate the clock configurations for all master clock rates of
+    MCR_LMK_VCO which the FPGA image supports.
+
+    By default, both daughterboards use the same rate. If all_pairs is True,
+    all combinations of rates are calculated.
+
+    Returns a tuple (table, errors). The table is a list of table entries
+    (see X440ClockPolicy.get_config_table()), errors is a list of messages
+    for configurations which fail validation. Those are not in the table.
+    """
+    policy = make_policy(log, dsp_bw, spc, extra_resampling)
+    # Start with an empty cache, so the table only contains this FPGA image
+    X440ClockPolicy._config_cache.clear()
+    X440ClockPolicy._preloaded_configs.clear()
+    mcrs = sorted(
+        mcr for mcr in MCR_LMK_VCO
+        if policy._get_min_mcr() <= mcr <= policy._get_max_mcr()
+    )
+    mcr_pairs = itertools.product(mcrs, repeat=2) if all_pairs else ((mcr, mcr) for mcr in mcrs)
+    errors = []
+    for mcr_pair, ref_clock_freq in itertools.product(mcr_pairs, ref_clock_freqs):
+        try:
+            coerced_mcrs = policy.coerce_mcr(mcr_pair)
+            config = policy.get_config(ref_clock_freq, coerced_mcrs)
+        except (RuntimeError, ValueError, AssertionError) as ex:
+            log.debug(f"No configuration for MCRs {mcr_pair}: {ex}")
+            continue
+        config_errors = validate_config(config, coerced_mcrs, spc, extra_resampling)
+        if config_errors:
+            X440ClockPolicy._config_cache.pop(
+                policy._get_cache_key(coerced_mcrs, ref_clock_freq))
+            errors.extend(f"MCRs {coerced_mcrs}: {error}" for error in config_errors)
+    return X440ClockPolicy.get_config_table(), errors
+
+
+def validate_table(log, table):
+    """Check every entry of a table against the lookup tables, and against
+    the configuration the current clock policy calculates.
+
+    Returns a list of error messages, which is empty if the table is valid.
+    """
+    errors = []
+    policies = {}
+    for entry in table:
+        spc, extra_resampling, dsp_bw = entry["spc"], entry["extra_resampling"], entry["dsp_bw"]
+        mcrs = entry["master_clock_rates"]
+        prefix = f"MCRs {mcrs} (ref. clock {entry['ref_clock_freq']}): "
+        config = config_from_dict(entry["config"])
+        errors.extend(prefix + error
+                      for error in validate_config(config, mcrs, spc, extra_resampling))
+        policy_key = (dsp_bw, spc, extra_resampling)
+        if policy_key not in policies:
+            policies[policy_key] = make_policy(log, dsp_bw, spc, extra_resampling)
+        policy = policies[policy_key]
+        policy.conv_rates = entry["conv_rates"]
+        try:
+            expected = policy._calculate_config(entry["ref_clock_freq"], mcrs)
+        except (RuntimeError, ValueError, AssertionError) as ex:
+            errors.append(prefix + f"Clock policy can't generate this configuration: {ex}")
+            continue
+        if config != expected:
+            errors.append(prefix + "Configuration differs from the clock policy")
+    return errors
+
+
+def parse_args():
+    """Return the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description="Generate or validate X440 clock tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    generate = subparsers.add_parser("generate", help="Generate a clock table")
+    generate.add_argument("-o", "--output", required=True, help="Table file to write")
+    generate.add_argument("--dsp-bw", type=int, default=1600,
+                          help="DSP bandwidth of the FPGA image in MHz")
+    generate.add_argument("--spc", type=int, default=8,
+                          help="Samples per clock cycle of the FPGA image")
+    generate.add_argument("--extra-resampling", type=int, default=1,
+                          help="Extra resampling factor of the FPGA image")
+    generate.add_argument("--ref-clock-freq", type=float, action="append",
+                          help="Reference clock frequency (can be given multiple times, "
+                               "defaults to 10 MHz)")
+    generate.add_argument("--all-pairs", action="store_true",
+                          help="Include all combinations of master clock rates, not "
+                               "only the same rate on both daughterboards")
+    validate = subparsers.add_parser("validate", help="Validate a clock table")
+    validate.add_argument("table", help="Table file to validate")
+    return parser.parse_args()
+
+
+def main():
+    """Generate or validate a clock table. Returns True on success."""
+    args = parse_args()
+    log = get_main_logger().getChild("clock_table")
+    if args.command == "generate":
+        table, errors = generate_table(
+            log, args.dsp_bw, args.spc, args.extra_resampling,
+            args.ref_clock_freq or [10e6], args.all_pairs)
+        with open(args.output, "w") as table_file:
+            json.dump(table, table_file, indent=1)
+        log.info(f"Wrote {len(table)} configurations to {args.output}")
+    else:
+        with open(args.table, "r") as table_file:
+            table = json.load(table_file)
+        errors = validate_table(log, table)
+        log.info(f"Validated {len(table)} configurations")
+    for error in errors:
+        log.error(error)
+    return not errors
+
+
+if __name__ == "__main__":
+    sys.exit(not main())
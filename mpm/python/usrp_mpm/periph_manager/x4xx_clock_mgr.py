@@ -45,6 +45,7 @@ from usrp_mpm.mpmutils import parse_multi_device_arg, str2bool
 from usrp_mpm.periph_manager.x4xx_clk_aux import ClockingAuxBrdControl
 from usrp_mpm.periph_manager.x4xx_clock_types import RpllRefSel, BrcSource
 from usrp_mpm.periph_manager.x4xx_clock_ctrl import X4xxClockCtrl
+from usrp_mpm.periph_manager.x4xx_clock_policy import get_clock_transition
 from usrp_mpm.rpc_utils import no_rpc
 
 class X4xxClockManager:
@@ -130,6 +131,14 @@ class X4xxClockManager:
         # Tasks to be executed by the host if queried
         self.tasks = {}
         self.skip_adc_selfcal = False
+        # If True, set_master_clock_rate() only reconfigures the clocks which
+        # actually change (see get_clock_transition()). Off by default.
+        self.partial_clock_reconfig = False
+        # The clock configuration which was applied last, and whether the
+        # clocks are still running with it (any reset of the clock chain
+        # invalidates it).
+        self._clk_settings = None
+        self._clk_settings_applied = False
 
         if self._clocking_auxbrd:
             self._safe_sync_source = {
@@ -340,6 +349,9 @@ class X4xxClockManager:
         # This flag is used to skip the self-cal that otherwise is marked as required
         # after each clocking change
         self.skip_adc_selfcal = args.get('skip_adc_selfcal', False)
+        # This flag enables skipping the reconfiguration of clocks which are not
+        # affected by a change of the master clock rate
+        self.partial_clock_reconfig = str2bool(args.get('partial_clock_reconfig', False))
         # This flag will be used to force a full run of the clocking initialization.
         # If False, MPM may still decide to do a full clocking initialization,
         # depending on other settings.
@@ -587,6 +599,8 @@ class X4xxClockManager:
         """
         if value:
             self.log.trace(f"Reset clocks: {reset_list}")
+            if any(clk in reset_list for clk in ('rfdc', 'mmcm', 'spll', 'rpll')):
+                self._clk_settings_applied = False
             if 'db_clock' in reset_list:
                 self._set_reset_db_clocks(value)
             if 'cpld' in reset_list:
@@ -618,31 +632,38 @@ class X4xxClockManager:
             if 'db_clock' in reset_list:
                 self._set_reset_db_clocks(value)
 
-    def _configure_clock_chain(self, clk_settings, time_source, ref_clk_freq):
+    def _configure_clock_chain(self, clk_settings, time_source, ref_clk_freq,
+                               config_spll=True):
         """
         Configures clocking chain (RPLL -> SPLL -> MMCM) with given clock
         settings. This function does not reset the RFDC, so that its
         startup can be controlled independently.
 
         This configuration takes 1-3 seconds, depending on the configuration
-        and the previous state of the clocks.
+        and the previous state of the clocks. Most of that time is spent on
+        the SPLL, so if the SPLL is already running with the SPLL settings of
+        clk_settings, set config_spll to False to only configure the MMCM.
 
         Arguments:
         clk_settings -- A clock settings object to be applied.
         time_source -- The current time source
+        config_spll -- If False, the SPLL is not touched.
         """
         # Reset everything downstream from SPLL
         self._reset_clocks(True, ('mmcm', 'rfdc', 'cpld', 'db_clock'))
-        # The following call will return only when the SPLL successfully locks
-        # to the new settings:
-        self.clk_ctrl.config_spll(clk_settings.spll_config)
-        # When the SPLL is configured and locked, its output dividers are
-        # synchronized (share a common flank). Next, we need to synchronize the
-        # R-dividers to the common PPS signals. Because we need to wait for the
-        # PPS, this function may take > 1s to execute, worst-case.
-        self.clk_ctrl.sync_spll_clocks(
-            "internal_pps" if time_source == self.TIME_SOURCE_INTERNAL else "external_pps",
-            ref_clk_freq)
+        if config_spll:
+            # The following call will return only when the SPLL successfully
+            # locks to the new settings:
+            self.clk_ctrl.config_spll(clk_settings.spll_config)
+            # When the SPLL is configured and locked, its output dividers are
+            # synchronized (share a common flank). Next, we need to synchronize
+            # the R-dividers to the common PPS signals. Because we need to wait
+            # for the PPS, this function may take > 1s to execute, worst-case.
+            self.clk_ctrl.sync_spll_clocks(
+                "internal_pps" if time_source == self.TIME_SOURCE_INTERNAL else "external_pps",
+                ref_clk_freq)
+        else:
+            self.log.debug("SPLL settings are unchanged, skipping SPLL configuration.")
         # At this point the SPLL is sync'd in time and frequency to the reference.
         # From now on, no-one will be touching the SPLL until we call
         # set_master_clock_rate() again.
@@ -658,21 +679,12 @@ class X4xxClockManager:
     # Public APIS, but not MPM APIs (these can be called by x4xx or the
     # DB iface)
     ###########################################################################
-    @no_rpc
-    def set_master_clock_rate(self, master_clock_rates):
+    def _get_clk_settings(self, master_clock_rates):
         """
-        Sets the master clock rate by configuring the RFDC decimation and SPLL,
-        and then resetting downstream clocks.
+        Validate the given master clock rates, and return them together with
+        the clock configuration which is required for them.
 
-        Arguments:
-        master_clock_rates -- An array either of length 1 (then this rate will be
-                             applied to all daughterboards) or of length equal
-                             to the number of daughterboards, if the current
-                             design supports separate clock rates per dboard.
-                             If the design only supports a single rate, then it
-                             must be of length 1.
-                             A scalar value will be interpreted as a list of
-                             length 1.
+        See set_master_clock_rate() for the arguments.
         """
         master_clock_rates = master_clock_rates \
                 if isinstance(master_clock_rates, (list, tuple)) \
@@ -692,6 +704,44 @@ class X4xxClockManager:
         master_clock_rates = self.clk_policy.coerce_mcr(master_clock_rates)
         clk_settings = self.clk_policy.get_config(
             self.get_ref_clock_freq(), master_clock_rates)
+        return master_clock_rates, clk_settings
+
+    def _get_clock_transition(self, clk_settings):
+        """
+        Return the clocks which set_master_clock_rate() reconfigures to apply
+        clk_settings (see get_clock_transition()). Unless partial_clock_reconfig
+        is set, or if the current state of the clocks is unknown, that's all
+        of them.
+        """
+        old_clk_settings = self._clk_settings \
+            if self.partial_clock_reconfig and self._clk_settings_applied \
+            else None
+        return get_clock_transition(old_clk_settings, clk_settings)
+
+    @no_rpc
+    def set_master_clock_rate(self, master_clock_rates):
+        """
+        Sets the master clock rate by configuring the RFDC decimation and SPLL,
+        and then resetting downstream clocks.
+
+        If partial_clock_reconfig is set, only the clocks whose settings differ
+        from the currently applied clock configuration are reconfigured (see
+        get_clock_transition()): If the SPLL settings are unchanged, the SPLL
+        is not reprogrammed and resynchronized, but the MMCM and the RFDC are
+        always reset and reconfigured together. If the clock configuration is
+        identical, nothing is touched.
+
+        Arguments:
+        master_clock_rates -- An array either of length 1 (then this rate will be
+                             applied to all daughterboards) or of length equal
+                             to the number of daughterboards, if the current
+                             design supports separate clock rates per dboard.
+                             If the design only supports a single rate, then it
+                             must be of length 1.
+                             A scalar value will be interpreted as a list of
+                             length 1.
+        """
+        master_clock_rates, clk_settings = self._get_clk_settings(master_clock_rates)
         self.log.debug(f"Clock Config: {clk_settings}")
         self.log.info(f"Using Clock Configuration:\n"
             f"DB0: Master Clock Rate: {master_clock_rates[0]/1e6} MSps "
@@ -701,8 +751,17 @@ class X4xxClockManager:
         if clk_settings.rfdc_configs[1].conv_rate > clk_settings.rfdc_configs[0].conv_rate:
             self.log.warn('Converter Rate 1 is larger than Converter Rate 0. This will impact '
             ' RF performance. Consider swapping your master clock rate values.')
+        transition = self._get_clock_transition(clk_settings)
+        if not transition:
+            self.log.debug("Clock configuration is unchanged, skipping reconfiguration.")
+            self._master_clock_rates = master_clock_rates
+            return
+        self.log.debug(f"Reconfiguring clocks: {', '.join(transition)}")
+        # We always reset and configure the MMCM and the RFDC together (as
+        # without partial_clock_reconfig), only the SPLL may be skipped.
         self._configure_clock_chain(
-            clk_settings, self.get_time_source(), self.get_ref_clock_freq())
+            clk_settings, self.get_time_source(), self.get_ref_clock_freq(),
+            config_spll='spll' in transition)
         # Bring RFDC out of reset, reset tiles and reconfigure RFDC
         self._reset_clocks(False, ('rfdc',))
         self.rfdc.reset_tiles()
@@ -723,6 +782,8 @@ class X4xxClockManager:
         # them so they only come back now.
         self._reset_clocks(False, ('cpld', 'db_clock'))
         self._master_clock_rates = master_clock_rates
+        self._clk_settings = clk_settings
+        self._clk_settings_applied = True
         # Configure PPS forwarding to timekeepers. The requirement is that this
         # be called after sync_spll_clocks() was called.
         for tk_idx, mcr in enumerate(master_clock_rates):
@@ -925,12 +986,29 @@ class X4xxClockManager:
         if clock_source in (self.CLOCK_SOURCE_EXTERNAL, self.CLOCK_SOURCE_MBOARD) \
                 and self._clocking_auxbrd:
             self._clocking_auxbrd.export_clock(enable=False)
-        # Now configure the sync sources:
-        force_update = str2bool(args.get('force_reinit', False)) or mcr_change
-        ret_val = self._set_sync_source(clock_source, time_source, force_update)
+        # Now configure the sync sources. With partial_clock_reconfig, a change
+        # of the MCR alone does not reset the clocks, set_master_clock_rate()
+        # will only reconfigure the clocks which are affected.
+        force_reinit = str2bool(args.get('force_reinit', False))
+        force_update = force_reinit or mcr_change
+        ret_val = self._set_sync_source(
+            clock_source, time_source,
+            force_reinit if self.partial_clock_reconfig else force_update)
         if ret_val == self.SetSyncRetVal.NOP and not force_update:
             self.log.debug("Skipping reconfiguration of clocks.")
             return
+        # This is what set_master_clock_rate() will reconfigure. Note that
+        # unless the sync source is unchanged and partial_clock_reconfig is
+        # set, the clocks were reset and this is all of them.
+        transition = self._get_clock_transition(
+            self._get_clk_settings(master_clock_rates)[1])
+        if not transition:
+            # The new MCR maps onto the clock configuration which is already
+            # applied, so the clocks are not touched at all. Because of that,
+            # the reboot check below does not apply either.
+            self.log.debug("Clock configuration is unchanged, skipping reconfiguration.")
+            self.set_master_clock_rate(master_clock_rates)
+            return
         try:
             # An intermittent spur has been seen on multiple reconfigurations of clocking for x440.
             # If we have already reconfigured clocking after initializtion, the next clocking
@@ -963,18 +1041,21 @@ class X4xxClockManager:
             # Re-set master clock rate. If this doesn't work, it will time out
             # and throw an exception. We need to put the device back into a safe
             # state in that case.
-            interm_clk_settings = self.clk_policy.get_intermediate_clk_settings(
-                    self.get_ref_clock_freq(),
-                    self._master_clock_rates,
-                    master_clock_rates)
-            if interm_clk_settings:
-                self.log.debug( "Applying intermediate clock settings.")
-                self._configure_clock_chain(interm_clk_settings,
-                                            self.get_time_source(),
-                                            self.get_ref_clock_freq())
-                # Note that set_master_clock_rate() will also configure the
-                # clock chain, so if we had an intermediate settting, it will
-                # be overwritten immediately.
+            # The intermediate clock settings are only needed for the SPLL, so
+            # they are skipped if the SPLL keeps its settings.
+            if 'spll' in transition:
+                interm_clk_settings = self.clk_policy.get_intermediate_clk_settings(
+                        self.get_ref_clock_freq(),
+                        self._master_clock_rates,
+                        master_clock_rates)
+                if interm_clk_settings:
+                    self.log.debug( "Applying intermediate clock settings.")
+                    self._configure_clock_chain(interm_clk_settings,
+                                                self.get_time_source(),
+                                                self.get_ref_clock_freq())
+                    # Note that set_master_clock_rate() will also configure the
+                    # clock chain, so if we had an intermediate settting, it will
+                    # be overwritten immediately.
             self.set_master_clock_rate(master_clock_rates)
             # Restore the nco frequency to the same values as before the sync source
             # was changed, to ensure the device transmission/acquisition continues at
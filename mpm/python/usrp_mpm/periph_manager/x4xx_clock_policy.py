@@ -8,9 +8,11 @@
 These clocking policies are sets of rules for configuring the various clocks on
 X4xx motherboards.
 """
+import copy
+import json
 import math
 from collections import OrderedDict
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 
 from usrp_mpm.chips import LMK04832
 from usrp_mpm.dboard_manager import FBX, ZBX
@@ -98,6 +100,137 @@ def lcm(x, y):
     return int(x * y / math.gcd(x, y))
 
 
+def config_to_dict(config):
+    """Convert an X4xxClockConfig into a dictionary of plain types.
+
+    The result can be stored as JSON, and be turned back into a config with
+    config_from_dict().
+    """
+    config_dict = asdict(config)
+    config_dict["spll_config"]["vcxo_freq"] = config.spll_config.vcxo_freq.name
+    return config_dict
+
+
+def config_from_dict(config_dict):
+    """Create an X4xxClockConfig from a dictionary returned by config_to_dict()."""
+    config_dict = copy.deepcopy(config_dict)
+    spll_config = config_dict.pop("spll_config")
+    spll_config["vcxo_freq"] = Spll1Vco[spll_config["vcxo_freq"]]
+    return X4xxClockConfig(
+        spll_config=SpllConfig(**spll_config),
+        rfdc_configs=[RfdcConfig(**rfdc_config) for rfdc_config in config_dict.pop("rfdc_configs")],
+        **config_dict,
+    )
+
+
+def validate_config(config, mcrs, spc, extra_resampling):
+    """Check an X440 clock configuration against the clock lookup tables and
+    the hardware limits which X440ClockPolicy applies when calculating it.
+
+    Returns a list of error messages, which is empty if config is valid.
+    """
+    errors = []
+    spll = config.spll_config
+    lmk_vco = spll.output_freq * spll.output_divider
+    vcxo_freq = 100e6 if spll.vcxo_freq == Spll1Vco.VCO100MHz else 122.88e6
+    if spll.pll2_prescaler not in LMK04832.PLL2_PRESCALER:
+        errors.append(f"Invalid PLL2 prescaler {spll.pll2_prescaler}")
+    if lmk_vco != vcxo_freq * spll.pll2_prescaler * spll.pll2_n_div:
+        errors.append(f"LMK VCO rate {lmk_vco} does not match the PLL2 dividers")
+    if spll.prc_divider not in LMK04832X4xx.PRC_OUT_DIVIDERS:
+        errors.append(f"Invalid PRC divider {spll.prc_divider}")
+    sysref_freq = lmk_vco / spll.sysref_div
+    sysref_config = next(
+        (
+            sysref_setting
+            for sysref_setting in LMK04832X4xx.SYSREF_CONFIG[vcxo_freq]
+            if sysref_setting["SYSREF_FREQ"] == sysref_freq
+        ),
+        None,
+    )
+    if sysref_config is None:
+        errors.append(f"Invalid SYSREF frequency {sysref_freq}")
+    else:
+        pdf = sysref_config["PDF"]
+        if spll.clkin0_r_div != int(spll.ref_freq / pdf):
+            errors.append(f"Invalid PLL1 R divider {spll.clkin0_r_div}")
+        if spll.pll1_n_div != int(sysref_freq / pdf):
+            errors.append(f"Invalid PLL1 N divider {spll.pll1_n_div}")
+    # See pg269, Ch. 4, Section "SYSREF Signal Requirements"
+    if sysref_freq >= 10e6:
+        errors.append(f"SYSREF frequency {sysref_freq} exceeds limit of 10 MHz")
+    for idx, (mcr, rfdc_config) in enumerate(zip(mcrs, config.rfdc_configs)):
+        if lmk_vco not in MCR_LMK_VCO.get(mcr, ()):
+            errors.append(f"DB{idx}: LMK VCO rate {lmk_vco} is not listed for MCR {mcr}")
+        if rfdc_config.resampling not in X4xxRfdcCtrl.RFDC_RESAMPLER:
+            errors.append(f"DB{idx}: Invalid RFDC resampling {rfdc_config.resampling}")
+        if rfdc_config.conv_rate != mcr * rfdc_config.resampling:
+            errors.append(
+                f"DB{idx}: Converter rate {rfdc_config.conv_rate} does not match MCR {mcr}"
+            )
+        if rfdc_config.conv_rate % sysref_freq != 0.0:
+            errors.append(
+                f"DB{idx}: Converter rate {rfdc_config.conv_rate} is not a multiple "
+                f"of the SYSREF frequency {sysref_freq}"
+            )
+        # Either the RFDC PLL is bypassed, or it must support the SPLL output
+        if (
+            spll.output_freq != rfdc_config.conv_rate
+            and spll.output_freq not in RFDC_PLL_CONFIGS.get(rfdc_config.conv_rate, ())
+        ):
+            errors.append(
+                f"DB{idx}: RFDC PLL can't generate {rfdc_config.conv_rate} "
+                f"from {spll.output_freq}"
+            )
+    prc_rate = lmk_vco / spll.prc_divider
+    if not X4xxRfdcCtrl.MMCM_INPUT_MIN <= prc_rate <= X4xxRfdcCtrl.MMCM_INPUT_MAX:
+        errors.append(f"MMCM input rate {prc_rate} out of range")
+    if not X4xxRfdcCtrl.MMCM_FB_MIN <= config.mmcm_feedback_divider <= X4xxRfdcCtrl.MMCM_FB_MAX:
+        errors.append(f"Invalid MMCM feedback divider {config.mmcm_feedback_divider}")
+    mmcm_vco_rate = prc_rate * config.mmcm_feedback_divider
+    if not X4xxRfdcCtrl.MMCM_VCO_MIN <= mmcm_vco_rate <= X4xxRfdcCtrl.MMCM_VCO_MAX:
+        errors.append(f"MMCM VCO rate {mmcm_vco_rate} out of range")
+    for name, divider in config.mmcm_output_div_map.items():
+        if not X4xxRfdcCtrl.MMCM_OD_MIN <= divider <= X4xxRfdcCtrl.MMCM_OD_MAX:
+            errors.append(f"Invalid MMCM output divider {divider} for {name}")
+    for idx, mcr in enumerate(mcrs):
+        radio_clk_div = config.mmcm_output_div_map[f"r{idx}_clk"]
+        if mmcm_vco_rate / radio_clk_div != mcr / (spc * extra_resampling):
+            errors.append(f"DB{idx}: Radio clock does not match MCR {mcr}")
+    return errors
+
+
+# The components which are configured from an X4xxClockConfig, ordered from
+# upstream to downstream
+CLOCK_COMPONENTS = ("spll", "mmcm", "rfdc")
+
+
+def get_clock_transition(old_config, new_config):
+    """Return the clock components which need to be reconfigured to go from
+    the clock configuration old_config to new_config.
+
+    The components are returned as a tuple, ordered like CLOCK_COMPONENTS.
+    Reconfiguring a component also requires reconfiguring everything
+    downstream of it: The SPLL (which also generates SYSREF) provides the
+    reference for the MMCM and the RFDC PLLs, and the MMCM provides the RFDC
+    fabric clocks. If old_config is None (i.e., the state of the clocks is
+    unknown), all components are returned.
+    """
+    if old_config is None or old_config.spll_config != new_config.spll_config:
+        return CLOCK_COMPONENTS
+    mmcm_fields = (
+        "mmcm_use_defaults",
+        "mmcm_input_divider",
+        "mmcm_feedback_divider",
+        "mmcm_output_div_map",
+    )
+    if any(getattr(old_config, name) != getattr(new_config, name) for name in mmcm_fields):
+        return ("mmcm", "rfdc")
+    if old_config.rfdc_configs != new_config.rfdc_configs:
+        return ("rfdc",)
+    return ()
+
+
 # pylint: enable=too-many-instance-attributes
 
 
@@ -388,6 +521,18 @@ class X440ClockPolicy(X4xxClockPolicy):
         1600: 368.64e6,
     }
 
+    # Results of coerce_mcr() and get_config(), shared by all instances. The
+    # keys contain the requested rates and all policy state which the
+    # results depend on (see _get_cache_key()).
+    _coerce_cache = {}
+    _config_cache = {}
+    # get_config() results preloaded from a table file (see
+    # load_config_table()), with the same keys as _config_cache
+    _preloaded_configs = {}
+    # The caches of calculated results are cleared when they grow beyond this
+    # size. Preloaded configurations are kept.
+    MAX_CACHE_ENTRIES = 4096
+
     def __init__(self, mboard_info, dboard_infos, args, log):
         """Initialize the X440 clock policy."""
         self.log = log.getChild("Clk_Policy")
@@ -406,6 +551,9 @@ class X440ClockPolicy(X4xxClockPolicy):
             for vcxo in LMK04832X4xx.SYSREF_CONFIG.keys()
             for sysref_setting in LMK04832X4xx.SYSREF_CONFIG[vcxo]
         )
+        if self.args.get("clock_config_table"):
+            for error in self.load_config_table(self.args["clock_config_table"]):
+                self.log.warning(f"Ignoring clock configuration table entry: {error}")
 
     def set_dsp_info(self, dsp_info):
         """Store the DSP info of the current FPGA image."""
@@ -670,9 +818,15 @@ class X440ClockPolicy(X4xxClockPolicy):
         the new master clock rates would fail otherwise.
         """
         # TODO we can be smarter here -- not all transitions require this.
-        if tuple(old_mcrs) != tuple(new_mcrs):
+        if tuple(old_mcrs) == tuple(new_mcrs):
+            return None
+        # Calculating the intermediate configuration must not change the
+        # converter rates for the new MCRs
+        conv_rates = self.conv_rates
+        try:
             return self.get_config(ref_clk_freq, [250e6, 250e6])
-        return None
+        finally:
+            self.conv_rates = conv_rates
 
     def coerce_mcr(self, master_clock_rates):
         """Validate that the requested master clock rate is valid.
@@ -695,6 +849,36 @@ class X440ClockPolicy(X4xxClockPolicy):
                     f"with bandwidth {self._dsp_bw} MHz!"
                 )
 
+        key = self._get_cache_key(master_clock_rates)
+        coerced = self._coerce_cache.get(key)
+        if coerced is None:
+            coerced = self._coerce_rates(master_clock_rates)
+            self._add_to_cache(self._coerce_cache, key, coerced)
+        mcrs, conv_rates = (list(rates) for rates in coerced)
+
+        if mcrs != master_clock_rates:
+            self.log.warning(
+                f"Unable to use desired master clock rate(s), using "
+                f"{mcrs[0]/1e6} MHz for DB0 and {mcrs[1]/1e6} MHz for DB1."
+            )
+        if self.conv_rates is not None and self.conv_rates != conv_rates:
+            self.log.warning(
+                f"Unable to use desired converter rate(s), using "
+                f"{conv_rates[0]/1e6} MSps for DB0 "
+                f"and {conv_rates[1]/1e6} MSps for DB1. Converter rate needs "
+                f"to be a {X4xxRfdcCtrl.RFDC_RESAMPLER} multiple of the master "
+                f"clock rates {mcrs[0]/1e6} MHz and {mcrs[1]/1e6} MHz "
+                f"but additional clock constraints may limit this."
+            )
+        self.conv_rates = conv_rates
+        return mcrs
+
+    def _coerce_rates(self, master_clock_rates):
+        """Find the master clock rates and converter rates closest to the
+        requested ones, which can be generated at the same time.
+
+        Returns a tuple (mcrs, conv_rates) of tuples.
+        """
         # Check if we can generate these MCRs with the RFDC at all
         mcrs = []
         conv_rates = []
@@ -719,23 +903,92 @@ class X440ClockPolicy(X4xxClockPolicy):
             mcrs[1] = mcrs[0]
             # Ensure we're falling back to converter rate 0, too
             conv_rates[1] = conv_rates[0]
+        return tuple(mcrs), tuple(conv_rates)
 
-        if mcrs != master_clock_rates:
-            self.log.warning(
-                f"Unable to use desired master clock rate(s), using "
-                f"{mcrs[0]/1e6} MHz for DB0 and {mcrs[1]/1e6} MHz for DB1."
+    def _get_cache_key(self, master_clock_rates, ref_clock_freq=None):
+        """Return the key of the coerce_mcr() or get_config() results for
+        the given arguments and the current state of this policy.
+        """
+        return (
+            ref_clock_freq,
+            tuple(master_clock_rates),
+            None if self.conv_rates is None else tuple(self.conv_rates),
+            self._spc,
+            self._extra_resampling,
+            self._dsp_bw,
+        )
+
+    def _add_to_cache(self, cache, key, value):
+        """Store value in one of the result caches."""
+        if len(cache) >= self.MAX_CACHE_ENTRIES:
+            cache.clear()
+        cache[key] = value
+
+    @classmethod
+    def get_config_table(cls):
+        """Returns all cached and preloaded get_config() results as a list of
+        table entries.
+
+        The entries can be stored as JSON and loaded with load_config_table().
+        """
+        return [
+            {
+                "ref_clock_freq": ref_clock_freq,
+                "master_clock_rates": list(master_clock_rates),
+                "conv_rates": None if conv_rates is None else list(conv_rates),
+                "spc": spc,
+                "extra_resampling": extra_resampling,
+                "dsp_bw": dsp_bw,
+                "config": config_to_dict(config),
+            }
+            for (
+                ref_clock_freq,
+                master_clock_rates,
+                conv_rates,
+                spc,
+                extra_resampling,
+                dsp_bw,
+            ), config in {**cls._preloaded_configs, **cls._config_cache}.items()
+        ]
+
+    @classmethod
+    def load_config_table(cls, path):
+        """Preload get_config() results from a JSON table file.
+
+        The table is a list of entries as returned by get_config_table(). See
+        x440_clock_table.py on how to generate such a table. Every entry is
+        checked with validate_config(), invalid entries are skipped.
+
+        Returns a list of error messages for the skipped entries.
+        """
+        with open(path, "r") as table_file:
+            table = json.load(table_file)
+        errors = []
+        for entry in table:
+            key = (
+                entry["ref_clock_freq"],
+                tuple(entry["master_clock_rates"]),
+                None if entry["conv_rates"] is None else tuple(entry["conv_rates"]),
+                entry["spc"],
+                entry["extra_resampling"],
+                entry["dsp_bw"],
             )
-        if self.conv_rates is not None and self.conv_rates != conv_rates:
-            self.log.warning(
-                f"Unable to use desired converter rate(s), using "
-                f"{conv_rates[0]/1e6} MSps for DB0 "
-                f"and {conv_rates[1]/1e6} MSps for DB1. Converter rate needs "
-                f"to be a {X4xxRfdcCtrl.RFDC_RESAMPLER} multiple of the master "
-                f"clock rates {mcrs[0]/1e6} MHz and {mcrs[1]/1e6} MHz "
-                f"but additional clock constraints may limit this."
+            prefix = f"MCRs {entry['master_clock_rates']} (ref. clock {entry['ref_clock_freq']}): "
+            try:
+                config = config_from_dict(entry["config"])
+            except (KeyError, TypeError) as ex:
+                errors.append(prefix + f"Invalid configuration: {ex}")
+                continue
+            config_errors = validate_config(
+                config, entry["master_clock_rates"], entry["spc"], entry["extra_resampling"]
             )
-        self.conv_rates = conv_rates
-        return mcrs
+            if config.spll_config.ref_freq != entry["ref_clock_freq"]:
+                config_errors.append("SPLL reference frequency does not match")
+            if config_errors:
+                errors.extend(prefix + error for error in config_errors)
+                continue
+            cls._preloaded_configs[key] = config
+        return errors
 
     def get_config(self, ref_clock_freq, master_clock_rates):
         """Returns a valid configuration based on the master clock rate.
@@ -743,10 +996,29 @@ class X440ClockPolicy(X4xxClockPolicy):
         It uses the configuration where the RFDC_CLOCK/SPC is the closest to the MCR
         This method is called after coerce_mcr() has run and - if necessary -
         rounded the MCR values, so will skip the checks here to save some time.
+
+        Configurations are cached, so repeated requests for the same rates
+        only cost a lookup.
         """
         if len(master_clock_rates) != self.get_num_rates():
             master_clock_rates = [master_clock_rates[0]] * self.get_num_rates()
+        key = self._get_cache_key(master_clock_rates, ref_clock_freq)
+        config = self._preloaded_configs.get(key) or self._config_cache.get(key)
+        if config is None:
+            config = self._calculate_config(ref_clock_freq, master_clock_rates)
+            self._add_to_cache(self._config_cache, key, config)
+        # When bypassing the RFDC PLL, the SPLL directly generates the
+        # converter rate
+        if config.spll_config.output_freq == config.rfdc_configs[0].conv_rate:
+            self.log.info("Bypassing RFDC PLL")
+        else:
+            self.log.info("Using RFDC PLL")
+        self.conv_rates = [rfdc_config.conv_rate for rfdc_config in config.rfdc_configs]
+        # The cached config must not be modified by the caller
+        return copy.deepcopy(config)
 
+    def _calculate_config(self, ref_clock_freq, master_clock_rates):
+        """Calculates the configuration for get_config()."""
         # Get us the rounded mcr with fitting converter rates
         mcrs = []
         conv_rates = []
@@ -762,20 +1034,17 @@ class X440ClockPolicy(X4xxClockPolicy):
         # Only bypass if this exact converter rate is desired
         if bypass and bypass_conv_rate in conv_rates:
             output_freq = lmk_vco / lmk_od
-            self.log.info("Bypassing RFDC PLL")
             conv_rate = lmk_vco / lmk_od
             conv_rates = [conv_rate, conv_rate]
         else:
             # Get the common LMK output freq for both MCRs
             common_out = self._get_common_spll_out_freqs(conv_rates, mcrs)
             assert len(common_out) > 0
-            self.log.info("Using RFDC PLL")
             # Use the maximum value
             output_freq = max(common_out)
             # Find out how to configure the LMK for this output freq:
             lmk_vco = self._get_common_lmk_vco_rates(mcrs)[0]
             lmk_od = int(lmk_vco / output_freq)
-        self.conv_rates = conv_rates
         spll1_vco = 100e6 if lmk_vco % 100e6 == 0 else 122.88e6
         pll2_n = lmk_vco / spll1_vco
         pll2_prescaler = [x for x in LMK04832.PLL2_PRESCALER if not pll2_n % x]
@@ -459,6 +459,10 @@ class CtrlportRegs:
         def poke32(self, addr, val):
             self.regs.poke32(addr + self.offset, val)
 
+        def poke32_batch(self, pokes, verify=False):
+            self.regs.poke32_batch(
+                [(addr + self.offset, val) for addr, val in pokes], verify)
+
     def __init__(self, label, log):
         self.log = log.getChild("CtrlportRegs")
         self._regs_uio_opened = False
@@ -508,6 +512,14 @@ class CtrlportRegs:
             with self.regs:
                 return self.regs.poke32(addr, val)
 
+    def poke32_batch(self, pokes, verify=False):
+        """
+        Write a list of (addr, val) pairs in one go. See UIO.poke32_batch().
+        """
+        if self.regs is None:
+            raise RuntimeError('The ctrlport registers were never configured!')
+        self.regs.poke32_batch(pokes, verify)
+
     def set_mb_pl_cpld_divider(self, divider_value):
         if not self.min_mb_cpld_spi_divider <= divider_value <= 0xFFFF:
             self.log.error('Cannot set MB CPLD SPI divider to invalid value {}'
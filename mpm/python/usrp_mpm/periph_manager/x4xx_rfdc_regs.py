@@ -593,8 +593,7 @@ class RfdcRegsControl:
         """
         Write all registers that have a changed state.
         """
-        for addr in self._regs.get_changed_addrs():
-            self._poke(addr, self._regs.get_reg(addr))
+        self.regs.poke32_batch(self._regs.get_dirty_writes())
         self._regs.save_state()
 
     def _update_reg(self, reg_name):
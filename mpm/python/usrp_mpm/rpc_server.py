@@ -10,6 +10,7 @@ Implemented RPC Servers
 from __future__ import print_function
 import traceback
 import copy
+import functools
 from random import choice
 from string import ascii_letters, digits
 from multiprocessing import Process
@@ -21,6 +22,7 @@ from gevent.pool import Pool
 from gevent import signal
 from gevent import spawn_later
 from gevent import Greenlet
+from gevent.threadpool import ThreadPool
 from gevent import monkey
 monkey.patch_all()
 from contextlib import contextmanager
@@ -30,6 +32,8 @@ from usrp_mpm.mpmutils import to_binary_str
 from usrp_mpm.sys_utils import watchdog
 from usrp_mpm.sys_utils import net
 from usrp_mpm.rpc_utils import get_map_for_rpc
+from usrp_mpm.rpc_utils import RPCStats
+from usrp_mpm.rpc_utils import get_rpc_executor
 
 
 TIMEOUT_INTERVAL = 5.0 # Seconds before claim expires (default value)
@@ -37,11 +41,30 @@ LOCK_ACQ_TIMEOUT = 1 # Seconds to wait for acquiring shared lock (default value)
 TOKEN_LEN = 16 # Length of the token string
 # Compatibility number for MPM
 MPM_COMPAT_NUM = (5, 3)
+# Number of worker threads for read-only methods (default value). With zero
+# workers, all methods run on the gevent hub.
+RPC_WORKER_THREADS = 0
+
+def _instrumented(method):
+    """
+    Decorator for the built-in RPC methods of MPMServer: Records call
+    statistics, like for all registered periph_manager methods.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        return self._rpc_stats.call(
+            method.__name__, functools.partial(method, self), args)
+    return wrapper
 
 class MPMServer(RPCServer):
     """
     Main MPM RPC class which holds the periph_manager object and translates
     RPC calls to appropiate calls in the periph_manager and dboard_managers.
+
+    All calls are instrumented, see get_rpc_stats(). If the rpc_worker_threads
+    argument is non-zero, methods decorated with @read_only run on a pool of
+    worker threads instead of the gevent hub, so that slow reads (e.g., of the
+    device tree overlay listings) do not stall other clients.
     """
     # This is a list of methods in this class which require a claim
     default_claimed_methods = ['init', 'update_component', 'reclaim', 'unclaim',
@@ -65,6 +88,12 @@ class MPMServer(RPCServer):
             TIMEOUT_INTERVAL
         ))
         self.session_id = None
+        self._rpc_stats = RPCStats()
+        num_workers = int(default_args.get(
+            "rpc_worker_threads",
+            RPC_WORKER_THREADS
+        ))
+        self._worker_pool = ThreadPool(num_workers) if num_workers > 0 else None
         # Create the periph_manager for this device
         # This call will be forwarded to the device specific implementation
         # e.g. in periph_manager/n3xx.py
@@ -86,6 +115,7 @@ class MPMServer(RPCServer):
                 to_binary_str(device_info.get("name", "n/a"))
         self._state.dev_fpga_type.value = \
                 to_binary_str(device_info.get("fpga", "n/a"))
+        self._state.touch()
         self._db_methods = []
         self._mb_methods = []
         self.claimed_methods = copy.copy(self.default_claimed_methods)
@@ -180,7 +210,7 @@ class MPMServer(RPCServer):
                 # Because we can only reach this point with a valid claim,
                 # there's no harm in resetting the timer
                 self._reset_timer()
-                return function(*args)
+                return self._call_rpc(command, function, args)
             except Exception as ex:
                 self.log.error(
                     "Uncaught exception in method %s: %s \n %s ",
@@ -205,7 +235,7 @@ class MPMServer(RPCServer):
         def new_unclaimed_function(*args):
             " Define a function that does not require a claim token check "
             try:
-                return function(*args)
+                return self._call_rpc(command, function, args)
             except Exception as ex:
                 self.log.error(
                     "Uncaught exception in method %s :%s\n %s ",
@@ -216,6 +246,16 @@ class MPMServer(RPCServer):
         new_unclaimed_function.__doc__ = function.__doc__
         setattr(self, command, new_unclaimed_function)
 
+    def _call_rpc(self, command, function, args):
+        """
+        Call a registered method and record its statistics. Read-only methods
+        are handed off to the worker pool, if there is one. The calling
+        greenlet yields until the worker is done, so other clients are served
+        in the meantime.
+        """
+        executor = get_rpc_executor(function, self._worker_pool)
+        return self._rpc_stats.call(command, function, args, executor)
+
     ###########################################################################
     # Diagnostics and introspection
     ###########################################################################
@@ -236,6 +276,7 @@ class MPMServer(RPCServer):
                     and callable(getattr(self, method))
         ]
 
+    @_instrumented
     def ping(self, data=None):
         """
         Take in data as argument and send it back
@@ -244,6 +285,23 @@ class MPMServer(RPCServer):
         self.log.debug("I was pinged from: %s:%s", self.client_host, self.client_port)
         return data
 
+    def get_rpc_stats(self, reset=False):
+        """
+        Return RPC call statistics as a dictionary with these keys:
+        - latency_buckets: Upper bounds of the latency histogram bins (seconds)
+        - methods: Dictionary of statistics per method, with the number of
+          calls, errors and calls in flight, the total and maximum latency
+          (seconds), a latency histogram (one more bin than there are bucket
+          bounds), and the total request and response payload sizes (bytes).
+
+        If reset is True, the statistics are cleared after reading them.
+        This is a safe method which can be called without a claim on the device
+        """
+        stats = self._rpc_stats.get()
+        if reset:
+            self._rpc_stats.reset()
+        return stats
+
     ###########################################################################
     # Claiming logic
     ###########################################################################
@@ -270,6 +328,7 @@ class MPMServer(RPCServer):
             raise RuntimeError("RPC Server Lock Acquire Timeout: " + error_msg)
 
 
+    @_instrumented
     def claim(self, session_id):
         """Claim device
 
@@ -304,6 +363,9 @@ class MPMServer(RPCServer):
             self._init_rpc_calls(self.periph_manager)
         token_val = self._state.claim_token.value
         self._state.lock.release()
+        # Only now let discovery pick up the claim. Touching the state while
+        # holding the lock would make discovery wait for the claim to finish.
+        self._state.touch()
         self.session_id = session_id + " ({})".format(self.client_host)
         self._reset_timer()
         self.log.debug(
@@ -317,6 +379,7 @@ class MPMServer(RPCServer):
             self.periph_manager.set_connection_type("remote")
         return token_val
 
+    @_instrumented
     def reclaim(self, token):
         """
         Reclaim a MPM device with a token. This operation will fail if the
@@ -381,8 +444,10 @@ class MPMServer(RPCServer):
             self._state.claim_status.value = False
             self._state.claim_token.value = b''
             self._state.lock.release()
+            self._state.touch()
             self.session_id = None
 
+    @_instrumented
     def unclaim(self, token):
         """
         unclaim `token` - unclaims the MPM device if it is claimed with this
@@ -429,6 +494,7 @@ class MPMServer(RPCServer):
         """Get the MPM compatibility number"""
         return MPM_COMPAT_NUM
 
+    @_instrumented
     def get_device_info(self):
         """
         get device information
@@ -472,6 +538,7 @@ class MPMServer(RPCServer):
     ###########################################################################
     # Session initialization
     ###########################################################################
+    @_instrumented
     def init(self, token, args):
         """
         Initialize device. See PeriphManagerBase for details. This is forwarded
@@ -528,6 +595,7 @@ class MPMServer(RPCServer):
         device_info = self.periph_manager.get_device_info()
         self._state.dev_fpga_type.value = \
                 to_binary_str(device_info.get("fpga", "n/a"))
+        self._state.touch()
 
     def reset_timer_and_mgr(self, token):
         """
@@ -8,6 +8,13 @@
 Implements decorators and utility functions to be used with the RPC server
 """
 
+import bisect
+import time
+
+# Upper bounds of the latency histogram bins (in seconds). The last bin
+# collects all calls that took longer than the last value.
+LATENCY_BUCKETS = (1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0)
+
 def no_claim(func):
     " Decorator for functions that require no token check "
     func._notok = True
@@ -18,6 +25,136 @@ def no_rpc(func):
     func._norpc = True
     return func
 
+def read_only(func):
+    """
+    Decorator for functions that do not modify any state. The RPC server may
+    execute these on a worker thread, see MPMServer.
+
+    Such functions run concurrently with other RPC calls, outside of the
+    gevent loop. Only use this for functions that don't touch the hardware
+    or driver state (e.g., returning cached or constant values, or reading
+    files), because the peripheral managers and their drivers are not
+    thread-safe.
+    """
+    func._readonly = True
+    return func
+
+def is_read_only(func):
+    " Return True if func (or the function behind a bound method) is @read_only "
+    return getattr(func, '_readonly', False)
+
+def get_rpc_executor(func, worker_pool):
+    """
+    Return the executor for calling func via RPCStats.call(): A callable
+    which runs func on worker_pool if func is @read_only and there is a
+    worker pool, or None if func shall be called directly.
+
+    worker_pool needs an apply(func, args) method, like gevent's ThreadPool.
+    """
+    if worker_pool is None or not is_read_only(func):
+        return None
+    return lambda func, *args: worker_pool.apply(func, args)
+
+def get_payload_size(obj):
+    """
+    Estimate the size of an RPC argument list or return value in bytes.
+
+    This is only used for statistics, and does not try to match the size of
+    the serialized data exactly.
+    """
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, (list, tuple)):
+        return sum(get_payload_size(item) for item in obj)
+    if isinstance(obj, dict):
+        return sum(get_payload_size(key) + get_payload_size(value)
+                   for key, value in obj.items())
+    if obj is None or isinstance(obj, bool):
+        return 1
+    return 8
+
+class RPCStats:
+    """
+    Per-method RPC call statistics: Number of calls and errors, calls
+    currently in flight, a latency histogram, and request/response payload
+    sizes.
+
+    All bookkeeping happens on the calling greenlet, so no locking is
+    required, even if the method itself is executed on a worker thread.
+    """
+    def __init__(self):
+        self._stats = {}
+
+    @staticmethod
+    def _new_method_stats(in_flight=0):
+        """
+        Return an empty statistics dictionary for a single method.
+        """
+        return {
+            'calls': 0,
+            'errors': 0,
+            'in_flight': in_flight,
+            'latency_total': 0.0,
+            'latency_max': 0.0,
+            'latency_hist': [0] * (len(LATENCY_BUCKETS) + 1),
+            'request_bytes': 0,
+            'response_bytes': 0,
+        }
+
+    def _get_method_stats(self, method):
+        """
+        Return the statistics dictionary for a method, creating it if needed.
+        """
+        if method not in self._stats:
+            self._stats[method] = self._new_method_stats()
+        return self._stats[method]
+
+    def call(self, method, func, args, executor=None):
+        """
+        Call func(*args) and record the statistics for it under the name
+        method. If executor is given, it is called as executor(func, *args)
+        and is responsible for running the function.
+        """
+        stats = self._get_method_stats(method)
+        stats['calls'] += 1
+        stats['in_flight'] += 1
+        stats['request_bytes'] += get_payload_size(args)
+        start_time = time.monotonic()
+        try:
+            result = func(*args) if executor is None else executor(func, *args)
+        except:
+            stats['errors'] += 1
+            raise
+        finally:
+            latency = time.monotonic() - start_time
+            stats['in_flight'] -= 1
+            stats['latency_total'] += latency
+            stats['latency_max'] = max(stats['latency_max'], latency)
+            stats['latency_hist'][bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+        stats['response_bytes'] += get_payload_size(result)
+        return result
+
+    def get(self):
+        """
+        Return a copy of all statistics, suitable for returning over RPC.
+        """
+        return {
+            'latency_buckets': list(LATENCY_BUCKETS),
+            'methods': {
+                method: dict(stats, latency_hist=list(stats['latency_hist']))
+                for method, stats in self._stats.items()
+            },
+        }
+
+    def reset(self):
+        """
+        Clear all statistics. Calls which are in flight are still accounted
+        for when they complete.
+        """
+        for stats in self._stats.values():
+            # Update in place, calls in flight hold a reference to this dict
+            stats.update(self._new_method_stats(stats['in_flight']))
+
 def get_map_for_rpc(map, log):
     """
     ensure the map contains only string values otherwise it cannot be
@@ -0,0 +1,125 @@
+#
+# Copyright 2020 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+This module contains the fast path for control packets, which make up
+most of the traffic while UHD enumerates the simulated device.
+
+Control packets are decoded and answered directly on their serialized
+bytes. They are neither deserialized into a ChdrPacket nor passed
+through the node graph. See chdr_types.hpp:ctrl_payload for the layout
+of the control payload.
+"""
+import struct
+from uhd.chdr import PacketType, CtrlOpCode, CtrlStatus
+from .chdr_stream import HEADER_STRUCT, NUM_MDATA_MASK, chdr_w_to_bytes
+
+CTRL_PKT_TYPE = int(PacketType.CTRL)
+
+# A 64-bit payload word, split into its lower and upper 32 bits
+WORD_STRUCT = struct.Struct("<II")
+# Control header word (lower half)
+DST_PORT_MASK = 0x3FF
+NUM_DATA_SHIFT = 20
+NUM_DATA_MASK = 0xF << NUM_DATA_SHIFT
+HAS_TIME_FLAG = 1 << 30
+IS_ACK_FLAG = 1 << 31
+# Control header word (upper half)
+SRC_EPID_MASK = 0xFFFF
+# Operation word (lower half), the upper half holds the first data word
+ADDRESS_MASK = 0xFFFFF
+OPCODE_SHIFT = 24
+STATUS_SHIFT = 30
+# Registers are 32 bits wide
+REG_BYTES = 4
+
+OP_READ = int(CtrlOpCode.READ)
+OP_WRITE = int(CtrlOpCode.WRITE)
+OP_BLOCK_READ = int(CtrlOpCode.BLOCK_READ)
+OP_BLOCK_WRITE = int(CtrlOpCode.BLOCK_WRITE)
+STATUS_OKAY = int(CtrlStatus.OKAY)
+
+class CtrlProcessor:
+    """Processes control packets which are addressed to a stream
+    endpoint of graph, and builds their responses.
+
+    Besides single register reads and writes, this handles block reads
+    and writes, i.e. multi-op payloads which access num_data consecutive
+    registers in one packet.
+
+    Packets which can't be handled here (e.g. unknown EPIDs or op codes)
+    are left to the node graph, which produces the appropriate error.
+    """
+    def __init__(self, log, graph, chdr_w):
+        self.log = log
+        self.graph = graph
+        self.chdr_w_bytes = chdr_w_to_bytes(chdr_w)
+        # Maps dst_epid -> stream endpoint. Must be cleared whenever the
+        # EPIDs change, i.e. when a management packet comes in.
+        self.stream_eps = {}
+
+    def clear_cache(self):
+        """Forget the stream endpoints of all EPIDs"""
+        self.stream_eps.clear()
+
+    def _get_stream_ep(self, dst_epid):
+        stream_ep = self.stream_eps.get(dst_epid)
+        if stream_ep is None:
+            stream_ep = self.graph.find_ep_by_id(dst_epid)
+            if stream_ep is not None:
+                self.stream_eps[dst_epid] = stream_ep
+        return stream_ep
+
+    def process(self, buffer, num_bytes):
+        """Handle the control packet in the first num_bytes of buffer.
+
+        Returns the serialized response, or None if the packet must be
+        handled by the node graph instead.
+        """
+        dst_epid, _, seq_num, type_mdata, flags = HEADER_STRUCT.unpack_from(buffer)
+        if self._get_stream_ep(dst_epid) is None:
+            return None
+        offset = self.chdr_w_bytes * (1 + (type_mdata & NUM_MDATA_MASK))
+        ctrl_header, ctrl_src = WORD_STRUCT.unpack_from(buffer, offset)
+        op_offset = offset + (16 if ctrl_header & HAS_TIME_FLAG else 8)
+        num_data = (ctrl_header & NUM_DATA_MASK) >> NUM_DATA_SHIFT
+        data_offset = op_offset + 4
+        if num_data == 0 or data_offset + num_data * REG_BYTES > num_bytes:
+            return None
+        op_word = struct.unpack_from("<I", buffer, op_offset)[0]
+        op_code = (op_word >> OPCODE_SHIFT) & 0xF
+        status = op_word >> STATUS_SHIFT
+        if status != STATUS_OKAY:
+            raise RuntimeError("Control Status not OK: {}".format(CtrlStatus(status)))
+        address = op_word & ADDRESS_MASK
+        port = ctrl_header & DST_PORT_MASK
+        regs = self.graph.regs
+        if op_code == OP_READ:
+            data = (regs.read(address, port),)
+        elif op_code == OP_WRITE:
+            data = struct.unpack_from("<{}I".format(num_data), buffer, data_offset)
+            regs.write(address, data[0], port)
+        elif op_code == OP_BLOCK_READ:
+            data = tuple(regs.read(address + i * REG_BYTES, port) for i in range(num_data))
+        elif op_code == OP_BLOCK_WRITE:
+            data = struct.unpack_from("<{}I".format(num_data), buffer, data_offset)
+            for i, value in enumerate(data):
+                regs.write(address + i * REG_BYTES, value, port)
+        else:
+            return None
+
+        # The response is the request with the ack flag set, the EPIDs
+        # swapped and the data replaced. It is padded to whole words.
+        length = (data_offset + len(data) * REG_BYTES + 7) & ~7
+        response = bytearray(length)
+        response[:data_offset] = memoryview(buffer)[:data_offset]
+        HEADER_STRUCT.pack_into(response, 0, ctrl_src & SRC_EPID_MASK, length, seq_num,
+                                type_mdata, flags)
+        WORD_STRUCT.pack_into(response, offset,
+                              (ctrl_header & ~NUM_DATA_MASK) | IS_ACK_FLAG
+                              | (len(data) << NUM_DATA_SHIFT),
+                              (ctrl_src & ~SRC_EPID_MASK) | dst_epid)
+        struct.pack_into("<{}I".format(len(data)), response, data_offset, *data)
+        return response
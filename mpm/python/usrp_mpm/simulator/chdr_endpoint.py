@@ -12,11 +12,28 @@ from threading import Thread
 import socket
 import queue
 import select
-from uhd.chdr import ChdrPacket, ChdrWidth
+from uhd.chdr import ChdrPacket, ChdrWidth, PacketType
+from usrp_mpm.mpmlog import TRACE
 from .rfnoc_graph import XbarNode, XportNode, StreamEndpointNode, RFNoCGraph, NodeType
-from .chdr_stream import ChdrOutputStream, ChdrInputStream
+from .timekeeper import Timekeeper
+from .chdr_ctrl import CtrlProcessor, CTRL_PKT_TYPE
+from .chdr_stream import ChdrOutputStream, ChdrInputStream, HEADER_STRUCT, PKT_TYPE_SHIFT, \
+    DATA_PKT_TYPES
 
 CHDR_W = ChdrWidth.W64
+# Socket send buffer size. This needs to hold a few batches of data packets.
+SEND_BUFFER_SIZE = 4 * 1024 * 1024
+# Socket receive buffer size
+RECV_BUFFER_SIZE = 4 * 1024 * 1024
+# Max MTU
+MAX_PACKET_SIZE = 8000
+# Number of receive buffers shared by the socket thread and the stream workers
+NUM_RECV_BUFFERS = 256
+# Max number of packets received per select() wakeup
+RECV_BATCH_SIZE = 32
+# Packets with these types are handed to the worker of their stream endpoint
+STREAM_PKT_TYPES = (int(PacketType.STRS), int(PacketType.STRC),
+                    int(PacketType.DATA_NO_TS), int(PacketType.DATA_WITH_TS))
 
 class SelectableQueue:
     """ A simple python Queue implementation which can be selected.
@@ -45,9 +62,13 @@ class SelectableQueue:
 class SendWrapper:
     """This class is used as an abstraction over queueing packets to be
     sent by the socket thread.
+
+    Once the socket is available, batches of data packets bypass the
+    queue and are sent directly from the calling thread.
     """
     def __init__(self, queue):
         self.queue = queue
+        self.sock = None
 
     def send_packet(self, packet, addr):
         """Serialize packet and then queue the data to be sent to addr
@@ -61,6 +82,69 @@ class SendWrapper:
         """Queue data to be sent to addr"""
         self.queue.put((data, addr))
 
+    def send_batch(self, packets, addr):
+        """Send a batch of packets to addr. Every packet is a sequence
+        of buffers (e.g. header and payload), which are sent as a single
+        datagram without joining them first.
+        """
+        if self.sock is None:
+            for buffers in packets:
+                self.send_data(b"".join(buffers), addr)
+            return
+        sendmsg = self.sock.sendmsg
+        for buffers in packets:
+            sendmsg(buffers, (), 0, addr)
+
+
+class StreamWorker:
+    """Processes the data and flow control packets of one stream
+    endpoint on a separate thread, so the socket thread only has to
+    handle control and management traffic.
+
+    Packets are passed in as (buffer, num_bytes, sender) tuples. Once a
+    packet has been decoded, its buffer is returned to free_buffers.
+    Data packets skip decoding: The buffer is handed straight to the
+    input stream of the endpoint, which releases it once the payload
+    has been consumed.
+    """
+    def __init__(self, log, graph, stream_ep, free_buffers):
+        self.log = log
+        self.graph = graph
+        self.stream_ep = stream_ep
+        self.free_buffers = free_buffers
+        self.queue = queue.Queue(NUM_RECV_BUFFERS)
+        self.thread = Thread(target=self._worker, daemon=True,
+                             name="ChdrStreamWorker{}".format(stream_ep.node_inst))
+        self.thread.start()
+
+    def put(self, buffer, num_bytes, sender):
+        """Queue a received packet for processing"""
+        self.queue.put((buffer, num_bytes, sender))
+
+    def _worker(self):
+        entry_xport = (NodeType.XPORT, 0)
+        send_wrapper = self.stream_ep.send_wrapper
+        unpack_header = HEADER_STRUCT.unpack_from
+        release = self.free_buffers.put
+        while True:
+            buffer, num_bytes, sender = self.queue.get()
+            input_stream = self.stream_ep.input_stream
+            if input_stream is not None and \
+                    (unpack_header(buffer)[3] >> PKT_TYPE_SHIFT) in DATA_PKT_TYPES:
+                input_stream.queue_buffer(buffer, num_bytes, sender, release)
+                continue
+            try:
+                packet = ChdrPacket.deserialize(CHDR_W, bytes(memoryview(buffer)[:num_bytes]))
+            finally:
+                self.free_buffers.put(buffer)
+            try:
+                response = self.graph.handle_packet(packet, entry_xport, sender,
+                                                    sender, num_bytes)
+                if response is not None:
+                    send_wrapper.send_packet(response, sender)
+            except Exception as ex:
+                self.log.error("Stream worker for SEP {} failed to process packet: {}"
+                               .format(self.stream_ep.node_inst, ex))
 
 class ChdrEndpoint:
     """This class is created by the sim periph_manager
@@ -69,19 +153,42 @@ class ChdrEndpoint:
     traffic.
 
     The config parameter is a Config object (see simulator/config.py)
+
+    Control and management packets are handled on the socket thread.
+    Control packets are answered by a CtrlProcessor without going
+    through the node graph, and the responses to a burst of packets are
+    sent together once the burst has been processed.
+    Data and flow control packets are steered to a StreamWorker per
+    stream endpoint, based on their dst_epid, so the streams of a
+    full-duplex or multi-channel simulation don't share a single core.
+    Receive buffers are taken from a fixed pool and never reallocated.
     """
     def __init__(self, log, config):
         self.log = log.getChild("ChdrEndpoint")
         self.config = config
         self.source_gen = config.source_gen
         self.sink_gen = config.sink_gen
+        self.topology = config.topology
+        self.chdr_options = config.chdr
         self.xport_map = {}
+        self.free_buffers = queue.Queue()
+        for _ in range(NUM_RECV_BUFFERS):
+            self.free_buffers.put(bytearray(MAX_PACKET_SIZE))
+        # Maps dst_epid -> StreamWorker. This is cleared whenever a
+        # management packet comes in, as those can change the EPIDs.
+        self.epid_workers = {}
+        # Maps stream endpoint node id -> StreamWorker
+        self.stream_workers = {}
 
         self.send_queue = SelectableQueue()
         self.send_wrapper = SendWrapper(self.send_queue)
+        self.timekeeper = Timekeeper()
 
         self.graph = RFNoCGraph(self.get_default_nodes(), self.log, 0, self.send_wrapper,
-                                CHDR_W, config.hardware.rfnoc_device_type)
+                                CHDR_W, config.hardware.rfnoc_device_type, self.topology,
+                                self.timekeeper, config.stream,
+                                rx_queue_cap=self.chdr_options.rx_queue_cap)
+        self.ctrl_processor = CtrlProcessor(self.log, self.graph, CHDR_W)
         self.thread = Thread(target=self.socket_worker, daemon=True)
         self.thread.start()
 
@@ -95,17 +202,21 @@ class ChdrEndpoint:
         This method is called by the daughterboard. It coresponds to
         sim_dboard.py:sim_db#set_catalina_clock_rate()
         """
-        self.graph.get_stream_spec().sample_rate = rate
+        self.graph.set_sample_rate(rate)
 
     def get_default_nodes(self):
         """Get a sensible NoC Core setup. This is the simplest
-        functional layout. It has one of each required component.
+        functional layout: One xport and one crossbar, with one crossbar
+        port for each of the stream endpoints required by the topology.
         """
+        num_sep = self.topology.num_stream_eps
         nodes = [
             XportNode(0),
-            XbarNode(0, [2], [0]),
-            StreamEndpointNode(0, self.source_gen, self.sink_gen)
+            XbarNode(0, list(range(2, 2 + num_sep)), [0]),
         ]
+        nodes.extend(StreamEndpointNode(inst, self.source_gen, self.sink_gen,
+                                        self.topology.get_num_sep_ports(inst))
+                     for inst in range(num_sep))
         return nodes
 
     def send_strc(self, stream_ep, addr):
@@ -120,43 +231,121 @@ class ChdrEndpoint:
     def begin_rx(self, dst_epid):
         pass # TODO: currently not implemented
 
+    def get_stream_worker(self, dst_epid):
+        """Return the StreamWorker of the stream endpoint with dst_epid,
+        or None if dst_epid is not a stream endpoint of this device
+        """
+        worker = self.epid_workers.get(dst_epid)
+        if worker is None:
+            stream_ep = self.graph.find_ep_by_id(dst_epid)
+            if stream_ep is None:
+                return None
+            node_id = stream_ep.get_local_id()
+            worker = self.stream_workers.get(node_id)
+            if worker is None:
+                worker = StreamWorker(self.log, self.graph, stream_ep, self.free_buffers)
+                self.stream_workers[node_id] = worker
+            self.epid_workers[dst_epid] = worker
+        return worker
+
+    def open_socket(self):
+        """Create and bind the CHDR socket"""
+        chdr_sock = socket.socket(socket.AF_INET,
+                                  socket.SOCK_DGRAM)
+        chdr_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_SIZE)
+        chdr_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER_SIZE)
+        chdr_sock.bind(("0.0.0.0", self.chdr_options.port))
+        return chdr_sock
+
+    def handle_packet(self, buffer, n_bytes, sender):
+        """Process a control or management packet on the socket thread.
+
+        Returns the serialized response, or None if there is none.
+        """
+        trace = self.log.isEnabledFor(TRACE)
+        if trace:
+            self.log.trace("Received {} bytes of data from {}"
+                           .format(n_bytes, sender))
+        try:
+            if (buffer[6] >> PKT_TYPE_SHIFT) == CTRL_PKT_TYPE:
+                data = self.ctrl_processor.process(buffer, n_bytes)
+                if data is not None:
+                    if trace:
+                        self.log.trace("Processed Ctrl Packet: {} -> {}"
+                                       .format(bytes(buffer[:n_bytes]).hex(), data.hex()))
+                    return data
+            packet = ChdrPacket.deserialize(CHDR_W, bytes(memoryview(buffer)[:n_bytes]))
+            if trace:
+                self.log.trace("Decoded Packet: {}"
+                               .format(packet.to_string_with_payload()))
+            if packet.get_header().pkt_type == PacketType.MGMT:
+                self.epid_workers.clear()
+                self.ctrl_processor.clear_cache()
+            entry_xport = (NodeType.XPORT, 0)
+            response = self.graph.handle_packet(packet, entry_xport, sender,
+                                                sender, n_bytes)
+
+            if response is not None:
+                if trace:
+                    self.log.trace("Returning Packet: {}"
+                                   .format(response.to_string_with_payload()))
+                return bytes(response.serialize())
+            return None
+        except BaseException as ex:
+            self.log.warning("Unable to decode packet: {}"
+                             .format(ex))
+            raise ex
+
     def socket_worker(self):
         """This is the method that runs in a background thread. It
         blocks on the CHDR socket and processes packets as they come
         in.
+
+        Every wakeup drains up to RECV_BATCH_SIZE packets from the socket.
+        Only the first 64 bits of the header are decoded here to decide
+        where a packet goes. The responses to the control and management
+        packets of one wakeup are sent after the whole batch has been
+        processed.
         """
         self.log.info("Starting ChdrEndpoint Thread")
-        main_sock = socket.socket(socket.AF_INET,
-                                  socket.SOCK_DGRAM)
-        main_sock.bind(("0.0.0.0", 49153))
+        main_sock = self.open_socket()
+        # UDP sends are atomic, so stream threads can share this socket
+        self.send_wrapper.sock = main_sock
+        unpack_header = HEADER_STRUCT.unpack_from
+        free_buffers = self.free_buffers
+        sendto = main_sock.sendto
+        responses = []
 
         while True:
             # This allows us to block on multiple sockets at the same time
             ready_list, _, _ = select.select([main_sock, self.send_queue], [], [])
-            buffer = bytearray(8000) # Max MTU
             for sock in ready_list:
                 if sock is main_sock:
                     # Received Data over socket
-                    n_bytes, sender = main_sock.recvfrom_into(buffer)
-                    self.log.trace("Received {} bytes of data from {}"
-                                   .format(n_bytes, sender))
-                    try:
-                        packet = ChdrPacket.deserialize(CHDR_W, buffer[:n_bytes])
-                        self.log.trace("Decoded Packet: {}"
-                                       .format(packet.to_string_with_payload()))
-                        entry_xport = (NodeType.XPORT, 0)
-                        response = self.graph.handle_packet(packet, entry_xport, sender,
-                                                            sender, n_bytes)
-
+                    for _ in range(RECV_BATCH_SIZE):
+                        buffer = free_buffers.get()
+                        try:
+                            n_bytes, sender = main_sock.recvfrom_into(
+                                buffer, MAX_PACKET_SIZE, socket.MSG_DONTWAIT)
+                        except BlockingIOError:
+                            free_buffers.put(buffer)
+                            break
+                        dst_epid, _, _, type_mdata, _ = unpack_header(buffer)
+                        worker = None
+                        if (type_mdata >> PKT_TYPE_SHIFT) in STREAM_PKT_TYPES:
+                            worker = self.get_stream_worker(dst_epid)
+                        if worker is not None:
+                            worker.put(buffer, n_bytes, sender)
+                            continue
+                        try:
+                            response = self.handle_packet(buffer, n_bytes, sender)
+                        finally:
+                            free_buffers.put(buffer)
                         if response is not None:
-                            data = response.serialize()
-                            self.log.trace("Returning Packet: {}"
-                                           .format(packet.to_string_with_payload()))
-                            main_sock.sendto(bytes(data), sender)
-                    except BaseException as ex:
-                        self.log.warning("Unable to decode packet: {}"
-                                         .format(ex))
-                        raise ex
+                            responses.append((response, sender))
+                    for response, sender in responses:
+                        sendto(response, sender)
+                    responses.clear()
                 else:
                     data, addr = self.send_queue.get()
                     sent_len = main_sock.sendto(data, addr)
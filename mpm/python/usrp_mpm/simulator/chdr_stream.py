@@ -9,10 +9,44 @@ handles managing threads, as well as interfacing with sample sources
 and sinks.
 """
 import time
-from threading import Thread
+import struct
+from threading import Thread, Lock
 import queue
-import socket
 from uhd.chdr import PacketType, StrcOpCode, StrcPayload, StrsPayload, StrsStatus, ChdrHeader, ChdrPacket
+from usrp_mpm.mpmlog import TRACE
+from .timekeeper import PacingClock
+
+# Bytes per sample (SC16)
+SC16_BYTES = 4
+
+# The first 64 bits of a CHDR header: dst_epid, length, seq_num, then a
+# byte holding num_mdata (52:48) and pkt_type (55:53), and a byte holding
+# EOB, EOV and VC
+HEADER_STRUCT = struct.Struct("<HHHBB")
+PKT_TYPE_SHIFT = 5
+NUM_MDATA_MASK = 0x1F
+DATA_PKT_TYPES = (int(PacketType.DATA_NO_TS), int(PacketType.DATA_WITH_TS))
+
+def chdr_w_to_bytes(chdr_w):
+    """Return the width of a CHDR word in bytes"""
+    return 8 << int(chdr_w)
+
+def get_data_payload_bounds(buffer, chdr_w_bytes):
+    """Locate the payload of a serialized CHDR data packet, without
+    deserializing it. Only the first 64 bits of the header are parsed.
+
+    Returns (pkt_type, payload_start, payload_end) as byte offsets into
+    buffer.
+    """
+    _, length, _, type_mdata, _ = HEADER_STRUCT.unpack_from(buffer)
+    pkt_type = type_mdata >> PKT_TYPE_SHIFT
+    start = chdr_w_bytes
+    # For 64-bit CHDR, the timestamp takes up its own word. For wider
+    # CHDR, it is part of the header word.
+    if chdr_w_bytes == 8 and pkt_type == PacketType.DATA_WITH_TS:
+        start += 8
+    start += (type_mdata & NUM_MDATA_MASK) * chdr_w_bytes
+    return pkt_type, start, length
 
 class XferCount:
     """This class keeps track of flow control transfer status which are
@@ -61,12 +95,18 @@ class ChdrInputStream:
     queue which receives STRC and DATA ChdrPackets. It places the data
     packets into the sample_sink and responds to the STRC packets using
     the send_wrapper
+
+    Data packets can also be queued as raw receive buffers (see
+    queue_buffer()). For those, only the header is parsed, and the
+    payload is handed to the sample sink as a memoryview of the buffer.
     """
     CAPACITY_BYTES = int(5e3) # 5 KB
-    QUEUE_CAP = 3
-    def __init__(self, log, chdr_w, sample_sink, send_wrapper, our_epid):
+    QUEUE_CAP = 64
+    def __init__(self, log, chdr_w, sample_sink, send_wrapper, our_epid,
+                 queue_cap=QUEUE_CAP):
         self.log = log
         self.chdr_w = chdr_w
+        self.chdr_w_bytes = chdr_w_to_bytes(chdr_w)
         self.sample_sink = sample_sink
         self.send_wrapper = send_wrapper
         self.xfer = XferCount()
@@ -76,19 +116,42 @@ class ChdrInputStream:
         self.command_addr = None
         self.command_epid = None
         self.our_epid = our_epid
-        self.rx_queue = queue.Queue(ChdrInputStream.QUEUE_CAP)
+        self.rx_queue = queue.Queue(queue_cap)
         self.stop = False
+        # Makes checking stop and queueing a buffer atomic with respect to
+        # finish(), so no buffer is queued after the worker has drained the
+        # queue for the last time
+        self.stop_lock = Lock()
         self.thread = Thread(target=self._rx_worker, daemon=True)
         self.thread.start()
 
     def _rx_worker(self):
         self.log.info("Stream RX Worker Starting")
+        accept_payload = self.sample_sink.accept_payload
         while True:
-            packet, recv_len, addr = self.rx_queue.get()
+            packet, recv_len, addr, release = self.rx_queue.get()
             # This break is here because when ChdrInputStream.stop() is called,
-            # a tuple of 3 None values is pushed into the queue to unblock the worker.
+            # a tuple of None values is pushed into the queue to unblock the worker.
             if self.stop:
+                if release is not None:
+                    release(packet)
                 break
+            if release is not None:
+                # Fast path: packet is the receive buffer of a data packet
+                try:
+                    _, start, end = get_data_payload_bounds(packet, self.chdr_w_bytes)
+                    accept_payload(memoryview(packet)[start:min(end, recv_len)])
+                finally:
+                    release(packet)
+                xfer = self.xfer
+                xfer.num_bytes += recv_len
+                xfer.num_packets += 1
+                accum = self.accum
+                accum.num_bytes += recv_len
+                accum.num_packets += 1
+                if self.fc_freq is not None and accum.has_exceeded(self.fc_freq):
+                    self._send_fc_status()
+                continue
             header = packet.get_header()
             self.xfer.count_packet(recv_len)
             self.accum.count_packet(recv_len)
@@ -112,22 +175,37 @@ class ChdrInputStream:
 
             # Check if a fc status packet is due
             if self.fc_freq is not None and self.accum.has_exceeded(self.fc_freq):
-                self.accum.clear()
-                self.log.trace("Flow Control Due, sending STRS")
-                self.command_target = None
-                resp_packet = self._generate_strs_packet(self.command_epid, self.our_epid)
-                self.log.trace("Sending Flow Control: {}".format(resp_packet.to_string_with_payload()))
-                self.send_wrapper.send_packet(resp_packet, self.command_addr)
+                self._send_fc_status()
 
+        # Hand back any receive buffers which are still queued
+        while True:
+            try:
+                packet, _, _, release = self.rx_queue.get_nowait()
+            except queue.Empty:
+                break
+            if release is not None:
+                release(packet)
         self.sample_sink.close()
         self.log.info("Stream RX Worker Done")
 
+    def _send_fc_status(self):
+        """Send a flow control status packet to the stream's source"""
+        self.accum.clear()
+        self.log.trace("Flow Control Due, sending STRS")
+        self.command_target = None
+        resp_packet = self._generate_strs_packet(self.command_epid, self.our_epid)
+        if self.log.isEnabledFor(TRACE):
+            self.log.trace("Sending Flow Control: {}"
+                           .format(resp_packet.to_string_with_payload()))
+        self.send_wrapper.send_packet(resp_packet, self.command_addr)
+
     def finish(self):
         """Unblocks the worker and stops the thread.
         The worker will close its sample_sink
         """
-        self.stop = True
-        self.rx_queue.put((None, None, None))
+        with self.stop_lock:
+            self.stop = True
+        self.rx_queue.put((None, None, None, None))
 
     def _generate_strs_packet(self, dst_epid, src_epid):
         """Create an strs packet from the information in self.xfer"""
@@ -145,7 +223,18 @@ class ChdrInputStream:
 
     def queue_packet(self, packet, recv_len, addr):
         """Queue a packet to be processed by the ChdrInputStream"""
-        self.rx_queue.put((packet, recv_len, addr))
+        self.rx_queue.put((packet, recv_len, addr, None))
+
+    def queue_buffer(self, buffer, recv_len, addr, release):
+        """Queue a serialized data packet to be processed by the
+        ChdrInputStream. Once the payload has been consumed,
+        release(buffer) is called.
+        """
+        with self.stop_lock:
+            if not self.stop:
+                self.rx_queue.put((buffer, recv_len, addr, release))
+                return
+        release(buffer)
 
 class ChdrOutputStream:
     """This class encapsulates a Tx Thread. It takes data from its
@@ -154,83 +243,228 @@ class ChdrOutputStream:
 
     The tx stream is configured using the stream_spec object, which
     sets parameters such as sample rate and destination
+
+    Packets are sent in batches of up to batch_size packets. Headers
+    are copied from a pre-serialized template and only the sequence
+    number and timestamp are patched in. Payloads are written by the
+    sample source directly into a preallocated buffer, and header and
+    payload are handed to the socket without being joined.
+
+    If a timekeeper is given, every packet carries a sample-accurate
+    timestamp, timed stream commands start at their timestamp, and
+    batches are paced against the timekeeper's clock (see PacingClock).
+    stream_options (see config.StreamOptions) can add jitter to the
+    pacing and inject overflows, which drop packets: Both the sequence
+    number and timestamp skip ahead, as they would if the packets had
+    been lost.
     """
-    def __init__(self, log, chdr_w, sample_source, stream_spec, send_wrapper):
+    BATCH_SIZE = 32
+    # The CHDR header is serialized as a little-endian 64-bit word, with
+    # the sequence number in bits 47:32
+    SEQ_NUM_OFFSET = 4
+    # The timestamp follows the first 64 bits of the header
+    TIMESTAMP_OFFSET = 8
+    # Size of the largest possible header (one 512-bit CHDR word)
+    MAX_HEADER_LEN = 64
+    # Max. lateness of a timed stream command (seconds)
+    LATE_TOLERANCE = 0.01
+
+    def __init__(self, log, chdr_w, sample_source, stream_spec, send_wrapper,
+                 batch_size=BATCH_SIZE, timekeeper=None, stream_options=None):
         self.log = log
         self.chdr_w = chdr_w
         self.sample_source = sample_source
         self.stream_spec = stream_spec
         self.send_wrapper = send_wrapper
+        self.batch_size = batch_size
+        self.timekeeper = timekeeper
+        self.jitter = stream_options.jitter if stream_options is not None else 0.0
+        self.seed = stream_options.seed if stream_options is not None else None
+        self.overflow_interval = stream_options.overflow_interval \
+            if stream_options is not None else 0
+        self.overflow_packets = stream_options.overflow_packets \
+            if stream_options is not None else 1
         self.xfer = XferCount()
         self.recv = XferCount()
         self.stop = False
         self.strs_queue = queue.Queue(100)
         self.strc_seq_num = 0
         self.data_seq_num = 0
+        self.header_templates = {}
+        self.pacer = None
+        # Number of samples produced so far, including dropped ones
+        self.num_samples = 0
+        self.num_overflows = 0
 
         self.thread = Thread(target=self._tx_worker, daemon=True)
         self.thread.start()
 
+    def _get_header_template(self, payload_len, has_timestamp):
+        """Return the serialized header for a data packet with a payload
+        of payload_len bytes (with zero sequence number and timestamp)
+        """
+        key = (payload_len, has_timestamp)
+        if key in self.header_templates:
+            return self.header_templates[key]
+        header = ChdrHeader()
+        header.dst_epid = self.stream_spec.dst_epid
+        header.pkt_type = PacketType.DATA_WITH_TS if has_timestamp \
+            else PacketType.DATA_NO_TS
+        packet = ChdrPacket(self.chdr_w, header, bytes(payload_len),
+                            0 if has_timestamp else None)
+        data = bytes(packet.serialize())
+        template = data[:len(data) - payload_len]
+        self.header_templates[key] = template
+        return template
+
+    def _get_start(self):
+        """Return (timestamp, monotonic time) of the first sample, where
+        the timestamp is None if the stream isn't timestamped
+        """
+        now = time.monotonic()
+        if self.timekeeper is None:
+            if self.stream_spec.is_timed:
+                return self.stream_spec.init_timestamp, now
+            return None, now
+        if self.stream_spec.is_timed:
+            start_ticks = self.stream_spec.init_timestamp
+            start_time = self.timekeeper.ticks_to_monotonic(start_ticks)
+            if start_time >= now - self.LATE_TOLERANCE:
+                self.log.info("Stream start is timed: {} ticks ({:.6f} s from now)"
+                              .format(start_ticks, start_time - now))
+                return start_ticks, start_time
+            self.log.warning("Stream command is late by {:.6f} s, starting now"
+                             .format(now - start_time))
+        return self.timekeeper.get_ticks(), now
+
     def _tx_worker(self):
         self.log.info("Stream TX Worker Starting with {} packets/sec"
                       .format(1/self.stream_spec.seconds_per_packet()))
         self.log.info("Downstream Buffer Capacity: {} packets or {} bytes"
                       .format(self.stream_spec.capacity_packets, self.stream_spec.capacity_bytes))
-        header = ChdrHeader()
         start_time = time.time()
-        next_send = start_time
-        header.dst_epid = self.stream_spec.dst_epid
-        header.pkt_type = PacketType.DATA_NO_TS
-
-        is_continuous = self.stream_spec.is_continuous
-        num_samps_left = None
-        if not is_continuous:
-            # TODO: Put sample format/width in the stream spec
-            num_samps_left = self.stream_spec.total_samples * 4 # SC16 is 4 bytes per sample
+        first_timestamp, first_sample_time = self._get_start()
+        has_timestamp = first_timestamp is not None
+        ticks_per_sample = 1.0
+        if self.timekeeper is not None:
+            ticks_per_sample = self.timekeeper.get_tick_rate() / self.stream_spec.sample_rate
+        self.pacer = PacingClock(first_sample_time, self.stream_spec.sample_rate,
+                                 self.jitter, self.seed)
+        self.num_samples = 0
+        # Wait for the start time of a timed stream
+        self.pacer.wait(0)
+        # TODO: Put sample format/width in the stream spec
+        payload_size = self.stream_spec.packet_samples * SC16_BYTES
+        payload_buffer = memoryview(bytearray(self.batch_size * payload_size))
+        payload_slots = [payload_buffer[idx * payload_size:(idx + 1) * payload_size]
+                         for idx in range(self.batch_size)]
+        header_slots = [memoryview(bytearray(self.MAX_HEADER_LEN))
+                        for _ in range(self.batch_size)]
 
-        timestamp = self.stream_spec.init_timestamp  \
-            if self.stream_spec.is_timed else None
+        num_bytes_left = None
+        if not self.stream_spec.is_continuous:
+            num_bytes_left = self.stream_spec.total_samples * SC16_BYTES
 
-        while is_continuous or num_samps_left > 0:
+        batch = []
+        packets_since_overflow = 0
+        is_done = False
+        while not is_done:
             if self.stop:
                 self.log.info("Stream Worker Stopped")
                 break
-            header.seq_num = self.data_seq_num
-            # When seq_num gets to 65535 (Max Unsigned 16 bit integer)
-            # It wraps back around to 0
-            self.data_seq_num = int(self.data_seq_num + 1) & 0xFFFF
-            packet = ChdrPacket(self.chdr_w, header, bytes(0), timestamp)
-            packet_samples = self.stream_spec.packet_samples
-            if num_samps_left is not None:
-                packet_samples = min(packet_samples, num_samps_left)
-                num_samps_left -= packet_samples
-            packet = self.sample_source.fill_packet(packet, packet_samples)
-            if packet is None:
-                break
-            send_data = bytes(packet.serialize()) # Serialize before waiting
-
-            delay = next_send - time.time()
-            if delay > 0:
-                time.sleep(delay)
-            next_send = next_send + self.stream_spec.seconds_per_packet()
+            batch.clear()
+            for slot in range(self.batch_size):
+                packet_size = payload_size
+                if num_bytes_left is not None:
+                    packet_size = min(packet_size, num_bytes_left)
+                num_bytes = self.sample_source.fill_payload(payload_slots[slot][:packet_size])
+                if num_bytes == 0:
+                    is_done = True
+                    break
+                template = self._get_header_template(num_bytes, has_timestamp)
+                header = header_slots[slot][:len(template)]
+                header[:] = template
+                struct.pack_into("<H", header, self.SEQ_NUM_OFFSET, self.data_seq_num)
+                if has_timestamp:
+                    struct.pack_into("<Q", header, self.TIMESTAMP_OFFSET,
+                                     (first_timestamp +
+                                      round(self.num_samples * ticks_per_sample))
+                                     & 0xFFFFFFFFFFFFFFFF)
+                # When seq_num gets to 65535 (Max Unsigned 16 bit integer)
+                # It wraps back around to 0
+                self.data_seq_num = (self.data_seq_num + 1) & 0xFFFF
+                self.num_samples += num_bytes // SC16_BYTES
+                packet_len = len(template) + num_bytes
 
-            timestamp = None
-
-            # Check Flow Control to assert there is space downstream
-            while not self._can_fit_packet(len(send_data)):
-                strs_update = self.strs_queue.get()
-                strs_payload = strs_update.get_payload_strs()
-                self._update_recv(strs_payload)
-
-            self.send_wrapper.send_data(send_data, self.stream_spec.addr)
-            self.xfer.count_packet(len(send_data))
+                # Check Flow Control to assert there is space downstream. Any
+                # packets that are already batched need to go out first.
+                if not self._can_fit_packet(packet_len):
+                    self._send_batch(batch)
+                    batch.clear()
+                    if not self._wait_for_space(packet_len):
+                        is_done = True
+                        break
+                batch.append((header, payload_slots[slot][:num_bytes]))
+                self.xfer.count_packet(packet_len)
+                # Dropped samples count towards the number of requested samples
+                consumed_bytes = num_bytes
+                if self.overflow_interval:
+                    packets_since_overflow += 1
+                    if packets_since_overflow == self.overflow_interval:
+                        packets_since_overflow = 0
+                        consumed_bytes += self._inject_overflow() * SC16_BYTES
+                if num_bytes_left is not None:
+                    num_bytes_left -= consumed_bytes
+                    if num_bytes_left <= 0:
+                        is_done = True
+                        break
+            self._send_batch(batch)
 
         self.log.info("Stream Worker Done")
         finish_time = time.time()
         self.log.info("Actual Packet Rate was {} packets/sec"
                       .format(self.xfer.num_packets/(finish_time - start_time)))
+        if self.num_overflows:
+            self.log.info("Injected {} overflows".format(self.num_overflows))
         self.sample_source.close()
 
+    def _inject_overflow(self):
+        """Drop overflow_packets packets: Skip their sequence numbers and
+        samples, without sending them. Returns the number of dropped
+        samples.
+        """
+        num_dropped = self.overflow_packets * self.stream_spec.packet_samples
+        self.num_overflows += 1
+        self.data_seq_num = (self.data_seq_num + self.overflow_packets) & 0xFFFF
+        self.num_samples += num_dropped
+        self.log.debug("Injecting overflow #{}, dropping {} packets"
+                       .format(self.num_overflows, self.overflow_packets))
+        return num_dropped
+
+    def _send_batch(self, batch):
+        """Wait until the samples of batch have been produced, then send
+        all packets in batch
+        """
+        if not batch:
+            return
+        self.pacer.wait(self.num_samples)
+        self.send_wrapper.send_batch(batch, self.stream_spec.addr)
+
+    def _wait_for_space(self, length):
+        """Process STRS packets until a packet of length bytes fits
+        downstream. Returns False if the stream was stopped meanwhile.
+        """
+        while not self._can_fit_packet(length):
+            if self.stop:
+                return False
+            try:
+                strs_update = self.strs_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            strs_payload = strs_update.get_payload_strs()
+            self._update_recv(strs_payload)
+        return True
+
     def finish(self):
         """Stops the ChdrOutputStream"""
         self.stop = True
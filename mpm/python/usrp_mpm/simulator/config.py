@@ -12,6 +12,8 @@ it identifies itself as.
 
 import configparser
 from .sample_source import sinks, sources, NullSamples, from_import_path
+# Importing this registers the NumPy sources and sinks
+from . import numpy_samples # pylint: disable=unused-import
 from .hardware_presets import presets
 import numbers
 
@@ -54,6 +56,131 @@ class HardwareDescriptor:
             dict['dboard_class'],
             dict['rfnoc_device_type'])
 
+class Topology:
+    """This class describes the NoC core of a simulated device: How many
+    radio blocks there are, how many channels each radio has, and how
+    many stream endpoints the radio channels are connected to.
+
+    Radio channels are numbered radio by radio, and assigned to stream
+    endpoints round-robin: Radio channel n is connected to port
+    n // num_stream_eps of stream endpoint n % num_stream_eps.
+
+    Additional (unconnected) NoC blocks can be simulated by listing their
+    types in blocks, e.g. "DDC,DUC,Replay" (see
+    noc_block_regs.BLOCK_TYPES). Each of them gets num_chans ports.
+    """
+    def __init__(self, num_radios=1, num_chans=2, num_stream_eps=None, blocks=None):
+        """
+        num_radios -> Number of radio blocks
+        num_chans -> Number of channels per radio block
+        num_stream_eps -> Number of stream endpoints. Defaults to one
+            stream endpoint per radio channel, which allows streaming
+            from all channels at the same time.
+        blocks -> List (or comma separated string) of the types of
+            additional NoC blocks, which follow after the radio blocks
+        """
+        self.num_radios = int(num_radios)
+        self.num_chans = int(num_chans)
+        self.num_stream_eps = int(num_stream_eps) if num_stream_eps is not None \
+            else self.num_radios * self.num_chans
+        if isinstance(blocks, str):
+            blocks = blocks.split(',')
+        self.blocks = [block.strip() for block in (blocks or []) if block.strip()]
+        if min(self.num_radios, self.num_chans, self.num_stream_eps) < 1:
+            raise ValueError("Invalid topology: {}".format(self))
+
+    @classmethod
+    def default(cls):
+        """Return the default topology: One radio with two channels,
+        each of which has its own stream endpoint
+        """
+        return cls(1, 2)
+
+    @classmethod
+    def from_dict(cls, topology_dict):
+        return cls(topology_dict.get('num_radios', 1),
+            topology_dict.get('num_chans', 2),
+            topology_dict.get('num_stream_eps', None),
+            topology_dict.get('blocks', None))
+
+    def get_radio_chan_sep(self, radio, chan):
+        """Return the (stream endpoint, port) a radio channel is
+        connected to
+        """
+        index = radio * self.num_chans + chan
+        return (index % self.num_stream_eps, index // self.num_stream_eps)
+
+    def get_num_sep_ports(self, sep_inst):
+        """Return the number of radio channels connected to a stream
+        endpoint
+        """
+        num_radio_chans = self.num_radios * self.num_chans
+        return len(range(sep_inst, num_radio_chans, self.num_stream_eps))
+
+    def __str__(self):
+        return "Topology{{num_radios: {}, num_chans: {}, num_stream_eps: {}, blocks: {}}}" \
+            .format(self.num_radios, self.num_chans, self.num_stream_eps, self.blocks)
+
+class ChdrOptions:
+    """This class holds the options of the CHDR transport of a simulated
+    device (see ChdrEndpoint)
+    """
+    def __init__(self, port=49153, rx_queue_cap=None):
+        """
+        port -> UDP port the CHDR socket is bound to. Every simulated
+            device needs its own port: UHD talks to a device through
+            several sockets (control and each data link), all of which
+            must reach the same simulator process. See farm.py for
+            running many devices side by side.
+        rx_queue_cap -> Max. number of packets queued by each input
+            stream (see ChdrInputStream). Defaults to
+            ChdrInputStream.QUEUE_CAP.
+        """
+        self.port = int(port)
+        self.rx_queue_cap = int(rx_queue_cap) if rx_queue_cap is not None else None
+        if self.rx_queue_cap is not None and self.rx_queue_cap < 1:
+            raise ValueError("Invalid CHDR options: {}".format(self))
+
+    @classmethod
+    def from_dict(cls, options_dict):
+        return cls(options_dict.get('port', 49153),
+            options_dict.get('rx_queue_cap', None))
+
+    def __str__(self):
+        return "ChdrOptions{{port: {}, rx_queue_cap: {}}}" \
+            .format(self.port, self.rx_queue_cap)
+
+class StreamOptions:
+    """This class holds the options of the simulator's output streams,
+    which are used to inject errors into otherwise ideal streams
+    """
+    def __init__(self, jitter=0.0, overflow_interval=0, overflow_packets=1, seed=None):
+        """
+        jitter -> Max. random delay (in seconds) added to each send
+        overflow_interval -> If nonzero, inject an overflow every
+            overflow_interval packets
+        overflow_packets -> Number of packets dropped per overflow
+        seed -> Seed for the random jitter, for reproducible runs
+        """
+        self.jitter = float(jitter)
+        self.overflow_interval = int(overflow_interval)
+        self.overflow_packets = int(overflow_packets)
+        self.seed = int(seed) if seed is not None else None
+        if self.jitter < 0 or self.overflow_interval < 0 or self.overflow_packets < 1:
+            raise ValueError("Invalid stream options: {}".format(self))
+
+    @classmethod
+    def from_dict(cls, options_dict):
+        return cls(options_dict.get('jitter', 0.0),
+            options_dict.get('overflow_interval', 0),
+            options_dict.get('overflow_packets', 1),
+            options_dict.get('seed', None))
+
+    def __str__(self):
+        return "StreamOptions{{jitter: {}, overflow_interval: {}, overflow_packets: {}, " \
+            "seed: {}}}".format(self.jitter, self.overflow_interval, self.overflow_packets,
+                                self.seed)
+
 class Config:
     """This class represents a configuration file for the usrp simulator.
     This file should conform to the .ini format defined by the
@@ -64,11 +191,21 @@ class Config:
     Source/Sink class to instanitate (see the decorators in
     sample_source.py). The other key value pairs in the section are
     passed to the source/sink constructor as strings through **kwargs
+
+    An optional [topology] section overrides the NoC core layout of the
+    hardware preset (see Topology for the keys). An optional [chdr]
+    section configures the CHDR transport (see ChdrOptions for the keys),
+    and an optional [stream] section configures error injection into the
+    output streams (see StreamOptions for the keys).
     """
-    def __init__(self, source_gen, sink_gen, hardware):
+    def __init__(self, source_gen, sink_gen, hardware, topology=None, chdr=None,
+                 stream=None):
         self.source_gen = source_gen
         self.sink_gen = sink_gen
         self.hardware = hardware
+        self.topology = topology if topology is not None else Topology.default()
+        self.chdr = chdr if chdr is not None else ChdrOptions()
+        self.stream = stream if stream is not None else StreamOptions()
 
     @classmethod
     def from_path(cls, log, path):
@@ -89,9 +226,22 @@ class Config:
         hardware_section = dict(parser['hardware'])
         preset_name = hardware_section.get('preset', None)
         hardware_preset = presets[preset_name].copy() if preset_name is not None else {}
+        topology_dict = dict(hardware_preset.pop('topology', {}))
         hardware_preset.update(hardware_section)
         hardware = HardwareDescriptor.from_dict(hardware_preset)
         parser.pop('hardware')
+        if 'topology' in parser:
+            topology_dict.update(parser['topology'])
+            parser.pop('topology')
+        topology = Topology.from_dict(topology_dict) if topology_dict else Topology.default()
+        chdr = ChdrOptions()
+        if 'chdr' in parser:
+            chdr = ChdrOptions.from_dict(dict(parser['chdr']))
+            parser.pop('chdr')
+        stream = StreamOptions()
+        if 'stream' in parser:
+            stream = StreamOptions.from_dict(dict(parser['stream']))
+            parser.pop('stream')
         for unused_section in parser:
             # Python sticks this into all config files
             if unused_section == 'DEFAULT':
@@ -99,7 +249,7 @@ class Config:
             # This helps stop you from shooting yourself in the foot when you add
             # the [sampel.sink] section
             log.warning("Unrecognized section in config file: {}".format(unused_section))
-        return cls(source_gen, sink_gen, hardware)
+        return cls(source_gen, sink_gen, hardware, topology, chdr, stream)
 
     @staticmethod
     def _read_sample_section(section, lookup):
@@ -119,7 +269,8 @@ class Config:
     def default(cls):
         """Return a default config"""
         hardware = dict(presets['E320'])
+        topology = Topology.from_dict(hardware.pop('topology'))
         # For the uninitiated, this is how you spell Fake Device in hex
         hardware['serial_num'] = "FA4EDE7"
         hardware = HardwareDescriptor.from_dict(hardware)
-        return cls(NullSamples, NullSamples, hardware)
+        return cls(NullSamples, NullSamples, hardware, topology)
@@ -0,0 +1,213 @@
+#
+# Copyright 2026 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+This module launches a farm of simulated devices on one computer, e.g. to
+test host code which talks to many USRPs at once.
+
+Every device runs in its own process tree (the same one usrp_hwd.py would
+start for a single simulator), so the devices share no state. Each device
+has its own serial number, and its own discovery, RPC and CHDR ports, which
+are allocated as consecutive blocks starting at base_port. The devices are
+found by UHD using the device args returned by SimulatorFarm.get_device_args().
+
+MPM must be built for the simulator (-DMPM_DEVICE=sim) to use this.
+
+Example:
+    python3 -m usrp_mpm.simulator.farm -n 64 --presets E320
+"""
+import argparse
+import configparser
+import os
+import signal
+import sys
+import tempfile
+from threading import Event
+from usrp_mpm.mpmlog import get_main_logger
+from usrp_mpm.process_manager import ProcessManager
+from .hardware_presets import presets
+
+# Ports per device: discovery, RPC and CHDR
+PORTS_PER_DEVICE = 3
+DEFAULT_BASE_PORT = 52000
+DEFAULT_SERIAL_PREFIX = "SIM"
+# Time to wait for a device to shut down cleanly, in seconds
+STOP_TIMEOUT = 10.0
+
+class FarmDevice:
+    """This class describes one device of a SimulatorFarm"""
+    def __init__(self, index, preset, serial, base_port, config_path):
+        self.index = index
+        self.preset = preset
+        self.serial = serial
+        self.discovery_port = base_port
+        self.rpc_port = base_port + 1
+        self.chdr_port = base_port + 2
+        self.config_path = config_path
+        self.process = None
+
+    def get_hwd_args(self):
+        """Return the usrp_hwd.py command line arguments of this device"""
+        return ["--default-args", "config={}".format(self.config_path),
+                "--discovery-port", str(self.discovery_port),
+                "--rpc-port", str(self.rpc_port)]
+
+    def get_device_args(self, addr):
+        """Return the UHD device args which select this device"""
+        return "addr={addr},mgmt_addr={addr},serial={serial}," \
+            "discovery_port={discovery_port},rpc_port={rpc_port}" \
+            .format(addr=addr, serial=self.serial, discovery_port=self.discovery_port,
+                    rpc_port=self.rpc_port)
+
+    def __str__(self):
+        return "FarmDevice{{index: {}, preset: {}, serial: {}, discovery_port: {}, " \
+            "rpc_port: {}, chdr_port: {}}}".format(
+                self.index, self.preset, self.serial, self.discovery_port,
+                self.rpc_port, self.chdr_port)
+
+class SimulatorFarm:
+    """Supervises a number of simulated devices.
+
+    The presets are assigned to the devices round-robin. If a config_template
+    is given (a simulator config file, see config.Config), every device's
+    config is a copy of it, with the preset, serial number and CHDR port
+    replaced. The generated config files are written to workdir.
+    """
+    def __init__(self, log, num_devices, preset_names=("E320",), base_port=DEFAULT_BASE_PORT,
+                 serial_prefix=DEFAULT_SERIAL_PREFIX, config_template=None, workdir=None):
+        self.log = log
+        for preset in preset_names:
+            if preset not in presets:
+                raise ValueError("Unknown hardware preset: {} (known presets: {})"
+                                 .format(preset, ", ".join(presets)))
+        if base_port + num_devices * PORTS_PER_DEVICE > 0x10000:
+            raise ValueError("Not enough ports above {} for {} devices"
+                             .format(base_port, num_devices))
+        self.workdir = workdir or tempfile.mkdtemp(prefix="usrp_sim_farm_")
+        self.devices = []
+        for index in range(num_devices):
+            device = FarmDevice(
+                index, preset_names[index % len(preset_names)],
+                "{}{:04X}".format(serial_prefix, index),
+                base_port + index * PORTS_PER_DEVICE,
+                os.path.join(self.workdir, "device{}.ini".format(index)))
+            self._write_config(device, config_template)
+            self.devices.append(device)
+
+    @staticmethod
+    def _write_config(device, config_template):
+        parser = configparser.ConfigParser()
+        if config_template is not None:
+            if not parser.read(config_template):
+                raise RuntimeError("Could not read config template: {}"
+                                   .format(config_template))
+        for section in ('hardware', 'chdr'):
+            if section not in parser:
+                parser.add_section(section)
+        parser['hardware']['preset'] = device.preset
+        parser['hardware']['serial_num'] = device.serial
+        parser['chdr']['port'] = str(device.chdr_port)
+        with open(device.config_path, 'w') as config_file:
+            parser.write(config_file)
+
+    def start(self):
+        """Launch all devices. Returns immediately."""
+        for device in self.devices:
+            self.log.debug("Starting {}".format(device))
+            device.process = ProcessManager(device.get_hwd_args())
+            device.process.start()
+        self.log.info("Started {} simulated devices".format(len(self.devices)))
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Stop all devices. Devices which don't stop cleanly within timeout
+        are terminated.
+        """
+        running = [device for device in self.devices if device.process is not None]
+        # Signal all devices first, so they shut down in parallel
+        for device in running:
+            device.process.stop_event.set()
+        for device in running:
+            if not device.process.stop(timeout):
+                self.log.warning("Device {} did not stop, terminating it"
+                                 .format(device.index))
+                device.process.terminate()
+            device.process = None
+
+    def get_failed(self):
+        """Return the devices whose process has exited on its own"""
+        return [device for device in self.devices
+                if device.process is not None
+                and device.process.process.exitcode is not None]
+
+    def get_device_args(self, addr="127.0.0.1"):
+        """Return a list with the UHD device args of every device"""
+        return [device.get_device_args(addr) for device in self.devices]
+
+def parse_args():
+    """Return the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description="Launch a farm of simulated USRPs")
+    parser.add_argument(
+        '-n', '--num-devices',
+        help="Number of simulated devices",
+        type=int,
+        default=2,
+    )
+    parser.add_argument(
+        '--presets',
+        help="Comma-separated list of hardware presets, which are assigned to "
+             "the devices round-robin (available: {})".format(", ".join(presets)),
+        default="E320",
+    )
+    parser.add_argument(
+        '--base-port',
+        help="First port to allocate. Every device uses {} consecutive ports."
+             .format(PORTS_PER_DEVICE),
+        type=int,
+        default=DEFAULT_BASE_PORT,
+    )
+    parser.add_argument(
+        '--serial-prefix',
+        help="Prefix of the generated serial numbers",
+        default=DEFAULT_SERIAL_PREFIX,
+    )
+    parser.add_argument(
+        '--config',
+        help="Simulator config file which is used as a template for the "
+             "config of every device",
+        default=None,
+    )
+    parser.add_argument(
+        '--workdir',
+        help="Directory for the generated config files. Defaults to a new "
+             "temporary directory.",
+        default=None,
+    )
+    return parser.parse_args()
+
+def main():
+    """Run a simulator farm until SIGINT or SIGTERM"""
+    args = parse_args()
+    log = get_main_logger().getChild('farm')
+    farm = SimulatorFarm(log, args.num_devices,
+                         [preset.strip() for preset in args.presets.split(',')],
+                         args.base_port, args.serial_prefix, args.config, args.workdir)
+    stop_event = Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+    farm.start()
+    for device_args in farm.get_device_args():
+        print(device_args)
+    sys.stdout.flush()
+    while not stop_event.wait(1.0):
+        for device in farm.get_failed():
+            log.error("Device {} exited with code {}"
+                      .format(device.index, device.process.process.exitcode))
+            device.process = None
+    log.info("Stopping {} simulated devices".format(len(farm.devices)))
+    farm.stop()
+    return True
+
+if __name__ == '__main__':
+    sys.exit(not main())
@@ -6,5 +6,7 @@ presets['E320'] = {
     'description': "E320-Series Device - SIMULATED",
     'pid': 0xE320,
     'dboard_class': "SimulatedCatalinaDboard",
-    'rfnoc_device_type': 0xE320
+    'rfnoc_device_type': 0xE320,
+    # One radio with two channels, each with its own stream endpoint
+    'topology': {'num_radios': 1, 'num_chans': 2, 'num_stream_eps': 2},
 }
@@ -3,6 +3,16 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 #
+"""This module contains the register spaces of the simulated NoC core
+(client zero) and NoC blocks.
+
+Register accesses are decoded through RegisterMap objects, which are
+built once at construction, so every access is a dictionary lookup
+(or a bisection for address ranges) instead of a chain of comparisons.
+"""
+from bisect import bisect_right
+from functools import partial
+from usrp_mpm.mpmlog import TRACE
 
 # Read Register Addresses
 #! Register address of the protocol version
@@ -36,6 +46,149 @@ RX_CMD_FINITE = 0x1
 
 RADIO_BASE_ADDR = 0x1000
 REG_CHAN_OFFSET = 128 # 0x80
+REG_LOOPBACK = 0x40
+
+RADIO_NOC_ID = 0x12AD1000
+DDC_NOC_ID = 0xDDC00000
+DUC_NOC_ID = 0xD0C00000
+REPLAY_NOC_ID = 0x4E91A000
+
+class RegisterMap:
+    """Address decoder for the register space behind one control port
+
+    Single registers are stored in a dictionary. Address ranges (e.g.
+    register banks which are decoded by a function) are kept sorted by
+    start address and found by bisection. Single registers take
+    precedence over ranges, but only in the directions they have a
+    handler for: Reads from a write-only register are decoded by the
+    range it lies in, and vice versa.
+
+    Read handlers take the address and return the value, write handlers
+    take the address and the value. Reads from unmapped addresses are
+    passed on to the fallback map if there is one, or raise a
+    RuntimeError. Writes to unmapped addresses are ignored.
+    """
+    def __init__(self, fallback=None):
+        self.fallback = fallback
+        self._registers = {}
+        self._range_starts = []
+        self._ranges = []
+
+    def add_register(self, addr, read=None, write=None):
+        """Map a single register"""
+        self._registers[addr] = (read, write)
+
+    def add_range(self, start, end, read=None, write=None):
+        """Map the addresses start <= addr < end"""
+        index = bisect_right(self._range_starts, start)
+        if (index > 0 and self._ranges[index - 1][1] > start) or \
+                (index < len(self._ranges) and self._ranges[index][0] < end):
+            raise ValueError("Register range 0x{:X}..0x{:X} overlaps an existing range"
+                             .format(start, end))
+        self._range_starts.insert(index, start)
+        self._ranges.insert(index, (start, end, read, write))
+
+    def add_channel_registers(self, base, chan_offset, num_chans, registers):
+        """Map a register bank which is repeated for every channel.
+
+        registers maps register offsets to (read, write) tuples. Unlike
+        the handlers of single registers, these handlers take the channel
+        instead of the address, i.e. read(chan) and write(chan, value).
+        """
+        def bind_read(read, chan):
+            return lambda addr: read(chan)
+        def bind_write(write, chan):
+            return lambda addr, value: write(chan, value)
+        for chan in range(num_chans):
+            for offset, (read, write) in registers.items():
+                self.add_register(base + chan * chan_offset + offset,
+                                  bind_read(read, chan) if read else None,
+                                  bind_write(write, chan) if write else None)
+
+    def _lookup(self, addr, direction):
+        """Return the read (direction 0) or write (direction 1) handler
+        of addr, or None
+        """
+        handlers = self._registers.get(addr)
+        if handlers is not None and handlers[direction] is not None:
+            return handlers[direction]
+        index = bisect_right(self._range_starts, addr) - 1
+        if index >= 0:
+            start, end, read, write = self._ranges[index]
+            if start <= addr < end:
+                return (read, write)[direction]
+        return None
+
+    def read(self, addr):
+        """Read the register at addr"""
+        read = self._lookup(addr, 0)
+        if read is not None:
+            return read(addr)
+        if self.fallback is not None:
+            return self.fallback.read(addr)
+        raise RuntimeError("Unsupported register addr: 0x{:08X}".format(addr))
+
+    def write(self, addr, value):
+        """Write value to the register at addr"""
+        write = self._lookup(addr, 1)
+        if write is not None:
+            write(addr, value)
+        elif self.fallback is not None:
+            self.fallback.write(addr, value)
+
+def make_storage_map(port_offset, num_ports, reset_values):
+    """Return a RegisterMap for a simple block, whose registers store the
+    values written to them. The register bank of every port is
+    port_offset bytes long. reset_values maps the offsets of the
+    registers within a bank to their initial values; registers which are
+    missing there read as zero until they are written.
+    """
+    storage = {}
+    for port in range(num_ports):
+        for offset, value in reset_values.items():
+            storage[port * port_offset + offset] = value
+    regmap = RegisterMap()
+    regmap.add_range(0, num_ports * port_offset,
+                     read=lambda addr: storage.get(addr, 0),
+                     write=storage.__setitem__)
+    return regmap
+
+def compat_num(major, minor):
+    """Encode an FPGA compat number"""
+    return ((major & 0xFFFF) << 16) | (minor & 0xFFFF)
+
+# Register maps of simulated NoC blocks. Every entry maps a block type to
+# (noc_id, factory), where factory takes the number of ports and returns
+# the block's RegisterMap. See the respective *_block_control.cpp files
+# for the registers which UHD reads when it initializes a block.
+BLOCK_TYPES = {
+    'DDC': (DDC_NOC_ID, lambda num_ports: make_storage_map(2048, num_ports, {
+        0x00: compat_num(0, 1), # RB_COMPAT_NUM
+        0x08: 3,                # RB_NUM_HB
+        0x10: 255,              # RB_CIC_MAX_DECIM
+    })),
+    'DUC': (DUC_NOC_ID, lambda num_ports: make_storage_map(2048, num_ports, {
+        0x00: compat_num(0, 1), # RB_COMPAT_NUM
+        0x08: 2,                # RB_NUM_HB
+        0x10: 128,              # RB_CIC_MAX_INTERP
+    })),
+    'Replay': (REPLAY_NOC_ID, lambda num_ports: make_storage_map(256, num_ports, {
+        0x00: compat_num(1, 2),       # REG_COMPAT_ADDR
+        0x04: (64 << 16) | 30,        # REG_MEM_SIZE_ADDR: 64-bit words, 1 GiB
+        0x64: 32,                     # REG_PLAY_CMD_FIFO_SPACE_ADDR
+    })),
+}
+
+def make_noc_block(block_type, num_ports):
+    """Create a simulated NoC block of block_type (a key of BLOCK_TYPES)
+    with num_ports input and output ports
+    """
+    if block_type not in BLOCK_TYPES:
+        raise ValueError("Unknown simulated NoC block type: {} (known types: {})"
+                         .format(block_type, ", ".join(BLOCK_TYPES)))
+    noc_id, make_regmap = BLOCK_TYPES[block_type]
+    return NocBlock(1 << 16, num_ports, num_ports, 512, 1, noc_id, 16,
+                    make_regmap(num_ports))
 
 
 class StreamEndpointPort:
@@ -71,10 +224,13 @@ class NocBlock:
 
     see client_zero.hpp:block_config_info
 
+    regmap is an optional RegisterMap with the block's registers. The
+    registers of radio blocks are implemented by NocBlockRegs.
+
     NOTE: The mtu in bytes is calculated by (2**data_mtu * CHDR_W)
     """
     def __init__(self, protover, num_inputs, num_outputs, ctrl_fifo_size,
-                 ctrl_max_async_msgs, noc_id, data_mtu):
+                 ctrl_max_async_msgs, noc_id, data_mtu, regmap=None):
         self.protover = protover
         self.num_inputs = num_inputs
         self.num_outputs = num_outputs
@@ -82,6 +238,7 @@ class NocBlock:
         self.ctrl_max_async_msgs = ctrl_max_async_msgs
         self.noc_id = noc_id
         self.data_mtu = data_mtu
+        self.regmap = regmap
 
     def read_reg(self, reg_num):
         # See client_zero.cpp
@@ -117,7 +274,12 @@ class NocBlockRegs:
     def __init__(self, log, protover, has_xbar, num_xports, blocks, num_stream_ep, num_ctrl_ep,
                  device_type, adjacency_list, sample_width, samples_per_cycle, get_stream_spec,
                  create_tx_stream, stop_tx_stream):
-        """ Args:
+        """ Radio registers are accessed through the control port of the
+        respective radio block. Control port 0 is client zero, the
+        ports of the NoC blocks follow after the control endpoints
+        (see client_zero.hpp:get_ctrl_xbar_port()).
+
+        Args:
         protover -> FPGA Compat number
         has_xbar -> Is there a chdr xbar?
         num_xports -> how many xports
@@ -129,8 +291,10 @@ class NocBlockRegs:
             Port is either StreamEndpointPort or NocBlockPort
         sample_width -> Sample width of radio
         samples_per_cycle -> Samples produced by a radio cycle
-        get_stream_spec -> Callback which returns the current stream spec
-        create_tx_stream -> Callback which takes a block_index and starts a tx stream
+        get_stream_spec -> Callback which takes a radio index and a channel, and
+            returns the current stream spec of that radio channel
+        create_tx_stream -> Callback which takes a block_index and a stream spec
+            and starts a tx stream
         stop_tx_stream -> Callback which takes a block_index and stops a tx stream
         """
         self.log = log.getChild("Regs")
@@ -145,109 +309,140 @@ class NocBlockRegs:
         self.adjacency_list = [(src_blk.to_tuple(num_stream_ep), dst_blk.to_tuple(num_stream_ep))
                                for src_blk, dst_blk in adjacency_list]
         self.adjacency_list_reg = NocBlockRegs._parse_adjacency_list(self.adjacency_list)
+        # Maps (block, port) to the (block, port) it is connected to
+        self.downstream = {}
+        for src_blk, dst_blk in self.adjacency_list:
+            self.downstream.setdefault(src_blk, dst_blk)
+        self.sep_cache = {}
         self.sample_width = sample_width
         self.samples_per_cycle = samples_per_cycle
-        self.radio_reg = {}
+        self.radio_slots = [1 + num_stream_ep + index
+                            for index, block in enumerate(blocks)
+                            if block.noc_id == RADIO_NOC_ID]
+        self.radio_reg = [0] * len(self.radio_slots)
         self.get_stream_spec = get_stream_spec
         self.create_tx_stream = create_tx_stream
         self.stop_tx_stream = stop_tx_stream
+        self.client_zero_map = self._make_client_zero_map()
+        # Maps control ports to the RegisterMaps of the blocks behind them
+        self.port_maps = {}
+        for index, block in enumerate(blocks):
+            ctrl_port = 1 + num_ctrl_ep + index
+            block_slot = 1 + num_stream_ep + index
+            if block_slot in self.radio_slots:
+                self.port_maps[ctrl_port] = self._make_radio_map(
+                    self.radio_slots.index(block_slot), block.num_outputs)
+            elif block.regmap is not None:
+                block.regmap.fallback = self.client_zero_map
+                self.port_maps[ctrl_port] = block.regmap
+        # Accesses to ports without a block (e.g. client zero) are decoded
+        # like accesses to the first radio, which falls back to client zero
+        self.default_map = self.port_maps.get(
+            1 + num_ctrl_ep + self.radio_slots[0] - 1 - num_stream_ep,
+            self.client_zero_map) if self.radio_slots else self.client_zero_map
+
+    def _make_client_zero_map(self):
+        """Build the register map of client zero (see client_zero.cpp)"""
+        regmap = RegisterMap()
+        regmap.add_register(PROTOVER_ADDR, read=lambda _: self.read_protover())
+        regmap.add_register(PORT_CNT_ADDR, read=lambda _: self.read_port_cnt())
+        regmap.add_register(EDGE_CNT_ADDR, read=lambda _: self.read_edge_cnt())
+        regmap.add_register(DEVICE_INFO_ADDR, read=lambda _: self.read_device_info())
+        regmap.add_register(CTRLPORT_CNT_ADDR, read=lambda _: self.read_ctrlport_cnt())
+        regmap.add_range(0x40, RADIO_BASE_ADDR, read=self.read_port_reg)
+        regmap.add_range(ADJACENCY_BASE_ADDR, 1 << 32, read=self.read_adjacency_list)
+        return regmap
+
+    def _make_radio_map(self, radio, num_chans):
+        """Build the register map of a radio block (see radio_control_impl.cpp)"""
+        regmap = RegisterMap(self.client_zero_map)
+        # TODO: 0x1000 should be REG_COMPAT
+        regmap.add_register(RADIO_BASE_ADDR + 0x04, read=lambda _: self.read_radio_width())
+        read_loopback = lambda chan: self.radio_reg[radio]
+        def write_loopback(chan, value):
+            if self.log.isEnabledFor(TRACE):
+                self.log.trace("Storing value: 0x:{:08X} to self.radio_reg for data loopback test"
+                               .format(value))
+            self.radio_reg[radio] = value
+        def write_spec(setter, chan, value):
+            setter(self.get_stream_spec(radio, chan), value)
+        regmap.add_channel_registers(RADIO_BASE_ADDR, REG_CHAN_OFFSET, num_chans, {
+            REG_LOOPBACK: (read_loopback, write_loopback),
+            0x3C: (read_loopback, None),
+            REG_RX_MAX_WORDS_PER_PKT: (None, partial(write_spec,
+                lambda spec, value: setattr(spec, 'packet_samples', value))),
+            REG_RX_CMD_NUM_WORDS_HI: (None, partial(write_spec,
+                lambda spec, value: spec.set_num_words_hi(value))),
+            REG_RX_CMD_NUM_WORDS_LO: (None, partial(write_spec,
+                lambda spec, value: spec.set_num_words_lo(value))),
+            REG_RX_CMD_TIME_HI: (None, partial(write_spec,
+                lambda spec, value: spec.set_timestamp_hi(value))),
+            REG_RX_CMD_TIME_LO: (None, partial(write_spec,
+                lambda spec, value: spec.set_timestamp_lo(value))),
+            REG_RX_CMD: (None, lambda chan, value: self.write_rx_cmd(radio, chan, value)),
+        })
+        # Unmapped radio registers don't fall through to client zero
+        def read_unmapped(addr):
+            raise NotImplementedError("Radio addr 0x{:08X} not implemented".format(addr))
+        regmap.add_range(RADIO_BASE_ADDR, ADJACENCY_BASE_ADDR, read=read_unmapped,
+                         write=lambda addr, value: None)
+        return regmap
+
+    def get_radio_index(self, ctrl_port):
+        """Return the index of the radio which is addressed by a control
+        packet for ctrl_port. Ports which don't belong to a radio block
+        are mapped to the first radio.
+        """
+        block_slot = 1 + self.num_stream_ep + ctrl_port - 1 - self.num_ctrl_ep
+        if block_slot in self.radio_slots:
+            return self.radio_slots.index(block_slot)
+        return 0
 
-    def read(self, addr):
-        # See client_zero.cpp
-        if addr == PROTOVER_ADDR:
-            return self.read_protover()
-        elif addr == PORT_CNT_ADDR:
-            return self.read_port_cnt()
-        elif addr == EDGE_CNT_ADDR:
-            return self.read_edge_cnt()
-        elif addr == DEVICE_INFO_ADDR:
-            return self.read_device_info()
-        elif addr == CTRLPORT_CNT_ADDR:
-            return self.read_ctrlport_cnt()
-        elif addr >= 0x40 and addr < 0x1000:
-            return self.read_port_reg(addr)
-        # See radio_control_impl.cpp
-        elif addr >= 0x1000 and addr < 0x10000:
-            return self.read_radio(addr)
-        # See client_zero.cpp
-        elif addr >= 0x10000:
-            return self.read_adjacency_list(addr)
-        else:
-            raise RuntimeError("Unsupported register addr: 0x{:08X}".format(addr))
+    def get_regmap(self, ctrl_port):
+        """Return the RegisterMap behind ctrl_port"""
+        return self.port_maps.get(ctrl_port, self.default_map)
 
-    def read_radio(self, addr):
-        if addr == 0x1000:
-            raise NotImplementedError() # TODO: This should be REG_COMPAT
-        elif addr == 0x1004:
-            return self.read_radio_width()
-        else:
-            offset = addr - 0x1000
-            chan = offset // 0x80
-            radio_offset = offset % 0x80
-            if radio_offset == 0x40:
-                return self.radio_reg
-            elif radio_offset == 0x3C:
-                return self.radio_reg
-            else:
-                raise NotImplementedError("Radio addr 0x{:08X} not implemented".format(addr))
-
-    def write_radio(self, addr, value):
-        """Write a value to radio registers
+    def read(self, addr, ctrl_port=0):
+        return self.get_regmap(ctrl_port).read(addr)
+
+    def write(self, addr, value, ctrl_port=0):
+        self.get_regmap(ctrl_port).write(addr, value)
+
+    def write_rx_cmd(self, radio, chan, value):
+        """Handle a write to the REG_RX_CMD register of a radio channel
 
         See radio_control_impl.cpp
         """
-        offset = addr - 0x1000
-        assert offset >= 0
-        chan = offset // 0x80
-        if chan > 0: # For now, just operate as if there is one channel
-            self.log.warn("Channel {} not suported".format(chan))
+        stream_spec = self.get_stream_spec(radio, chan)
+        stream_spec.is_timed = value & (1 << 31) != 0
+        value = value & ~(1 << 31) # Clear the flag
+        sep_block_id = self.resolve_ep_towards_outputs((self.radio_slots[radio], chan))
+        if value == RX_CMD_STOP:
+            self.stop_tx_stream(sep_block_id)
             return
-        reg = offset % 0x80
-        if reg == REG_RX_MAX_WORDS_PER_PKT:
-            self.get_stream_spec().packet_samples = value
-        elif reg == REG_RX_CMD_NUM_WORDS_HI:
-            self.get_stream_spec().set_num_words_hi(value)
-        elif reg == REG_RX_CMD_NUM_WORDS_LO:
-            self.get_stream_spec().set_num_words_lo(value)
-        elif reg == REG_RX_CMD_TIME_HI:
-            self.get_stream_spec().set_timestamp_hi(value)
-        elif reg == REG_RX_CMD_TIME_LO:
-            self.get_stream_spec().set_timestamp_lo(value)
-        elif reg == REG_RX_CMD:
-            if value & (1 << 31) != 0:
-                value = value & ~(1 << 31) # Clear the flag
-                self.get_stream_spec().is_timed = True
-            if value == RX_CMD_STOP:
-                sep_block_id = self.resolve_ep_towards_outputs((self.get_radio_port(), chan))
-                self.stop_tx_stream(sep_block_id)
-                return
-            elif value == RX_CMD_CONTINUOUS:
-                self.get_stream_spec().is_continuous = True
-            elif value == RX_CMD_FINITE:
-                self.get_stream_spec().is_continuous = False
-            else:
-                raise RuntimeError("Unknown Stream RX_CMD: {:08X}".format(value))
-            sep_block_id = self.resolve_ep_towards_outputs((self.get_radio_port(), chan))
-            self.create_tx_stream(sep_block_id)
+        elif value == RX_CMD_CONTINUOUS:
+            stream_spec.is_continuous = True
+        elif value == RX_CMD_FINITE:
+            stream_spec.is_continuous = False
+        else:
+            raise RuntimeError("Unknown Stream RX_CMD: {:08X}".format(value))
+        self.create_tx_stream(sep_block_id, stream_spec)
 
     def resolve_ep_towards_outputs(self, block_id):
         """Follow dataflow downstream through the adjacency list until
         a stream_endpoint is encountered
         """
-        for src_blk, dst_blk in self.adjacency_list:
-            if src_blk == block_id:
-                dst_index, dst_port = dst_blk
-                if dst_index <= self.num_stream_ep:
-                    return dst_blk
-                else:
-                    return self.resolve_ep_towards_outputs(dst_blk)
-
-    def get_radio_port(self):
-        """Returns the block_id of the radio block"""
-        radio_noc_id = 0x12AD1000
-        for i, block in enumerate(self.blocks):
-            if block.noc_id == radio_noc_id:
-                return i + 1 + self.num_stream_ep
+        if block_id in self.sep_cache:
+            return self.sep_cache[block_id]
+        current = block_id
+        visited = set()
+        while current in self.downstream and current not in visited:
+            visited.add(current)
+            current = self.downstream[current]
+            if current[0] <= self.num_stream_ep:
+                self.sep_cache[block_id] = current
+                return current
+        return None
 
     # This is the FPGA compat number
     def read_protover(self):
@@ -278,15 +473,6 @@ class NocBlockRegs:
             index = (offset // 4) - 1
             return self.adjacency_list_reg[index]
 
-    def write(self, addr, value):
-        if addr == 0x1040 or addr == 0x10C0:
-            self.log.trace("Storing value: 0x:{:08X} to self.radio_reg for data loopback test".format(value))
-            self.radio_reg = value
-        # assuming 2 channels, out of bounds is
-        # BASE + 2 * CHAN_OFFSET = 0x1000 + 2 * 0x80 = 0x1100
-        elif 0x1000 <= addr < 0x1100:
-            self.write_radio(addr, value)
-
     def read_port_reg(self, addr):
         port = addr // 0x40
         if port < self.num_stream_ep:
@@ -0,0 +1,215 @@
+#
+# Copyright 2020 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+This module contains NumPy-backed sample sources and sinks for the
+simulator.
+
+The sources precompute their samples (sc16, i.e. interleaved little-endian
+int16 I/Q pairs) into a ring buffer once, and then copy slices of that ring
+into the payload buffers of the output stream. No memory is allocated per
+packet. The sink computes running statistics without storing any data.
+
+All constructor arguments can be given as strings, so these classes can be
+used from the [sample.source] and [sample.sink] sections of a simulator
+config file.
+"""
+import zlib
+import numpy as np
+from usrp_mpm.mpmlog import get_logger
+from .sample_source import cli_source, cli_sink, SampleSource, SampleSink
+
+# Bytes per sc16 sample
+SC16_BYTES = 4
+# Full scale of an sc16 sample
+SC16_FULL_SCALE = 2**15 - 1
+# Default length of the sample ring of the signal generators
+DEFAULT_RING_SAMPLES = 2**16
+
+def _to_bool(value):
+    """Convert a config file value to a bool"""
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+def _to_sc16(samples, amplitude):
+    """Convert complex samples in [-1, 1] to an array of sc16 samples,
+    stored as a flat little-endian int16 array of interleaved I/Q values
+    """
+    scaled = np.asarray(samples, dtype=np.complex128) * (float(amplitude) * SC16_FULL_SCALE)
+    sc16 = np.empty(2 * len(scaled), dtype='<i2')
+    sc16[0::2] = np.clip(np.round(scaled.real), -SC16_FULL_SCALE, SC16_FULL_SCALE)
+    sc16[1::2] = np.clip(np.round(scaled.imag), -SC16_FULL_SCALE, SC16_FULL_SCALE)
+    return sc16
+
+class RingSource(SampleSource):
+    """This source copies its payloads from a ring of bytes (any object
+    which supports the buffer protocol, e.g. a NumPy array or an
+    np.memmap).
+
+    If repeat is True, the source wraps around at the end of the ring
+    forever. Otherwise, it is exhausted once the ring has been sent once.
+    """
+    def __init__(self, ring, repeat=True):
+        self.ring = memoryview(ring).cast('B')
+        if len(self.ring) == 0:
+            raise ValueError("RingSource requires a non-empty ring")
+        self.repeat = repeat
+        self.pos = 0
+
+    def fill_packet(self, packet, payload_size):
+        payload = bytearray(payload_size)
+        num_bytes = self.fill_payload(memoryview(payload))
+        if num_bytes == 0:
+            return None
+        packet.set_payload_bytes(bytes(payload[:num_bytes]))
+        return packet
+
+    def fill_payload(self, buffer):
+        ring = self.ring
+        ring_len = len(ring)
+        num_bytes = len(buffer)
+        filled = 0
+        while filled < num_bytes:
+            if self.pos == ring_len:
+                if not self.repeat:
+                    break
+                self.pos = 0
+            chunk = min(num_bytes - filled, ring_len - self.pos)
+            buffer[filled:filled + chunk] = ring[self.pos:self.pos + chunk]
+            filled += chunk
+            self.pos += chunk
+        return filled
+
+    def close(self):
+        self.ring.release()
+
+@cli_source
+class ToneSource(RingSource):
+    """This source generates a complex sine wave.
+
+    freq is given relative to the sample rate (-0.5 to 0.5), and is
+    rounded such that the tone is continuous across the end of the ring.
+    amplitude is relative to full scale.
+    """
+    def __init__(self, freq=0.1, amplitude=0.5, ring_samples=DEFAULT_RING_SAMPLES):
+        ring_samples = int(ring_samples)
+        cycles = round(float(freq) * ring_samples)
+        phase = 2 * np.pi * cycles * np.arange(ring_samples) / ring_samples
+        self.freq = cycles / ring_samples
+        super().__init__(_to_sc16(np.exp(1j * phase), amplitude))
+
+@cli_source
+class NoiseSource(RingSource):
+    """This source generates complex white Gaussian noise.
+
+    amplitude is the RMS amplitude relative to full scale. The noise
+    repeats after ring_samples samples, so pick a ring that is long
+    compared to the expected analysis window.
+    """
+    def __init__(self, amplitude=0.1, seed=None, ring_samples=2**20):
+        rng = np.random.default_rng(None if seed is None else int(seed))
+        ring_samples = int(ring_samples)
+        noise = (rng.standard_normal(ring_samples) + 1j * rng.standard_normal(ring_samples)) \
+            / np.sqrt(2)
+        super().__init__(_to_sc16(noise, amplitude))
+
+@cli_source
+class ChirpSource(RingSource):
+    """This source generates a repeating linear chirp, which sweeps from
+    start_freq to stop_freq (relative to the sample rate) over
+    ring_samples samples.
+    """
+    def __init__(self, start_freq=-0.25, stop_freq=0.25, amplitude=0.5,
+                 ring_samples=DEFAULT_RING_SAMPLES):
+        ring_samples = int(ring_samples)
+        start_freq = float(start_freq)
+        stop_freq = float(stop_freq)
+        idx = np.arange(ring_samples)
+        rate = (stop_freq - start_freq) / ring_samples
+        phase = 2 * np.pi * (start_freq * idx + 0.5 * rate * idx**2)
+        super().__init__(_to_sc16(np.exp(1j * phase), amplitude))
+
+@cli_source
+class MmapFileSource(RingSource):
+    """This source streams a file of samples through a memory map. Unlike
+    FileSource, it doesn't need to reopen the file to loop over it, and
+    the file's contents are paged in by the OS instead of being read.
+    """
+    def __init__(self, read_file, repeat=True):
+        self.mmap = np.memmap(read_file, dtype=np.uint8, mode='r')
+        super().__init__(self.mmap, _to_bool(repeat))
+
+    def close(self):
+        super().close()
+        # Dropping the last reference unmaps the file
+        self.mmap = None
+
+@cli_sink
+class StatsSink(SampleSink):
+    """This sink computes running statistics over the received sc16
+    samples and logs them when it is closed (and every log_interval
+    samples, if given). The samples themselves are discarded.
+
+    The statistics are: Number of packets and samples, mean power and
+    peak magnitude (in dBFS), and the CRC32 of the received bytes,
+    which can be compared against the CRC32 of the transmitted file.
+    """
+    def __init__(self, log_interval=None):
+        self.log = get_logger("StatsSink")
+        self.log_interval = int(float(log_interval)) if log_interval else None
+        self.next_log = self.log_interval
+        self.num_packets = 0
+        self.num_bytes = 0
+        self.sum_power = 0.0
+        self.peak_power = 0
+        self.crc = 0
+        self.scratch = np.empty(0, dtype=np.float64)
+
+    def accept_packet(self, packet):
+        self.accept_payload(bytes(packet.get_payload_bytes()))
+
+    def accept_payload(self, payload):
+        self.num_packets += 1
+        self.num_bytes += len(payload)
+        self.crc = zlib.crc32(payload, self.crc)
+        values = np.frombuffer(payload, dtype='<i2', count=len(payload) // 2)
+        if len(values) > len(self.scratch):
+            self.scratch = np.empty(len(values), dtype=np.float64)
+        squares = np.square(values, out=self.scratch[:len(values)], dtype=np.float64)
+        self.sum_power += squares.sum()
+        if len(values) > 1:
+            peak = (squares[0:len(values) & ~1:2] + squares[1::2]).max()
+            self.peak_power = max(self.peak_power, peak)
+        if self.next_log is not None and self.num_bytes // SC16_BYTES >= self.next_log:
+            self.next_log += self.log_interval
+            self.log.info(self.format_stats())
+
+    def get_stats(self):
+        """Return the current statistics as a dictionary"""
+        num_samples = self.num_bytes // SC16_BYTES
+        full_scale_power = float(SC16_FULL_SCALE)**2
+        def to_dbfs(power):
+            return float(10 * np.log10(power / full_scale_power)) if power > 0 \
+                else float('-inf')
+        return {
+            'num_packets': self.num_packets,
+            'num_samples': num_samples,
+            'mean_power_dbfs': to_dbfs(self.sum_power / num_samples) if num_samples
+                               else float('-inf'),
+            'peak_power_dbfs': to_dbfs(self.peak_power),
+            'crc32': self.crc,
+        }
+
+    def format_stats(self):
+        """Return the current statistics as a human-readable string"""
+        stats = self.get_stats()
+        return ("{num_packets} packets, {num_samples} samples, "
+                "mean power: {mean_power_dbfs:.2f} dBFS, "
+                "peak power: {peak_power_dbfs:.2f} dBFS, "
+                "CRC32: 0x{crc32:08X}".format(**stats))
+
+    def close(self):
+        self.log.info("Stream done: {}".format(self.format_stats()))
@@ -186,6 +186,7 @@ class StreamSpec:
 
     def __str__(self):
         return "StreamSpec{{total_samples: {}, is_continuous: {}, packet_samples: {}," \
-               "sample_rate: {}, dst_epid: {}, addr: {}}}" \
+               "sample_rate: {}, dst_epid: {}, addr: {}, is_timed: {}, init_timestamp: {}}}" \
                .format(self.total_samples, self.is_continuous, self.packet_samples,
-                       self.sample_rate, self.dst_epid, self.addr)
+                       self.sample_rate, self.dst_epid, self.addr, self.is_timed,
+                       self.init_timestamp)
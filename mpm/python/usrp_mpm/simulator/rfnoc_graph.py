@@ -11,7 +11,9 @@ also instantiates the registers and acts as an interface between
 the chdr packets on the network and the registers.
 """
 from uhd.chdr import MgmtOpCode, MgmtOpCfg, MgmtOpSelDest
-from .noc_block_regs import NocBlockRegs, NocBlock, StreamEndpointPort, NocBlockPort
+from usrp_mpm.mpmlog import TRACE
+from .noc_block_regs import NocBlockRegs, NocBlock, StreamEndpointPort, NocBlockPort, \
+    RADIO_NOC_ID, make_noc_block
 from .rfnoc_common import Node, NodeType, StreamSpec, to_iter, swap_src_dst, RETURN_TO_SENDER
 from .stream_endpoint_node import StreamEndpointNode
 
@@ -50,8 +52,9 @@ class XportNode(Node):
                 self.addr_map[payload.src_epid] = addr
             else:
                 raise NotImplementedError(op.op_code)
-        self.log.trace("Xport {} processed hop:\n{}"
-                       .format(self.node_inst, our_hop))
+        if self.log.isEnabledFor(TRACE):
+            self.log.trace("Xport {} processed hop:\n{}"
+                           .format(self.node_inst, our_hop))
         packet.set_payload(payload)
         if send_upstream:
             return RETURN_TO_SENDER
@@ -112,8 +115,9 @@ class XbarNode(Node):
                 destination = self.ports[dest_port]
             else:
                 raise NotImplementedError(op.op_code)
-        self.log.trace("Xbar {} processed hop:\n{}"
-                       .format(self.node_inst, our_hop))
+        if self.log.isEnabledFor(TRACE):
+            self.log.trace("Xbar {} processed hop:\n{}"
+                           .format(self.node_inst, our_hop))
         packet.set_payload(payload)
         if send_upstream:
             return RETURN_TO_SENDER
@@ -147,53 +151,70 @@ class RFNoCGraph:
 
     It serves as an interface between the ChdrEndpoint and the
     individual blocks/nodes.
+
+    The radio blocks and their connections to the stream endpoints are
+    generated from topology (see config.Topology). Every radio channel
+    has its own StreamSpec.
     """
-    def __init__(self, graph_list, log, device_id, send_wrapper, chdr_w, rfnoc_device_id):
+    def __init__(self, graph_list, log, device_id, send_wrapper, chdr_w, rfnoc_device_id,
+                 topology, timekeeper=None, stream_options=None, rx_queue_cap=None):
         self.log = log.getChild("Graph")
         self.device_id = device_id
-        self.stream_spec = StreamSpec()
+        self.topology = topology
+        self.stream_specs = [[StreamSpec() for _ in range(topology.num_chans)]
+                             for _ in range(topology.num_radios)]
         self.stream_ep = []
         for node in graph_list:
             if node.__class__ is StreamEndpointNode:
                 self.stream_ep.append(node)
             node.graph_init(self.log, self.get_device_id, send_wrapper=send_wrapper,
-                            chdr_w=chdr_w, dst_to_addr=self.dst_to_addr)
+                            chdr_w=chdr_w, dst_to_addr=self.dst_to_addr,
+                            timekeeper=timekeeper, stream_options=stream_options,
+                            rx_queue_cap=rx_queue_cap)
         # These must be done sequentially so that get_device_id is initialized on all nodes
         # before from_index is called on any node
         for node in graph_list:
             node.from_index(graph_list)
         self.graph_map = {node.get_local_id(): node
                           for node in graph_list}
-        # For now, just use one radio block and hardcode it to the first stream endpoint
-        radio = NocBlock(1 << 16, 2, 2, 512, 1, 0x12AD1000, 16)
-        adj_list = [
-            (StreamEndpointPort(0, 0), NocBlockPort(0, 0)),
-            (StreamEndpointPort(0, 1), NocBlockPort(0, 1)),
-            (NocBlockPort(0, 0), StreamEndpointPort(0, 0)),
-            (NocBlockPort(0, 1), StreamEndpointPort(0, 1))
-        ]
-        self.regs = NocBlockRegs(self.log, 1 << 16, True, 1, [radio], len(self.stream_ep), 1,
+        assert len(self.stream_ep) == topology.num_stream_eps, \
+            "Topology requires {} stream endpoints, graph has {}" \
+            .format(topology.num_stream_eps, len(self.stream_ep))
+        radios = [NocBlock(1 << 16, topology.num_chans, topology.num_chans, 512, 1,
+                           RADIO_NOC_ID, 16)
+                  for _ in range(topology.num_radios)]
+        blocks = radios + [make_noc_block(block_type, topology.num_chans)
+                           for block_type in topology.blocks]
+        adj_list = []
+        for radio in range(topology.num_radios):
+            for chan in range(topology.num_chans):
+                sep_inst, sep_port = topology.get_radio_chan_sep(radio, chan)
+                adj_list.append((StreamEndpointPort(sep_inst, sep_port),
+                                 NocBlockPort(radio, chan)))
+                adj_list.append((NocBlockPort(radio, chan),
+                                 StreamEndpointPort(sep_inst, sep_port)))
+        self.regs = NocBlockRegs(self.log, 1 << 16, True, 1, blocks, len(self.stream_ep), 1,
                                  rfnoc_device_id, adj_list, 8, 1, self.get_stream_spec,
                                  self.radio_tx_cmd, self.radio_tx_stop)
 
-    def radio_tx_cmd(self, sep_block_id):
+    def radio_tx_cmd(self, sep_block_id, stream_spec):
         """Triggers the creation of a ChdrOutputStream in the ChdrEndpoint using
-        the current stream_spec.
+        stream_spec.
 
         This method transforms the sep_block_id into an epid useable by
         the transmit code
         """
-        # TODO: Use the port
         sep_blk, sep_port = sep_block_id
         # The NoC Block index for stream endpoints is the inst + 1
         # See rfnoc_graph.cpp:rfnoc_graph_impl#_init_sep_map()
         sep_inst = sep_blk - 1
         sep_id = (NodeType.STRM_EP, sep_inst)
         stream_ep = self.graph_map[sep_id]
-        self.stream_spec.addr = self.dst_to_addr(stream_ep)
-        self.log.info("Streaming with StreamSpec:")
-        self.log.info(str(self.stream_spec))
-        stream_ep.begin_output(self.stream_spec)
+        stream_spec.addr = self.dst_to_addr(stream_ep)
+        self.log.info("Streaming from SEP {} port {} with StreamSpec:"
+                      .format(sep_inst, sep_port))
+        self.log.info(str(stream_spec))
+        stream_ep.begin_output(stream_spec, sep_port)
 
     def radio_tx_stop(self, sep_block_id):
         """Triggers the destuction of a ChdrOutputStream in the ChdrEndpoint
@@ -207,7 +228,7 @@ class RFNoCGraph:
         # See rfnoc_graph.cpp:rfnoc_graph_impl#_init_sep_map()
         sep_id = (NodeType.STRM_EP, sep_inst)
         stream_ep = self.graph_map[sep_id]
-        stream_ep.end_output()
+        stream_ep.end_output(sep_port)
 
     def get_device_id(self):
         return self.device_id
@@ -217,8 +238,14 @@ class RFNoCGraph:
         self.device_id = device_id
 
     def change_spp(self, spp):
-        """Change the Stream Samples per Packet"""
-        self.stream_spec.packet_samples = spp
+        """Change the Stream Samples per Packet of all radio channels"""
+        for stream_spec in self.get_stream_specs():
+            stream_spec.packet_samples = spp
+
+    def set_sample_rate(self, rate):
+        """Change the sample rate of all radio channels"""
+        for stream_spec in self.get_stream_specs():
+            stream_spec.sample_rate = rate
 
     def find_ep_by_id(self, epid):
         """Find a Stream Endpoint which identifies with epid"""
@@ -273,6 +300,11 @@ class RFNoCGraph:
                                          sender=sender, num_bytes=num_bytes)
         return response_packet
 
-    def get_stream_spec(self):
-        """ Get the current output stream configuration """
-        return self.stream_spec
+    def get_stream_spec(self, radio=0, chan=0):
+        """ Get the current output stream configuration of a radio channel """
+        return self.stream_specs[radio][chan]
+
+    def get_stream_specs(self):
+        """ Get the output stream configurations of all radio channels """
+        return [stream_spec for radio_specs in self.stream_specs
+                for stream_spec in radio_specs]
@@ -38,6 +38,24 @@ def from_import_path(class_name, import_path):
         module_lookup[import_path] = module
     return getattr(module, class_name)
 
+class _PayloadPacket:
+    """Stand-in for a ChdrPacket, which only stores its payload. This
+    is used to implement SampleSource.fill_payload() in terms of
+    SampleSource.fill_packet(), and SampleSink.accept_payload() in terms
+    of SampleSink.accept_packet()
+    """
+    __slots__ = ("payload",)
+    def __init__(self, payload=b""):
+        self.payload = payload
+
+    def set_payload_bytes(self, payload):
+        """Store the payload"""
+        self.payload = payload
+
+    def get_payload_bytes(self):
+        """Return the payload"""
+        return self.payload
+
 class SampleSource:
     """This class defines the interface of a SampleSource. It
     provides samples to the simulator which are then sent over the
@@ -50,6 +68,23 @@ class SampleSource:
         """
         raise NotImplementedError()
 
+    def fill_payload(self, buffer):
+        """This method should write samples directly into buffer (a
+        writable buffer such as a memoryview), and return the number
+        of bytes written. Returning 0 signals that this source is
+        exhausted.
+
+        This is what the simulator's output streams use. The default
+        implementation calls fill_packet() and copies the payload, so
+        sources only need to override this to avoid the copy.
+        """
+        packet = self.fill_packet(_PayloadPacket(), len(buffer))
+        if packet is None:
+            return 0
+        num_bytes = min(len(packet.payload), len(buffer))
+        buffer[:num_bytes] = bytes(packet.payload[:num_bytes])
+        return num_bytes
+
     def close(self):
         """Use this to clean up any resources held by the object"""
         raise NotImplementedError()
@@ -63,6 +98,16 @@ class SampleSink:
         """Called whenever a new packet is received"""
         raise NotImplementedError()
 
+    def accept_payload(self, payload):
+        """Called with the payload of a received data packet, as a
+        memoryview into the receive buffer. The view is only valid
+        until this method returns.
+
+        The default implementation copies the payload and passes it on
+        to accept_packet().
+        """
+        self.accept_packet(_PayloadPacket(bytes(payload)))
+
     def close(self):
         """Use this to clean up any resources held by the object"""
         raise NotImplementedError()
@@ -76,18 +121,31 @@ class NullSamples(SampleSource, SampleSink):
     """
     def __init__(self, log=None):
         self.log = log
+        self.zeros = bytes(0)
 
     def fill_packet(self, packet, payload_size):
         if self.log is not None:
             self.log.debug("Null Source called, providing {} bytes of zeroes".format(payload_size))
-        payload = bytes(payload_size)
-        packet.set_payload_bytes(payload)
+        if len(self.zeros) < payload_size:
+            self.zeros = bytes(payload_size)
+        packet.set_payload_bytes(self.zeros[:payload_size])
         return packet
 
+    def fill_payload(self, buffer):
+        if self.log is not None:
+            self.log.debug("Null Source called, providing {} bytes of zeroes".format(len(buffer)))
+        if len(self.zeros) < len(buffer):
+            self.zeros = bytes(len(buffer))
+        buffer[:] = memoryview(self.zeros)[:len(buffer)]
+        return len(buffer)
+
     def accept_packet(self, packet):
+        self.accept_payload(packet.get_payload_bytes())
+
+    def accept_payload(self, payload):
         if self.log is not None:
             self.log.debug("Null Source called, accepting {} bytes of payload"
-                           .format(len(packet.get_payload_bytes())))
+                           .format(len(payload)))
 
     def close(self):
         pass
@@ -107,6 +165,11 @@ class IOSource(SampleSource):
         packet.set_payload_bytes(payload)
         return packet
 
+    def fill_payload(self, buffer):
+        if not hasattr(self.read_obj, "readinto"):
+            return super().fill_payload(buffer)
+        return self.read_obj.readinto(buffer) or 0
+
     def close(self):
         self.read_obj.close()
 
@@ -119,8 +182,10 @@ class IOSink(SampleSink):
         self.write_obj = write
 
     def accept_packet(self, packet):
-        payload = packet.get_payload_bytes()
-        written = self.write_obj.write(bytes(payload))
+        self.accept_payload(bytes(packet.get_payload_bytes()))
+
+    def accept_payload(self, payload):
+        written = self.write_obj.write(payload)
         assert written == len(payload)
 
     def close(self):
@@ -150,6 +215,14 @@ class FileSource(IOSource):
         packet.set_payload_bytes(payload)
         return packet
 
+    def fill_payload(self, buffer):
+        num_bytes = self.read_obj.readinto(buffer)
+        if num_bytes == 0 and self.repeat:
+            self.read_obj.close()
+            self.read_obj = self.open()
+            num_bytes = self.read_obj.readinto(buffer)
+        return num_bytes
+
 @cli_sink
 class FileSink(IOSink):
     """This class creates a SampleSink using a file path"""
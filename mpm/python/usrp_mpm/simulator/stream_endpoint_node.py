@@ -9,6 +9,7 @@ It also houses the logic to create output and input streams.
 """
 from uhd.chdr import MgmtOpCode, MgmtOpCfg, MgmtOp, PacketType, CtrlStatus, CtrlOpCode, \
     ChdrHeader, StrcOpCode, StrcPayload, ChdrPacket, StrsStatus
+from usrp_mpm.mpmlog import TRACE
 from .rfnoc_common import Node, NodeType, to_iter, swap_src_dst, RETURN_TO_SENDER
 from .stream_ep_regs import StreamEpRegs, STRM_STATUS_FC_ENABLED
 from .chdr_stream import ChdrOutputStream, ChdrInputStream
@@ -21,22 +22,28 @@ class StreamEndpointNode(Node):
     registers of the noc_blocks which are held in the RFNoCGraph and
     passed into handle_packet as the regs parameter
     """
-    def __init__(self, node_inst, source_gen, sink_gen):
+    def __init__(self, node_inst, source_gen, sink_gen, num_ports=1):
         super().__init__(node_inst)
         self.epid = node_inst
         self.dst_epid = None
         self.upstream = None
-        # ---- These 4 aren't configurable right now
+        # ---- These 2 aren't configurable right now
         self.has_data = True
         self.has_ctrl = True
-        self.input_ports = 1
-        self.output_ports = 1
         # ----
+        # Number of radio channels connected to this endpoint. Only one
+        # of them can stream at a time (see begin_output()).
+        self.input_ports = num_ports
+        self.output_ports = num_ports
         self.input_stream = None
         self.output_stream = None
+        self.output_port = None
         self.chdr_w = None
         self.send_wrapper = None
         self.dst_to_addr = None
+        self.timekeeper = None
+        self.stream_options = None
+        self.rx_queue_cap = None
         self.source_gen = source_gen
         self.sink_gen = sink_gen
         self.downstream_capacity = None
@@ -70,12 +77,16 @@ class StreamEndpointNode(Node):
         self.begin_input()
         return STRM_STATUS_FC_ENABLED
 
-    def graph_init(self, log, set_device_id, send_wrapper, chdr_w, dst_to_addr, **kwargs):
+    def graph_init(self, log, set_device_id, send_wrapper, chdr_w, dst_to_addr,
+                   timekeeper=None, stream_options=None, rx_queue_cap=None, **kwargs):
         super().graph_init(log, set_device_id)
         self.ep_regs.log = log
         self.chdr_w = chdr_w
         self.send_wrapper = send_wrapper
         self.dst_to_addr = dst_to_addr
+        self.timekeeper = timekeeper
+        self.stream_options = stream_options
+        self.rx_queue_cap = rx_queue_cap
 
     def get_type(self):
         return NodeType.STRM_EP
@@ -120,13 +131,16 @@ class StreamEndpointNode(Node):
             else:
                 raise NotImplementedError("op_code {} is not implemented for StreamEndpointNode"
                                           .format(op.op_code))
-        self.log.trace("Stream Endpoint {} processed hop:\n{}"
-                       .format(self.node_inst, our_hop))
+        trace = self.log.isEnabledFor(TRACE)
+        if trace:
+            self.log.trace("Stream Endpoint {} processed hop:\n{}"
+                           .format(self.node_inst, our_hop))
         packet.set_payload(payload)
         if send_upstream:
             return RETURN_TO_SENDER
-        self.log.trace("Stream Endpoint {} received packet:\n{}"
-                       .format(self.node_inst, packet))
+        if trace:
+            self.log.trace("Stream Endpoint {} received packet:\n{}"
+                           .format(self.node_inst, packet))
 
     def _handle_ctrl_packet(self, packet, regs, **kwargs):
         payload = packet.get_payload_ctrl()
@@ -135,10 +149,18 @@ class StreamEndpointNode(Node):
             raise RuntimeError("Control Status not OK: {}".format(payload.status))
         if payload.op_code == CtrlOpCode.READ:
             payload.is_ack = True
-            payload.set_data([regs.read(payload.address)])
+            payload.set_data([regs.read(payload.address, payload.dst_port)])
         elif payload.op_code == CtrlOpCode.WRITE:
             payload.is_ack = True
-            regs.write(payload.address, payload.get_data()[0])
+            regs.write(payload.address, payload.get_data()[0], payload.dst_port)
+        elif payload.op_code == CtrlOpCode.BLOCK_READ:
+            payload.is_ack = True
+            payload.set_data([regs.read(payload.address + 4 * i, payload.dst_port)
+                              for i in range(len(payload.get_data()))])
+        elif payload.op_code == CtrlOpCode.BLOCK_WRITE:
+            payload.is_ack = True
+            for i, value in enumerate(payload.get_data()):
+                regs.write(payload.address + 4 * i, value, payload.dst_port)
         else:
             raise NotImplementedError("Unknown Control OpCode: {}".format(payload.op_code))
         packet.set_payload(payload)
@@ -177,7 +199,7 @@ class StreamEndpointNode(Node):
         packet = ChdrPacket(self.chdr_w, header, payload)
         self.send_wrapper.send_packet(packet, addr)
 
-    def begin_output(self, stream_spec):
+    def begin_output(self, stream_spec, port=0):
         """Spin up a new ChdrOutputStream thread which transmits from src_epid
         according to stream_spec.
 
@@ -185,17 +207,25 @@ class StreamEndpointNode(Node):
         Stream Command
         """
         # As of now, only one stream endpoint port per stream endpoint
-        # is supported.
-        assert self.output_stream is None, \
-            "Output Stream already running on epid: {}".format(self.epid)
+        # can stream at a time.
+        if self.output_stream is not None:
+            self.log.error("Output Stream already running on epid: {} port {}, "
+                           "ignoring stream command for port {}. Use one stream "
+                           "endpoint per radio channel to stream from several "
+                           "channels at once."
+                           .format(self.epid, self.output_port, port))
+            return
         stream_spec.dst_epid = self.dst_epid
         stream_spec.capacity_packets = self.downstream_capacity[0]
         stream_spec.capacity_bytes = self.downstream_capacity[1]
         self.downstream_capacity = None
+        self.output_port = port
         self.output_stream = ChdrOutputStream(self.log, self.chdr_w, self.source_gen(),
-                                              stream_spec, self.send_wrapper)
+                                              stream_spec, self.send_wrapper,
+                                              timekeeper=self.timekeeper,
+                                              stream_options=self.stream_options)
 
-    def end_output(self):
+    def end_output(self, port=0):
         """Stops src_epid's current transmission. This opens up the sep
         to new transmissions in the future.
 
@@ -203,8 +233,11 @@ class StreamEndpointNode(Node):
         receives a Stop Stream command or when the transmission has no
         more samples to send.
         """
+        if self.output_stream is None or port != self.output_port:
+            return
         self.output_stream.finish()
         self.output_stream = None
+        self.output_port = None
 
     def begin_input(self):
         """Spin up a new ChdrInputStream thread which receives all data and strc
@@ -219,5 +252,8 @@ class StreamEndpointNode(Node):
         # a new one on the same epid, just quietly close the old one.
         if self.input_stream is not None:
             self.input_stream.finish()
+        queue_cap = self.rx_queue_cap if self.rx_queue_cap is not None \
+            else ChdrInputStream.QUEUE_CAP
         self.input_stream = ChdrInputStream(self.log, self.chdr_w,
-                                            self.sink_gen(), self.send_wrapper, self.epid)
+                                            self.sink_gen(), self.send_wrapper, self.epid,
+                                            queue_cap=queue_cap)
@@ -0,0 +1,117 @@
+#
+# Copyright 2020 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+This module contains the timekeeper of the simulated device, and the
+clock which paces the simulator's output streams.
+"""
+import random
+import threading
+import time
+
+class Timekeeper:
+    """This class simulates an RFNoC timekeeper. Device time is derived
+    from time.monotonic(), so it never jumps with the system clock.
+
+    Simulated PPS edges occur once per second, counted from the creation
+    of the timekeeper.
+    """
+    DEFAULT_TICK_RATE = 122.88e6
+
+    def __init__(self, tick_rate=DEFAULT_TICK_RATE):
+        self._lock = threading.Lock()
+        self._epoch = time.monotonic()
+        self._base_time = self._epoch
+        self._base_ticks = 0
+        self._tick_rate = float(tick_rate)
+        # (ticks, monotonic time) of a set_ticks() on the next PPS
+        self._pending = None
+
+    def _last_pps(self, now):
+        """Return the monotonic time of the last PPS edge before now"""
+        return self._epoch + int(now - self._epoch)
+
+    def _apply_pending(self, now):
+        if self._pending is not None and now >= self._pending[1]:
+            self._base_ticks, self._base_time = self._pending
+            self._pending = None
+
+    def _ticks_at(self, now):
+        self._apply_pending(now)
+        return int(self._base_ticks + (now - self._base_time) * self._tick_rate)
+
+    def get_tick_rate(self):
+        """Return the tick rate in Hz"""
+        return self._tick_rate
+
+    def set_tick_rate(self, tick_rate):
+        """Change the tick rate, without changing the current time"""
+        with self._lock:
+            now = time.monotonic()
+            self._base_ticks = self._ticks_at(now)
+            self._base_time = now
+            self._tick_rate = float(tick_rate)
+
+    def get_ticks(self, last_pps=False):
+        """Return the current time in ticks, or the time of the last PPS
+        edge if last_pps is True
+        """
+        with self._lock:
+            now = time.monotonic()
+            if last_pps:
+                now = self._last_pps(now)
+            return self._ticks_at(now)
+
+    def set_ticks(self, ticks, next_pps=False):
+        """Set the current time in ticks. If next_pps is True, the time
+        is set on the next PPS edge instead.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if next_pps:
+                self._pending = (int(ticks), self._last_pps(now) + 1)
+            else:
+                self._pending = None
+                self._base_ticks = int(ticks)
+                self._base_time = now
+
+    def ticks_to_monotonic(self, ticks):
+        """Return the time.monotonic() value at which the device time
+        reaches ticks
+        """
+        with self._lock:
+            self._apply_pending(time.monotonic())
+            return self._base_time + (ticks - self._base_ticks) / self._tick_rate
+
+class PacingClock:
+    """This class paces a stream of samples in real time.
+
+    Every send is scheduled against an ideal timeline which is computed
+    from the total number of samples, instead of sleeping for a fixed
+    time per packet. Oversleeping, scheduling delays and jitter thus
+    don't accumulate as drift.
+
+    jitter is the maximum delay in seconds which is randomly added to
+    every send. It does not affect the timeline.
+    """
+    def __init__(self, start_time, sample_rate, jitter=0.0, seed=None):
+        self.start_time = start_time
+        self.sample_rate = float(sample_rate)
+        self.jitter = float(jitter)
+        self.rng = random.Random(seed)
+
+    def wait(self, num_samples):
+        """Block until num_samples samples have been produced since
+        start_time. Returns how late this call was in seconds (zero or
+        positive).
+        """
+        deadline = self.start_time + num_samples / self.sample_rate
+        if self.jitter:
+            deadline += self.rng.uniform(0, self.jitter)
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            return 0.0
+        return -delay
@@ -204,3 +204,20 @@ class UIO(object):
         """
         assert not self._read_only
         return self._uio.poke32(addr, val)
+
+    def poke32_batch(self, pokes, verify=False):
+        """
+        Writes a list of (addr, val) pairs, in the given order. All values are
+        written by a single call into the C++ layer, and the device is only
+        opened once (unless it is open already). An empty batch does not open
+        the device at all.
+        If verify is True, every register is read back after it was written,
+        and a RuntimeError is raised if it does not hold the written value.
+        Will throw if read_only was set to True.
+        """
+        assert not self._read_only
+        pokes = list(pokes)
+        if not pokes:
+            return
+        with self:
+            self._uio.poke32_batch(pokes, verify)